@@ -0,0 +1,85 @@
+"""
+Incremental prompt construction for the agent strategies.
+
+Every agent round sends the whole conversation to the model again. The helpers
+here remember the work done for earlier rounds, so a round only processes the
+messages and scratchpad units it added.
+"""
+
+from dify_plugin.entities.model.message import (
+    PromptMessage,
+    PromptMessageContentType,
+    UserPromptMessage,
+)
+from dify_plugin.interfaces.agent import AgentScratchpadUnit
+
+
+def _placeholder_text(contents: list) -> str:
+    return "\n".join(
+        content.data
+        if content.type == PromptMessageContentType.TEXT
+        else "[image]"
+        if content.type == PromptMessageContentType.IMAGE
+        else "[file]"
+        for content in contents
+    )
+
+
+class ImageFreeMessages:
+    """
+    Copies of user messages with their images and files replaced by placeholder text.
+
+    A copy is made once per message and looked up by identity afterwards. Other
+    messages are returned as they are, so nothing in the history is copied again
+    on later rounds.
+    """
+
+    def __init__(self):
+        # the original message is kept with its copy, so its id cannot be reused
+        self._copies: dict[int, tuple[PromptMessage, PromptMessage]] = {}
+
+    def get(self, message: PromptMessage) -> PromptMessage:
+        if not (isinstance(message, UserPromptMessage) and isinstance(message.content, list)):
+            return message
+        cached = self._copies.get(id(message))
+        if cached is None or cached[0] is not message:
+            text_only = message.model_copy(update={"content": _placeholder_text(message.content)})
+            cached = self._copies[id(message)] = (message, text_only)
+        return cached[1]
+
+    def strip(self, messages: list[PromptMessage]) -> list[PromptMessage]:
+        return [self.get(message) for message in messages]
+
+
+def format_scratchpad_unit(unit: AgentScratchpadUnit) -> str:
+    if unit.is_final():
+        return f"Final Answer: {unit.agent_response}"
+    text = f"Thought: {unit.thought}\n\n"
+    if unit.action_str:
+        text += f"Action: {unit.action_str}\n\n"
+    if unit.observation:
+        text += f"Observation: {unit.observation}\n\n"
+    return text
+
+
+class ScratchpadTranscript:
+    """
+    The ReAct scratchpad rendered as the text of the assistant message.
+
+    Units are rendered once, after their round has finished, and appended to the
+    text of the earlier rounds.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._rendered = 0
+
+    def update(self, units: list[AgentScratchpadUnit]) -> str:
+        if len(units) < self._rendered:
+            # a different scratchpad, start over
+            self.text = ""
+            self._rendered = 0
+        if len(units) > self._rendered:
+            self.text += "".join(format_scratchpad_unit(unit) for unit in units[self._rendered :])
+            self._rendered = len(units)
+        return self.text
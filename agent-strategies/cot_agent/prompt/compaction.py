@@ -0,0 +1,280 @@
+"""
+Token-budgeted compaction of the prompt of an agent run.
+
+The prompt of every round repeats the conversation history and the observations
+of earlier rounds. The compactor keeps it within the context window of the
+model by capping each tool response when it is recorded and, once the prompt
+outgrows its budget, by shortening the oldest observations and then dropping
+the oldest conversation turns.
+
+Compaction goes well below the budget in one step, and its result is reused on
+later rounds. Most rounds therefore only append to the prompt of the previous
+round, which keeps provider-side prompt caching effective.
+"""
+
+import dataclasses
+import json
+from collections.abc import Iterable
+
+from dify_plugin.entities.model import ModelPropertyKey
+from dify_plugin.entities.model.message import (
+    AssistantPromptMessage,
+    PromptMessage,
+    PromptMessageContentType,
+    PromptMessageTool,
+    SystemPromptMessage,
+    ToolPromptMessage,
+    UserPromptMessage,
+)
+from dify_plugin.interfaces.agent import AgentModelConfig, AgentScratchpadUnit
+
+# a rough, tokenizer-free estimate that errs on the side of more tokens for CJK text
+BYTES_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+NON_TEXT_CONTENT_TOKENS = 256
+# tokens kept free for tool schemas and the estimate's error
+RESERVED_TOKENS = 1024
+# compaction goes down to this share of the budget, so it is not needed again soon
+LOW_WATER_RATIO = 0.75
+MAX_TOOL_RESPONSE_TOKENS = 8192
+COMPACTED_RESPONSE_TOKENS = 64
+# the messages of the latest rounds are never compacted
+KEEP_RECENT_MESSAGES = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text.encode("utf-8")) // BYTES_PER_TOKEN)
+
+
+def truncate_text(text: str, max_tokens: int) -> str:
+    """Keep the head and the tail of ``text`` within about ``max_tokens`` tokens."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    data = text.encode("utf-8")
+    keep = max_tokens * BYTES_PER_TOKEN
+    head = data[: keep * 3 // 4].decode("utf-8", errors="ignore")
+    tail = data[len(data) - keep // 4 :].decode("utf-8", errors="ignore")
+    omitted = len(text) - len(head) - len(tail)
+    return f"{head}\n...[{omitted} characters omitted]...\n{tail}"
+
+
+def model_token_budget(model: AgentModelConfig) -> int | None:
+    """The prompt tokens the model can take next to its completion, or None if unknown."""
+    if not model.entity:
+        return None
+    context_size = model.entity.model_properties.get(ModelPropertyKey.CONTEXT_SIZE)
+    if not context_size:
+        return None
+    max_tokens = 0
+    for parameter_rule in model.entity.parameter_rules:
+        if parameter_rule.name == "max_tokens" or parameter_rule.use_template == "max_tokens":
+            params = model.completion_params or {}
+            max_tokens = params.get(parameter_rule.name) or params.get("max_tokens") or 0
+    return max(int(context_size) - int(max_tokens) - RESERVED_TOKENS, 0)
+
+
+@dataclasses.dataclass
+class CompactionStats:
+    budget: int | None = None
+    prompt_tokens: int = 0
+    truncated_responses: int = 0
+    compacted_messages: int = 0
+    dropped_messages: int = 0
+    saved_tokens: int = 0
+
+    def to_dict(self) -> dict:
+        return dataclasses.asdict(self)
+
+
+class PromptCompactor:
+    """
+    Compacts the prompt messages of one agent run.
+
+    Compacted and dropped messages are remembered by identity, so every round
+    sends the same compacted prefix until the budget is exceeded again.
+    """
+
+    def __init__(self, budget: int | None, max_response_tokens: int = MAX_TOOL_RESPONSE_TOKENS):
+        self.budget = budget
+        self.max_response_tokens = (
+            min(max_response_tokens, max(budget // 4, COMPACTED_RESPONSE_TOKENS))
+            if budget
+            else max_response_tokens
+        )
+        self.stats = CompactionStats(budget=budget)
+        self._tokens: dict[int, tuple[PromptMessage, int]] = {}
+        self._replacements: dict[int, tuple[PromptMessage, PromptMessage]] = {}
+        self._replacement_ids: set[int] = set()
+        self._dropped: dict[int, PromptMessage] = {}
+
+    @classmethod
+    def for_model(
+        cls, model: AgentModelConfig, tools: list[PromptMessageTool] | None = None
+    ) -> "PromptCompactor":
+        """A compactor for the model, whose budget leaves room for the tool schemas."""
+        budget = model_token_budget(model)
+        if budget is not None and tools:
+            schemas = json.dumps([tool.model_dump(mode="json") for tool in tools])
+            budget = max(budget - estimate_tokens(schemas), 0)
+        return cls(budget)
+
+    def cap_response(self, text: str) -> str:
+        """Cap a tool response before it is added to the prompt."""
+        capped = truncate_text(text, self.max_response_tokens)
+        if capped is not text:
+            self.stats.truncated_responses += 1
+            self.stats.saved_tokens += estimate_tokens(text) - estimate_tokens(capped)
+        return capped
+
+    def message_tokens(self, message: PromptMessage) -> int:
+        cached = self._tokens.get(id(message))
+        if cached is not None and cached[0] is message:
+            return cached[1]
+        tokens = MESSAGE_OVERHEAD_TOKENS
+        if isinstance(message.content, str):
+            tokens += estimate_tokens(message.content)
+        elif isinstance(message.content, list):
+            for content in message.content:
+                if content.type == PromptMessageContentType.TEXT:
+                    tokens += estimate_tokens(content.data)
+                else:
+                    tokens += NON_TEXT_CONTENT_TOKENS
+        if isinstance(message, AssistantPromptMessage):
+            for tool_call in message.tool_calls:
+                tokens += estimate_tokens(tool_call.function.name)
+                tokens += estimate_tokens(tool_call.function.arguments)
+        self._tokens[id(message)] = (message, tokens)
+        return tokens
+
+    def _apply(self, messages: list[PromptMessage]) -> list[PromptMessage]:
+        compacted = []
+        for message in messages:
+            if id(message) in self._dropped:
+                continue
+            replacement = self._replacements.get(id(message))
+            compacted.append(replacement[1] if replacement else message)
+        return compacted
+
+    @property
+    def target(self) -> int:
+        return int(self.budget * LOW_WATER_RATIO) if self.budget else 0
+
+    def excess_tokens(self, messages: list[PromptMessage]) -> int:
+        """The tokens to compact ``messages`` by, 0 while they fit the budget."""
+        if self.budget is None:
+            return 0
+        total = sum(self.message_tokens(m) for m in self._apply(messages))
+        return total - self.target if total > self.budget else 0
+
+    def compact(
+        self,
+        messages: list[PromptMessage],
+        pinned: Iterable[PromptMessage] = (),
+    ) -> list[PromptMessage]:
+        """
+        Return ``messages`` within the budget.
+
+        The system message, the ``pinned`` messages and the latest messages are kept
+        as they are. Tool responses are shortened oldest first, then the oldest
+        conversation turns are dropped as a whole, so that tool calls stay paired
+        with their responses.
+        """
+        compacted = self._apply(messages)
+        total = sum(self.message_tokens(message) for message in compacted)
+        if self.budget is not None and total > self.budget:
+            protected = {id(message) for message in pinned}
+            protected.update(id(message) for message in compacted[-KEEP_RECENT_MESSAGES:])
+            if compacted and isinstance(compacted[0], SystemPromptMessage):
+                protected.add(id(compacted[0]))
+            total = self._shorten_tool_responses(compacted, protected, total)
+            compacted, total = self._drop_turns(compacted, protected, total)
+
+        self.stats.prompt_tokens = total
+        # only the messages still in the prompt are worth remembering
+        self._tokens = {id(m): self._tokens[id(m)] for m in compacted if id(m) in self._tokens}
+        return compacted
+
+    def _shorten_tool_responses(
+        self, compacted: list[PromptMessage], protected: set[int], total: int
+    ) -> int:
+        for index, message in enumerate(compacted):
+            if total <= self.target:
+                break
+            if (
+                not isinstance(message, ToolPromptMessage)
+                or not isinstance(message.content, str)
+                or id(message) in protected
+                or id(message) in self._replacement_ids
+            ):
+                continue
+            shortened = message.model_copy(
+                update={"content": truncate_text(message.content, COMPACTED_RESPONSE_TOKENS)}
+            )
+            saved = self.message_tokens(message) - self.message_tokens(shortened)
+            if saved <= 0:
+                continue
+            self._replacements[id(message)] = (message, shortened)
+            self._replacement_ids.add(id(shortened))
+            compacted[index] = shortened
+            total -= saved
+            self.stats.compacted_messages += 1
+            self.stats.saved_tokens += saved
+        return total
+
+    def _drop_turns(
+        self, compacted: list[PromptMessage], protected: set[int], total: int
+    ) -> tuple[list[PromptMessage], int]:
+        originals = {id(new): old for old, new in self._replacements.values()}
+        while total > self.target:
+            turn = self._oldest_turn(compacted, protected)
+            if not turn:
+                break
+            for message in turn:
+                original = originals.get(id(message), message)
+                self._dropped[id(original)] = original
+                tokens = self.message_tokens(message)
+                total -= tokens
+                self.stats.dropped_messages += 1
+                self.stats.saved_tokens += tokens
+            dropped = {id(message) for message in turn}
+            compacted = [message for message in compacted if id(message) not in dropped]
+        return compacted, total
+
+    @staticmethod
+    def _oldest_turn(
+        messages: list[PromptMessage], protected: set[int]
+    ) -> list[PromptMessage]:
+        # a turn starts with a user message and runs until the next one
+        start = None
+        for index, message in enumerate(messages):
+            if isinstance(message, UserPromptMessage):
+                if start is not None:
+                    return messages[start:index]
+                if id(message) in protected:
+                    return []
+                start = index
+            elif start is not None and id(message) in protected:
+                return []
+        return []
+
+    def compact_scratchpad(self, units: list[AgentScratchpadUnit], excess_tokens: int) -> bool:
+        """
+        Shorten the observations of the oldest ReAct scratchpad units, leaving the
+        latest unit as it is. Return whether any unit was changed.
+        """
+        changed = False
+        for unit in units[:-1]:
+            if excess_tokens <= 0:
+                break
+            if not unit.observation:
+                continue
+            shortened = truncate_text(unit.observation, COMPACTED_RESPONSE_TOKENS)
+            saved = estimate_tokens(unit.observation) - estimate_tokens(shortened)
+            if saved <= 0:
+                continue
+            unit.observation = shortened
+            excess_tokens -= saved
+            changed = True
+            self.stats.compacted_messages += 1
+            self.stats.saved_tokens += saved
+        return changed
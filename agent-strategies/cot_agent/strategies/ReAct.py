@@ -25,6 +25,8 @@ from dify_plugin.interfaces.agent import (
     ToolEntity,
 )
 from output_parser.cot_output_parser import ReactChunk, ReactState, CotAgentOutputParser
+from prompt.builder import ScratchpadTranscript, format_scratchpad_unit
+from prompt.compaction import PromptCompactor
 from prompt.template import REACT_PROMPT_TEMPLATES
 from pydantic import BaseModel, Field
 
@@ -37,6 +39,7 @@ class LogMetadata:
     TOTAL_PRICE = "total_price"
     CURRENCY = "currency"
     TOTAL_TOKENS = "total_tokens"
+    COMPACTION = "compaction"
 
 ignore_observation_providers = ["wenxin"]
 
@@ -70,6 +73,8 @@ class ReActAgentStrategy(AgentStrategy):
     instruction: str = ""
     history_prompt_messages: list[PromptMessage] = Field(default_factory=list)
     prompt_messages_tools: list[ToolEntity] = Field(default_factory=list)
+    _scratchpad_transcript: ScratchpadTranscript | None = None
+    _compactor: PromptCompactor | None = None
 
     @property
     def _user_prompt_message(self) -> UserPromptMessage:
@@ -116,6 +121,7 @@ class ReActAgentStrategy(AgentStrategy):
         self.query = react_params.query
         self.instruction = react_params.instruction
         agent_scratchpad: list[AgentScratchpadUnit] = []
+        self._scratchpad_transcript = ScratchpadTranscript()
         iteration_step = 1
         max_iteration_steps = react_params.maximum_iterations
         run_agent_state = True
@@ -147,6 +153,8 @@ class ReActAgentStrategy(AgentStrategy):
         )
         prompt_messages_tools = self._init_prompt_tools(tools)
         self._prompt_messages_tools = prompt_messages_tools
+        # the tool schemas are part of the system prompt, which is counted as a message
+        self._compactor = PromptCompactor.for_model(model)
 
         while run_agent_state and iteration_step <= max_iteration_steps:
             # continue to run until there is not any tool call
@@ -360,7 +368,9 @@ class ReActAgentStrategy(AgentStrategy):
                             tool_instances=tool_instances,
                             message_file_ids=message_file_ids,
                         )
-                        scratchpad.observation = tool_invoke_response
+                        scratchpad.observation = self._compactor.cap_response(
+                            tool_invoke_response
+                        )
                         scratchpad.agent_response = tool_invoke_response
 
                         # TODO: convert to agent invoke message
@@ -406,6 +416,7 @@ class ReActAgentStrategy(AgentStrategy):
                     LogMetadata.STARTED_AT: round_started_at,
                     LogMetadata.FINISHED_AT: time.perf_counter(),
                     LogMetadata.ELAPSED_TIME: time.perf_counter() - round_started_at,
+                    LogMetadata.COMPACTION: self._compactor.stats.to_dict(),
                     LogMetadata.TOTAL_PRICE: usage_dict["usage"].total_price
                     if usage_dict["usage"]
                     else 0,
@@ -484,26 +495,17 @@ class ReActAgentStrategy(AgentStrategy):
         system_message = self._system_prompt_message
 
         # organize current assistant messages
-        agent_scratchpad = agent_scratchpad
         if not agent_scratchpad:
             assistant_messages = []
         else:
-            assistant_message = AssistantPromptMessage(content="")
-            for unit in agent_scratchpad:
-                if unit.is_final():
-                    assert isinstance(assistant_message.content, str)
-                    assistant_message.content += f"Final Answer: {unit.agent_response}"
-                else:
-                    assert isinstance(assistant_message.content, str)
-                    assistant_message.content += f"Thought: {unit.thought}\n\n"
-                    if unit.action_str:
-                        assistant_message.content += f"Action: {unit.action_str}\n\n"
-                    if unit.observation:
-                        assistant_message.content += (
-                            f"Observation: {unit.observation}\n\n"
-                        )
-
-            assistant_messages = [assistant_message]
+            if self._scratchpad_transcript is None:
+                self._scratchpad_transcript = ScratchpadTranscript()
+            # only the units of the last round are rendered
+            assistant_messages = [
+                AssistantPromptMessage(
+                    content=self._scratchpad_transcript.update(agent_scratchpad)
+                )
+            ]
 
         # query messages
         query_messages = self._organize_user_query(query, [])
@@ -523,6 +525,23 @@ class ReActAgentStrategy(AgentStrategy):
             historic_messages = self.history_prompt_messages
             messages = [system_message, *historic_messages, *query_messages]
 
+        if self._compactor is not None:
+            excess_tokens = self._compactor.excess_tokens(messages)
+            if excess_tokens > 0 and self._compactor.compact_scratchpad(
+                agent_scratchpad, excess_tokens
+            ):
+                # observations were shortened, render the scratchpad again
+                self._scratchpad_transcript = ScratchpadTranscript()
+                assistant_messages = [
+                    AssistantPromptMessage(
+                        content=self._scratchpad_transcript.update(agent_scratchpad)
+                    )
+                ]
+                messages[-2:-1] = assistant_messages
+            messages = self._compactor.compact(
+                messages, pinned=[*query_messages, *assistant_messages]
+            )
+
         # join all messages
         return messages
 
@@ -628,15 +647,6 @@ class ReActAgentStrategy(AgentStrategy):
         """
         format assistant message
         """
-        message = ""
-        for scratchpad in agent_scratchpad:
-            if scratchpad.is_final():
-                message += f"Final Answer: {scratchpad.agent_response}"
-            else:
-                message += f"Thought: {scratchpad.thought}\n\n"
-                if scratchpad.action_str:
-                    message += f"Action: {scratchpad.action_str}\n\n"
-                if scratchpad.observation:
-                    message += f"Observation: {scratchpad.observation}\n\n"
-
-        return message
+        return "".join(
+            format_scratchpad_unit(scratchpad) for scratchpad in agent_scratchpad
+        )
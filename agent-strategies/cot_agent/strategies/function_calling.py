@@ -1,7 +1,6 @@
 import json
 import time
 from collections.abc import Generator
-from copy import deepcopy
 from typing import Any, Optional, cast
 
 from dify_plugin.entities.agent import AgentInvokeMessage
@@ -15,7 +14,6 @@ from dify_plugin.entities.model.llm import (
 from dify_plugin.entities.model.message import (
     AssistantPromptMessage,
     PromptMessage,
-    PromptMessageContentType,
     SystemPromptMessage,
     ToolPromptMessage,
     UserPromptMessage,
@@ -27,6 +25,8 @@ from dify_plugin.interfaces.agent import (
     ToolEntity,
     ToolInvokeMeta,
 )
+from prompt.builder import ImageFreeMessages
+from prompt.compaction import PromptCompactor
 from pydantic import BaseModel
 
 class LogMetadata:
@@ -38,6 +38,7 @@ class LogMetadata:
     TOTAL_PRICE = "total_price"
     CURRENCY = "currency"
     TOTAL_TOKENS = "total_tokens"
+    COMPACTION = "compaction"
 
 class ExecutionMetadata(BaseModel):
     """Execution metadata with default values"""
@@ -93,6 +94,8 @@ class FunctionCallingParams(BaseModel):
 class FunctionCallingAgentStrategy(AgentStrategy):
     query: str = ""
     instruction: str | None = ""
+    _image_free_messages: ImageFreeMessages | None = None
+    _compactor: PromptCompactor | None = None
 
     @property
     def _user_prompt_message(self) -> UserPromptMessage:
@@ -109,6 +112,7 @@ class FunctionCallingAgentStrategy(AgentStrategy):
         Run FunctionCall agent application
         """
         fc_params = FunctionCallingParams(**parameters)
+        self._image_free_messages = ImageFreeMessages()
 
         # init prompt messages
         query = fc_params.query
@@ -122,6 +126,9 @@ class FunctionCallingAgentStrategy(AgentStrategy):
         tools = fc_params.tools
         tool_instances = {tool.identity.name: tool for tool in tools} if tools else {}
         prompt_messages_tools = self._init_prompt_tools(tools)
+        self._compactor = PromptCompactor.for_model(
+            fc_params.model, prompt_messages_tools
+        )
 
         # init model parameters
         stream = (
@@ -544,7 +551,9 @@ class FunctionCallingAgentStrategy(AgentStrategy):
                     if tool_response["tool_response"] is not None:
                         current_thoughts.append(
                             ToolPromptMessage(
-                                content=str(tool_response["tool_response"]),
+                                content=self._compactor.cap_response(
+                                    str(tool_response["tool_response"])
+                                ),
                                 tool_call_id=tool_call_id,
                                 name=tool_call_name,
                             )
@@ -571,6 +580,7 @@ class FunctionCallingAgentStrategy(AgentStrategy):
                     LogMetadata.STARTED_AT: round_started_at,
                     LogMetadata.FINISHED_AT: time.perf_counter(),
                     LogMetadata.ELAPSED_TIME: time.perf_counter() - round_started_at,
+                    LogMetadata.COMPACTION: self._compactor.stats.to_dict(),
                     LogMetadata.TOTAL_PRICE: current_llm_usage.total_price
                     if current_llm_usage
                     else 0,
@@ -715,25 +725,13 @@ class FunctionCallingAgentStrategy(AgentStrategy):
         1. Some models don't support vision at all
         2. Some models support vision in the first iteration but not in subsequent iterations
             (when tool calls are involved)
-        """
-        prompt_messages = deepcopy(prompt_messages)
-
-        for prompt_message in prompt_messages:
-            if isinstance(prompt_message, UserPromptMessage) and isinstance(
-                prompt_message.content, list
-            ):
-                prompt_message.content = "\n".join(
-                    [
-                        content.data
-                        if content.type == PromptMessageContentType.TEXT
-                        else "[image]"
-                        if content.type == PromptMessageContentType.IMAGE
-                        else "[file]"
-                        for content in prompt_message.content
-                    ]
-                )
 
-        return prompt_messages
+        The messages are not modified. Each user message is converted once and its
+        converted copy is reused on later iterations.
+        """
+        if self._image_free_messages is None:
+            self._image_free_messages = ImageFreeMessages()
+        return self._image_free_messages.strip(prompt_messages)
 
     def _organize_prompt_messages(
         self,
@@ -745,6 +743,11 @@ class FunctionCallingAgentStrategy(AgentStrategy):
             *history_prompt_messages,
             *current_thoughts,
         ]
+        if self._compactor is not None:
+            # keep the prompt within the context window, never dropping the query
+            prompt_messages = self._compactor.compact(
+                prompt_messages, pinned=history_prompt_messages[-1:]
+            )
 
         # Check if model supports vision
         supports_vision = (
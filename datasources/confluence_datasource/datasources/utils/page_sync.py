@@ -0,0 +1,268 @@
+"""
+Incremental sync of Confluence pages.
+
+Pages are listed with their storage-format bodies in bulk, and a page→version
+index of every space is kept in the plugin storage together with the converted
+text of each page. A listing only converts the pages whose version number
+changed since the last one, in a worker pool that runs while the next batch is
+downloaded. The content of a page is served from the storage once a request
+for its metadata shows that its version has not changed since it was converted,
+instead of being downloaded and converted again.
+"""
+
+import json
+import logging
+import re
+from collections.abc import Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Optional
+
+from bs4 import BeautifulSoup
+
+logger = logging.getLogger(__name__)
+
+# the most pages Confluence returns per request when bodies are included
+LIST_PAGE_LIMIT = 250
+MAX_CONVERT_WORKERS = 4
+
+# bumped when the conversion changes, so every page is converted again
+CONVERSION_VERSION = 1
+
+
+def html_to_text(html: str) -> str:
+    """Convert Confluence HTML to plain text with improved formatting."""
+    if not html:
+        return ""
+
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Remove unwanted tags
+    for tag in soup(["script", "style", "meta", "noscript", "link"]):
+        tag.decompose()
+
+    # Handle Confluence-specific elements
+    # Convert ac:structured-macro to readable format
+    for macro in soup.find_all("ac:structured-macro"):
+        macro_name = macro.get("ac:name", "")  # type: ignore
+        if macro_name == "code":
+            # Extract code content
+            code_body = macro.find("ac:plain-text-body")  # type: ignore
+            if code_body:
+                code_text = code_body.get_text()  # type: ignore
+                new_tag = soup.new_tag("p")
+                new_tag.string = f"\n```\n{code_text}\n```\n"
+                macro.replace_with(new_tag)  # type: ignore
+        elif macro_name == "info" or macro_name == "note":
+            # Extract info/note content
+            rich_body = macro.find("ac:rich-text-body")  # type: ignore
+            if rich_body:
+                note_text = rich_body.get_text(strip=True)  # type: ignore
+                new_tag = soup.new_tag("p")
+                new_tag.string = f"\n[{str(macro_name).upper()}]: {note_text}\n"
+                macro.replace_with(new_tag)  # type: ignore
+        else:
+            macro.decompose()  # type: ignore
+
+    # Handle tables
+    for table in soup.find_all("table"):
+        rows = []
+        for tr in table.find_all("tr"):  # type: ignore
+            cells = [td.get_text(strip=True) for td in tr.find_all(["td", "th"])]  # type: ignore
+            if cells:
+                rows.append(" | ".join(cells))
+        if rows:
+            table_text = "\n".join(rows)
+            new_tag = soup.new_tag("p")
+            new_tag.string = f"\n{table_text}\n"
+            table.replace_with(new_tag)  # type: ignore
+
+    # Extract text with better formatting
+    text_parts = []
+
+    # Process different block elements with appropriate spacing
+    for element in soup.find_all(
+        ["h1", "h2", "h3", "h4", "h5", "h6", "p", "li", "div", "blockquote", "pre"]
+    ):
+        text = element.get_text(strip=True)  # type: ignore
+        if text:
+            # Add appropriate formatting based on tag
+            element_name = element.name  # type: ignore
+            if element_name and element_name.startswith("h"):
+                level = int(element_name[1])
+                text = f"\n{'#' * level} {text}\n"
+            elif element_name == "li":
+                # Check if it's part of ordered or unordered list
+                parent = element.parent  # type: ignore
+                if parent and hasattr(parent, "name") and parent.name == "ol":
+                    text = f"  * {text}"
+                else:
+                    text = f"  - {text}"
+            elif element_name == "blockquote":
+                text = f"\n> {text}\n"
+            elif element_name == "pre":
+                text = f"\n```\n{text}\n```\n"
+
+            text_parts.append(text)
+
+    # Join and clean up excessive whitespace
+    result = "\n".join(text_parts)
+    # Remove multiple consecutive newlines
+    result = re.sub(r"\n{3,}", "\n\n", result)
+
+    return result.strip()
+
+
+def page_text(item: dict) -> str:
+    """The text of a page returned with ``body-format=storage``."""
+    body = item.get("body") or {}
+    # v2 can have multiple body representations
+    if "storage" in body:
+        content_html = body["storage"].get("value", "")
+    elif "atlas_doc_format" in body:
+        # Handle Atlas Doc Format if present (newer format)
+        content_html = body["atlas_doc_format"].get("value", "")
+    else:
+        logger.warning(f"No body content found for page {item.get('id')}")
+        content_html = "<p>No content available</p>"
+    return html_to_text(content_html)
+
+
+def page_version(item: dict) -> Optional[int]:
+    return (item.get("version") or {}).get("number")
+
+
+class PageSync:
+    """
+    The page index and converted contents of one workspace, in the plugin storage.
+
+    A listing submits its batches with ``submit`` and finishes with ``commit``,
+    which saves the index of every listed space. Storage errors are logged and
+    only cost a conversion on the next sync.
+    """
+
+    def __init__(self, storage: Any, workspace_id: str, max_workers: int = MAX_CONVERT_WORKERS):
+        self._storage = storage
+        self._prefix = f"confluence:{workspace_id}:"
+        self._max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: list[tuple[dict, Future]] = []
+        self._indexes: dict[str, dict[str, int]] = {}
+        self._listed: dict[str, dict[str, int]] = {}
+        self.converted = 0
+        self.skipped = 0
+
+    def _read(self, key: str) -> Optional[dict]:
+        try:
+            if not self._storage.exist(self._prefix + key):
+                return None
+            return json.loads(self._storage.get(self._prefix + key))
+        except Exception as e:
+            logger.warning(f"Failed to read {key} from the plugin storage: {e}")
+            return None
+
+    def _write(self, key: str, value: dict) -> bool:
+        try:
+            self._storage.set(self._prefix + key, json.dumps(value).encode())
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to write {key} to the plugin storage: {e}")
+            return False
+
+    def _delete(self, key: str) -> None:
+        try:
+            self._storage.delete(self._prefix + key)
+        except Exception as e:
+            logger.warning(f"Failed to delete {key} from the plugin storage: {e}")
+
+    def index(self, space_id: str) -> dict[str, int]:
+        """The version of every page of the space at the last sync."""
+        if space_id not in self._indexes:
+            stored = self._read(f"index:{space_id}") or {}
+            if stored.get("conversion") != CONVERSION_VERSION:
+                stored = {}
+            self._indexes[space_id] = stored.get("pages", {})
+        return self._indexes[space_id]
+
+    def submit(self, items: Iterable[dict]) -> None:
+        """
+        Convert the pages of one listing batch whose version changed. The batch
+        before is stored first, so its conversion overlaps the download of this one.
+        """
+        self._drain()
+        for item in items:
+            page_id = item.get("id", "")
+            space_id = item.get("spaceId", "")
+            version = page_version(item)
+            listed = self._listed.setdefault(space_id, {})
+            if version is not None and self.index(space_id).get(page_id) == version:
+                listed[page_id] = version
+                self.skipped += 1
+                continue
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._max_workers)
+            self._pending.append((item, self._executor.submit(page_text, item)))
+
+    def _drain(self) -> None:
+        pending, self._pending = self._pending, []
+        for item, future in pending:
+            page_id = item.get("id", "")
+            version = page_version(item)
+            try:
+                content = future.result()
+            except Exception as e:
+                logger.warning(f"Failed to convert page {page_id}: {e}")
+                continue
+            self.converted += 1
+            stored = self.store_page(page_id, version, item.get("title", ""), content)
+            if stored and version is not None:
+                self._listed[item.get("spaceId", "")][page_id] = version
+
+    def commit(self) -> None:
+        """Store the last batch and save the index of every listed space."""
+        try:
+            self._drain()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+        listed_ids = {page_id for pages in self._listed.values() for page_id in pages}
+        for space_id, pages in self._listed.items():
+            # pages gone from the space, unless they moved to another listed one
+            for page_id in self.index(space_id).keys() - listed_ids:
+                self._delete(f"page:{page_id}")
+            self._write(
+                f"index:{space_id}",
+                {"conversion": CONVERSION_VERSION, "pages": pages},
+            )
+            self._indexes[space_id] = pages
+        logger.info(
+            f"Confluence sync converted {self.converted} pages and skipped {self.skipped} unchanged"
+        )
+
+    def close(self) -> None:
+        """Drop the work of an unfinished listing without saving the index."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._pending = []
+
+    def cached_page(self, page_id: str) -> Optional[dict]:
+        """The converted page as ``{"version", "title", "content"}``, if stored."""
+        page = self._read(f"page:{page_id}")
+        if not page or page.get("conversion") != CONVERSION_VERSION:
+            return None
+        return page
+
+    def store_page(self, page_id: str, version: Optional[int], title: str, content: str) -> bool:
+        if version is None:
+            return False
+        return self._write(
+            f"page:{page_id}",
+            {
+                "conversion": CONVERSION_VERSION,
+                "version": version,
+                "title": title,
+                "content": content,
+            },
+        )
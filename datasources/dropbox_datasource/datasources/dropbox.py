@@ -16,6 +16,8 @@ from dify_plugin.entities.datasource import (
 )
 from dify_plugin.interfaces.datasource.online_drive import OnlineDriveDatasource
 
+from .utils import dropbox_sync
+
 logger = logging.getLogger(__name__)
 
 
@@ -23,6 +25,10 @@ class DropboxDataSource(OnlineDriveDatasource):
     
     def _get_dropbox_client(self) -> dropbox.Dropbox:
         """Get authenticated Dropbox client"""
+        return self._get_client_and_account()[0]
+
+    def _get_client_and_account(self) -> tuple[dropbox.Dropbox, str]:
+        """Get the shared client of the access token and the id of its account"""
         credentials = self.runtime.credentials
         if not credentials:
             raise ValueError("Credentials not found")
@@ -32,12 +38,16 @@ class DropboxDataSource(OnlineDriveDatasource):
             raise ValueError("Access token not found in credentials")
         
         try:
-            dbx = dropbox.Dropbox(access_token)
-            # Verify the connection
-            dbx.users_get_current_account()
-            return dbx
+            # The connection is verified when the client is created
+            return dropbox_sync.get_client(access_token)
         except AuthError as e:
             raise ValueError(f"Authentication failed: {str(e)}") from e
+
+    def _forget_client(self) -> None:
+        """Drop the shared client after Dropbox rejected its token"""
+        access_token = (self.runtime.credentials or {}).get("access_token")
+        if access_token:
+            dropbox_sync.forget_client(access_token)
     
     def _browse_files(
         self,  request: OnlineDriveBrowseFilesRequest
@@ -48,7 +58,7 @@ class DropboxDataSource(OnlineDriveDatasource):
         next_page_parameters = request.next_page_parameters or {}
         
         try:
-            dbx = self._get_dropbox_client()
+            dbx, account_id = self._get_client_and_account()
             
             # Handle file IDs vs paths
             if prefix and prefix.startswith("id:"):
@@ -79,12 +89,25 @@ class DropboxDataSource(OnlineDriveDatasource):
             cursor = next_page_parameters.get("cursor")
             
             try:
-                if cursor:
-                    # Continue from previous listing
-                    result = dbx.files_list_folder_continue(cursor)
-                else:
-                    # Start new listing
-                    result = dbx.files_list_folder(path, limit=max_keys)
+                if not cursor:
+                    # List the folder from its stored entries and the changes since its cursor
+                    sync_state = dropbox_sync.SyncState(self.session.storage, self.runtime.user_id, account_id)
+                    folder_files = sync_state.list_folder(dbx, path)
+                    offset = int(next_page_parameters.get("offset") or 0)
+                    files = folder_files[offset : offset + max_keys]
+                    next_offset = offset + len(files)
+                    is_truncated = next_offset < len(folder_files)
+                    return OnlineDriveBrowseFilesResponse(result=[
+                        OnlineDriveFileBucket(
+                            bucket=bucket_name,
+                            files=files,
+                            is_truncated=is_truncated,
+                            next_page_parameters={"offset": next_offset} if is_truncated else {}
+                        )
+                    ])
+
+                # Continue from previous listing
+                result = dbx.files_list_folder_continue(cursor)
                 
                 files = []
                 for entry in result.entries:
@@ -139,6 +162,7 @@ class DropboxDataSource(OnlineDriveDatasource):
                     raise ValueError(f"Dropbox API error: {error_str}") from e
                     
         except AuthError as e:
+            self._forget_client()
             raise ValueError(
                 "Authentication failed. The access token may have expired. "
                 "Please refresh or reauthorize the connection."
@@ -156,7 +180,7 @@ class DropboxDataSource(OnlineDriveDatasource):
             raise ValueError("File ID is required")
         
         try:
-            dbx = self._get_dropbox_client()
+            dbx, account_id = self._get_client_and_account()
             
             # First, get file metadata using the file ID
             try:
@@ -168,6 +192,7 @@ class DropboxDataSource(OnlineDriveDatasource):
                 
                 file_name = metadata_result.name
                 file_size = metadata_result.size
+                content_hash = metadata_result.content_hash
                 
                 # Use the path_display for downloading since Dropbox download API requires path
                 file_path = metadata_result.path_display
@@ -179,21 +204,40 @@ class DropboxDataSource(OnlineDriveDatasource):
                 else:
                     raise ValueError(f"Failed to get file metadata: {error_str}") from e
             
+            # Skip files that have not changed since they were last delivered, if opted into
+            sync_state = dropbox_sync.SyncState(self.session.storage, self.runtime.user_id, account_id)
+            skip_unchanged = dropbox_sync.skips_unchanged_files(self.runtime.credentials)
+            if skip_unchanged and sync_state.is_unchanged(file_id, content_hash):
+                logger.info(f"File '{file_name}' ({file_id}) has not changed, skipping download")
+                yield self.create_json_message({
+                    "id": file_id,
+                    "name": file_name,
+                    "unchanged": True,
+                    "content_hash": content_hash,
+                })
+                return
+
             # Download the file content
             try:
                 _, response = dbx.files_download(file_path)
-                file_content = response.content
                 
                 # Determine MIME type based on file extension
                 mime_type = self._get_mime_type(file_name)
                 
+                # Stream the content, verifying it against its content hash
+                with response:
+                    yield from dropbox_sync.iter_blob_chunks(
+                        response.iter_content(chunk_size=dropbox_sync.DOWNLOAD_CHUNK_SIZE),
+                        file_size,
+                        meta={
+                            "file_name": file_name,
+                            "mime_type": mime_type,
+                            "file_size": file_size
+                        },
+                        content_hash=content_hash,
+                    )
                 logger.debug(f"Downloaded file: {file_name} (size: {file_size} bytes)")
-                
-                yield self.create_blob_message(file_content, meta={
-                    "file_name": file_name,
-                    "mime_type": mime_type,
-                    "file_size": file_size
-                })
+                sync_state.record(file_id, content_hash)
                 
             except ApiError as e:
                 error_str = str(e)
@@ -205,6 +249,7 @@ class DropboxDataSource(OnlineDriveDatasource):
                     raise ValueError(f"Failed to download file: {error_str}") from e
                     
         except AuthError as e:
+            self._forget_client()
             raise ValueError(
                 "Authentication failed during file download. "
                 "Please refresh or reauthorize the connection."
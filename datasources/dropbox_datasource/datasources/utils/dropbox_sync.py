@@ -0,0 +1,224 @@
+"""
+Shared clients, incremental folder listings and streamed downloads for Dropbox.
+
+One client is kept per access token, so the account is only verified once.
+The entries of every browsed folder are kept in the plugin storage with their
+``files_list_folder`` cursor, and later listings only ask Dropbox for the
+changes since that cursor with ``files_list_folder_continue``.
+
+Downloads are streamed as blob chunks while their Dropbox content hash is
+computed, and the content hash of every delivered file is kept. When the
+credentials opt into it, a file that has not changed since is not downloaded
+again. The hashes are only keyed by user and account, so skipping is off by
+default: a knowledge base that imports a file another one already has would get
+no content.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from collections.abc import Generator, Iterable, Mapping
+from typing import Any, Optional
+
+import dropbox
+from dify_plugin.entities.datasource import DatasourceMessage, OnlineDriveFile
+from dify_plugin.entities.invoke_message import InvokeMessage
+from dropbox.exceptions import ApiError
+from dropbox.files import DeletedMetadata, FileMetadata, FolderMetadata
+
+logger = logging.getLogger(__name__)
+
+CLIENT_CACHE_SIZE = 32
+# the most entries Dropbox returns per listing request
+LIST_LIMIT = 2000
+# Dropbox hashes files in blocks of 4 MiB
+HASH_BLOCK_SIZE = 4 * 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# the largest blob chunk the plugin daemon accepts
+BLOB_CHUNK_SIZE = 8192
+
+_clients: "OrderedDict[str, tuple[dropbox.Dropbox, str]]" = OrderedDict()
+_clients_lock = threading.Lock()
+
+
+def get_client(access_token: str) -> tuple[dropbox.Dropbox, str]:
+    """
+    The client of an access token and the id of its account. The account is
+    only looked up, and the token verified, when the client is created.
+    """
+    key = hashlib.sha256(access_token.encode()).hexdigest()
+    with _clients_lock:
+        cached = _clients.get(key)
+        if cached is not None:
+            _clients.move_to_end(key)
+            return cached
+
+    client = dropbox.Dropbox(access_token)
+    account = client.users_get_current_account()
+    with _clients_lock:
+        _clients[key] = (client, account.account_id)
+        while len(_clients) > CLIENT_CACHE_SIZE:
+            _clients.popitem(last=False)
+    return client, account.account_id
+
+
+def forget_client(access_token: str) -> None:
+    """Drop the client of a token Dropbox rejected."""
+    with _clients_lock:
+        _clients.pop(hashlib.sha256(access_token.encode()).hexdigest(), None)
+
+
+class ContentHasher:
+    """The Dropbox content hash: the SHA-256 of the SHA-256 of every 4 MiB block."""
+
+    def __init__(self):
+        self._overall = hashlib.sha256()
+        self._block = hashlib.sha256()
+        self._block_size = 0
+
+    def update(self, data: bytes) -> None:
+        view = memoryview(data)
+        while view:
+            take = min(HASH_BLOCK_SIZE - self._block_size, len(view))
+            self._block.update(view[:take])
+            self._block_size += take
+            view = view[take:]
+            if self._block_size == HASH_BLOCK_SIZE:
+                self._overall.update(self._block.digest())
+                self._block = hashlib.sha256()
+                self._block_size = 0
+
+    def hexdigest(self) -> str:
+        overall = self._overall.copy()
+        if self._block_size:
+            overall.update(self._block.digest())
+        return overall.hexdigest()
+
+
+def skips_unchanged_files(credentials: Mapping[str, Any]) -> bool:
+    """Whether the credentials opt into skipping files that have not changed."""
+    value = credentials.get("skip_unchanged_files")
+    return value is True or str(value).lower() == "true"
+
+
+class SyncState:
+    """Folder listings and the content hashes of delivered files, in the plugin storage."""
+
+    def __init__(self, storage: Any, user_id: Optional[str], account_id: str):
+        self._storage = storage
+        self._prefix = f"dropbox:{user_id or 'anonymous'}:{account_id}:"
+
+    def _read(self, key: str) -> Optional[dict]:
+        try:
+            if not self._storage.exist(self._prefix + key):
+                return None
+            return json.loads(self._storage.get(self._prefix + key))
+        except Exception as e:
+            logger.warning(f"Failed to read {key} from the plugin storage: {e}")
+            return None
+
+    def _write(self, key: str, value: dict) -> None:
+        try:
+            self._storage.set(self._prefix + key, json.dumps(value).encode())
+        except Exception as e:
+            logger.warning(f"Failed to write {key} to the plugin storage: {e}")
+
+    def is_unchanged(self, file_id: str, content_hash: Optional[str]) -> bool:
+        stored = self._read(f"file:{file_id}")
+        return (
+            bool(content_hash) and stored is not None and stored.get("content_hash") == content_hash
+        )
+
+    def record(self, file_id: str, content_hash: Optional[str]) -> None:
+        if content_hash:
+            self._write(f"file:{file_id}", {"content_hash": content_hash})
+
+    def list_folder(self, client: dropbox.Dropbox, path: str) -> list[OnlineDriveFile]:
+        """
+        All entries of a folder, folders first, by name. A folder listed before is
+        brought up to date from its stored cursor instead of being listed again.
+        """
+        key = f"folder:{path.lower()}"
+        folder = self._read(key)
+        entries: dict[str, list] = {}
+        try:
+            if folder is None:
+                result = client.files_list_folder(path, limit=LIST_LIMIT)
+            else:
+                entries = folder["entries"]
+                result = client.files_list_folder_continue(folder["cursor"])
+        except ApiError as e:
+            if folder is None or not e.error.is_reset():
+                raise
+            # the cursor was invalidated, the folder is listed again
+            logger.info(f"Listing cursor of '{path}' was reset, listing the folder again")
+            entries = {}
+            result = client.files_list_folder(path, limit=LIST_LIMIT)
+
+        changed = folder is None
+        while True:
+            for entry in result.entries:
+                changed = True
+                if isinstance(entry, DeletedMetadata):
+                    # deleted entries have no id, only their path
+                    name = entry.name.lower()
+                    entries = {k: v for k, v in entries.items() if v[0].lower() != name}
+                elif isinstance(entry, FileMetadata):
+                    entries[entry.id] = [entry.name, entry.size, "file"]
+                elif isinstance(entry, FolderMetadata):
+                    entries[entry.id] = [entry.name, 0, "folder"]
+            if not result.has_more:
+                break
+            result = client.files_list_folder_continue(result.cursor)
+
+        if changed or folder is None or folder.get("cursor") != result.cursor:
+            self._write(key, {"cursor": result.cursor, "entries": entries})
+
+        files = [
+            OnlineDriveFile(id=entry_id, name=name, size=size, type=entry_type)
+            for entry_id, (name, size, entry_type) in entries.items()
+        ]
+        files.sort(key=lambda file: (file.type != "folder", file.name.lower()))
+        return files
+
+
+def iter_blob_chunks(
+    parts: Iterable[bytes], total_length: int, meta: dict, content_hash: Optional[str] = None
+) -> Generator[DatasourceMessage, None, None]:
+    """
+    Stream a file as blob chunk messages of at most BLOB_CHUNK_SIZE bytes. The
+    final chunk, which ends the blob, is only sent once the length and, if given,
+    the Dropbox ``content_hash`` of the received bytes have been verified.
+    """
+    blob_id = uuid.uuid4().hex
+    hasher = ContentHasher() if content_hash else None
+    sequence = 0
+    received = 0
+    for part in parts:
+        if hasher is not None:
+            hasher.update(part)
+        for start in range(0, len(part), BLOB_CHUNK_SIZE):
+            chunk = part[start : start + BLOB_CHUNK_SIZE]
+            received += len(chunk)
+            yield DatasourceMessage(
+                type=InvokeMessage.MessageType.BLOB_CHUNK,
+                message=InvokeMessage.BlobChunkMessage(
+                    id=blob_id, sequence=sequence, total_length=total_length, blob=chunk, end=False
+                ),
+                meta=meta,
+            )
+            sequence += 1
+    if received != total_length:
+        raise ValueError(f"Download incomplete: received {received} of {total_length} bytes")
+    if hasher is not None and hasher.hexdigest() != content_hash:
+        raise ValueError("Downloaded file does not match its Dropbox content hash")
+    yield DatasourceMessage(
+        type=InvokeMessage.MessageType.BLOB_CHUNK,
+        message=InvokeMessage.BlobChunkMessage(
+            id=blob_id, sequence=sequence, total_length=total_length, blob=b"", end=True
+        ),
+        meta=meta,
+    )
@@ -93,7 +93,10 @@ class DropboxDatasourceProvider(DatasourceProvider):
             return DatasourceOAuthCredentials(
                 name=user_name or user_email or "Dropbox User",
                 avatar_url=user_avatar,
-                credentials={"access_token": access_token},
+                credentials={
+                    "access_token": access_token,
+                    "skip_unchanged_files": system_credentials.get("skip_unchanged_files", False),
+                },
                 expires_at=-1  # Dropbox tokens don't expire
             )
             
@@ -127,6 +130,11 @@ class DropboxDatasourceProvider(DatasourceProvider):
         return DatasourceOAuthCredentials(
             name=user_name or user_email or "Dropbox User",
             avatar_url=user_avatar,
-            credentials={"access_token": access_token},
+            credentials={
+                "access_token": access_token,
+                "skip_unchanged_files": system_credentials.get(
+                    "skip_unchanged_files", credentials.get("skip_unchanged_files", False)
+                ),
+            },
             expires_at=-1  # Dropbox tokens don't expire
         )
\ No newline at end of file
@@ -1,7 +1,8 @@
+import base64
 import json
 import os
 from collections.abc import Generator
-from typing import Any, Mapping
+from typing import Any, Mapping, Optional
 
 from dify_plugin.entities.datasource import (
     DatasourceMessage,
@@ -14,6 +15,8 @@ from dify_plugin.entities.datasource import (
 from dify_plugin.interfaces.datasource.online_drive import OnlineDriveDatasource
 from google.cloud import storage
 
+from .utils import object_download
+
 
 class GoogleCloudStorageDataSource(OnlineDriveDatasource):
     def _browse_files(
@@ -30,7 +33,7 @@ class GoogleCloudStorageDataSource(OnlineDriveDatasource):
             raise ValueError("Credentials not found")
         
         
-        client = storage.Client.from_service_account_info(json.loads(credentials))
+        client = self._get_client(credentials)
         if not bucket_name:
             buckets = client.list_buckets()
             file_buckets = [OnlineDriveFileBucket(bucket=bucket.name, files=[], is_truncated=False, next_page_parameters={}) for bucket in buckets]
@@ -65,11 +68,52 @@ class GoogleCloudStorageDataSource(OnlineDriveDatasource):
         if not bucket_name:
             raise ValueError("Bucket name not found")
 
-        client = storage.Client.from_service_account_info(json.loads(credentials))
-        bucket = client.get_bucket(bucket_name)
-        blob = bucket.blob(key)
-        b64bytes = blob.download_as_bytes()
-        yield self.create_blob_message(b64bytes, meta={"file_name": key, "mime_type": blob.content_type})
+        client = self._get_client(credentials)
+        bucket = client.bucket(bucket_name)
+
+        def read_range(name: str, start: int, end: Optional[int]) -> bytes:
+            return bucket.blob(name).download_as_bytes(start=start, end=end, checksum=None)
+
+        if key.endswith("/"):
+            # a folder: every object under its prefix, small ones fetched concurrently
+            objects = (
+                self._stored_object(blob)
+                for blob in client.list_blobs(bucket_name, prefix=key)
+                if not blob.name.endswith("/")
+            )
+            yield from object_download.stream_objects(objects, read_range)
+            return
+
+        blob = bucket.get_blob(key)
+        if blob is None:
+            raise ValueError(f"File {key} not found in bucket {bucket_name}")
+        yield from object_download.stream_object(self._stored_object(blob), read_range)
+
+    def _get_client(self, credentials: str) -> storage.Client:
+        return object_download.cached_client(
+            credentials,
+            lambda: storage.Client.from_service_account_info(json.loads(credentials)),
+        )
+
+    @staticmethod
+    def _stored_object(blob: storage.Blob) -> object_download.StoredObject:
+        if blob.content_encoding == "gzip":
+            # served decompressed, so the stored size and checksums do not apply
+            return object_download.StoredObject(
+                key=blob.name, size=None, content_type=blob.content_type
+            )
+        # every object has a CRC32C, composite objects have no MD5
+        if blob.crc32c:
+            algorithm, checksum = "crc32c", blob.crc32c
+        else:
+            algorithm, checksum = "md5", blob.md5_hash
+        return object_download.StoredObject(
+            key=blob.name,
+            size=blob.size,
+            content_type=blob.content_type,
+            checksum_algorithm=algorithm,
+            checksum=base64.b64decode(checksum) if checksum else None,
+        )
 
     def _get_service_account_obj(self, credentials: Mapping[str, Any]) -> dict:
         service_account_obj = {
@@ -1,5 +1,6 @@
 import logging
 from collections.abc import Generator
+from typing import Optional
 
 import requests
 from dify_plugin.entities.datasource import (
@@ -12,11 +13,16 @@ from dify_plugin.entities.datasource import (
 )
 from dify_plugin.interfaces.datasource.online_drive import OnlineDriveDatasource
 
+from .utils import drive_sync
+
 logger = logging.getLogger(__name__)
 
 
 class GoogleDriveDataSource(OnlineDriveDatasource):
     _BASE_URL = "https://www.googleapis.com/drive/v3"
+    _SHEETS_URL = "https://sheets.googleapis.com/v4/spreadsheets"
+    _SHEETS_EXPORT_URL = "https://docs.google.com/spreadsheets/d"
+    _DOWNLOAD_CHUNK_SIZE = 1024 * 1024
     
     def _browse_files(
         self,  request: OnlineDriveBrowseFilesRequest
@@ -131,7 +137,7 @@ class GoogleDriveDataSource(OnlineDriveDatasource):
         try:
             # First, get file metadata
             metadata_url = f"{self._BASE_URL}/files/{file_id}"
-            metadata_params = {"fields": "id,name,mimeType,size"}
+            metadata_params = {"fields": drive_sync.METADATA_FIELDS}
             
             metadata_response = requests.get(
                 metadata_url, 
@@ -156,51 +162,33 @@ class GoogleDriveDataSource(OnlineDriveDatasource):
             file_metadata = metadata_response.json()
             file_name = file_metadata.get("name", "unknown")
             mime_type = file_metadata.get("mimeType", "application/octet-stream")
-                        
-            # Check if it's a Google Workspace file (Docs, Sheets, etc.)
-            is_google_workspace_file = mime_type.startswith("application/vnd.google-apps.")
-            
-            if is_google_workspace_file:
-                # Google Workspace files need to be exported
-                export_mime_type = self._get_export_mime_type(mime_type)
-                content_url = f"{self._BASE_URL}/files/{file_id}/export"
-                content_params = {"mimeType": export_mime_type}
-                
+
+            # Skip files that have not changed since they were last delivered, if opted into
+            current = drive_sync.fingerprint(file_metadata)
+            sync_state = drive_sync.SyncState(self.session.storage, self.runtime.user_id)
+            if drive_sync.skips_unchanged_files(self.runtime.credentials) and sync_state.is_unchanged(
+                file_id, current
+            ):
+                logger.info(f"File '{file_name}' ({file_id}) has not changed, skipping download")
+                yield self.create_json_message(
+                    {"id": file_id, "name": file_name, "mime_type": mime_type, "unchanged": True, **current}
+                )
+                return
+
+            if mime_type == drive_sync.SPREADSHEET_MIME_TYPE:
+                # Sheets are exported as one CSV file per sheet
+                yield from self._export_sheets(file_id, file_name, headers)
+            elif mime_type.startswith(drive_sync.GOOGLE_APPS_PREFIX):
+                # Other Google Workspace files need to be exported
+                yield from self._export_file(file_id, file_name, mime_type, headers)
             else:
                 # Regular files can be downloaded directly
-                content_url = f"{self._BASE_URL}/files/{file_id}"
-                content_params = {"alt": "media"}
-            
-            # Download file content
-            content_response = requests.get(
-                content_url,
-                headers=headers,
-                params=content_params,
-                timeout=60,  # Longer timeout for file downloads
-                stream=True  # Stream the response for large files
-            )
-            
-            if content_response.status_code == 401:
-                logger.error("Authentication failed during file download")
-                raise ValueError(
-                    "Authentication failed during file download. "
-                    "Please refresh or reauthorize the connection."
+                yield from self._download_content(
+                    file_id, file_name, mime_type, file_metadata.get("size"), headers
                 )
-            elif content_response.status_code != 200:
-                logger.error(f"Failed to download file: {content_response.status_code}")
-                raise ValueError(f"Failed to download file: {content_response.status_code}")
-            
-            # Get the content
-            file_content = content_response.content
-            
-            # For exported Google Workspace files, update the mime type
-            if is_google_workspace_file:
-                mime_type = self._get_export_mime_type(mime_type)
-            
-            yield self.create_blob_message(file_content, meta={
-                "file_name": file_name,
-                "mime_type": mime_type
-            })
+
+            # Only files that were delivered completely are recorded
+            sync_state.record(file_id, current)
             
         except requests.exceptions.RequestException as e:
             logger.error(f"Network error: {e}")
@@ -209,14 +197,101 @@ class GoogleDriveDataSource(OnlineDriveDatasource):
             if "already" not in str(e).lower():  # Avoid re-raising our own errors
                 logger.error(f"Unexpected error: {e}")
             raise
+
+    def _check_download_response(self, response: requests.Response) -> None:
+        if response.status_code == 401:
+            logger.error("Authentication failed during file download")
+            raise ValueError(
+                "Authentication failed during file download. "
+                "Please refresh or reauthorize the connection."
+            )
+        elif response.status_code != 200:
+            logger.error(f"Failed to download file: {response.status_code}")
+            raise ValueError(f"Failed to download file: {response.status_code}")
+
+    def _export_file(
+        self, file_id: str, file_name: str, mime_type: str, headers: dict
+    ) -> Generator[DatasourceMessage, None, None]:
+        """Export a Google Workspace file. Drive caps exports at 10 MB, so they are read at once."""
+        export_mime_type = self._get_export_mime_type(mime_type)
+        _, extension = drive_sync.export_format(mime_type)
+        content_response = requests.get(
+            f"{self._BASE_URL}/files/{file_id}/export",
+            headers=headers,
+            params={"mimeType": export_mime_type},
+            timeout=60,
+        )
+        self._check_download_response(content_response)
+        yield self.create_blob_message(content_response.content, meta={
+            "file_name": drive_sync.with_extension(file_name, extension),
+            "mime_type": export_mime_type
+        })
+
+    def _export_sheets(
+        self, file_id: str, file_name: str, headers: dict
+    ) -> Generator[DatasourceMessage, None, None]:
+        """Export every sheet of a spreadsheet as CSV, or the whole spreadsheet as XLSX
+        if its sheets cannot be listed."""
+        sheets_response = requests.get(
+            f"{self._SHEETS_URL}/{file_id}",
+            headers=headers,
+            params={"fields": "sheets.properties(sheetId,title)"},
+            timeout=30,
+        )
+        if sheets_response.status_code != 200:
+            logger.warning(
+                f"Failed to list the sheets of '{file_name}' ({sheets_response.status_code}), "
+                "exporting it as XLSX"
+            )
+            content_response = requests.get(
+                f"{self._BASE_URL}/files/{file_id}/export",
+                headers=headers,
+                params={"mimeType": drive_sync.XLSX_MIME_TYPE},
+                timeout=60,
+            )
+            self._check_download_response(content_response)
+            yield self.create_blob_message(content_response.content, meta={
+                "file_name": drive_sync.with_extension(file_name, ".xlsx"),
+                "mime_type": drive_sync.XLSX_MIME_TYPE
+            })
+            return
+
+        sheets = [sheet["properties"] for sheet in sheets_response.json().get("sheets", [])]
+        for sheet in sheets:
+            content_response = requests.get(
+                f"{self._SHEETS_EXPORT_URL}/{file_id}/export",
+                headers=headers,
+                params={"format": "csv", "gid": sheet["sheetId"]},
+                timeout=60,
+            )
+            self._check_download_response(content_response)
+            sheet_file_name = file_name if len(sheets) == 1 else f"{file_name} - {sheet['title']}"
+            yield self.create_blob_message(content_response.content, meta={
+                "file_name": drive_sync.with_extension(sheet_file_name, ".csv"),
+                "mime_type": "text/csv"
+            })
+
+    def _download_content(
+        self, file_id: str, file_name: str, mime_type: str, size: Optional[str], headers: dict
+    ) -> Generator[DatasourceMessage, None, None]:
+        """Stream a regular file as blob chunks, holding one network read in memory at a time."""
+        meta = {"file_name": file_name, "mime_type": mime_type}
+        with requests.get(
+            f"{self._BASE_URL}/files/{file_id}",
+            headers=headers,
+            params={"alt": "media"},
+            timeout=60,  # Longer timeout for file downloads
+            stream=True,  # Stream the response for large files
+        ) as content_response:
+            self._check_download_response(content_response)
+            total_length = int(size or content_response.headers.get("Content-Length") or 0)
+            if not total_length:
+                yield self.create_blob_message(content_response.content, meta=meta)
+                return
+            yield from drive_sync.iter_blob_chunks(
+                content_response.iter_content(chunk_size=self._DOWNLOAD_CHUNK_SIZE), total_length, meta
+            )
     
     def _get_export_mime_type(self, google_mime_type: str) -> str:
         """Convert Google Workspace MIME types to exportable formats."""
-        export_mapping = {
-            "application/vnd.google-apps.document": "application/pdf",  # Google Docs to PDF
-            "application/vnd.google-apps.spreadsheet": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",  # Google Sheets to Excel
-            "application/vnd.google-apps.presentation": "application/pdf",  # Google Slides to PDF
-            "application/vnd.google-apps.drawing": "image/png",  # Google Drawings to PNG
-            "application/vnd.google-apps.form": "application/pdf",  # Google Forms to PDF
-        }
-        return export_mapping.get(google_mime_type, "application/pdf")  # Default to PDF
\ No newline at end of file
+        return drive_sync.export_format(google_mime_type)[0]
@@ -0,0 +1,143 @@
+"""
+Export formats and change tracking for Google Drive downloads.
+
+Google Docs and Slides are exported as text and Sheets as one CSV per sheet, so
+natively textual files skip PDF parsing downstream. The checksum, modification
+time and version of every delivered file are kept in the plugin storage. When
+the OAuth client opts into it, a file whose fingerprint has not changed since is
+not downloaded again. The state is only keyed by user, so skipping is off by
+default: a knowledge base that imports a file another one already has would get
+no content.
+"""
+
+import json
+import logging
+import uuid
+from collections.abc import Generator, Iterable, Mapping
+from typing import Any, Optional
+
+from dify_plugin.entities.datasource import DatasourceMessage
+from dify_plugin.entities.invoke_message import InvokeMessage
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_APPS_PREFIX = "application/vnd.google-apps."
+SPREADSHEET_MIME_TYPE = "application/vnd.google-apps.spreadsheet"
+XLSX_MIME_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+DEFAULT_EXPORT_MIME_TYPE = "application/pdf"
+
+# export MIME type and file extension of each Google Workspace type
+EXPORT_FORMATS = {
+    "application/vnd.google-apps.document": ("text/markdown", ".md"),
+    "application/vnd.google-apps.presentation": ("text/plain", ".txt"),
+    "application/vnd.google-apps.drawing": ("image/png", ".png"),
+    "application/vnd.google-apps.form": ("application/pdf", ".pdf"),
+}
+EXTENSIONS = {
+    "text/csv": ".csv",
+    XLSX_MIME_TYPE: ".xlsx",
+    DEFAULT_EXPORT_MIME_TYPE: ".pdf",
+}
+
+# bumped when the export formats change, so earlier exports are delivered again
+EXPORT_VERSION = 2
+FINGERPRINT_FIELDS = ("md5Checksum", "modifiedTime", "version")
+METADATA_FIELDS = "id,name,mimeType,size," + ",".join(FINGERPRINT_FIELDS)
+
+# the largest blob chunk the plugin daemon accepts
+BLOB_CHUNK_SIZE = 8192
+
+
+def export_format(google_mime_type: str) -> tuple[str, str]:
+    """Return the export MIME type and extension of a Google Workspace type."""
+    return EXPORT_FORMATS.get(google_mime_type, (DEFAULT_EXPORT_MIME_TYPE, ".pdf"))
+
+
+def with_extension(file_name: str, extension: str) -> str:
+    if not extension or file_name.lower().endswith(extension):
+        return file_name
+    return file_name + extension
+
+
+def fingerprint(metadata: dict) -> Optional[dict]:
+    """
+    The change-detecting fields of a file, or None if the file has none of them.
+    Binary files have a checksum, Google Workspace files a version.
+    """
+    values = {field: metadata.get(field) for field in FINGERPRINT_FIELDS if metadata.get(field)}
+    if not values:
+        return None
+    return {**values, "export_version": EXPORT_VERSION}
+
+
+def skips_unchanged_files(credentials: Mapping[str, Any]) -> bool:
+    """Whether the credentials opt into skipping files that have not changed."""
+    value = credentials.get("skip_unchanged_files")
+    return value is True or str(value).lower() == "true"
+
+
+class SyncState:
+    """Fingerprints of the files delivered to a user, kept in the plugin storage."""
+
+    def __init__(self, storage: Any, user_id: Optional[str]):
+        self._storage = storage
+        self._prefix = f"google_drive:sync:{user_id or 'anonymous'}:"
+
+    def _key(self, file_id: str) -> str:
+        return self._prefix + file_id
+
+    def get(self, file_id: str) -> Optional[dict]:
+        try:
+            if not self._storage.exist(self._key(file_id)):
+                return None
+            return json.loads(self._storage.get(self._key(file_id)))
+        except Exception as e:
+            # a file that cannot be checked is downloaded
+            logger.warning(f"Failed to read the sync state of file {file_id}: {e}")
+            return None
+
+    def is_unchanged(self, file_id: str, current: Optional[dict]) -> bool:
+        return current is not None and self.get(file_id) == current
+
+    def record(self, file_id: str, current: Optional[dict]) -> None:
+        if current is None:
+            return
+        try:
+            self._storage.set(self._key(file_id), json.dumps(current).encode())
+        except Exception as e:
+            logger.warning(f"Failed to record the sync state of file {file_id}: {e}")
+
+
+def iter_blob_chunks(
+    parts: Iterable[bytes], total_length: int, meta: dict
+) -> Generator[DatasourceMessage, None, None]:
+    """
+    Stream a file as blob chunk messages of at most BLOB_CHUNK_SIZE bytes,
+    without holding more than one part in memory.
+
+    :raises ValueError: if the parts do not add up to ``total_length``
+    """
+    blob_id = uuid.uuid4().hex
+    sequence = 0
+    received = 0
+    for part in parts:
+        for start in range(0, len(part), BLOB_CHUNK_SIZE):
+            chunk = part[start : start + BLOB_CHUNK_SIZE]
+            received += len(chunk)
+            yield DatasourceMessage(
+                type=InvokeMessage.MessageType.BLOB_CHUNK,
+                message=InvokeMessage.BlobChunkMessage(
+                    id=blob_id, sequence=sequence, total_length=total_length, blob=chunk, end=False
+                ),
+                meta=meta,
+            )
+            sequence += 1
+    if received != total_length:
+        raise ValueError(f"Download incomplete: received {received} of {total_length} bytes")
+    yield DatasourceMessage(
+        type=InvokeMessage.MessageType.BLOB_CHUNK,
+        message=InvokeMessage.BlobChunkMessage(
+            id=blob_id, sequence=sequence, total_length=total_length, blob=b"", end=True
+        ),
+        meta=meta,
+    )
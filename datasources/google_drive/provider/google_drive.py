@@ -135,6 +135,7 @@ class GoogleDriveDatasourceProvider(DatasourceProvider):
             credentials={
                 "access_token": access_token,
                 "refresh_token": refresh_token,
+                "skip_unchanged_files": system_credentials.get("skip_unchanged_files", False),
             },
         )
 
@@ -198,6 +199,9 @@ class GoogleDriveDatasourceProvider(DatasourceProvider):
             "client_id": system_credentials.get("client_id") or credentials.get("client_id"),
             "client_secret": system_credentials.get("client_secret") or credentials.get("client_secret"),
             "user_email": user_email,
+            "skip_unchanged_files": system_credentials.get(
+                "skip_unchanged_files", credentials.get("skip_unchanged_files", False)
+            ),
         }
 
         return DatasourceOAuthCredentials(
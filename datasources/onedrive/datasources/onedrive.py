@@ -1,5 +1,6 @@
+import logging
 from collections.abc import Generator
-import requests
+from typing import Optional
 
 from dify_plugin.entities.datasource import (
     DatasourceMessage,
@@ -11,6 +12,9 @@ from dify_plugin.entities.datasource import (
 )
 from dify_plugin.interfaces.datasource.online_drive import OnlineDriveDatasource
 
+from .utils import graph_sync
+
+logger = logging.getLogger(__name__)
 
 class OneDriveDataSource(OnlineDriveDatasource):
     
@@ -42,6 +46,17 @@ class OneDriveDataSource(OnlineDriveDatasource):
             raise ValueError("Credentials not found")
 
         headers = {"Authorization": f"Bearer {access_token}", "Accept": "application/json"}
+
+        # Listings that started from the API keep paging through it
+        if not next_page_parameters.get("next_link"):
+            mirror = self._sync_mirror(headers)
+            if mirror is not None:
+                folder_id = "" if prefix == "root" else prefix
+                files, next_page_parameters = graph_sync.list_mirror_page(
+                    mirror, folder_id, max_keys, next_page_parameters
+                )
+                return OnlineDriveBrowseFilesResponse(result=[OnlineDriveFileBucket(bucket=bucket_name, files=files, is_truncated=bool(next_page_parameters), next_page_parameters=next_page_parameters)])
+
         base_url = "https://graph.microsoft.com/v1.0/me/drive"
         url = f"{base_url}/root/children" if prefix == "root" else f"{base_url}/items/{prefix}/children"
         params = {"$top": max_keys}
@@ -49,13 +64,14 @@ class OneDriveDataSource(OnlineDriveDatasource):
             url = next_page_parameters["next_link"]
             params = {}
 
-        resp = requests.get(url, headers=headers, params=params, timeout=10)
+        session = graph_sync.graph_session()
+        resp = session.get(url, headers=headers, params=params, timeout=10)
         if resp.status_code == 401:
             # Token may have expired, try to refresh
             try:
                 updated_credentials = self._refresh_token_if_needed()
                 headers["Authorization"] = f"Bearer {updated_credentials['access_token']}"
-                resp = requests.get(url, headers=headers, params=params, timeout=10)
+                resp = session.get(url, headers=headers, params=params, timeout=10)
             except Exception as e:
                 raise ValueError(f"Token refresh failed: {str(e)}")
         
@@ -95,24 +111,43 @@ class OneDriveDataSource(OnlineDriveDatasource):
         headers = {"Authorization": f"Bearer {access_token}", "Accept": "application/json"}
         base_url = "https://graph.microsoft.com/v1.0/me/drive/items"
 
-        meta_resp = requests.get(f"{base_url}/{file_id}", headers=headers, timeout=10)
-        meta = meta_resp.json() if meta_resp.content else {}
-
-        content_resp = requests.get(f"{base_url}/{file_id}/content", headers=headers, timeout=30)
-        if content_resp.status_code == 401:
+        session = graph_sync.graph_session()
+        meta_params = {"$select": "id,name,size,file,@microsoft.graph.downloadUrl"}
+        meta_resp = session.get(f"{base_url}/{file_id}", headers=headers, params=meta_params, timeout=10)
+        if meta_resp.status_code == 401:
             # Token may have expired, try to refresh
             try:
                 updated_credentials = self._refresh_token_if_needed()
                 headers["Authorization"] = f"Bearer {updated_credentials['access_token']}"
-                content_resp = requests.get(f"{base_url}/{file_id}/content", headers=headers, timeout=30)
+                meta_resp = session.get(f"{base_url}/{file_id}", headers=headers, params=meta_params, timeout=10)
             except Exception as e:
                 raise ValueError(f"Token refresh failed: {str(e)}")
-        
-        content_resp.raise_for_status()
-        file_bytes = content_resp.content
-
-        yield self.create_blob_message(file_bytes, meta={
+        graph_sync.check_response(meta_resp, "get file metadata")
+        meta = meta_resp.json() if meta_resp.content else {}
+        file_meta = {
             "file_name": meta.get("name"),
             "mime_type": meta.get("file", {}).get("mimeType", "application/octet-stream"),
-        })
+        }
+
+        # Ranges of the pre-authenticated download URL are fetched concurrently
+        download_url = meta.get("@microsoft.graph.downloadUrl")
+        size = int(meta.get("size") or 0)
+        if download_url and size > 0:
+            yield from graph_sync.stream_download(download_url, size, file_meta)
+            return
+
+        content_resp = session.get(f"{base_url}/{file_id}/content", headers=headers, timeout=30)
+        content_resp.raise_for_status()
+        file_bytes = content_resp.content
 
+        yield self.create_blob_message(file_bytes, meta=file_meta)
+
+    def _sync_mirror(self, headers: dict) -> Optional[graph_sync.DriveMirror]:
+        """The up to date mirror of the user's drive, or None while it is being crawled."""
+        user = self.runtime.credentials.get("user_email") or "me"
+        key = f"onedrive:{self.runtime.user_id}:{user}"
+        try:
+            return graph_sync.sync_drive(self.session.storage, key, "/me/drive", headers)
+        except Exception as e:
+            logger.warning(f"Failed to sync the drive mirror, listing from the API: {e}")
+            return None
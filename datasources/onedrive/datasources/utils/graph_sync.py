@@ -0,0 +1,410 @@
+"""
+Incremental browsing and concurrent downloads for Microsoft Graph drives.
+
+A drive is mirrored into the plugin storage with the Graph ``/delta`` query:
+the first sync crawls the drive for a bounded time per call, and every later
+one only fetches the changes since the stored delta link. Once a drive
+is mirrored, folders are listed from the mirror instead of the API.
+
+Files are downloaded from their pre-authenticated
+``@microsoft.graph.downloadUrl`` in byte ranges fetched concurrently, and
+streamed as blob chunks in order. All requests share one pooled session.
+
+This module is shared by the OneDrive and SharePoint datasources.
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from collections.abc import Generator, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+import requests
+from dify_plugin.entities.datasource import DatasourceMessage, OnlineDriveFile
+from dify_plugin.entities.invoke_message import InvokeMessage
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+GRAPH_BASE_URL = "https://graph.microsoft.com/v1.0"
+DELTA_SELECT = "id,name,size,folder,file,parentReference,deleted,root"
+# the most delta pages fetched by one call, and the time after which no further page is
+# requested; a larger first crawl continues on the next call, so a browse call is not held up
+MAX_DELTA_PAGES = 50
+MAX_SYNC_SECONDS = 2.0
+# a mirror synced more recently than this is used without asking for changes
+MIN_SYNC_INTERVAL_SECONDS = 30
+MIRROR_CACHE_SIZE = 8
+# the most requests Graph accepts in one $batch
+MAX_BATCH_REQUESTS = 20
+
+RANGE_SIZE = 4 * 1024 * 1024
+MAX_RANGE_WORKERS = 4
+MAX_RANGE_ATTEMPTS = 3
+# the largest blob chunk the plugin daemon accepts
+BLOB_CHUNK_SIZE = 8192
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def graph_session() -> requests.Session:
+    """The pooled session shared by all Graph and download requests."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=MAX_RANGE_WORKERS * 4)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def check_response(response: requests.Response, action: str) -> None:
+    if response.status_code == 401:
+        raise ValueError(
+            "Authentication failed (401 Unauthorized). Access token may have expired. "
+            "Please refresh or re-authorize the connection."
+        )
+    if response.status_code >= 400:
+        raise ValueError(f"Failed to {action}: {response.status_code} - {response.text[:200]}")
+
+
+def batch_get(headers: dict, paths: list[str]) -> list[dict]:
+    """
+    GET several Graph paths, relative to the version root, with JSON ``$batch``
+    requests, and return their bodies in order.
+    """
+    session = graph_session()
+    bodies: list[dict] = []
+    for start in range(0, len(paths), MAX_BATCH_REQUESTS):
+        chunk = paths[start : start + MAX_BATCH_REQUESTS]
+        payload = {
+            "requests": [
+                {"id": str(index), "method": "GET", "url": path} for index, path in enumerate(chunk)
+            ]
+        }
+        response = session.post(
+            f"{GRAPH_BASE_URL}/$batch",
+            headers={**headers, "Content-Type": "application/json"},
+            json=payload,
+            timeout=30,
+        )
+        check_response(response, "run batch request")
+        responses = {item["id"]: item for item in response.json().get("responses", [])}
+        for index, path in enumerate(chunk):
+            item = responses.get(str(index), {})
+            status = item.get("status", 500)
+            if status == 401:
+                raise ValueError(
+                    "Authentication failed (401 Unauthorized). Access token may have expired. "
+                    "Please refresh or re-authorize the connection."
+                )
+            if status >= 400:
+                raise ValueError(f"Failed to get {path}: {status} - {str(item.get('body'))[:200]}")
+            bodies.append(item.get("body") or {})
+    return bodies
+
+
+class DriveMirror:
+    """The folders and files of a drive, as last reported by its delta query."""
+
+    def __init__(
+        self,
+        drive_id: str,
+        root_id: str,
+        link: str,
+        items: Optional[dict[str, list]] = None,
+        complete: bool = False,
+        synced_at: float = 0.0,
+    ):
+        self.drive_id = drive_id
+        self.root_id = root_id
+        self.link = link
+        self.complete = complete
+        self.synced_at = synced_at
+        # item id -> [parent id, name, size, is folder]
+        self.items: dict[str, list] = items or {}
+        self._children: dict[str, set[str]] = {}
+        for item_id, (parent_id, *_rest) in self.items.items():
+            self._children.setdefault(parent_id, set()).add(item_id)
+
+    def _remove(self, item_id: str) -> None:
+        entry = self.items.pop(item_id, None)
+        if entry is None:
+            return
+        self._children.get(entry[0], set()).discard(item_id)
+        # a deleted folder is not always reported with its contents
+        for child_id in list(self._children.pop(item_id, ())):
+            self._remove(child_id)
+
+    def apply(self, changes: list[dict]) -> bool:
+        """Apply one page of delta changes and return whether anything changed."""
+        changed = False
+        for change in changes:
+            item_id = change.get("id")
+            if not item_id:
+                continue
+            if "root" in change:
+                self.root_id = item_id
+                continue
+            if "deleted" in change:
+                changed = changed or item_id in self.items
+                self._remove(item_id)
+                continue
+            parent_id = (change.get("parentReference") or {}).get("id", "")
+            is_folder = "folder" in change
+            size = 0 if is_folder else int(change.get("size") or 0)
+            entry = [parent_id, change.get("name", ""), size, 1 if is_folder else 0]
+            previous = self.items.get(item_id)
+            if previous == entry:
+                continue
+            if previous is not None:
+                self._children.get(previous[0], set()).discard(item_id)
+            self.items[item_id] = entry
+            self._children.setdefault(parent_id, set()).add(item_id)
+            changed = True
+        return changed
+
+    def children(self, folder_id: str) -> list[tuple[str, str, int, bool]]:
+        """The ``(id, name, size, is folder)`` of a folder's children, folders first, by name."""
+        children = []
+        for item_id in self._children.get(folder_id or self.root_id, ()):
+            parent_id, name, size, is_folder = self.items[item_id]
+            children.append((item_id, name, size, bool(is_folder)))
+        children.sort(key=lambda child: (not child[3], child[1].lower()))
+        return children
+
+    def to_bytes(self) -> bytes:
+        data = {
+            "drive_id": self.drive_id,
+            "root_id": self.root_id,
+            "link": self.link,
+            "complete": self.complete,
+            "synced_at": self.synced_at,
+            "items": self.items,
+        }
+        return zlib.compress(json.dumps(data, separators=(",", ":")).encode())
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "DriveMirror":
+        return cls(**json.loads(zlib.decompress(data)))
+
+
+_mirrors: "OrderedDict[str, DriveMirror]" = OrderedDict()
+_mirror_locks: dict[str, threading.Lock] = {}
+_mirrors_lock = threading.Lock()
+
+
+def _mirror_lock(key: str) -> threading.Lock:
+    with _mirrors_lock:
+        return _mirror_locks.setdefault(key, threading.Lock())
+
+
+def _load_mirror(storage: Any, key: str) -> Optional[DriveMirror]:
+    try:
+        if not storage.exist(f"{key}:cursor"):
+            return None
+        cursor = json.loads(storage.get(f"{key}:cursor"))
+        with _mirrors_lock:
+            mirror = _mirrors.get(key)
+        if mirror is not None and mirror.link == cursor.get("link"):
+            return mirror
+        mirror = DriveMirror.from_bytes(storage.get(f"{key}:items"))
+        # the items are only written when they change, the cursor on every sync
+        mirror.link = cursor["link"]
+        mirror.complete = cursor.get("complete", mirror.complete)
+        mirror.synced_at = cursor.get("synced_at", mirror.synced_at)
+        return mirror
+    except Exception as e:
+        logger.warning(f"Failed to load the drive mirror {key}: {e}")
+        return None
+
+
+def _save_mirror(storage: Any, key: str, mirror: DriveMirror, items_changed: bool) -> None:
+    try:
+        if items_changed or not storage.exist(f"{key}:items"):
+            storage.set(f"{key}:items", mirror.to_bytes())
+        cursor = {"link": mirror.link, "complete": mirror.complete, "synced_at": mirror.synced_at}
+        storage.set(f"{key}:cursor", json.dumps(cursor).encode())
+    except Exception as e:
+        logger.warning(f"Failed to save the drive mirror {key}: {e}")
+
+
+def sync_drive(storage: Any, key: str, drive_path: str, headers: dict) -> Optional[DriveMirror]:
+    """
+    Bring the mirror of the drive at ``drive_path`` (e.g. ``/me/drive``) up to date
+    and return it, or None while its first crawl is still unfinished.
+    ``key`` identifies the drive and its user in the plugin storage.
+    """
+    with _mirror_lock(key):
+        mirror = _load_mirror(storage, key)
+        if mirror is not None and mirror.complete:
+            if time.time() - mirror.synced_at < MIN_SYNC_INTERVAL_SECONDS:
+                return mirror
+        if mirror is None:
+            drive, root = batch_get(
+                headers, [drive_path + "?$select=id", drive_path + "/root?$select=id"]
+            )
+            start_link = f"{GRAPH_BASE_URL}/drives/{drive['id']}/root/delta?$select={DELTA_SELECT}"
+            mirror = DriveMirror(drive["id"], root["id"], start_link)
+
+        session = graph_session()
+        items_changed = False
+        deadline = time.monotonic() + MAX_SYNC_SECONDS
+        for page in range(MAX_DELTA_PAGES):
+            if page and time.monotonic() >= deadline:
+                break
+            response = session.get(mirror.link, headers=headers, timeout=30)
+            if response.status_code == 410:
+                # the delta link expired, the drive has to be crawled again
+                logger.info(f"Delta link of {key} expired, crawling the drive again")
+                mirror = DriveMirror(
+                    mirror.drive_id,
+                    mirror.root_id,
+                    f"{GRAPH_BASE_URL}/drives/{mirror.drive_id}/root/delta?$select={DELTA_SELECT}",
+                )
+                items_changed = True
+                continue
+            check_response(response, "query drive changes")
+            data = response.json()
+            items_changed = mirror.apply(data.get("value", [])) or items_changed
+            if data.get("@odata.nextLink"):
+                mirror.link = data["@odata.nextLink"]
+                continue
+            mirror.link = data.get("@odata.deltaLink", mirror.link)
+            mirror.complete = True
+            break
+
+        mirror.synced_at = time.time()
+        _save_mirror(storage, key, mirror, items_changed)
+        with _mirrors_lock:
+            _mirrors[key] = mirror
+            _mirrors.move_to_end(key)
+            while len(_mirrors) > MIRROR_CACHE_SIZE:
+                _mirrors.popitem(last=False)
+        logger.info(
+            f"Drive mirror {key} holds {len(mirror.items)} items, complete: {mirror.complete}"
+        )
+        return mirror if mirror.complete else None
+
+
+def list_mirror_page(
+    mirror: DriveMirror,
+    folder_id: str,
+    max_keys: int,
+    next_page_parameters: dict,
+    id_prefix: str = "",
+) -> tuple[list[OnlineDriveFile], dict]:
+    """One page of a folder of the mirror, and the parameters of the next page."""
+    children = mirror.children(folder_id)
+    offset = int((next_page_parameters or {}).get("offset") or 0)
+    page = children[offset : offset + max_keys]
+    files = [
+        OnlineDriveFile(
+            id=f"{id_prefix}{item_id}",
+            name=name,
+            size=size,
+            type="folder" if is_folder else "file",
+        )
+        for item_id, name, size, is_folder in page
+    ]
+    next_offset = offset + len(page)
+    return files, ({"offset": next_offset} if next_offset < len(children) else {})
+
+
+def _fetch_range(url: str, start: int, end: int) -> bytes:
+    session = graph_session()
+    attempt = 1
+    while True:
+        try:
+            response = session.get(url, headers={"Range": f"bytes={start}-{end}"}, timeout=120)
+            check_response(response, "download file range")
+            if response.status_code == 200 and start == 0:
+                # the server ignored the range and sent the whole file
+                return response.content[: end + 1]
+            if response.status_code != 206 or len(response.content) != end - start + 1:
+                raise ValueError(
+                    f"Unexpected response for bytes {start}-{end}: {response.status_code}"
+                )
+            return response.content
+        except (requests.exceptions.RequestException, ValueError) as e:
+            if attempt >= MAX_RANGE_ATTEMPTS or "401" in str(e):
+                raise
+            logger.warning(f"Retrying bytes {start}-{end} after attempt {attempt} failed: {e}")
+            time.sleep(0.5 * 2 ** (attempt - 1))
+            attempt += 1
+
+
+def iter_ranges(url: str, total_length: int) -> Iterator[bytes]:
+    """
+    The content of a file in order, fetched in ranges by a pool of workers.
+    At most ``MAX_RANGE_WORKERS`` ranges are held in memory ahead of the reader.
+    """
+    ranges = [
+        (start, min(start + RANGE_SIZE, total_length) - 1)
+        for start in range(0, total_length, RANGE_SIZE)
+    ]
+    if len(ranges) == 1:
+        yield _fetch_range(url, *ranges[0])
+        return
+
+    executor = ThreadPoolExecutor(max_workers=MAX_RANGE_WORKERS)
+    try:
+        pending = [executor.submit(_fetch_range, url, *r) for r in ranges[:MAX_RANGE_WORKERS]]
+        next_range = len(pending)
+        while pending:
+            data = pending.pop(0).result()
+            if next_range < len(ranges):
+                pending.append(executor.submit(_fetch_range, url, *ranges[next_range]))
+                next_range += 1
+            yield data
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_blob_chunks(
+    parts: Iterator[bytes], total_length: int, meta: dict
+) -> Generator[DatasourceMessage, None, None]:
+    """
+    Stream a file as blob chunk messages of at most BLOB_CHUNK_SIZE bytes, ended
+    by an empty chunk once all ``total_length`` bytes have been received.
+
+    :raises ValueError: if the parts do not add up to ``total_length``
+    """
+    blob_id = uuid.uuid4().hex
+    sequence = 0
+    received = 0
+    for part in parts:
+        for start in range(0, len(part), BLOB_CHUNK_SIZE):
+            chunk = part[start : start + BLOB_CHUNK_SIZE]
+            received += len(chunk)
+            yield DatasourceMessage(
+                type=InvokeMessage.MessageType.BLOB_CHUNK,
+                message=InvokeMessage.BlobChunkMessage(
+                    id=blob_id, sequence=sequence, total_length=total_length, blob=chunk, end=False
+                ),
+                meta=meta,
+            )
+            sequence += 1
+    if received != total_length:
+        raise ValueError(f"Download incomplete: received {received} of {total_length} bytes")
+    yield DatasourceMessage(
+        type=InvokeMessage.MessageType.BLOB_CHUNK,
+        message=InvokeMessage.BlobChunkMessage(
+            id=blob_id, sequence=sequence, total_length=total_length, blob=b"", end=True
+        ),
+        meta=meta,
+    )
+
+
+def stream_download(
+    download_url: str, total_length: int, meta: dict
+) -> Generator[DatasourceMessage, None, None]:
+    """Download a file from its ``@microsoft.graph.downloadUrl`` as blob chunks."""
+    yield from iter_blob_chunks(iter_ranges(download_url, total_length), total_length, meta)
@@ -13,7 +13,7 @@ from dify_plugin.entities.datasource import (
 from dify_plugin.entities.invoke_message import InvokeMessage
 from dify_plugin.interfaces.datasource.online_drive import OnlineDriveDatasource
 
-from .utils import graph_utils
+from .utils import graph_sync, graph_utils
 
 logger = logging.getLogger(__name__)
 
@@ -74,7 +74,16 @@ class SharePointDataSource(OnlineDriveDatasource):
         self, site_id: str, item_id: str, headers: dict, max_keys: int, next_page_parameters: dict, bucket_name: str
     ) -> OnlineDriveBrowseFilesResponse:
         return graph_utils.browse_drive(
-            self._BASE_URL, self._RESOURCE, site_id, item_id, headers, max_keys, next_page_parameters, bucket_name
+            self._BASE_URL,
+            self._RESOURCE,
+            site_id,
+            item_id,
+            headers,
+            max_keys,
+            next_page_parameters,
+            bucket_name,
+            storage=self.session.storage,
+            user_id=self.runtime.user_id,
         )
 
     def _stream_blob_chunks(
@@ -192,6 +201,17 @@ class SharePointDataSource(OnlineDriveDatasource):
         try:
             logger.info(f"Downloading file with streaming: {file_id}")
 
+            # Ranges of the pre-authenticated download URL are fetched concurrently
+            download_url, size, file_name, mime_type = graph_utils.get_download_source(
+                self._BASE_URL, self._RESOURCE, file_id, headers, self._get_mime_type_from_filename
+            )
+            if download_url and size > 0:
+                logger.info(f"Streaming file '{file_name}' ({size / 1024 / 1024:.2f}MB, {mime_type}) in ranges")
+                yield from graph_sync.stream_download(
+                    download_url, size, meta={"file_name": file_name, "mime_type": mime_type}
+                )
+                return
+
             # Download file from SharePoint
             file_content, file_name, mime_type = graph_utils.download_file(
                 self._BASE_URL, self._RESOURCE, file_id, headers, self._get_mime_type_from_filename
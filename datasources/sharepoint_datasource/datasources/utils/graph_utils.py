@@ -5,6 +5,9 @@ import mimetypes
 import urllib.parse
 from dify_plugin.entities.datasource import OnlineDriveFile, OnlineDriveFileBucket, OnlineDriveBrowseFilesResponse
 from pathlib import Path
+from typing import Any, Optional
+
+from . import graph_sync
 
 logger = logging.getLogger(__name__)
 
@@ -92,7 +95,7 @@ def list_all_resources(
 
     # Send HTTP request to Graph API
     url = f"{base_url}/{resource}"
-    response = requests.get(url, headers=headers, params=params, timeout=30)
+    response = graph_sync.graph_session().get(url, headers=headers, params=params, timeout=30)
 
     # Check authentication errors
     if response.status_code == 401:
@@ -151,10 +154,33 @@ def browse_drive(
     max_keys: int,
     next_page_parameters: dict,
     bucket_name: str,
+    storage: Any = None,
+    user_id: Optional[str] = None,
 ) -> OnlineDriveBrowseFilesResponse:
     """
     Browse drive content of a specific resource (site/group)
+
+    With a plugin ``storage``, folders are listed from a mirror of the drive kept
+    up to date with delta queries, once its first crawl has finished.
     """
+    # Listings that started from the API keep paging through it
+    if storage is not None and not (next_page_parameters or {}).get("skip"):
+        mirror = sync_resource_drive(storage, user_id, resource, resource_id, headers)
+        if mirror is not None:
+            files, next_page_parameters = graph_sync.list_mirror_page(
+                mirror, item_id, max_keys, next_page_parameters, id_prefix=f"{resource_id}/"
+            )
+            return OnlineDriveBrowseFilesResponse(
+                result=[
+                    OnlineDriveFileBucket(
+                        bucket=resource_id,
+                        files=files,
+                        is_truncated=bool(next_page_parameters),
+                        next_page_parameters=next_page_parameters,
+                    )
+                ]
+            )
+
     # Build URL for the default drive
     if not item_id:
         # List root items in the default drive
@@ -170,7 +196,7 @@ def browse_drive(
     if next_page_parameters and next_page_parameters.get("skip"):
         params["$skip"] = next_page_parameters.get("skip")
 
-    response = requests.get(url, headers=headers, params=params, timeout=30)
+    response = graph_sync.graph_session().get(url, headers=headers, params=params, timeout=30)
 
     # Check authentication errors
     if response.status_code == 401:
@@ -220,75 +246,131 @@ def browse_drive(
     )
 
 
+def sync_resource_drive(
+    storage: Any, user_id: Optional[str], resource: str, resource_id: str, headers: dict
+) -> Optional[graph_sync.DriveMirror]:
+    """The up to date mirror of the default drive of a site/group, or None while it is being crawled."""
+    key = f"sharepoint:{user_id}:{resource}:{resource_id}"
+    try:
+        return graph_sync.sync_drive(storage, key, f"/{resource}/{resource_id}/drive", headers)
+    except Exception as e:
+        logger.warning(f"Failed to sync the drive mirror, listing from the API: {e}")
+        return None
+
+
 def get_mime_type_from_filename(filename: str) -> str:
     """Determine MIME type from file extension."""
     mime_type, _ = mimetypes.guess_type(filename)
     return mime_type or "application/octet-stream"
 
 
-def download_file(base_url: str, resource: str, file_id: str, headers: dict, get_mime_type_from_filename):
-    try:
-        # For SharePoint, we need to determine if this is a direct drive item
-        # file_id may be in format "resource_id/drive_item_id" or just "drive_item_id"
-        resource_id, item_id = file_id.split("/", 1)
+def get_file_metadata(
+    base_url: str, resource: str, file_id: str, headers: dict, get_mime_type_from_filename
+) -> tuple[dict, str, str]:
+    """
+    Get and check the metadata of a file before it is downloaded.
 
-        metadata_url = f"{base_url}/{resource}/{resource_id}/drive/items/{item_id}"
-        content_url = f"{base_url}/{resource}/{resource_id}/drive/items/{item_id}/content"
+    Returns:
+        Tuple (file_metadata, file_name, mime_type), where file_name includes the file path
+    """
+    # file_id may be in format "resource_id/drive_item_id" or just "drive_item_id"
+    resource_id, item_id = file_id.split("/", 1)
 
-        # First, get file metadata
-        # metadata_params = {"$select": "id,name,size,folder,file"}
-        metadata_response = requests.get(metadata_url, headers=headers, timeout=30)
+    metadata_url = f"{base_url}/{resource}/{resource_id}/drive/items/{item_id}"
 
-        if metadata_response.status_code == 401:
-            logger.error(f"Authentication failed: {metadata_response.text[:200]}")
-            raise ValueError(
-                "Authentication failed (401 Unauthorized). Access token may have expired. "
-                "Please refresh or re-authorize the connection."
-            )
-        elif metadata_response.status_code == 404:
-            logger.error(f"File not found: {item_id}")
-            raise ValueError(f"File with ID '{item_id}' not found.")
-        elif metadata_response.status_code != 200:
-            logger.error(f"Failed to get file metadata: {metadata_response.status_code}")
-            raise ValueError(f"Failed to get file metadata: {metadata_response.status_code}")
+    # First, get file metadata
+    # metadata_params = {"$select": "id,name,size,folder,file"}
+    metadata_response = graph_sync.graph_session().get(metadata_url, headers=headers, timeout=30)
+
+    if metadata_response.status_code == 401:
+        logger.error(f"Authentication failed: {metadata_response.text[:200]}")
+        raise ValueError(
+            "Authentication failed (401 Unauthorized). Access token may have expired. "
+            "Please refresh or re-authorize the connection."
+        )
+    elif metadata_response.status_code == 404:
+        logger.error(f"File not found: {item_id}")
+        raise ValueError(f"File with ID '{item_id}' not found.")
+    elif metadata_response.status_code != 200:
+        logger.error(f"Failed to get file metadata: {metadata_response.status_code}")
+        raise ValueError(f"Failed to get file metadata: {metadata_response.status_code}")
+
+    file_metadata = metadata_response.json()
+
+    # Check file size
+    file_size = file_metadata.get("size", 0)
+    if file_size > 1000 * 1024 * 1024:
+        raise ValueError(f"File size exceeds limit: {file_size} bytes")
+
+    file_name = file_metadata.get("name", "unknown")
+
+    # check extension
+    file_extension = Path(file_name).suffix
+    if file_extension in reject_extensions:
+        raise ValueError(f"Cannot download file '{file_name}'. Not supported file extension {file_extension}.")
+
+    # Get file path
+    parent_reference = file_metadata.get("parentReference", {})
+    raw_file_path = parent_reference.get("path", "")
+    file_path = raw_file_path.removeprefix("/drive/root:")
 
-        file_metadata = metadata_response.json()
+    #Add file path to file_name
+    if file_path:
+        file_name = file_path + "/" + file_name
 
-        # Check file size
-        file_size = file_metadata.get("size", 0)
-        if file_size > 1000 * 1024 * 1024:
-            raise ValueError(f"File size exceeds limit: {file_size} bytes")
+    # Determine MIME type from file extension or use default
+    mime_type = get_mime_type_from_filename(file_name)
 
-        file_name = file_metadata.get("name", "unknown")
+    # check mimetype
+    for reject_mime_type in reject_mime_types:
+        if reject_mime_type in mime_type:
+            raise ValueError(f"Cannot download file '{file_name}'. {rag_reject_reason(mime_type)}")
 
-        # check extension
-        file_extension = Path(file_name).suffix
-        if file_extension in reject_extensions:
-            raise ValueError(f"Cannot download file '{file_name}'. Not supported file extension {file_extension}.")
+    # Check if it's a folder (has 'folder' facet in SharePoint)
+    if "folder" in file_metadata:
+        raise ValueError(f"Cannot download folder '{file_name}'. Please select a file.")
 
-        # Get file path
-        parent_reference = file_metadata.get("parentReference", {})
-        raw_file_path = parent_reference.get("path", "")
-        file_path = raw_file_path.removeprefix("/drive/root:")
+    return file_metadata, file_name, mime_type
+
+
+def get_download_source(
+    base_url: str, resource: str, file_id: str, headers: dict, get_mime_type_from_filename
+) -> tuple[Optional[str], int, str, str]:
+    """
+    Get where a file can be downloaded from in ranges.
+
+    Returns:
+        Tuple (download_url, size, file_name, mime_type), where download_url is the
+        pre-authenticated URL of the file, if Graph returned one, and file_name carries
+        the clean download URL like in download_file
+    """
+    try:
+        file_metadata, file_name, mime_type = get_file_metadata(
+            base_url, resource, file_id, headers, get_mime_type_from_filename
+        )
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Network error: {e}")
+        raise ValueError(f"Network error occurred while downloading file: {str(e)}") from e
 
-        #Add file path to file_name
-        if file_path:
-            file_name = file_path + "/" + file_name
+    download_url = file_metadata.get("@microsoft.graph.downloadUrl")
+    if download_url:
+        file_name = file_name + "@@" + get_download_url(download_url)
+    return download_url, int(file_metadata.get("size") or 0), file_name, mime_type
 
-        # Determine MIME type from file extension or use default
-        mime_type = get_mime_type_from_filename(file_name)
 
-        # check mimetype
-        for reject_mime_type in reject_mime_types:
-            if reject_mime_type in mime_type:
-                raise ValueError(f"Cannot download file '{file_name}'. {rag_reject_reason(mime_type)}")
+def download_file(base_url: str, resource: str, file_id: str, headers: dict, get_mime_type_from_filename):
+    try:
+        # For SharePoint, we need to determine if this is a direct drive item
+        # file_id may be in format "resource_id/drive_item_id" or just "drive_item_id"
+        resource_id, item_id = file_id.split("/", 1)
+        content_url = f"{base_url}/{resource}/{resource_id}/drive/items/{item_id}/content"
 
-        # Check if it's a folder (has 'folder' facet in SharePoint)
-        if "folder" in file_metadata:
-            raise ValueError(f"Cannot download folder '{file_name}'. Please select a file.")
+        file_metadata, file_name, mime_type = get_file_metadata(
+            base_url, resource, file_id, headers, get_mime_type_from_filename
+        )
 
         # Use SharePoint Graph API to download file content
-        content_response = requests.get(
+        content_response = graph_sync.graph_session().get(
             content_url,
             headers=headers,
             timeout=600,  # Use longer timeout for file downloads
@@ -1,5 +1,9 @@
+import mimetypes
 import os
+import re
 from collections.abc import Generator
+from typing import Optional
+
 from qcloud_cos import CosConfig, CosS3Client
 from dify_plugin.entities.datasource import (
     DatasourceMessage,
@@ -11,6 +15,11 @@ from dify_plugin.entities.datasource import (
 )
 from dify_plugin.interfaces.datasource.online_drive import OnlineDriveDatasource
 
+from .utils import object_download
+
+# the ETag of an object uploaded in one part is the MD5 of its content
+_MD5_ETAG = re.compile(r"^[0-9a-f]{32}$")
+
 
 class TencentCOSStorageDataSource(OnlineDriveDatasource):
     def _browse_files(
@@ -25,13 +34,7 @@ class TencentCOSStorageDataSource(OnlineDriveDatasource):
         if not credentials:
             raise ValueError("Credentials not found")
 
-        config = CosConfig(
-            Region=credentials.get("region"),
-            SecretId=credentials.get("secret_id"),
-            SecretKey=credentials.get("secret_key"),
-            Scheme="https",
-        )
-        client = CosS3Client(config)
+        client = self._get_client(credentials)
 
         if not bucket_name:
             response = client.list_buckets()
@@ -109,19 +112,78 @@ class TencentCOSStorageDataSource(OnlineDriveDatasource):
         if not bucket_name:
             raise ValueError("Bucket name not found")
 
-        config = CosConfig(
-            Region=credentials.get("region"),
-            SecretId=credentials.get("secret_id"),
-            SecretKey=credentials.get("secret_key"),
-            Scheme="https",
+        client = self._get_client(credentials)
+
+        def read_range(name: str, start: int, end: Optional[int]) -> bytes:
+            response = client.get_object(
+                Bucket=bucket_name,
+                Key=name,
+                Range=f"bytes={start}-{'' if end is None else end}",
+            )
+            return response["Body"].get_raw_stream().read()
+
+        if key.endswith("/"):
+            # a folder: every object under its prefix, small ones fetched concurrently
+            objects = (
+                self._stored_object(obj["Key"], obj["Size"], obj.get("ETag"))
+                for obj in self._list_prefix(client, bucket_name, key)
+                if not obj["Key"].endswith("/")
+            )
+            yield from object_download.stream_objects(objects, read_range)
+            return
+
+        response = client.head_object(Bucket=bucket_name, Key=key)
+        yield from object_download.stream_object(
+            self._stored_object(
+                key,
+                response.get("Content-Length"),
+                response.get("ETag"),
+                response.get("Content-Type"),
+            ),
+            read_range,
         )
-        client = CosS3Client(config)
 
-        response = client.get_object(Bucket=bucket_name, Key=key)
-        content = response["Body"].get_raw_stream().read()
+    def _get_client(self, credentials: dict) -> CosS3Client:
+        def create() -> CosS3Client:
+            config = CosConfig(
+                Region=credentials.get("region"),
+                SecretId=credentials.get("secret_id"),
+                SecretKey=credentials.get("secret_key"),
+                Scheme="https",
+            )
+            return CosS3Client(config)
 
-        # Get content type from response headers
-        content_type = response.get("Content-Type", "application/octet-stream")
-        yield self.create_blob_message(
-            content, meta={"file_name": key, "mime_type": content_type}
+        return object_download.cached_client(
+            [credentials.get(k) for k in ("region", "secret_id", "secret_key")], create
+        )
+
+    @staticmethod
+    def _list_prefix(
+        client: CosS3Client, bucket_name: str, prefix: str
+    ) -> Generator[dict, None, None]:
+        marker = ""
+        while True:
+            response = client.list_objects(
+                Bucket=bucket_name, Prefix=prefix, Marker=marker, MaxKeys=1000
+            )
+            contents = response.get("Contents", [])
+            yield from contents
+            if response.get("IsTruncated") != "true" or not contents:
+                return
+            marker = response.get("NextMarker") or contents[-1]["Key"]
+
+    @staticmethod
+    def _stored_object(
+        key: str,
+        size: int | str,
+        etag: Optional[str],
+        content_type: Optional[str] = None,
+    ) -> object_download.StoredObject:
+        etag = (etag or "").strip('"').lower()
+        return object_download.StoredObject(
+            key=key,
+            size=int(size),
+            content_type=content_type or mimetypes.guess_type(key)[0],
+            checksum_algorithm="md5",
+            checksum=bytes.fromhex(etag) if _MD5_ETAG.match(etag) else None,
         )
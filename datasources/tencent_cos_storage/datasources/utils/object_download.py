@@ -0,0 +1,259 @@
+"""
+Shared clients and streamed, verified downloads for object storage datasources.
+
+One client is kept per set of credentials, so the clients and their connection
+pools are created once instead of on every call. Objects are read in ranges by
+a pool of workers and sent as blob chunks while their checksum is computed;
+the blob is only ended once the checksum matches the one the storage reported.
+
+A whole prefix can be downloaded as well: small objects are fetched
+concurrently ahead of the reader, large ones are streamed in ranges.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable, Generator, Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from dify_plugin.entities.datasource import DatasourceMessage
+from dify_plugin.entities.invoke_message import InvokeMessage
+
+try:
+    import google_crc32c
+except ImportError:
+    google_crc32c = None
+
+logger = logging.getLogger(__name__)
+
+CLIENT_CACHE_SIZE = 16
+# objects larger than one range are read in ranges by a pool of workers
+RANGE_SIZE = 8 * 1024 * 1024
+MAX_RANGE_WORKERS = 4
+MAX_RANGE_ATTEMPTS = 3
+# objects up to this size are fetched concurrently when a prefix is downloaded
+SMALL_OBJECT_SIZE = 1024 * 1024
+MAX_OBJECT_WORKERS = 8
+# the largest blob chunk the plugin daemon accepts
+BLOB_CHUNK_SIZE = 8192
+
+# reads the bytes ``start`` to ``end``, both inclusive, of an object, or to its end if None
+ReadRange = Callable[[str, int, Optional[int]], bytes]
+
+_clients: "OrderedDict[str, Any]" = OrderedDict()
+_clients_lock = threading.Lock()
+
+
+def _client_key(credentials: Any) -> str:
+    return hashlib.sha256(json.dumps(credentials, sort_keys=True).encode()).hexdigest()
+
+
+def cached_client(credentials: Any, create: Callable[[], Any]) -> Any:
+    """The client of a set of credentials, created with ``create`` the first time."""
+    key = _client_key(credentials)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is not None:
+            _clients.move_to_end(key)
+            return client
+
+    client = create()
+    with _clients_lock:
+        _clients[key] = client
+        while len(_clients) > CLIENT_CACHE_SIZE:
+            _clients.popitem(last=False)
+    return client
+
+
+def forget_client(credentials: Any) -> None:
+    """Drop the client of credentials the storage rejected."""
+    with _clients_lock:
+        _clients.pop(_client_key(credentials), None)
+
+
+class Checksum:
+    """A CRC32C or MD5 checksum computed over a download and compared to the expected digest."""
+
+    def __init__(self, algorithm: str, expected: bytes):
+        if algorithm == "crc32c":
+            self._hash = google_crc32c.Checksum()
+        elif algorithm == "md5":
+            self._hash = hashlib.md5()
+        else:
+            raise ValueError(f"Unsupported checksum algorithm: {algorithm}")
+        self.algorithm = algorithm
+        self.expected = expected
+
+    @staticmethod
+    def is_supported(algorithm: str) -> bool:
+        return algorithm == "md5" or (algorithm == "crc32c" and google_crc32c is not None)
+
+    def update(self, data: bytes) -> None:
+        self._hash.update(data)
+
+    def verify(self, name: str) -> None:
+        if self._hash.digest() != self.expected:
+            raise ValueError(f"Downloaded object {name} does not match its {self.algorithm}")
+
+
+@dataclass
+class StoredObject:
+    """
+    An object to download, with the digest the storage reported for it, if any.
+    The size is None for an object transformed on the way, like a decompressed
+    one, which is then read whole and not verified.
+    """
+
+    key: str
+    size: Optional[int]
+    content_type: Optional[str] = None
+    checksum_algorithm: Optional[str] = None
+    checksum: Optional[bytes] = None
+
+    def new_checksum(self) -> Optional[Checksum]:
+        if (
+            self.size is None
+            or not self.checksum
+            or not Checksum.is_supported(self.checksum_algorithm)
+        ):
+            return None
+        return Checksum(self.checksum_algorithm, self.checksum)
+
+    @property
+    def meta(self) -> dict:
+        return {"file_name": self.key, "mime_type": self.content_type or "application/octet-stream"}
+
+
+def _read_range(read_range: ReadRange, key: str, start: int, end: Optional[int]) -> bytes:
+    for attempt in range(MAX_RANGE_ATTEMPTS):
+        try:
+            data = read_range(key, start, end)
+        except Exception as e:
+            if attempt == MAX_RANGE_ATTEMPTS - 1:
+                raise
+            logger.warning(f"Failed to read bytes {start}-{end} of {key}, retrying: {e}")
+            time.sleep(2**attempt)
+            continue
+        if end is not None and len(data) != end - start + 1:
+            raise ValueError(f"Received {len(data)} bytes for bytes {start}-{end} of {key}")
+        return data
+
+
+def iter_ranges(read_range: ReadRange, key: str, size: int) -> Iterator[bytes]:
+    """
+    The content of an object in order, read in ranges by a pool of workers.
+    At most ``MAX_RANGE_WORKERS`` ranges are held in memory ahead of the reader.
+    """
+    ranges = [(start, min(start + RANGE_SIZE, size) - 1) for start in range(0, size, RANGE_SIZE)]
+    if len(ranges) <= 1:
+        for r in ranges:
+            yield _read_range(read_range, key, *r)
+        return
+
+    executor = ThreadPoolExecutor(max_workers=MAX_RANGE_WORKERS)
+    try:
+        pending = [
+            executor.submit(_read_range, read_range, key, *r) for r in ranges[:MAX_RANGE_WORKERS]
+        ]
+        next_range = len(pending)
+        while pending:
+            data = pending.pop(0).result()
+            if next_range < len(ranges):
+                pending.append(executor.submit(_read_range, read_range, key, *ranges[next_range]))
+                next_range += 1
+            yield data
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_blob_chunks(
+    parts: Iterable[bytes], total_length: int, meta: dict, checksum: Optional[Checksum] = None
+) -> Generator[DatasourceMessage, None, None]:
+    """
+    Stream an object as blob chunk messages of at most BLOB_CHUNK_SIZE bytes. The
+    final chunk, which ends the blob and carries the metadata, is only sent once
+    the length and, if given, the checksum of the received bytes have been verified.
+    """
+    blob_id = uuid.uuid4().hex
+    sequence = 0
+    received = 0
+    for part in parts:
+        if checksum is not None:
+            checksum.update(part)
+        for start in range(0, len(part), BLOB_CHUNK_SIZE):
+            chunk = part[start : start + BLOB_CHUNK_SIZE]
+            received += len(chunk)
+            yield DatasourceMessage(
+                type=InvokeMessage.MessageType.BLOB_CHUNK,
+                message=InvokeMessage.BlobChunkMessage(
+                    id=blob_id, sequence=sequence, total_length=total_length, blob=chunk, end=False
+                ),
+            )
+            sequence += 1
+    if received != total_length:
+        raise ValueError(f"Download incomplete: received {received} of {total_length} bytes")
+    if checksum is not None:
+        checksum.verify(meta.get("file_name", ""))
+    yield DatasourceMessage(
+        type=InvokeMessage.MessageType.BLOB_CHUNK,
+        message=InvokeMessage.BlobChunkMessage(
+            id=blob_id, sequence=sequence, total_length=total_length, blob=b"", end=True
+        ),
+        meta=meta,
+    )
+
+
+def stream_object(
+    obj: StoredObject, read_range: ReadRange
+) -> Generator[DatasourceMessage, None, None]:
+    """Download an object in ranges as verified blob chunks."""
+    if obj.size is None:
+        data = _read_range(read_range, obj.key, 0, None)
+        yield from iter_blob_chunks([data], len(data), obj.meta)
+        return
+    yield from iter_blob_chunks(
+        iter_ranges(read_range, obj.key, obj.size), obj.size, obj.meta, obj.new_checksum()
+    )
+
+
+def stream_objects(
+    objects: Iterable[StoredObject], read_range: ReadRange
+) -> Generator[DatasourceMessage, None, None]:
+    """
+    Download many objects, one blob after the other. Small objects are fetched by
+    a pool of workers ahead of the reader, at most ``MAX_OBJECT_WORKERS`` of them;
+    large ones are streamed in ranges when their turn comes.
+    """
+
+    def fetch(obj: StoredObject) -> bytes:
+        return _read_range(read_range, obj.key, 0, obj.size - 1) if obj.size else b""
+
+    objects = iter(objects)
+    executor = ThreadPoolExecutor(max_workers=MAX_OBJECT_WORKERS)
+    pending: list[tuple[StoredObject, Optional[Future]]] = []
+    try:
+        while True:
+            # keep the workers busy with the small objects up to a window ahead
+            while len(pending) < MAX_OBJECT_WORKERS:
+                obj = next(objects, None)
+                if obj is None:
+                    break
+                small = obj.size is not None and obj.size <= SMALL_OBJECT_SIZE
+                pending.append((obj, executor.submit(fetch, obj) if small else None))
+            if not pending:
+                break
+            obj, future = pending.pop(0)
+            if future is None:
+                yield from stream_object(obj, read_range)
+            else:
+                yield from iter_blob_chunks(
+                    [future.result()], obj.size, obj.meta, obj.new_checksum()
+                )
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
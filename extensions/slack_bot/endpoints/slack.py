@@ -1,5 +1,9 @@
 import json
+import logging
+import threading
+import time
 import traceback
+from collections import OrderedDict
 from typing import Mapping
 from werkzeug import Request, Response
 from dify_plugin import Endpoint
@@ -7,8 +11,67 @@ from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
 from markdown_to_mrkdwn import SlackMarkdownConverter
 
+logger = logging.getLogger(__name__)
+
 converter = SlackMarkdownConverter()
 
+ERROR_REPLY = "Sorry, I'm having trouble processing your request. Please try again later."
+PLACEHOLDER_TEXT = "_Thinking..._"
+# Slack allows roughly one chat.update per second per message
+UPDATE_INTERVAL_SECONDS = 1.0
+# Slack gives up redelivering an event after about five minutes
+EVENT_TTL_SECONDS = 10 * 60
+MAX_TRACKED_EVENTS = 10000
+
+
+class RecentEvents:
+    """Event ids seen within the last ``ttl`` seconds, to drop Slack redeliveries."""
+
+    def __init__(self, ttl: float = EVENT_TTL_SECONDS, max_size: int = MAX_TRACKED_EVENTS):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._seen: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, event_id: str) -> bool:
+        """Record ``event_id``; return False if it was already seen and has not expired."""
+        now = time.monotonic()
+        with self._lock:
+            while self._seen and next(iter(self._seen.values())) <= now:
+                self._seen.popitem(last=False)
+            if event_id in self._seen:
+                return False
+            while len(self._seen) >= self.max_size:
+                self._seen.popitem(last=False)
+            self._seen[event_id] = now + self.ttl
+            return True
+
+
+recent_events = RecentEvents()
+
+_clients: dict[str, WebClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(token: str) -> WebClient:
+    """Return the WebClient of a bot token, reusing its connection between events."""
+    with _clients_lock:
+        client = _clients.get(token)
+        if client is None:
+            client = _clients[token] = WebClient(token=token)
+        return client
+
+
+def answer_blocks(formatted_answer: str) -> list[dict]:
+    # Create proper mrkdwn block structure
+    return [{
+        "type": "section",
+        "text": {
+            "type": "mrkdwn",
+            "text": formatted_answer
+        }
+    }]
+
 
 class SlackEndpoint(Endpoint):
     def _invoke(self, r: Request, values: Mapping, settings: Mapping) -> Response:
@@ -27,8 +90,12 @@ class SlackEndpoint(Endpoint):
                 status=200,
                 content_type="application/json"
             )
-        
+
         if (data.get("type") == "event_callback"):
+            event_id = data.get("event_id")
+            if event_id and not recent_events.add(event_id):
+                # a redelivery of an event that is already being answered
+                return Response(status=200, response="ok")
             event = data.get("event")
             if (event.get("type") == "app_mention"):
                 message = event.get("text", "")
@@ -36,8 +103,10 @@ class SlackEndpoint(Endpoint):
                     message = message.split("> ", 1)[1] if "> " in message else message
                     channel = event.get("channel", "")
                     token = settings.get("bot_token")
-                    client = WebClient(token=token)
-                    try: 
+                    client = get_client(token)
+                    if settings.get("reply_mode") == "streaming":
+                        return self._reply_streaming(client, channel, message, settings)
+                    try:
                         response = self.session.app.chat.invoke(
                             app_id=settings["app"]["app_id"],
                             query=message,
@@ -47,16 +116,8 @@ class SlackEndpoint(Endpoint):
                         try:
                             answer = response.get("answer", "")
                             formatted_answer = converter.convert(answer)
-                            
-                            # Create proper mrkdwn block structure
-                            blocks = [{
-                                "type": "section",
-                                "text": {
-                                    "type": "mrkdwn",
-                                    "text": formatted_answer
-                                }
-                            }]
-                            
+                            blocks = answer_blocks(formatted_answer)
+
                             result = client.chat_postMessage(
                                 channel=channel,
                                 text=formatted_answer,  # Fallback text
@@ -74,7 +135,7 @@ class SlackEndpoint(Endpoint):
                         err = traceback.format_exc()
                         return Response(
                             status=200,
-                            response="Sorry, I'm having trouble processing your request. Please try again later." + str(err),
+                            response=ERROR_REPLY + str(err),
                             content_type="text/plain",
                         )
                 else:
@@ -83,3 +144,65 @@ class SlackEndpoint(Endpoint):
                 return Response(status=200, response="ok")
         else:
             return Response(status=200, response="ok")
+
+    def _reply_streaming(
+        self, client: WebClient, channel: str, message: str, settings: Mapping
+    ) -> Response:
+        """
+        Acknowledge the event at once and answer from a background worker, since
+        Slack redelivers events that are not acknowledged within three seconds.
+        """
+        worker = threading.Thread(
+            target=self._stream_answer,
+            args=(client, channel, message, settings["app"]["app_id"]),
+            daemon=True,
+        )
+        worker.start()
+        return Response(status=200, response="ok", content_type="text/plain")
+
+    def _stream_answer(self, client: WebClient, channel: str, message: str, app_id: str) -> None:
+        """Post a placeholder and keep editing it while the answer streams in."""
+        ts = None
+        try:
+            placeholder = client.chat_postMessage(channel=channel, text=PLACEHOLDER_TEXT, mrkdwn=True)
+            ts = placeholder["ts"]
+
+            answer = ""
+            shown = ""
+            last_update = time.monotonic()
+            for chunk in self.session.app.chat.invoke(
+                app_id=app_id,
+                query=message,
+                inputs={},
+                response_mode="streaming",
+            ):
+                event = chunk.get("event")
+                if event in ("message", "agent_message"):
+                    answer += chunk.get("answer", "")
+                elif event == "message_replace":
+                    answer = chunk.get("answer", "")
+                elif event == "error":
+                    raise RuntimeError(chunk.get("message", "App invocation failed"))
+
+                now = time.monotonic()
+                if answer and answer != shown and now - last_update >= UPDATE_INTERVAL_SECONDS:
+                    client.chat_update(channel=channel, ts=ts, text=converter.convert(answer))
+                    shown = answer
+                    last_update = now
+
+            formatted_answer = converter.convert(answer)
+            client.chat_update(
+                channel=channel,
+                ts=ts,
+                text=formatted_answer,  # Fallback text
+                blocks=answer_blocks(formatted_answer),
+            )
+        except Exception:
+            logger.exception("Failed to answer Slack message")
+            try:
+                if ts is None:
+                    client.chat_postMessage(channel=channel, text=ERROR_REPLY)
+                else:
+                    client.chat_update(channel=channel, ts=ts, text=ERROR_REPLY)
+            except SlackApiError:
+                logger.exception("Failed to report the error to Slack")
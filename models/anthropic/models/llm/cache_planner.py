@@ -0,0 +1,159 @@
+"""
+Placement of prompt cache breakpoints, shared by the Anthropic and Bedrock models.
+
+Both APIs cache the prompt prefix that ends at a breakpoint, in the order tools,
+system, messages, and accept a few breakpoints per request. A cached prefix is
+only read back by a later request that starts with the same content, so the
+planner puts breakpoints at the ends of the parts that stay the same across the
+turns of a conversation: the latest message, which is the prefix of the next
+turn, the tools and system prompt, and older turns of the history. Prefixes
+shorter than the minimum cacheable length of the model are never marked.
+
+Cache reads and writes reported by the responses are summed per conversation,
+so the hit rate of a conversation can be followed in the logs.
+"""
+
+import dataclasses
+import hashlib
+import json
+import logging
+import math
+import threading
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+TOOLS = "tools"
+SYSTEM = "system"
+MESSAGES = "messages"
+
+CHARS_PER_TOKEN = 4
+# images and documents are counted as a typical page, their real size is not known here
+MEDIA_TOKENS = 1600
+DEFAULT_MIN_TOKENS = 1024
+DEFAULT_MAX_BREAKPOINTS = 4
+USAGE_CACHE_SIZE = 1024
+
+# minimum cacheable prompt length by model name fragment, checked in order
+MIN_CACHEABLE_TOKENS = (
+    ("haiku-4-5", 4096),
+    ("opus-4-5", 4096),
+    ("3-5-haiku", 2048),
+    ("3-haiku", 2048),
+)
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def min_cacheable_tokens(model: str) -> int:
+    for fragment, min_tokens in MIN_CACHEABLE_TOKENS:
+        if fragment in model:
+            return min_tokens
+    return DEFAULT_MIN_TOKENS
+
+
+@dataclasses.dataclass
+class CacheSlot:
+    """A place a breakpoint can go: the end of a block of the prompt."""
+
+    region: str
+    # tokens of the prompt up to and including the block
+    prefix_tokens: int
+    # the provider's block or message the breakpoint is added to
+    target: Any = None
+
+
+def plan_breakpoints(
+    slots: Sequence[CacheSlot],
+    min_tokens: int = DEFAULT_MIN_TOKENS,
+    max_breakpoints: int = DEFAULT_MAX_BREAKPOINTS,
+) -> list[CacheSlot]:
+    """
+    Choose the slots to put breakpoints at, in prompt order.
+
+    The end of the latest message comes first, then the end of the tools and
+    system prompt, then older messages from the newest, then the end of the tools
+    alone. A slot is only taken if it adds or saves at least ``min_tokens`` over
+    every breakpoint already taken, so no breakpoint is spent on a prefix that
+    another one nearly covers.
+    """
+    eligible = [slot for slot in slots if slot.prefix_tokens >= min_tokens]
+    messages = [slot for slot in eligible if slot.region == MESSAGES]
+    stable = [slot for slot in eligible if slot.region != MESSAGES]
+    tools = [slot for slot in stable if slot.region == TOOLS]
+
+    candidates = messages[-1:] + stable[-1:] + messages[-2::-1] + tools[-1:]
+    chosen: list[CacheSlot] = []
+    for slot in candidates:
+        if len(chosen) >= max_breakpoints:
+            break
+        if all(abs(slot.prefix_tokens - other.prefix_tokens) >= min_tokens for other in chosen):
+            chosen.append(slot)
+    return sorted(chosen, key=lambda slot: slot.prefix_tokens)
+
+
+def conversation_key(model: str, *parts: Any) -> str:
+    """A key shared by the requests of one conversation, from the parts its turns start with."""
+    data = json.dumps([model, *parts], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(data.encode(), digest_size=16).hexdigest()
+
+
+@dataclasses.dataclass
+class CacheUsage:
+    requests: int = 0
+    input_tokens: int = 0
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """The share of prompt tokens that were read from the cache."""
+        total = self.input_tokens + self.cache_read_tokens + self.cache_write_tokens
+        return self.cache_read_tokens / total if total else 0.0
+
+
+class CacheUsageTracker:
+    """LRU of the cache usage of recent conversations."""
+
+    def __init__(self, maxsize: int = USAGE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._usage: OrderedDict[str, CacheUsage] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        key: Optional[str],
+        input_tokens: int,
+        cache_read_tokens: int,
+        cache_write_tokens: int,
+    ) -> CacheUsage:
+        """
+        Add the usage of one response to its conversation and return the totals.
+        ``input_tokens`` are the prompt tokens that were neither read nor written.
+        """
+        with self._lock:
+            usage = (self._usage.pop(key, None) if key else None) or CacheUsage()
+            usage.requests += 1
+            usage.input_tokens += input_tokens or 0
+            usage.cache_read_tokens += cache_read_tokens or 0
+            usage.cache_write_tokens += cache_write_tokens or 0
+            if key:
+                self._usage[key] = usage
+                while len(self._usage) > self.maxsize:
+                    self._usage.popitem(last=False)
+            total = dataclasses.replace(usage)
+
+        logger.info(
+            f"Prompt cache: read {cache_read_tokens or 0} and wrote {cache_write_tokens or 0}"
+            f" tokens, conversation hit rate {total.hit_rate:.0%} over {total.requests} requests"
+        )
+        return total
+
+    def get(self, key: str) -> Optional[CacheUsage]:
+        with self._lock:
+            usage = self._usage.get(key)
+            return dataclasses.replace(usage) if usage else None
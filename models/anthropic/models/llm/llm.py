@@ -49,8 +49,24 @@ from dify_plugin.interfaces.model.large_language_model import LargeLanguageModel
 from httpx import Timeout
 from PIL import Image
 
+from .cache_planner import (
+    MEDIA_TOKENS,
+    MESSAGES,
+    SYSTEM,
+    TOOLS,
+    CacheSlot,
+    CacheUsageTracker,
+    conversation_key,
+    estimate_tokens,
+    min_cacheable_tokens,
+    plan_breakpoints,
+)
+
 ANTHROPIC_BLOCK_MODE_PROMPT = 'You should always follow the instructions and output a valid {{block}} object.\nThe structure of the {{block}} object you can found in the instructions, use {"answer": "$your_answer"} as the default structure\nif you are not sure about the structure.\n\n<instructions>\n{{instructions}}\n</instructions>\n'
 
+# cache reads and writes of recent conversations
+_cache_usage = CacheUsageTracker()
+
 
 class PromptCachingHandler:
     def __init__(self, prompt_messages: Sequence[PromptMessage], enable_system_cache: bool = False):
@@ -94,7 +110,11 @@ class PromptCachingHandler:
                         "text": part
                     })
         elif system_content_str:
-            system_components.append({"type": "text", "text": system_content_str})
+            system_component = {"type": "text", "text": system_content_str}
+            if self.enable_system_cache:
+                # without <cache> tags the whole system prompt may be cached
+                system_component["cache_control"] = {"type": "ephemeral"}
+            system_components.append(system_component)
 
         system: Union[str, list[dict]] = ""
         if system_components:
@@ -247,60 +267,6 @@ class AnthropicLargeLanguageModel(LargeLanguageModel):
         if system:
             extra_model_kwargs["system"] = system
 
-        # Helper to prune cache_control blocks to max 4 by priority
-        def _prune_cache_blocks(payload: dict):
-            blocks: list[tuple[int, int, dict]] = []  # (priority, neg_length, block_dict)
-
-            # Helper to record
-            def _record_block(d: dict, priority: int, length: int = 0):
-                if "cache_control" in d:
-                    blocks.append((priority, -length, d))
-
-            # 1. system blocks
-            if isinstance(payload.get("system"), list):
-                for block in payload["system"]:
-                    if isinstance(block, dict):
-                        text_len = 0
-                        if block.get("type") == "text":
-                            text_len = len(block.get("text", ""))
-                        _record_block(block, 2, text_len)  # system priority 2
-
-            # 2. message content blocks
-            for msg in payload.get("messages", []):
-                content = msg.get("content")
-                if isinstance(content, list):
-                    for block in content:
-                        if not isinstance(block, dict):
-                            continue
-                        btype = block.get("type")
-                        text_len = 0
-                        if btype in {"image", "document"}:
-                            pr = 1
-                            if block.get("source", {}).get("type") == "base64":
-                                text_len = len(block.get("source", {}).get("data", ""))
-                        elif btype in {"tool_use", "tool_result"}:
-                            pr = 4
-                        else:
-                            pr = 3  # text or others
-                            if btype == "text":
-                                text_len = len(block.get("text", ""))
-                        _record_block(block, pr, text_len)
-
-            # 3. tools definitions
-            for tool_def in payload.get("tools", []):
-                if isinstance(tool_def, dict):
-                    _record_block(tool_def, 4, 0)
-
-            # Sort by priority (lower number = higher priority), then by length descending
-            blocks.sort(key=lambda x: (x[0], x[1]))
-
-            logging.info(f"Blocks: {blocks}")
-
-            # Keep first 4
-            for idx, (_, _, block_dict) in enumerate(blocks):
-                if idx >= 4:
-                    block_dict.pop("cache_control", None)
-
         def _sanitize_for_logging(data_structure: Any) -> Any:
             """Recursively truncate 'data' fields in a nested structure for logging."""
             if isinstance(data_structure, dict):
@@ -326,7 +292,7 @@ class AnthropicLargeLanguageModel(LargeLanguageModel):
             **extra_model_kwargs,
         }
 
-        # We will insert tools later; prune cache blocks after that just before send
+        # We will insert tools later; plan cache breakpoints after that just before send
 
         if model == "claude-3-5-sonnet-20240620":
             if model_parameters.get("max_tokens", 0) > 4096:
@@ -358,8 +324,8 @@ class AnthropicLargeLanguageModel(LargeLanguageModel):
             
             request_payload["tools"] = extra_model_kwargs["tools"]
 
-            # Now prune cache blocks to respect Anthropic limit
-            _prune_cache_blocks(request_payload)
+            # Now choose the cache breakpoints among the marked blocks
+            cache_key = self._plan_cache_breakpoints(model, request_payload)
 
             loggable_request = _sanitize_for_logging(request_payload)
             logging.info(f"Anthropic API Request: {json.dumps(loggable_request, indent=2)}")
@@ -373,7 +339,7 @@ class AnthropicLargeLanguageModel(LargeLanguageModel):
                 **{k: v for k, v in extra_model_kwargs.items() if k != "tools"},
             )
         else:
-            _prune_cache_blocks(request_payload)
+            cache_key = self._plan_cache_breakpoints(model, request_payload)
 
             loggable_request = _sanitize_for_logging(request_payload)
             logging.info(f"Anthropic API Request: {json.dumps(loggable_request, indent=2)}")
@@ -388,14 +354,114 @@ class AnthropicLargeLanguageModel(LargeLanguageModel):
 
         if stream:
             return self._handle_chat_generate_stream_response(
-                model, credentials, response, prompt_messages
+                model, credentials, response, prompt_messages, cache_key
             )
         
         logging.info(f"Anthropic API Response: {response.model_dump_json(indent=2)}")
         return self._handle_chat_generate_response(
-            model, credentials, response, prompt_messages
+            model, credentials, response, prompt_messages, cache_key
         )
 
+    @property
+    def _message_cache_enabled(self) -> bool:
+        return bool(
+            self._message_flow_cache_threshold > 0
+            or self._image_cache_enabled
+            or self._document_cache_enabled
+            or self._tool_results_cache_enabled
+        )
+
+    def _plan_cache_breakpoints(self, model: str, payload: dict) -> str:
+        """
+        Keep ``cache_control`` on the blocks chosen by the cache planner and remove it
+        from the others. The blocks marked by the caching options are candidates, and
+        so is the end of every message once any message caching option is enabled.
+
+        :param model: model name
+        :param payload: request payload, changed in place
+        :return: key of the conversation, to record the cache usage of the response under
+        """
+        messages = payload.get("messages", [])
+        cache_key = conversation_key(
+            model, payload.get("tools"), payload.get("system"), messages[:1]
+        )
+
+        slots: list[CacheSlot] = []
+        tokens = 0
+        for tool_def in payload.get("tools", []):
+            tokens += estimate_tokens(json.dumps(tool_def, default=str))
+            if "cache_control" in tool_def:
+                slots.append(CacheSlot(TOOLS, tokens, tool_def))
+
+        system = payload.get("system")
+        if isinstance(system, list):
+            for block in system:
+                tokens += self._cache_block_tokens(block)
+                if "cache_control" in block:
+                    slots.append(CacheSlot(SYSTEM, tokens, block))
+        elif system:
+            tokens += estimate_tokens(system)
+
+        for message in messages:
+            content = message.get("content")
+            if isinstance(content, str):
+                tokens += estimate_tokens(content)
+                if content and self._message_cache_enabled:
+                    # the content is turned into a block if the breakpoint is taken
+                    slots.append(CacheSlot(MESSAGES, tokens, message))
+                continue
+            for block in content or []:
+                tokens += self._cache_block_tokens(block)
+                if not isinstance(block, dict):
+                    continue
+                if "cache_control" in block or (
+                    block is content[-1]
+                    and self._message_cache_enabled
+                    and self._is_cacheable_block(block)
+                ):
+                    slots.append(CacheSlot(MESSAGES, tokens, block))
+
+        chosen = plan_breakpoints(slots, min_cacheable_tokens(model))
+        chosen_ids = {id(slot.target) for slot in chosen}
+        for slot in slots:
+            if id(slot.target) not in chosen_ids:
+                slot.target.pop("cache_control", None)
+            elif "role" in slot.target:
+                slot.target["content"] = [
+                    {
+                        "type": "text",
+                        "text": slot.target["content"],
+                        "cache_control": {"type": "ephemeral"},
+                    }
+                ]
+            else:
+                slot.target["cache_control"] = {"type": "ephemeral"}
+
+        logging.info(
+            f"Cache breakpoints at prefixes of {[slot.prefix_tokens for slot in chosen]} "
+            f"tokens, chosen from {len(slots)} candidates"
+        )
+        return cache_key
+
+    @staticmethod
+    def _cache_block_tokens(block: Any) -> int:
+        """Estimate the tokens of a content block."""
+        if not isinstance(block, dict):
+            # thinking blocks kept from an earlier response
+            return estimate_tokens(getattr(block, "thinking", "") or "")
+        if block.get("type") in {"image", "document"}:
+            return MEDIA_TOKENS
+        if block.get("type") == "text":
+            return estimate_tokens(block.get("text", ""))
+        return estimate_tokens(json.dumps(block, default=str))
+
+    @staticmethod
+    def _is_cacheable_block(block: dict) -> bool:
+        """Thinking blocks and empty text blocks cannot carry cache_control."""
+        if block.get("type") in {"thinking", "redacted_thinking"}:
+            return False
+        return block.get("type") != "text" or bool(block.get("text"))
+
     def _code_block_mode_wrapper(
         self,
         model: str,
@@ -608,6 +674,7 @@ class AnthropicLargeLanguageModel(LargeLanguageModel):
         credentials: Mapping[str, Any],
         response: Message,
         prompt_messages: Sequence[PromptMessage],
+        cache_key: Optional[str] = None,
     ) -> LLMResult:
         """
         Handle llm chat response with cache token adjustments for billing
@@ -616,6 +683,7 @@ class AnthropicLargeLanguageModel(LargeLanguageModel):
         :param credentials: credentials
         :param response: response
         :param prompt_messages: prompt messages
+        :param cache_key: conversation key the cache usage is recorded under
         :return: llm response
         """
         self.previous_thinking_blocks = []
@@ -667,6 +735,12 @@ class AnthropicLargeLanguageModel(LargeLanguageModel):
                 cache_creation_input_tokens = response.usage.cache_creation_input_tokens
             if hasattr(response.usage, "cache_read_input_tokens") and response.usage.cache_read_input_tokens:
                 cache_read_input_tokens = response.usage.cache_read_input_tokens
+            _cache_usage.record(
+                cache_key,
+                response.usage.input_tokens,
+                cache_read_input_tokens,
+                cache_creation_input_tokens,
+            )
 
         adjusted_prompt_tokens = PromptCachingHandler.calc_adjusted_prompt_tokens(
             prompt_tokens,
@@ -697,6 +771,7 @@ class AnthropicLargeLanguageModel(LargeLanguageModel):
         credentials: Mapping[str, Any],
         response: Stream[MessageStreamEvent],
         prompt_messages: Sequence[PromptMessage],
+        cache_key: Optional[str] = None,
     ) -> Generator:
         """
         Handle llm chat stream response with token adjustments for caching
@@ -887,6 +962,13 @@ class AnthropicLargeLanguageModel(LargeLanguageModel):
                 if tool_calls and current_redacted_thinking_blocks:
                     self.previous_redacted_thinking_blocks = current_redacted_thinking_blocks
                 
+                _cache_usage.record(
+                    cache_key,
+                    input_tokens,
+                    cache_read_input_tokens,
+                    cache_creation_input_tokens,
+                )
+
                 # Adjust prompt tokens for cache operations
                 adjusted_prompt_tokens = PromptCachingHandler.calc_adjusted_prompt_tokens(
                     input_tokens,
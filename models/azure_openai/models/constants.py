@@ -1,3 +1,7 @@
+import threading
+from collections.abc import Callable
+from typing import NamedTuple, Optional
+
 from dify_plugin.entities.model import (
     PARAMETER_RULE_TEMPLATE,
     AIModelEntity,
@@ -52,10 +56,70 @@ class AzureBaseModel(BaseModel):
     entity: AIModelEntity
 
 
-LLM_BASE_MODELS = [
-    AzureBaseModel(
+class _LazyBaseModel(NamedTuple):
+    base_model_name: str
+    entity: Callable[[], AIModelEntity]
+
+
+class BaseModelRegistry:
+    """
+    Base model entities indexed by base model name.
+
+    An entity is only built the first time its base model is looked up, and
+    ``get`` returns a shallow copy of it that overrides the deployment name and
+    label. The rest of the entity is shared between lookups. The SDK fills
+    template defaults into the parameter rules in place, and that fill is
+    idempotent.
+    """
+
+    def __init__(self, base_models: list[_LazyBaseModel]):
+        self._factories: dict[str, Callable[[], AIModelEntity]] = {}
+        for base_model in base_models:
+            # the first entry of a base model name wins, as with the former list scan
+            self._factories.setdefault(base_model.base_model_name, base_model.entity)
+        self._entities: dict[str, AIModelEntity] = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, base_model_name: str) -> bool:
+        return base_model_name in self._factories
+
+    def __len__(self) -> int:
+        return len(self._factories)
+
+    def names(self) -> list[str]:
+        return list(self._factories)
+
+    def get_template(self, base_model_name: str) -> Optional[AIModelEntity]:
+        """Return the shared entity of a base model. It must not be modified."""
+        entity = self._entities.get(base_model_name)
+        if entity is not None:
+            return entity
+        factory = self._factories.get(base_model_name)
+        if factory is None:
+            return None
+        with self._lock:
+            if base_model_name not in self._entities:
+                self._entities[base_model_name] = factory()
+            return self._entities[base_model_name]
+
+    def get(self, base_model_name: str, model: str) -> Optional[AzureBaseModel]:
+        """Return the entity of ``base_model_name`` for the deployment ``model``."""
+        template = self.get_template(base_model_name)
+        if template is None:
+            return None
+        entity = template.model_copy(
+            update={
+                "model": model,
+                "label": template.label.model_copy(update={"en_US": model, "zh_Hans": model}),
+            }
+        )
+        return AzureBaseModel.model_construct(base_model_name=base_model_name, entity=entity)
+
+
+_LLM_BASE_MODELS = [
+    _LazyBaseModel(
         base_model_name="gpt-4o-audio-preview",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="gpt-4o-audio-preview",
             label=I18nObject(
                 zh_Hans="gpt-4o-audio-preview",
@@ -120,9 +184,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-35-turbo",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -176,9 +240,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-35-turbo-16k",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -221,9 +285,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-35-turbo-0125",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -277,9 +341,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-4",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -343,9 +407,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-4-32k",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -409,9 +473,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-4-0125-preview",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -475,9 +539,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-4-1106-preview",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -541,9 +605,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-4o-mini",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -618,9 +682,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-4o-mini-2024-07-18",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -696,9 +760,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-4o",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -773,9 +837,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-4o-2024-05-13",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -840,9 +904,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-4o-2024-08-06",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -918,9 +982,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-4o-2024-11-20",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -996,9 +1060,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-4.5-preview",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -1074,9 +1138,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-4.1",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -1152,9 +1216,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-4.1-mini",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -1230,9 +1294,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-4.1-nano",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -1308,9 +1372,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-4-turbo",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -1375,9 +1439,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-4-turbo-2024-04-09",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -1442,9 +1506,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-4-vision-preview",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -1504,9 +1568,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-35-turbo-instruct",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -1544,9 +1608,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="text-davinci-003",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -1584,9 +1648,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="o1-preview",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -1611,9 +1675,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="o1-mini",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -1638,9 +1702,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="o1",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -1701,9 +1765,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="o3-mini",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -1763,9 +1827,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="o4-mini",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -1826,9 +1890,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="o3",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -1889,9 +1953,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-5",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -1968,9 +2032,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-5-mini",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -2047,9 +2111,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-5-nano",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -2126,9 +2190,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-5-chat",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -2182,9 +2246,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-5-codex",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 zh_Hans="gpt-5-codex",
@@ -2289,9 +2353,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-5-pro",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -2401,9 +2465,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="grok-3",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -2473,9 +2537,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="grok-3-mini",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -2557,9 +2621,9 @@ LLM_BASE_MODELS = [
         ),
     ),
     # GPT-5.1 Series
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-5.1",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -2637,9 +2701,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-5.1-chat",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 en_US="fake-deployment-name-label",
@@ -2717,9 +2781,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-5.1-codex",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 zh_Hans="gpt-5.1-codex",
@@ -2827,9 +2891,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-5.1-codex-mini",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 zh_Hans="gpt-5.1-codex-mini",
@@ -2937,9 +3001,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-5.1-codex-max",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 zh_Hans="gpt-5.1-codex-max",
@@ -3020,9 +3084,9 @@ LLM_BASE_MODELS = [
         ),
     ),
     # GPT-5.2 Series
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-5.2",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 zh_Hans="gpt-5.2",
@@ -3118,9 +3182,9 @@ LLM_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-5.2-chat",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(
                 zh_Hans="gpt-5.2",
@@ -3206,10 +3270,10 @@ LLM_BASE_MODELS = [
         ),
     ),
 ]
-EMBEDDING_BASE_MODELS = [
-    AzureBaseModel(
+_EMBEDDING_BASE_MODELS = [
+    _LazyBaseModel(
         base_model_name="text-embedding-ada-002",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(en_US="fake-deployment-name-label"),
             fetch_from=FetchFrom.CUSTOMIZABLE_MODEL,
@@ -3225,9 +3289,9 @@ EMBEDDING_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="text-embedding-3-small",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(en_US="fake-deployment-name-label"),
             fetch_from=FetchFrom.CUSTOMIZABLE_MODEL,
@@ -3243,9 +3307,9 @@ EMBEDDING_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="text-embedding-3-large",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(en_US="fake-deployment-name-label"),
             fetch_from=FetchFrom.CUSTOMIZABLE_MODEL,
@@ -3262,10 +3326,10 @@ EMBEDDING_BASE_MODELS = [
         ),
     ),
 ]
-SPEECH2TEXT_BASE_MODELS = [
-    AzureBaseModel(
+_SPEECH2TEXT_BASE_MODELS = [
+    _LazyBaseModel(
         base_model_name="whisper-1",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(en_US="fake-deployment-name-label"),
             fetch_from=FetchFrom.CUSTOMIZABLE_MODEL,
@@ -3276,9 +3340,9 @@ SPEECH2TEXT_BASE_MODELS = [
             },
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-4o-transcribe",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(en_US="fake-deployment-name-label"),
             fetch_from=FetchFrom.CUSTOMIZABLE_MODEL,
@@ -3289,9 +3353,9 @@ SPEECH2TEXT_BASE_MODELS = [
             },
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-4o-mini-transcribe",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(en_US="fake-deployment-name-label"),
             fetch_from=FetchFrom.CUSTOMIZABLE_MODEL,
@@ -3303,10 +3367,10 @@ SPEECH2TEXT_BASE_MODELS = [
         ),
     ),
 ]
-TTS_BASE_MODELS = [
-    AzureBaseModel(
+_TTS_BASE_MODELS = [
+    _LazyBaseModel(
         base_model_name="tts-1",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(en_US="fake-deployment-name-label"),
             fetch_from=FetchFrom.CUSTOMIZABLE_MODEL,
@@ -3416,9 +3480,9 @@ TTS_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="tts-1-hd",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(en_US="fake-deployment-name-label"),
             fetch_from=FetchFrom.CUSTOMIZABLE_MODEL,
@@ -3528,9 +3592,9 @@ TTS_BASE_MODELS = [
             ),
         ),
     ),
-    AzureBaseModel(
+    _LazyBaseModel(
         base_model_name="gpt-4o-mini-tts",
-        entity=AIModelEntity(
+        entity=lambda: AIModelEntity(
             model="fake-deployment-name",
             label=I18nObject(en_US="fake-deployment-name-label"),
             fetch_from=FetchFrom.CUSTOMIZABLE_MODEL,
@@ -3717,3 +3781,8 @@ TTS_BASE_MODELS = [
         ),
     ),
 ]
+
+LLM_BASE_MODELS = BaseModelRegistry(_LLM_BASE_MODELS)
+EMBEDDING_BASE_MODELS = BaseModelRegistry(_EMBEDDING_BASE_MODELS)
+SPEECH2TEXT_BASE_MODELS = BaseModelRegistry(_SPEECH2TEXT_BASE_MODELS)
+TTS_BASE_MODELS = BaseModelRegistry(_TTS_BASE_MODELS)
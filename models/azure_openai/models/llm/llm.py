@@ -1,5 +1,4 @@
 import base64
-import copy
 import io
 import json
 import logging
@@ -7,7 +6,6 @@ import math
 from collections.abc import Generator, Sequence
 from typing import Any, Optional, Union, cast
 
-import tiktoken
 from PIL import Image
 from dify_plugin.entities.model import AIModelEntity, ModelPropertyKey
 from dify_plugin.entities.model.llm import (
@@ -43,6 +41,12 @@ from openai.types.responses import ResponseStreamEvent, Response
 
 from ..common import _CommonAzureOpenAI
 from ..constants import LLM_BASE_MODELS
+from ..token_counting import (
+    count_message_tokens,
+    count_tokens,
+    count_tool_tokens,
+    get_encoding,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -1255,13 +1259,10 @@ class AzureOpenAILargeLanguageModel(_CommonAzureOpenAI, LargeLanguageModel):
         text: str,
         tools: Optional[list[PromptMessageTool]] = None,
     ) -> int:
-        try:
-            encoding = tiktoken.encoding_for_model(credentials["base_model_name"])
-        except KeyError:
-            encoding = tiktoken.get_encoding("cl100k_base")
-        num_tokens = len(encoding.encode(text))
+        encoding = get_encoding(credentials["base_model_name"])
+        num_tokens = count_tokens(encoding, [text])
         if tools:
-            num_tokens += self._num_tokens_for_tools(encoding, tools)
+            num_tokens += count_tool_tokens(encoding, tools)
         return num_tokens
 
     def _num_tokens_from_messages(
@@ -1277,12 +1278,7 @@ class AzureOpenAILargeLanguageModel(_CommonAzureOpenAI, LargeLanguageModel):
         model = credentials["base_model_name"]
         if model.startswith(("o1", "o3", "o4", "gpt-4.1", "gpt-4.5", "gpt-5")):
             model = "gpt-4o"
-        try:
-            encoding = tiktoken.encoding_for_model(model)
-        except KeyError:
-            logger.warning("Warning: model not found. Using cl100k_base encoding.")
-            encoding_name = "cl100k_base"
-            encoding = tiktoken.get_encoding(encoding_name)
+        encoding = get_encoding(model)
         if model.startswith("gpt-35-turbo-0301"):
             tokens_per_message = 4
             tokens_per_name = -1
@@ -1298,40 +1294,20 @@ class AzureOpenAILargeLanguageModel(_CommonAzureOpenAI, LargeLanguageModel):
             raise NotImplementedError(
                 f"get_num_tokens_from_messages() is not presently implemented for model {model}.See https://github.com/openai/openai-python/blob/main/chatml.md for information on how messages are converted to tokens."
             )
-        num_tokens = 0
         messages_dict = [self._convert_prompt_message_to_dict(m) for m in messages]
-        image_details: list[dict] = []
-        for message in messages_dict:
-            num_tokens += tokens_per_message
-            for key, value in message.items():
-                if isinstance(value, list):
-                    text = ""
-                    for item in value:
-                        if isinstance(item, dict):
-                            if item["type"] == "text":
-                                text += item["text"]
-                            elif item["type"] == "image_url":
-                                image_details.append(item["image_url"])
-                    value = text
-                if key == "tool_calls":
-                    for tool_call in value:
-                        assert isinstance(tool_call, dict)
-                        for t_key, t_value in tool_call.items():
-                            num_tokens += len(encoding.encode(t_key))
-                            if t_key == "function":
-                                for f_key, f_value in t_value.items():
-                                    num_tokens += len(encoding.encode(f_key))
-                                    num_tokens += len(encoding.encode(f_value))
-                            else:
-                                num_tokens += len(encoding.encode(t_key))
-                                num_tokens += len(encoding.encode(t_value))
-                else:
-                    num_tokens += len(encoding.encode(str(value)))
-                if key == "name":
-                    num_tokens += tokens_per_name
-        num_tokens += 3
+        image_details: list[dict] = [
+            item["image_url"]
+            for message in messages_dict
+            for value in message.values()
+            if isinstance(value, list)
+            for item in value
+            if isinstance(item, dict) and item.get("type") == "image_url"
+        ]
+        num_tokens = count_message_tokens(
+            encoding, messages_dict, tokens_per_message, tokens_per_name
+        )
         if tools:
-            num_tokens += self._num_tokens_for_tools(encoding, tools)
+            num_tokens += count_tool_tokens(encoding, tools)
         if len(image_details) > 0:
             num_tokens += self._num_tokens_from_images(
                 image_details=image_details,
@@ -1339,54 +1315,9 @@ class AzureOpenAILargeLanguageModel(_CommonAzureOpenAI, LargeLanguageModel):
             )
         return num_tokens
 
-    @staticmethod
-    def _num_tokens_for_tools(
-        encoding: tiktoken.Encoding, tools: list[PromptMessageTool]
-    ) -> int:
-        num_tokens = 0
-        for tool in tools:
-            num_tokens += len(encoding.encode("type"))
-            num_tokens += len(encoding.encode("function"))
-            num_tokens += len(encoding.encode("name"))
-            num_tokens += len(encoding.encode(tool.name))
-            num_tokens += len(encoding.encode("description"))
-            num_tokens += len(encoding.encode(tool.description))
-            parameters = tool.parameters
-            num_tokens += len(encoding.encode("parameters"))
-            if "title" in parameters:
-                num_tokens += len(encoding.encode("title"))
-                num_tokens += len(encoding.encode(parameters["title"]))
-            num_tokens += len(encoding.encode("type"))
-            num_tokens += len(encoding.encode(parameters["type"]))
-            if "properties" in parameters:
-                num_tokens += len(encoding.encode("properties"))
-                for key, value in parameters["properties"].items():
-                    num_tokens += len(encoding.encode(key))
-                    for field_key, field_value in value.items():
-                        num_tokens += len(encoding.encode(field_key))
-                        if field_key == "enum":
-                            for enum_field in field_value:
-                                num_tokens += 3
-                                num_tokens += len(encoding.encode(enum_field))
-                        else:
-                            num_tokens += len(encoding.encode(field_key))
-                            num_tokens += len(encoding.encode(str(field_value)))
-            if "required" in parameters:
-                num_tokens += len(encoding.encode("required"))
-                for required_field in parameters["required"]:
-                    num_tokens += 3
-                    num_tokens += len(encoding.encode(required_field))
-        return num_tokens
-
     @staticmethod
     def _get_ai_model_entity(base_model_name: str, model: str):
-        for ai_model_entity in LLM_BASE_MODELS:
-            if ai_model_entity.base_model_name == base_model_name:
-                ai_model_entity_copy = copy.deepcopy(ai_model_entity)
-                ai_model_entity_copy.entity.model = model
-                ai_model_entity_copy.entity.label.en_US = model
-                ai_model_entity_copy.entity.label.zh_Hans = model
-                return ai_model_entity_copy
+        return LLM_BASE_MODELS.get(base_model_name, model)
 
     def _get_base_model_name(self, credentials: dict) -> str:
         base_model_name = credentials.get("base_model_name")
@@ -1,10 +1,8 @@
 import base64
-import copy
 import time
 from typing import Optional, Union
 
 import numpy as np
-import tiktoken
 from dify_plugin.entities.model import AIModelEntity, EmbeddingInputType, PriceType
 from dify_plugin.entities.model.text_embedding import (
     EmbeddingUsage,
@@ -16,6 +14,7 @@ from openai import AzureOpenAI
 
 from ..common import _CommonAzureOpenAI
 from ..constants import EMBEDDING_BASE_MODELS, AzureBaseModel
+from ..token_counting import get_encoding, token_lengths
 
 
 class AzureOpenAITextEmbeddingModel(_CommonAzureOpenAI, TextEmbeddingModel):
@@ -50,10 +49,7 @@ class AzureOpenAITextEmbeddingModel(_CommonAzureOpenAI, TextEmbeddingModel):
         tokens = []
         indices = []
         used_tokens = 0
-        try:
-            enc = tiktoken.encoding_for_model(base_model_name)
-        except KeyError:
-            enc = tiktoken.get_encoding("cl100k_base")
+        enc = get_encoding(base_model_name)
         for i, text in enumerate(texts):
             token = enc.encode(text)
             for j in range(0, len(token), context_size):
@@ -103,16 +99,7 @@ class AzureOpenAITextEmbeddingModel(_CommonAzureOpenAI, TextEmbeddingModel):
     def get_num_tokens(self, model: str, credentials: dict, texts: list[str]) -> list[int]:
         if len(texts) == 0:
             return [0]
-        tokens = []
-        try:
-            enc = tiktoken.encoding_for_model(credentials["base_model_name"])
-        except KeyError:
-            enc = tiktoken.get_encoding("cl100k_base")
-        
-        for text in texts:
-            tokenized_text = enc.encode(text)
-            tokens.append(len(tokenized_text))
-        return tokens
+        return token_lengths(get_encoding(credentials["base_model_name"]), texts)
 
     def validate_credentials(self, model: str, credentials: dict) -> None:
         if "openai_api_base" not in credentials:
@@ -197,11 +184,4 @@ class AzureOpenAITextEmbeddingModel(_CommonAzureOpenAI, TextEmbeddingModel):
 
     @staticmethod
     def _get_ai_model_entity(base_model_name: str, model: str) -> AzureBaseModel:
-        for ai_model_entity in EMBEDDING_BASE_MODELS:
-            if ai_model_entity.base_model_name == base_model_name:
-                ai_model_entity_copy = copy.deepcopy(ai_model_entity)
-                ai_model_entity_copy.entity.model = model
-                ai_model_entity_copy.entity.label.en_US = model
-                ai_model_entity_copy.entity.label.zh_Hans = model
-                return ai_model_entity_copy
-        return None
+        return EMBEDDING_BASE_MODELS.get(base_model_name, model)
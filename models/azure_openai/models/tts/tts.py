@@ -1,5 +1,5 @@
-import concurrent.futures
-import copy
+from collections.abc import Iterator
+from contextlib import contextmanager
 from typing import Any, Optional
 from dify_plugin.entities.model import AIModelEntity
 from dify_plugin.errors.model import (
@@ -10,6 +10,7 @@ from dify_plugin.interfaces.model.tts_model import TTSModel
 from openai import AzureOpenAI
 from ..common import _CommonAzureOpenAI
 from ..constants import TTS_BASE_MODELS, AzureBaseModel
+from .pipeline import CHUNK_SIZE, stream_pipelined
 
 
 class AzureOpenAIText2SpeechModel(_CommonAzureOpenAI, TTSModel):
@@ -83,32 +84,33 @@ class AzureOpenAIText2SpeechModel(_CommonAzureOpenAI, TTSModel):
                 sentences = self._split_text_into_sentences(
                     content_text, max_length=max_length
                 )
-                executor = concurrent.futures.ThreadPoolExecutor(
-                    max_workers=min(3, len(sentences))
-                )
-                futures = [
-                    executor.submit(
-                        client.audio.speech.with_streaming_response.create,
-                        model=model,
-                        response_format="mp3",
-                        input=sentences[i],
-                        voice=voice,
-                    )
-                    for i in range(len(sentences))
-                ]
-                for future in futures:
-                    yield from future.result().__enter__().iter_bytes(1024)
             else:
-                response = client.audio.speech.with_streaming_response.create(
-                    model=model,
-                    voice=voice,
-                    response_format="mp3",
-                    input=content_text.strip(),
-                )
-                yield from response.__enter__().iter_bytes(1024)
+                sentences = [content_text]
+            yield from stream_pipelined(
+                sentences,
+                lambda sentence: self._open_speech_stream(
+                    client, model, voice, sentence
+                ),
+            )
         except Exception as ex:
             raise InvokeBadRequestError(str(ex))
 
+    @staticmethod
+    @contextmanager
+    def _open_speech_stream(
+        client: AzureOpenAI, model: str, voice: str, sentence: str
+    ) -> Iterator[Iterator[bytes]]:
+        """
+        Open the audio stream of one sentence; the response is closed on exit
+        """
+        with client.audio.speech.with_streaming_response.create(
+            model=model,
+            voice=voice,
+            response_format="mp3",
+            input=sentence.strip(),
+        ) as response:
+            yield response.iter_bytes(CHUNK_SIZE)
+
     def _process_sentence(self, sentence: str, model: str, voice, credentials: dict):
         """
         _tts_invoke openai text2speech model api
@@ -137,11 +139,4 @@ class AzureOpenAIText2SpeechModel(_CommonAzureOpenAI, TTSModel):
 
     @staticmethod
     def _get_ai_model_entity(base_model_name: str, model: str) -> AzureBaseModel | None:
-        for ai_model_entity in TTS_BASE_MODELS:
-            if ai_model_entity.base_model_name == base_model_name:
-                ai_model_entity_copy = copy.deepcopy(ai_model_entity)
-                ai_model_entity_copy.entity.model = model
-                ai_model_entity_copy.entity.label.en_US = model
-                ai_model_entity_copy.entity.label.zh_Hans = model
-                return ai_model_entity_copy
-        return None
+        return TTS_BASE_MODELS.get(base_model_name, model)
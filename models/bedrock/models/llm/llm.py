@@ -54,6 +54,17 @@ from dify_plugin.errors.model import (
 
 from provider.get_bedrock_client import get_bedrock_client
 from .cache_config import is_cache_supported, get_cache_config
+from .cache_planner import (
+    MEDIA_TOKENS,
+    MESSAGES,
+    SYSTEM,
+    TOOLS,
+    CacheSlot,
+    CacheUsageTracker,
+    conversation_key,
+    estimate_tokens,
+    plan_breakpoints,
+)
 from . import model_ids
 from utils.inference_profile import (
     get_inference_profile_info,
@@ -63,6 +74,10 @@ from utils.inference_profile import (
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
 logger = logging.getLogger(__name__)
+
+# cache reads and writes of recent conversations
+_cache_usage = CacheUsageTracker()
+
 ANTHROPIC_BLOCK_MODE_PROMPT = """You should always follow the instructions and output a valid {{block}} object.
 The structure of the {{block}} object you can found in the instructions, use {"answer": "$your_answer"} as the default structure
 if you are not sure about the structure.
@@ -359,15 +374,7 @@ class BedrockLargeLanguageModel(LargeLanguageModel):
             system_cache_checkpoint = False
             latest_two_messages_cache_checkpoint = False
 
-        # Convert messages with cache points if enabled
-        # For inference profiles, use underlying model ID for cache configuration
-        cache_config_model_id = model_info.get("underlying_model_id", model_id)
-        system, prompt_message_dicts = self._convert_converse_prompt_messages(
-            prompt_messages,
-            model_id=cache_config_model_id,
-            system_cache_checkpoint=system_cache_checkpoint,
-            latest_two_messages_cache_checkpoint=latest_two_messages_cache_checkpoint
-        )
+        system, prompt_message_dicts = self._convert_converse_prompt_messages(prompt_messages)
         inference_config, additional_model_fields = self._convert_converse_api_model_parameters(model_parameters, stop)
 
         parameters = {
@@ -425,44 +432,27 @@ class BedrockLargeLanguageModel(LargeLanguageModel):
                 if conversations_list[i]["role"] == conversations_list[i + 1]["role"]:
                     conversations_list[i]["content"].extend(conversations_list.pop(i + 1)["content"])
 
+            # Add cache points once the messages are final
+            # For inference profiles, use underlying model ID for cache configuration
+            cache_key = self._place_converse_cache_points(
+                parameters,
+                model_id=cache_check_model_id,
+                system_cache_checkpoint=system_cache_checkpoint,
+                messages_cache_checkpoint=latest_two_messages_cache_checkpoint,
+            )
+
             if stream:
                 response = bedrock_client.converse_stream(**parameters)
                 return self._handle_converse_stream_response(
-                    model_info["model"], credentials, response, prompt_messages
+                    model_info["model"], credentials, response, prompt_messages, cache_key
                 )
             else:
                 logger.info(f"converse: {parameters}")
                 response = bedrock_client.converse(**parameters)
 
-                # Log cache usage metrics if available
-                if "usage" in response:
-                    # Extract token usage
-                    input_tokens = response["usage"].get("inputTokens", 0)
-                    output_tokens = response["usage"].get("outputTokens", 0)
-
-                    # Extract cache metrics if available
-                    cache_read_tokens = response["usage"].get("cacheReadInputTokens", 0)
-                    cache_write_tokens = response["usage"].get("cacheWriteInputTokens", 0)
-
-                    # Always log the metrics for debugging
-                    logger.info(f"[CACHE METRICS] Model: {model_id}, Read: {cache_read_tokens} tokens, Write: {cache_write_tokens} tokens")
-
-                    # Print the full response usage for debugging
-
-                    # Log cache usage if any tokens were read or written
-                    if cache_read_tokens > 0 or cache_write_tokens > 0:
-                        logger.info(f"Cache metrics - Model: {model_id}, Read: {cache_read_tokens} tokens, Write: {cache_write_tokens} tokens")
-                        # If tokens were read from cache, log the savings
-                        if cache_read_tokens > 0:
-                            logger.debug(f"[CACHE HIT] {cache_read_tokens} tokens read from cache")
-                        elif cache_write_tokens > 0:
-                            logger.debug(f"[CACHE WRITE] {cache_write_tokens} tokens written to cache")
-                else:
-                    # Log if usage data is missing
-                    logger.warning(f"[WARNING] No usage data in response")
-                    logger.warning(f"No usage data in response")
-
-                return self._handle_converse_response(model_info["model"], credentials, response, prompt_messages)
+                return self._handle_converse_response(
+                    model_info["model"], credentials, response, prompt_messages, cache_key
+                )
         except ClientError as ex:
             error_code = ex.response["Error"]["Code"]
             full_error_msg = f"{error_code}: {ex.response['Error']['Message']}"
@@ -477,7 +467,12 @@ class BedrockLargeLanguageModel(LargeLanguageModel):
             raise InvokeError(str(ex))
 
     def _handle_converse_response(
-        self, model: str, credentials: dict, response: dict, prompt_messages: list[PromptMessage]
+        self,
+        model: str,
+        credentials: dict,
+        response: dict,
+        prompt_messages: list[PromptMessage],
+        cache_key: Optional[str] = None,
     ) -> LLMResult:
         """
         Handle llm chat response
@@ -486,6 +481,7 @@ class BedrockLargeLanguageModel(LargeLanguageModel):
         :param credentials: credentials
         :param response: response
         :param prompt_messages: prompt messages
+        :param cache_key: conversation key the cache usage is recorded under
         :return: full response chunk generator result
         """
         response_content = response["output"]["message"]["content"]
@@ -513,15 +509,13 @@ class BedrockLargeLanguageModel(LargeLanguageModel):
             prompt_tokens = response["usage"]["inputTokens"]
             completion_tokens = response["usage"]["outputTokens"]
 
-            # Log cache metrics if available
-            cache_read_tokens = response["usage"].get("cacheReadInputTokens", 0)
-            cache_write_tokens = response["usage"].get("cacheWriteInputTokens", 0)
-
-            if cache_read_tokens > 0 or cache_write_tokens > 0:
-                logger.info(f"Cache metrics - Model: {model}, Read: {cache_read_tokens} tokens, Write: {cache_write_tokens} tokens")
-                # If tokens were read from cache, log the savings
-                if cache_read_tokens > 0:
-                    logger.info(f"Cache hit detected - {cache_read_tokens} tokens read from cache")
+            # Track cache reads and writes across the conversation
+            _cache_usage.record(
+                cache_key,
+                prompt_tokens,
+                response["usage"].get("cacheReadInputTokens", 0),
+                response["usage"].get("cacheWriteInputTokens", 0),
+            )
         else:
             # calculate num tokens
             prompt_tokens = self.get_num_tokens(model, credentials, prompt_messages)
@@ -556,6 +550,7 @@ class BedrockLargeLanguageModel(LargeLanguageModel):
         credentials: dict,
         response: dict,
         prompt_messages: list[PromptMessage],
+        cache_key: Optional[str] = None,
     ) -> Generator:
         """
         Handle llm chat stream response
@@ -564,6 +559,7 @@ class BedrockLargeLanguageModel(LargeLanguageModel):
         :param credentials: credentials
         :param response: response
         :param prompt_messages: prompt messages
+        :param cache_key: conversation key the cache usage is recorded under
         :return: full response or stream response chunk generator result
         """
 
@@ -594,23 +590,13 @@ class BedrockLargeLanguageModel(LargeLanguageModel):
                         input_tokens = chunk["metadata"]["usage"].get("inputTokens", 0)
                         output_tokens = chunk["metadata"]["usage"].get("outputTokens", 0)
 
-                        # Extract cache metrics if available
-                        cache_read_tokens = chunk["metadata"]["usage"].get("cacheReadInputTokens", 0)
-                        cache_write_tokens = chunk["metadata"]["usage"].get("cacheWriteInputTokens", 0)
-
-                        # Always log the metrics for debugging
-                        logger.info(f"[STREAM CACHE METRICS] Model: {model}, Read: {cache_read_tokens} tokens, Write: {cache_write_tokens} tokens")
-
-                        # Print the full usage data for debugging
-
-                        # Log cache usage if any tokens were read or written
-                        if cache_read_tokens > 0 or cache_write_tokens > 0:
-                            logger.info(f"Cache metrics - Model: {model}, Read: {cache_read_tokens} tokens, Write: {cache_write_tokens} tokens")
-                            # If tokens were read from cache, log the savings
-                            if cache_read_tokens > 0:
-                                logger.debug(f"[STREAM CACHE HIT] {cache_read_tokens} tokens read from cache")
-                            elif cache_write_tokens > 0:
-                                logger.debug(f"[STREAM CACHE WRITE] {cache_write_tokens} tokens written to cache")
+                        # Track cache reads and writes across the conversation
+                        _cache_usage.record(
+                            cache_key,
+                            input_tokens,
+                            chunk["metadata"]["usage"].get("cacheReadInputTokens", 0),
+                            chunk["metadata"]["usage"].get("cacheWriteInputTokens", 0),
+                        )
                     else:
                         # Log if usage data is missing
                         logger.warning(f"[STREAM WARNING] No usage data found in metadata chunk")
@@ -757,24 +743,16 @@ class BedrockLargeLanguageModel(LargeLanguageModel):
 
         return inference_config, additional_model_fields
 
-    def _convert_converse_prompt_messages(self, prompt_messages: list[PromptMessage], model_id: str = None,
-        system_cache_checkpoint: bool = True, latest_two_messages_cache_checkpoint: bool = False) -> tuple[list, list[dict]]:
+    def _convert_converse_prompt_messages(self, prompt_messages: list[PromptMessage]) -> tuple[list, list[dict]]:
         """
         Convert prompt messages to dict list and system
-        Add cache points for supported models when enable_cache is True
 
         :param prompt_messages: List of prompt messages to convert
-        :param model_id: Model ID to check for cache support
-        :param system_cache_checkpoint: Whether to add cache checkpoint to system message
-        :param latest_two_messages_cache_checkpoint: Whether to add cache checkpoint to the latest two user messages
         :return: Tuple of system messages and prompt message dicts
         """
         system = []
         prompt_message_dicts = []
 
-        # Check if model supports caching
-        cache_config = get_cache_config(model_id)
-
         # Process system messages first
         system_messages = [msg for msg in prompt_messages if isinstance(msg, SystemPromptMessage)]
         other_messages = [msg for msg in prompt_messages if not isinstance(msg, SystemPromptMessage)]
@@ -784,45 +762,76 @@ class BedrockLargeLanguageModel(LargeLanguageModel):
             message.content = message.content.strip()
             system.append({"text": message.content})
 
-            # Add cache point to system if it's not empty and caching is supported for system field
-        # and system_cache_checkpoint is enabled
-        if system and cache_config and "system" in cache_config["supported_fields"] and system_cache_checkpoint:
-            system.append({"cachePoint": {"type": "default"}})
-            logger.debug(f"Added cache point to system messages for model: {model_id}")
-
-            # Process other messages
+        # Process other messages
         for message in other_messages:
             message_dict = self._convert_prompt_message_to_dict(message)
             prompt_message_dicts.append(message_dict)
 
-            # Only add cache point to messages if supported and latest_two_messages_cache_checkpoint is enabled
-        if cache_config and "messages" in cache_config["supported_fields"] and latest_two_messages_cache_checkpoint:
-            # Find all user messages
-            user_message_indices = [i for i, msg in enumerate(prompt_message_dicts) if msg["role"] in ["user"]]
-
-            # Add cache point to available user messages (up to the latest two)
-            if len(user_message_indices) > 0:
-                # Get indices for the latest messages (either one or two depending on availability)
-                indices_to_cache = user_message_indices[-min(2, len(user_message_indices)):]
-                logger.debug(f"indices_to_cache is {indices_to_cache}")
-                for idx in indices_to_cache:
-                    message = prompt_message_dicts[idx]
-                    logger.debug(f"current idx is {idx}")
-
-                    # Check if content is a list
-                    if isinstance(message["content"], list):
-                        # Add cache point to the content array
-                        message["content"].append({"cachePoint": {"type": "default"}})
-                        logger.debug(f"Added cache point to user message content list at index {idx} for model: {model_id}")
-                    else:
-                        # If content is not a list, convert it to a list with the original content and add cache point
-                        original_content = message["content"]
-                        message["content"] = [{"text": original_content}, {"cachePoint": {"type": "default"}}]
-                        logger.debug(f"Converted user message content to list and added cache point at index {idx} for model: {model_id}")
+        return system, prompt_message_dicts
 
-                    prompt_message_dicts[idx] = message
+    def _place_converse_cache_points(
+        self,
+        parameters: dict,
+        model_id: str,
+        system_cache_checkpoint: bool = False,
+        messages_cache_checkpoint: bool = False,
+    ) -> str:
+        """
+        Add cache points to a Converse request where the cache planner puts them.
 
-        return system, prompt_message_dicts
+        The system cache checkpoint option lets the tools and the system prompt be
+        cached, the messages option the conversation history.
+
+        :param parameters: Converse request parameters, changed in place
+        :param model_id: Model ID to get the cache configuration for
+        :param system_cache_checkpoint: Whether the tools and system prompt may be cached
+        :param messages_cache_checkpoint: Whether the conversation history may be cached
+        :return: Key of the conversation, to record the cache usage of the response under
+        """
+        messages = parameters["messages"]
+        tools = parameters.get("toolConfig", {}).get("tools", [])
+        system = parameters.get("system", [])
+        cache_key = conversation_key(model_id, tools, system, messages[:1])
+
+        cache_config = get_cache_config(model_id)
+        supported_fields = cache_config["supported_fields"]
+        slots: list[CacheSlot] = []
+        tokens = sum(self._cache_block_tokens(tool) for tool in tools)
+        if tools and system_cache_checkpoint and "tools" in supported_fields:
+            slots.append(CacheSlot(TOOLS, tokens, tools))
+        tokens += sum(self._cache_block_tokens(block) for block in system)
+        if system and system_cache_checkpoint and "system" in supported_fields:
+            slots.append(CacheSlot(SYSTEM, tokens, system))
+        for message in messages:
+            content = message["content"]
+            tokens += sum(self._cache_block_tokens(block) for block in content)
+            if (
+                content
+                and messages_cache_checkpoint
+                and "messages" in supported_fields
+                and "reasoningContent" not in content[-1]
+            ):
+                slots.append(CacheSlot(MESSAGES, tokens, content))
+
+        chosen = plan_breakpoints(
+            slots, cache_config["min_tokens"], cache_config["max_checkpoints"]
+        )
+        for slot in chosen:
+            slot.target.append({"cachePoint": {"type": "default"}})
+        logger.debug(
+            f"Cache points for model {model_id} at prefixes of "
+            f"{[slot.prefix_tokens for slot in chosen]} tokens, chosen from {len(slots)} candidates"
+        )
+        return cache_key
+
+    @staticmethod
+    def _cache_block_tokens(block: dict) -> int:
+        """Estimate the tokens of a Converse content block."""
+        if "text" in block:
+            return estimate_tokens(block["text"])
+        if "image" in block or "document" in block:
+            return MEDIA_TOKENS
+        return estimate_tokens(json.dumps(block, default=str))
 
     def _convert_converse_tool_config(self, tools: Optional[list[PromptMessageTool]] = None) -> dict:
         tool_config = {}
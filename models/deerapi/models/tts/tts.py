@@ -1,5 +1,6 @@
-from collections.abc import Generator
+from collections.abc import Generator, Iterator
 import concurrent.futures
+from contextlib import contextmanager
 from functools import reduce
 from io import BytesIO
 from typing import Optional
@@ -13,6 +14,7 @@ from dify_plugin.errors.model import (
     InvokeBadRequestError,
 )
 from ..common_openai import _CommonOpenAI
+from .pipeline import CHUNK_SIZE, is_concatenable, stream_pipelined
 
 
 class OpenAIText2SpeechModel(_CommonOpenAI, TTSModel):
@@ -90,48 +92,51 @@ class OpenAIText2SpeechModel(_CommonOpenAI, TTSModel):
         word_limit = self._get_model_word_limit(model, credentials) or 500
         max_workers = self._get_model_workers_limit(model, credentials)
         try:
+            client = OpenAI(**self._to_credential_kwargs(credentials))
             sentences = list(
                 self._split_text_into_sentences(
                     org_text=content_text, max_length=word_limit
                 )
             )
-            audio_bytes_list = []
+            if not sentences:
+                raise InvokeBadRequestError("No audio bytes found")
+
+            def open_stream(sentence: str):
+                return self._open_speech_stream(
+                    client, model, voice, sentence, audio_type
+                )
+
+            if is_concatenable(audio_type):
+                # the segments join into one stream as they are
+                audio = b"".join(
+                    stream_pipelined(sentences, open_stream, lookahead=max_workers)
+                )
+                if not audio:
+                    raise InvokeBadRequestError("No audio bytes found")
+                return audio
+
+            def read(sentence: str) -> bytes:
+                with open_stream(sentence) as stream:
+                    return b"".join(stream)
 
-            # Create a thread pool and map the function to the list of sentences
             with concurrent.futures.ThreadPoolExecutor(
                 max_workers=max_workers
             ) as executor:
-                futures = [
-                    executor.submit(
-                        self._process_sentence,
-                        sentence=sentence,
-                        model=model,
-                        voice=voice,
-                        credentials=credentials,
-                    )
-                    for sentence in sentences
-                ]
-                for future in futures:
-                    try:
-                        if future.result():
-                            audio_bytes_list.append(future.result())
-                    except Exception as ex:
-                        raise InvokeBadRequestError(str(ex))
-
-            if len(audio_bytes_list) > 0:
-                audio_segments = [
-                    AudioSegment.from_file(BytesIO(audio_bytes), format=audio_type)
-                    for audio_bytes in audio_bytes_list
+                audio_bytes_list = [
+                    audio_bytes
+                    for audio_bytes in executor.map(read, sentences)
                     if audio_bytes
                 ]
-                combined_segment = reduce(lambda x, y: x + y, audio_segments)
-                buffer: BytesIO = BytesIO()
-                combined_segment.export(buffer, format=audio_type)
-                buffer.seek(0)
-
-                return buffer.read()
-            else:
+            if not audio_bytes_list:
                 raise InvokeBadRequestError("No audio bytes found")
+            audio_segments = [
+                AudioSegment.from_file(BytesIO(audio_bytes), format=audio_type)
+                for audio_bytes in audio_bytes_list
+            ]
+            combined_segment = reduce(lambda x, y: x + y, audio_segments)
+            buffer: BytesIO = BytesIO()
+            combined_segment.export(buffer, format=audio_type)
+            return buffer.getvalue()
         except Exception as ex:
             raise InvokeBadRequestError(str(ex))
 
@@ -156,7 +161,7 @@ class OpenAIText2SpeechModel(_CommonOpenAI, TTSModel):
             if not voices:
                 raise InvokeBadRequestError("No voices found for the model")
 
-            if not voice or voice not in voices:
+            if not voice or voice not in [d["value"] for d in voices]:
                 voice = self._get_model_default_voice(model, credentials)
 
             word_limit = self._get_model_word_limit(model, credentials) or 500
@@ -164,49 +169,29 @@ class OpenAIText2SpeechModel(_CommonOpenAI, TTSModel):
                 sentences = self._split_text_into_sentences(
                     content_text, max_length=word_limit
                 )
-                executor = concurrent.futures.ThreadPoolExecutor(
-                    max_workers=min(3, len(sentences))
-                )
-                futures = [
-                    executor.submit(
-                        client.audio.speech.with_streaming_response.create,
-                        model=model,
-                        response_format="mp3",
-                        input=sentences[i],
-                        voice=voice,  # type: ignore
-                    )
-                    for i in range(len(sentences))
-                ]
-                for index, future in enumerate(futures):
-                    yield from future.result().__enter__().iter_bytes(1024)
-
             else:
-                response = client.audio.speech.with_streaming_response.create(
-                    model=model,
-                    voice=voice,  # type: ignore
-                    response_format="mp3",
-                    input=content_text.strip(),
-                )
-
-                yield from response.__enter__().iter_bytes(1024)
+                sentences = [content_text]
+            yield from stream_pipelined(
+                sentences,
+                lambda sentence: self._open_speech_stream(
+                    client, model, voice, sentence, "mp3"
+                ),
+            )
         except Exception as ex:
             raise InvokeBadRequestError(str(ex))
 
-    def _process_sentence(self, sentence: str, model: str, voice, credentials: dict):
+    @staticmethod
+    @contextmanager
+    def _open_speech_stream(
+        client: OpenAI, model: str, voice: str, sentence: str, response_format: str
+    ) -> Iterator[Iterator[bytes]]:
         """
-        _tts_invoke openai text2speech model api
-
-        :param model: model name
-        :param credentials: model credentials
-        :param voice: model timbre
-        :param sentence: text content to be translated
-        :return: text translated to audio file
+        Open the audio stream of one sentence; the response is closed on exit
         """
-        # transform credentials to kwargs for model instance
-        credentials_kwargs = self._to_credential_kwargs(credentials)
-        client = OpenAI(**credentials_kwargs)
-        response = client.audio.speech.create(
-            model=model, voice=voice, input=sentence.strip()
-        )
-        if isinstance(response.read(), bytes):
-            return response.read()
+        with client.audio.speech.with_streaming_response.create(
+            model=model,
+            voice=voice,  # type: ignore
+            response_format=response_format,  # type: ignore
+            input=sentence.strip(),
+        ) as response:
+            yield response.iter_bytes(CHUNK_SIZE)
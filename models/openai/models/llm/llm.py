@@ -3,7 +3,6 @@ import json
 import logging
 from collections.abc import Generator
 from typing import Optional, Union, cast, Any
-import tiktoken
 
 from openai import OpenAI
 from openai import Stream
@@ -20,6 +19,7 @@ from openai.types.chat.chat_completion_chunk import (
 from openai.types.chat.chat_completion_message import FunctionCall
 
 from ..common_openai import _CommonOpenAI
+from ..token_counting import count_message_tokens, count_tokens, count_tool_tokens, get_encoding
 
 from dify_plugin import LargeLanguageModel
 from dify_plugin.entities import I18nObject
@@ -1331,15 +1331,12 @@ class OpenAILargeLanguageModel(_CommonOpenAI, LargeLanguageModel):
         :param tools: tools for tool calling
         :return: number of tokens
         """
-        try:
-            encoding = tiktoken.encoding_for_model(model)
-        except KeyError:
-            encoding = tiktoken.get_encoding("cl100k_base")
+        encoding = get_encoding(model)
 
-        num_tokens = len(encoding.encode(text))
+        num_tokens = count_tokens(encoding, [text])
 
         if tools:
-            num_tokens += self._num_tokens_for_tools(encoding, tools)
+            num_tokens += count_tool_tokens(encoding, tools)
 
         return num_tokens
 
@@ -1360,12 +1357,7 @@ class OpenAILargeLanguageModel(_CommonOpenAI, LargeLanguageModel):
         if model == "chatgpt-4o-latest" or model.startswith(("o1", "o3", "o4", "gpt-4.1", "gpt-4.5", "gpt-5")):
             model = "gpt-4o"
 
-        try:
-            encoding = tiktoken.encoding_for_model(model)
-        except KeyError:
-            logger.warning("Warning: model not found. Using cl100k_base encoding.")
-            encoding_name = "cl100k_base"
-            encoding = tiktoken.get_encoding(encoding_name)
+        encoding = get_encoding(model)
 
         if model.startswith("gpt-3.5-turbo-0301"):
             # every message follows <im_start>{role/name}\n{content}<im_end>\n
@@ -1387,94 +1379,11 @@ class OpenAILargeLanguageModel(_CommonOpenAI, LargeLanguageModel):
                 "See https://platform.openai.com/docs/advanced-usage/managing-tokens for for "
                 "information on how messages are converted to tokens."
             )
-        num_tokens = 0
         messages_dict = [self._convert_prompt_message_to_dict(m) for m in messages]
-        for message in messages_dict:
-            num_tokens += tokens_per_message
-            for key, value in message.items():
-                # Cast str(value) in case the message value is not a string
-                # This occurs with function messages
-                # TODO: The current token calculation method for the image type is not implemented,
-                #  which need to download the image and then get the resolution for calculation,
-                #  and will increase the request delay
-                if isinstance(value, list):
-                    text = ""
-                    for item in value:
-                        if isinstance(item, dict) and item["type"] == "text":
-                            text += item["text"]
-
-                    value = text
-
-                if key == "tool_calls":
-                    for tool_call in value:
-                        for t_key, t_value in tool_call.items():  # type: ignore
-                            num_tokens += len(encoding.encode(t_key))
-                            if t_key == "function":
-                                for f_key, f_value in t_value.items():
-                                    num_tokens += len(encoding.encode(f_key))
-                                    num_tokens += len(encoding.encode(f_value))
-                            else:
-                                num_tokens += len(encoding.encode(t_key))
-                                num_tokens += len(encoding.encode(t_value))
-                else:
-                    num_tokens += len(encoding.encode(str(value)))
-
-                if key == "name":
-                    num_tokens += tokens_per_name
-
-        # every reply is primed with <im_start>assistant
-        num_tokens += 3
+        num_tokens = count_message_tokens(encoding, messages_dict, tokens_per_message, tokens_per_name)
 
         if tools:
-            num_tokens += self._num_tokens_for_tools(encoding, tools)
-
-        return num_tokens
-
-    def _num_tokens_for_tools(
-        self, encoding: tiktoken.Encoding, tools: list[PromptMessageTool]
-    ) -> int:
-        """
-        Calculate num tokens for tool calling with tiktoken package.
-
-        :param encoding: encoding
-        :param tools: tools for tool calling
-        :return: number of tokens
-        """
-        num_tokens = 0
-        for tool in tools:
-            num_tokens += len(encoding.encode("type"))
-            num_tokens += len(encoding.encode("function"))
-
-            # calculate num tokens for function object
-            num_tokens += len(encoding.encode("name"))
-            num_tokens += len(encoding.encode(tool.name))
-            num_tokens += len(encoding.encode("description"))
-            num_tokens += len(encoding.encode(tool.description))
-            parameters = tool.parameters
-            num_tokens += len(encoding.encode("parameters"))
-            if "title" in parameters:
-                num_tokens += len(encoding.encode("title"))
-                num_tokens += len(encoding.encode(parameters.get("title")))  # type: ignore
-            num_tokens += len(encoding.encode("type"))
-            num_tokens += len(encoding.encode(parameters.get("type")))  # type: ignore
-            if "properties" in parameters:
-                num_tokens += len(encoding.encode("properties"))
-                for key, value in parameters.get("properties").items():  # type: ignore
-                    num_tokens += len(encoding.encode(key))
-                    for field_key, field_value in value.items():
-                        num_tokens += len(encoding.encode(field_key))
-                        if field_key == "enum":
-                            for enum_field in field_value:
-                                num_tokens += 3
-                                num_tokens += len(encoding.encode(enum_field))
-                        else:
-                            num_tokens += len(encoding.encode(field_key))
-                            num_tokens += len(encoding.encode(str(field_value)))
-            if "required" in parameters:
-                num_tokens += len(encoding.encode("required"))
-                for required_field in parameters["required"]:
-                    num_tokens += 3
-                    num_tokens += len(encoding.encode(required_field))
+            num_tokens += count_tool_tokens(encoding, tools)
 
         return num_tokens
 
@@ -3,7 +3,6 @@ import time
 from typing import Optional, Union
 
 import numpy as np
-import tiktoken
 from dify_plugin import TextEmbeddingModel
 from dify_plugin.entities.model import EmbeddingInputType, PriceType
 from dify_plugin.entities.model.text_embedding import (
@@ -14,6 +13,7 @@ from dify_plugin.errors.model import CredentialsValidateFailedError
 from openai import OpenAI
 
 from ..common_openai import _CommonOpenAI
+from ..token_counting import get_encoding, token_lengths
 
 
 class OpenAITextEmbeddingModel(_CommonOpenAI, TextEmbeddingModel):
@@ -58,10 +58,7 @@ class OpenAITextEmbeddingModel(_CommonOpenAI, TextEmbeddingModel):
         indices = []
         used_tokens = 0
 
-        try:
-            enc = tiktoken.encoding_for_model(model)
-        except KeyError:
-            enc = tiktoken.get_encoding("cl100k_base")
+        enc = get_encoding(model)
 
         for i, text in enumerate(texts):
             token = enc.encode(text)
@@ -130,18 +127,7 @@ class OpenAITextEmbeddingModel(_CommonOpenAI, TextEmbeddingModel):
         if len(texts) == 0:
             return []
 
-        try:
-            enc = tiktoken.encoding_for_model(model)
-        except KeyError:
-            enc = tiktoken.get_encoding("cl100k_base")
-
-        total_num_tokens = []
-        for text in texts:
-            # calculate the number of tokens in the encoded text
-            tokenized_text = enc.encode(text)
-            total_num_tokens.append(len(tokenized_text))
-
-        return total_num_tokens
+        return token_lengths(get_encoding(model), texts)
 
     def validate_credentials(self, model: str, credentials: dict) -> None:
         """
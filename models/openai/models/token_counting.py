@@ -0,0 +1,183 @@
+"""
+Token counting with tiktoken, shared by the LLM and text embedding models.
+
+Encoders are resolved once per model name, the strings of a prompt are encoded
+together, and the token count of every tool schema is remembered so that the
+tools of an agent are not tokenized again on each round.
+"""
+
+import functools
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Sequence
+
+import tiktoken
+from dify_plugin.entities.model.message import PromptMessageTool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENCODING = "cl100k_base"
+# prompts longer than this many characters are encoded on several threads
+BATCH_ENCODE_THRESHOLD = 256 * 1024
+TOOL_CACHE_SIZE = 1024
+# every enum value and required field of a tool schema is wrapped in a few tokens
+LIST_ITEM_TOKENS = 3
+# every reply is primed with <im_start>assistant
+REPLY_PRIMING_TOKENS = 3
+
+
+@functools.lru_cache(maxsize=256)
+def get_encoding(model: str) -> tiktoken.Encoding:
+    """Return the encoder of ``model``, falling back to cl100k_base for unknown models."""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        logger.warning(f"Warning: model {model} not found. Using {DEFAULT_ENCODING} encoding.")
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+
+
+def token_lengths(encoding: tiktoken.Encoding, texts: Sequence[str]) -> list[int]:
+    """
+    Return the number of tokens of each text. Special tokens are counted as plain text.
+
+    ``encode_ordinary_batch`` starts a thread pool per call, which only pays off for
+    long inputs, so short prompts are encoded in a plain loop.
+    """
+    if sum(map(len, texts)) >= BATCH_ENCODE_THRESHOLD:
+        return [len(tokens) for tokens in encoding.encode_ordinary_batch(list(texts))]
+    encode = encoding.encode_ordinary
+    return [len(encode(text)) for text in texts]
+
+
+def count_tokens(encoding: tiktoken.Encoding, texts: Sequence[str]) -> int:
+    return sum(token_lengths(encoding, texts))
+
+
+def count_message_tokens(
+    encoding: tiktoken.Encoding,
+    messages: list[dict],
+    tokens_per_message: int,
+    tokens_per_name: int,
+) -> int:
+    """
+    Count the tokens of chat messages in the OpenAI request format.
+
+    Official documentation: https://github.com/openai/openai-cookbook/blob/
+    main/examples/How_to_format_inputs_to_ChatGPT_models.ipynb
+    """
+    num_tokens = REPLY_PRIMING_TOKENS
+    texts: list[str] = []
+    for message in messages:
+        num_tokens += tokens_per_message
+        for key, value in message.items():
+            if key == "tool_calls":
+                for tool_call in value:
+                    for t_key, t_value in tool_call.items():
+                        texts.append(t_key)
+                        if t_key == "function":
+                            for f_key, f_value in t_value.items():
+                                texts += (f_key, f_value)
+                        else:
+                            texts.append(str(t_value))
+                continue
+            # TODO: The current token calculation method for the image type is not implemented,
+            #  which need to download the image and then get the resolution for calculation,
+            #  and will increase the request delay
+            if isinstance(value, list):
+                value = "".join(
+                    item["text"]
+                    for item in value
+                    if isinstance(item, dict) and item["type"] == "text"
+                )
+            # Cast str(value) in case the message value is not a string
+            # This occurs with function messages
+            texts.append(str(value))
+            if key == "name":
+                num_tokens += tokens_per_name
+    return num_tokens + count_tokens(encoding, texts)
+
+
+def _tool_texts(tool: PromptMessageTool) -> tuple[list[str], int]:
+    """Return the strings a tool schema is encoded from and its fixed token overhead."""
+    texts = ["type", "function", "name", tool.name, "description", tool.description]
+    extra_tokens = 0
+    parameters = tool.parameters
+    texts.append("parameters")
+    if "title" in parameters:
+        texts += ("title", str(parameters["title"]))
+    texts += ("type", str(parameters.get("type", "")))
+    if "properties" in parameters:
+        texts.append("properties")
+        for key, value in parameters["properties"].items():
+            texts.append(key)
+            for field_key, field_value in value.items():
+                texts.append(field_key)
+                if field_key == "enum":
+                    extra_tokens += LIST_ITEM_TOKENS * len(field_value)
+                    texts += (str(enum_field) for enum_field in field_value)
+                else:
+                    texts += (field_key, str(field_value))
+    if "required" in parameters:
+        texts.append("required")
+        extra_tokens += LIST_ITEM_TOKENS * len(parameters["required"])
+        texts += parameters["required"]
+    return texts, extra_tokens
+
+
+def _schema_hash(tool: PromptMessageTool) -> bytes:
+    schema = json.dumps(
+        [tool.name, tool.description, tool.parameters],
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.blake2b(schema.encode(), digest_size=16).digest()
+
+
+class ToolTokenCache:
+    """LRU of tool schema token counts, keyed by the encoding and a hash of the schema."""
+
+    def __init__(self, maxsize: int = TOOL_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._counts: OrderedDict[tuple[str, bytes], int] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def count(self, encoding: tiktoken.Encoding, tools: Sequence[PromptMessageTool]) -> int:
+        keys = [(encoding.name, _schema_hash(tool)) for tool in tools]
+        counts: dict[tuple[str, bytes], int] = {}
+        with self._lock:
+            for key in keys:
+                if key in self._counts:
+                    self._counts.move_to_end(key)
+                    counts[key] = self._counts[key]
+
+        missing = {key: tool for key, tool in zip(keys, tools) if key not in counts}
+        if missing:
+            # encode the schemas of all new tools in one batch
+            schemas = [_tool_texts(tool) for tool in missing.values()]
+            lengths = iter(token_lengths(encoding, [t for texts, _ in schemas for t in texts]))
+            for key, (texts, extra_tokens) in zip(missing, schemas):
+                counts[key] = extra_tokens + sum(next(lengths) for _ in texts)
+            with self._lock:
+                for key in missing:
+                    self._counts[key] = counts[key]
+                    self._counts.move_to_end(key)
+                while len(self._counts) > self.maxsize:
+                    self._counts.popitem(last=False)
+
+        return sum(counts[key] for key in keys)
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+
+
+_tool_token_cache = ToolTokenCache()
+
+
+def count_tool_tokens(encoding: tiktoken.Encoding, tools: Sequence[PromptMessageTool]) -> int:
+    """Calculate num tokens for tool calling."""
+    return _tool_token_cache.count(encoding, tools)
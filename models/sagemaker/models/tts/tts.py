@@ -1,7 +1,7 @@
-import concurrent.futures
-import copy
 import json
 import logging
+from collections.abc import Iterator
+from contextlib import contextmanager
 from enum import Enum
 from typing import Any, Optional
 
@@ -19,6 +19,8 @@ from dify_plugin.errors.model import (
 )
 from dify_plugin.interfaces.model.tts_model import TTSModel
 
+from .pipeline import CHUNK_SIZE, stream_pipelined
+
 logger = logging.getLogger(__name__)
 
 class TTSModelType(Enum):
@@ -212,6 +214,15 @@ class SageMakerText2SpeechModel(TTSModel):
         json_obj = json.loads(json_str)
         return json_obj
 
+    @contextmanager
+    def _open_speech_stream(self, payload: dict, endpoint: str) -> Iterator[Iterator[bytes]]:
+        """
+        Synthesize one sentence and open the download of its audio; the response is closed on exit
+        """
+        resp = self._invoke_sagemaker(payload=payload, endpoint=endpoint)
+        with requests.get(resp.get("s3_presign_url"), stream=True) as response:
+            yield response.iter_content(CHUNK_SIZE)
+
     def _tts_invoke_streaming(self, model_type: str, payload: dict, sagemaker_endpoint: str) -> Any:
         """
         _tts_invoke_streaming text2speech model
@@ -232,31 +243,14 @@ class SageMakerText2SpeechModel(TTSModel):
             if len(content_text) > word_limit:
                 split_sentences = self._split_text_into_sentences(content_text, max_length=word_limit)
                 sentences = [f"{lang_tag}{s}" for s in split_sentences if len(s)]
-                len_sent = len(sentences)
-                executor = concurrent.futures.ThreadPoolExecutor(max_workers=min(4, len_sent))
-                payloads = [copy.deepcopy(payload) for i in range(len_sent)]
-                for idx in range(len_sent):
-                    payloads[idx]["tts_text"] = sentences[idx]
-
-                futures = [
-                    executor.submit(
-                        self._invoke_sagemaker,
-                        payload=payload,
-                        endpoint=sagemaker_endpoint,
-                    )
-                    for payload in payloads
-                ]
-
-                for future in futures:
-                    resp = future.result()
-                    audio_bytes = requests.get(resp.get("s3_presign_url")).content
-                    for i in range(0, len(audio_bytes), 1024):
-                        yield audio_bytes[i : i + 1024]
+                payloads = [{**payload, "tts_text": sentence} for sentence in sentences]
             else:
-                resp = self._invoke_sagemaker(payload, sagemaker_endpoint)
-                audio_bytes = requests.get(resp.get("s3_presign_url")).content
+                payloads = [payload]
 
-                for i in range(0, len(audio_bytes), 1024):
-                    yield audio_bytes[i : i + 1024]
+            yield from stream_pipelined(
+                payloads,
+                lambda sentence_payload: self._open_speech_stream(sentence_payload, sagemaker_endpoint),
+                lookahead=4,
+            )
         except Exception as ex:
             raise InvokeBadRequestError(str(ex))
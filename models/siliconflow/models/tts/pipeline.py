@@ -0,0 +1,86 @@
+"""
+Pipelined text-to-speech: the sentences of a long text are synthesized ahead of
+playback and their audio is streamed to the caller in order.
+"""
+
+import queue
+import threading
+from collections import deque
+from collections.abc import Callable, Generator, Iterable, Sequence
+from contextlib import AbstractContextManager
+from typing import TypeVar
+
+T = TypeVar("T")
+
+# sentence requests in flight or waiting to be played
+DEFAULT_LOOKAHEAD = 3
+CHUNK_SIZE = 1024
+# formats whose files can be joined byte-wise into one playable stream
+CONCATENABLE_FORMATS = frozenset({"mp3", "opus", "aac", "pcm"})
+
+_END = object()
+
+
+def is_concatenable(audio_type: str) -> bool:
+    return audio_type.lower() in CONCATENABLE_FORMATS
+
+
+def stream_pipelined(
+    items: Sequence[T],
+    open_stream: Callable[[T], AbstractContextManager[Iterable[bytes]]],
+    lookahead: int = DEFAULT_LOOKAHEAD,
+) -> Generator[bytes, None, None]:
+    """
+    Synthesize ``items`` and yield their audio chunks in order.
+
+    ``open_stream`` opens the audio stream of one item, e.g. a streaming HTTP
+    response, as a context manager so that it is always closed. The current
+    item is yielded as its chunks arrive, while up to ``lookahead - 1`` later
+    items are fetched and buffered in the background; a new request starts
+    each time an item has been fully yielded. Closing the generator stops
+    the pending requests.
+    """
+    if len(items) == 1:
+        # nothing to overlap with, so skip the worker
+        with open_stream(items[0]) as stream:
+            yield from stream
+        return
+
+    cancelled = threading.Event()
+
+    def fetch(item: T, chunks: queue.Queue):
+        try:
+            with open_stream(item) as stream:
+                for chunk in stream:
+                    if cancelled.is_set():
+                        return
+                    if chunk:
+                        chunks.put(chunk)
+            chunks.put(_END)
+        except Exception as e:
+            chunks.put(e)
+
+    def start(index: int) -> queue.Queue:
+        chunks: queue.Queue = queue.Queue()
+        threading.Thread(target=fetch, args=(items[index], chunks), daemon=True).start()
+        return chunks
+
+    in_flight: deque[queue.Queue] = deque()
+    next_index = 0
+    try:
+        while next_index < min(max(1, lookahead), len(items)):
+            in_flight.append(start(next_index))
+            next_index += 1
+        while in_flight:
+            chunks = in_flight[0]
+            while (chunk := chunks.get()) is not _END:
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+            in_flight.popleft()
+            if next_index < len(items):
+                in_flight.append(start(next_index))
+                next_index += 1
+    finally:
+        cancelled.set()
+
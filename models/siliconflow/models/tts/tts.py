@@ -1,4 +1,5 @@
-import concurrent.futures
+from collections.abc import Iterator
+from contextlib import contextmanager
 from typing import Any, Mapping, Optional
 from dify_plugin.interfaces.model.openai_compatible.common import _CommonOaiApiCompat
 from httpx import Timeout
@@ -8,6 +9,7 @@ from dify_plugin.errors.model import (
 )
 from dify_plugin.interfaces.model.tts_model import TTSModel
 from openai import OpenAI
+from .pipeline import CHUNK_SIZE, stream_pipelined
 
 
 class SiliconFlowText2SpeechModel(_CommonOaiApiCompat, TTSModel):
@@ -88,32 +90,33 @@ class SiliconFlowText2SpeechModel(_CommonOaiApiCompat, TTSModel):
                 sentences = self._split_text_into_sentences(
                     content_text, max_length=4096
                 )
-                executor = concurrent.futures.ThreadPoolExecutor(
-                    max_workers=min(3, len(sentences))
-                )
-                futures = [
-                    executor.submit(
-                        client.audio.speech.with_streaming_response.create,
-                        model=model,
-                        response_format="mp3",
-                        input=sentences[i],
-                        voice=voice,
-                    )
-                    for i in range(len(sentences))
-                ]
-                for future in futures:
-                    yield from future.result().__enter__().iter_bytes(1024)
             else:
-                response = client.audio.speech.with_streaming_response.create(
-                    model=model,
-                    voice=voice,
-                    response_format="mp3",
-                    input=content_text.strip(),
-                )
-                yield from response.__enter__().iter_bytes(1024)
+                sentences = [content_text]
+            yield from stream_pipelined(
+                sentences,
+                lambda sentence: self._open_speech_stream(
+                    client, model, voice, sentence
+                ),
+            )
         except Exception as ex:
             raise InvokeBadRequestError(str(ex))
 
+    @staticmethod
+    @contextmanager
+    def _open_speech_stream(
+        client: OpenAI, model: str, voice: str, sentence: str
+    ) -> Iterator[Iterator[bytes]]:
+        """
+        Open the audio stream of one sentence; the response is closed on exit
+        """
+        with client.audio.speech.with_streaming_response.create(
+            model=model,
+            voice=voice,
+            response_format="mp3",
+            input=sentence.strip(),
+        ) as response:
+            yield response.iter_bytes(CHUNK_SIZE)
+
     @classmethod
     def _add_custom_parameters(cls, credentials: dict) -> None:
         if credentials.get("use_international_endpoint", "false") == "true":
@@ -1,4 +1,5 @@
-import concurrent.futures
+from collections.abc import Iterator
+from contextlib import contextmanager
 from typing import Any, Optional
 from dify_plugin import TTSModel
 from dify_plugin.entities.model import AIModelEntity, FetchFrom, I18nObject, ModelType
@@ -13,6 +14,7 @@ from dify_plugin.errors.model import (
 )
 from xinference_client.client.restful.restful_client import RESTfulAudioModelHandle
 from models.xinference_helper import XinferenceHelper, validate_model_uid
+from .pipeline import stream_pipelined
 
 
 class XinferenceText2SpeechModel(TTSModel):
@@ -206,33 +208,33 @@ class XinferenceText2SpeechModel(TTSModel):
                 sentences = self._split_text_into_sentences(
                     content_text, max_length=word_limit
                 )
-                executor = concurrent.futures.ThreadPoolExecutor(
-                    max_workers=min(3, len(sentences))
-                )
-                futures = [
-                    executor.submit(
-                        handle.speech,
-                        input=sentences[i],
-                        voice=voice,
-                        response_format="mp3",
-                        speed=1.0,
-                        stream=True,
-                    )
-                    for i in range(len(sentences))
-                ]
-                for future in futures:
-                    response = future.result()
-                    for chunk in response:
-                        yield chunk
             else:
-                response = handle.speech(
-                    input=content_text.strip(),
-                    voice=voice,
-                    response_format="mp3",
-                    speed=1.0,
-                    stream=True,
-                )
-                for chunk in response:
-                    yield chunk
+                sentences = [content_text]
+            yield from stream_pipelined(
+                sentences,
+                lambda sentence: self._open_speech_stream(handle, voice, sentence),
+            )
         except Exception as ex:
             raise InvokeBadRequestError(str(ex))
+
+    @staticmethod
+    @contextmanager
+    def _open_speech_stream(
+        handle: RESTfulAudioModelHandle, voice: str, sentence: str
+    ) -> Iterator[Iterator[bytes]]:
+        """
+        Open the audio stream of one sentence; the stream is closed on exit
+        """
+        chunks = handle.speech(
+            input=sentence.strip(),
+            voice=voice,
+            response_format="mp3",
+            speed=1.0,
+            stream=True,
+        )
+        try:
+            yield chunks
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
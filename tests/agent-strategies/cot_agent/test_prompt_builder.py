@@ -0,0 +1,106 @@
+import importlib
+import os
+import sys
+from copy import deepcopy
+
+from dify_plugin.entities.model.message import (
+    AssistantPromptMessage,
+    ImagePromptMessageContent,
+    PromptMessageContentType,
+    SystemPromptMessage,
+    TextPromptMessageContent,
+    ToolPromptMessage,
+    UserPromptMessage,
+)
+from dify_plugin.interfaces.agent import AgentScratchpadUnit
+
+# the plugin imports its modules from its own root
+sys.path.insert(0, os.path.join("agent-strategies", "cot_agent"))
+builder = importlib.import_module("prompt.builder")
+function_calling = importlib.import_module("strategies.function_calling")
+react = importlib.import_module("strategies.ReAct")
+
+
+def image_message(text: str) -> UserPromptMessage:
+    return UserPromptMessage(
+        content=[
+            TextPromptMessageContent(data=text),
+            ImagePromptMessageContent(
+                format="png", base64_data="iVBORw0KGgo" * 1000, mime_type="image/png"
+            ),
+        ]
+    )
+
+
+def former_clear(prompt_messages):
+    prompt_messages = deepcopy(prompt_messages)
+    for prompt_message in prompt_messages:
+        if isinstance(prompt_message, UserPromptMessage) and isinstance(
+            prompt_message.content, list
+        ):
+            prompt_message.content = "\n".join(
+                content.data if content.type == PromptMessageContentType.TEXT else "[image]"
+                for content in prompt_message.content
+            )
+    return prompt_messages
+
+
+def test_user_messages_are_converted_once():
+    messages = [SystemPromptMessage(content="be helpful"), image_message("what is this?")]
+    image_free = builder.ImageFreeMessages()
+
+    first = image_free.strip(messages)
+    assert [m.model_dump() for m in first] == [m.model_dump() for m in former_clear(messages)]
+    assert first[1].content == "what is this?\n[image]"
+    assert first[0] is messages[0]
+    # the history is left as it was
+    assert isinstance(messages[1].content, list)
+
+    second = image_free.strip(messages + [AssistantPromptMessage(content="a chart")])
+    assert second[1] is first[1]
+
+
+def test_function_calling_rounds_match_the_former_prompts():
+    strategy = function_calling.FunctionCallingAgentStrategy(runtime=None, session=None)
+    history = [
+        SystemPromptMessage(content="be helpful"),
+        image_message("first picture"),
+        AssistantPromptMessage(content="a cat"),
+        image_message("second picture"),
+    ]
+    thoughts = []
+    for round_index in range(3):
+        prompt = strategy._organize_prompt_messages(
+            current_thoughts=thoughts, history_prompt_messages=history
+        )
+        expected = former_clear([*history, *thoughts])
+        assert [m.model_dump() for m in prompt] == [m.model_dump() for m in expected]
+        thoughts.append(AssistantPromptMessage(content=f"calling tool {round_index}"))
+        thoughts.append(
+            ToolPromptMessage(content="result", tool_call_id=str(round_index), name="tool")
+        )
+    assert isinstance(history[1].content, list)
+
+
+def test_react_scratchpad_is_extended():
+    strategy = react.ReActAgentStrategy(runtime=None, session=None)
+    strategy._prompt_messages_tools = []
+    strategy.history_prompt_messages = []
+    scratchpad = []
+    for round_index in range(4):
+        scratchpad.append(
+            AgentScratchpadUnit(
+                agent_response="",
+                thought=f"thought {round_index}",
+                action_str='{"action": "search"}',
+                observation=f"observation {round_index}",
+                action=AgentScratchpadUnit.Action(action_name="search", action_input={}),
+            )
+        )
+        messages = strategy._organize_prompt_messages(scratchpad, "query")
+        assert messages[-2].content == strategy._format_assistant_message(scratchpad)
+        assert messages[-1].content == "continue"
+
+    transcript = builder.ScratchpadTranscript()
+    transcript.update(scratchpad)
+    assert transcript.update(scratchpad[:1]) == builder.format_scratchpad_unit(scratchpad[0])
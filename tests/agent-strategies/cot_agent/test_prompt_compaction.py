@@ -0,0 +1,157 @@
+import importlib
+import os
+import sys
+
+from dify_plugin.entities.model import (
+    AIModelEntity,
+    FetchFrom,
+    ModelPropertyKey,
+    ModelType,
+    ParameterRule,
+    ParameterType,
+)
+from dify_plugin.entities.model.message import (
+    AssistantPromptMessage,
+    SystemPromptMessage,
+    ToolPromptMessage,
+    UserPromptMessage,
+)
+from dify_plugin.interfaces.agent import AgentModelConfig, AgentScratchpadUnit
+
+# the plugin imports its modules from its own root
+sys.path.insert(0, os.path.join("agent-strategies", "cot_agent"))
+compaction = importlib.import_module("prompt.compaction")
+function_calling = importlib.import_module("strategies.function_calling")
+react = importlib.import_module("strategies.ReAct")
+
+
+def tool_round(index: int, size: int) -> list:
+    call = AssistantPromptMessage.ToolCall(
+        id=f"call_{index}",
+        type="function",
+        function=AssistantPromptMessage.ToolCall.ToolCallFunction(name="search", arguments="{}"),
+    )
+    return [
+        AssistantPromptMessage(content="", tool_calls=[call]),
+        ToolPromptMessage(content="x" * size, tool_call_id=f"call_{index}", name="search"),
+    ]
+
+
+def test_truncation_and_response_caps():
+    text = "head " + "y" * 10000 + " tail"
+    truncated = compaction.truncate_text(text, 100)
+    assert truncated.startswith("head ") and truncated.endswith(" tail")
+    assert compaction.estimate_tokens(truncated) <= 110
+    assert compaction.truncate_text("short", 100) == "short"
+    # multi-byte text is never cut inside a character
+    assert "�" not in compaction.truncate_text("日本語" * 1000, 50)
+
+    compactor = compaction.PromptCompactor(budget=4000)
+    assert compactor.max_response_tokens == 1000
+    capped = compactor.cap_response(text)
+    assert compaction.estimate_tokens(capped) <= 1010
+    assert compactor.stats.truncated_responses == 1
+    assert compactor.stats.saved_tokens > 0
+
+
+def test_model_token_budget():
+    entity = AIModelEntity(
+        model="gpt",
+        label={"en_US": "gpt"},
+        model_type=ModelType.LLM,
+        fetch_from=FetchFrom.PREDEFINED_MODEL,
+        model_properties={ModelPropertyKey.CONTEXT_SIZE: 16000},
+        parameter_rules=[
+            ParameterRule(
+                name="max_tokens", label={"en_US": "max"}, type=ParameterType.INT, default=512
+            )
+        ],
+    )
+    model = AgentModelConfig(
+        provider="openai",
+        model="gpt",
+        mode="chat",
+        completion_params={"max_tokens": 2000},
+        entity=entity,
+    )
+    assert compaction.model_token_budget(model) == 16000 - 2000 - compaction.RESERVED_TOKENS
+    model.entity = None
+    assert compaction.model_token_budget(model) is None
+    assert compaction.PromptCompactor.for_model(model).compact([UserPromptMessage(content="hi")])
+
+
+def test_function_calling_prefix_stays_stable():
+    strategy = function_calling.FunctionCallingAgentStrategy(runtime=None, session=None)
+    strategy._compactor = compaction.PromptCompactor(budget=3000)
+    history = [
+        SystemPromptMessage(content="be helpful"),
+        UserPromptMessage(content="old question"),
+        AssistantPromptMessage(content="old answer " * 200),
+        UserPromptMessage(content="question"),
+    ]
+    thoughts = []
+    prompts = []
+    for round_index in range(12):
+        thoughts += tool_round(round_index, 2000)
+        prompt = strategy._organize_prompt_messages(
+            current_thoughts=thoughts, history_prompt_messages=history
+        )
+        assert strategy._compactor.stats.prompt_tokens <= 3000
+        assert sum(strategy._compactor.message_tokens(m) for m in prompt) <= 3000
+        assert prompt[0] is history[0]
+        assert history[-1] in prompt
+        # the latest tool response is sent in full
+        assert prompt[-1] is thoughts[-1]
+        prompts.append(prompt)
+
+    stats = strategy._compactor.stats
+    assert stats.compacted_messages > 0 and stats.dropped_messages > 0
+    # the old turn was dropped as a whole
+    assert history[1] not in prompts[-1] and history[2] not in prompts[-1]
+    # most rounds only append to the prompt of the round before
+    appended = sum(
+        1
+        for previous, current in zip(prompts, prompts[1:])
+        if all(a is b for a, b in zip(previous, current))
+    )
+    assert appended >= len(prompts) // 2
+    # a tool call is never sent without its response
+    for prompt in prompts:
+        call_ids = {
+            call.id
+            for m in prompt
+            if isinstance(m, AssistantPromptMessage)
+            for call in m.tool_calls
+        }
+        response_ids = {m.tool_call_id for m in prompt if isinstance(m, ToolPromptMessage)}
+        assert call_ids == response_ids
+
+
+def test_react_observations_are_compacted():
+    strategy = react.ReActAgentStrategy(runtime=None, session=None)
+    strategy._prompt_messages_tools = []
+    strategy.history_prompt_messages = [
+        UserPromptMessage(content="old question"),
+        AssistantPromptMessage(content="old answer " * 100),
+    ]
+    strategy._compactor = compaction.PromptCompactor(budget=4000)
+    scratchpad = []
+    for round_index in range(8):
+        observation = strategy._compactor.cap_response("z" * 6000)
+        scratchpad.append(
+            AgentScratchpadUnit(
+                agent_response="",
+                thought=f"thought {round_index}",
+                action_str='{"action": "search"}',
+                observation=observation,
+                action=AgentScratchpadUnit.Action(action_name="search", action_input={}),
+            )
+        )
+        messages = strategy._organize_prompt_messages(scratchpad, "query")
+        assert sum(strategy._compactor.message_tokens(m) for m in messages) <= 4000
+        assert messages[-2].content == strategy._format_assistant_message(scratchpad)
+        assert messages[-3].content == "query"
+        # the observation of the latest round is kept as it is
+        assert scratchpad[-1].observation == observation
+
+    assert strategy._compactor.stats.compacted_messages > 0
@@ -0,0 +1,152 @@
+from types import SimpleNamespace
+
+import pytest
+from dify_plugin.entities.datasource import GetOnlineDocumentPageContentRequest
+
+from plugin_loader import load_plugin_modules
+
+confluence, page_sync = load_plugin_modules(
+    "datasources/confluence_datasource",
+    "datasources.confluence_datasource",
+    "datasources.utils.page_sync",
+)
+
+PAGES_URL = "https://api.atlassian.com/ex/confluence/cloud/wiki/api/v2/pages"
+
+
+class FakeStorage:
+    def __init__(self):
+        self.data = {}
+
+    def set(self, key, value):
+        self.data[key] = value
+
+    def get(self, key):
+        return self.data[key]
+
+    def exist(self, key):
+        return key in self.data
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self._payload = payload
+        self.status_code = 200
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._payload
+
+
+class FakeConfluence:
+    """Serves a space of pages in listing batches of two."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.requests = []
+
+    def item(self, page_id):
+        page = self.pages[page_id]
+        return {
+            "id": page_id,
+            "title": f"Page {page_id}",
+            "spaceId": page.get("space", "s1"),
+            "version": {"number": page["version"], "createdAt": "2025-01-01"},
+            "body": {"storage": {"value": f"<p>{page['text']}</p>"}},
+        }
+
+    def get(self, url, headers=None, params=None, timeout=None):
+        self.requests.append((url, dict(params or {})))
+        if url != PAGES_URL:
+            return FakeResponse(self.item(url.rsplit("/", 1)[-1]))
+        ids = sorted(self.pages)
+        start = int(params.get("cursor") or 0)
+        payload = {"results": [self.item(page_id) for page_id in ids[start : start + 2]]}
+        if start + 2 < len(ids):
+            payload["_links"] = {"next": f"/wiki/api/v2/pages?cursor={start + 2}"}
+        return FakeResponse(payload)
+
+
+@pytest.fixture
+def conversions(monkeypatch):
+    converted = []
+    html_to_text = page_sync.html_to_text
+
+    def counting_html_to_text(html):
+        converted.append(html)
+        return html_to_text(html)
+
+    monkeypatch.setattr(page_sync, "html_to_text", counting_html_to_text)
+    return converted
+
+
+def make_datasource(monkeypatch, server, storage):
+    monkeypatch.setattr(confluence.requests, "get", server.get)
+    monkeypatch.setattr(
+        confluence.requests, "Session", lambda: SimpleNamespace(get=server.get, close=lambda: None)
+    )
+    runtime = SimpleNamespace(credentials={"access_token": "token", "workspace_id": "cloud"})
+    return confluence.ConfluenceDataSource(
+        runtime=runtime, session=SimpleNamespace(storage=storage)
+    )
+
+
+def content_of(datasource, page_id):
+    request = GetOnlineDocumentPageContentRequest(
+        workspace_id="cloud", page_id=page_id, type="page"
+    )
+    messages = list(datasource._get_content(request))
+    return messages[0].message.variable_value
+
+
+def test_listing_converts_only_changed_pages(monkeypatch, conversions):
+    pages = {str(i): {"version": 1, "text": f"text {i}"} for i in range(5)}
+    server = FakeConfluence(pages)
+    storage = FakeStorage()
+    datasource = make_datasource(monkeypatch, server, storage)
+
+    result = datasource._get_pages({}).result[0]
+    assert [page.page_id for page in result.pages] == sorted(pages)
+    assert len(conversions) == 5
+    assert all(params["body-format"] == "storage" for _, params in server.requests)
+    assert all(params["limit"] == page_sync.LIST_PAGE_LIMIT for _, params in server.requests)
+
+    # one page was edited and one deleted since
+    pages["2"] = {"version": 2, "text": "edited"}
+    del pages["4"]
+    conversions.clear()
+    datasource._get_pages({})
+    assert conversions == ["<p>edited</p>"]
+    assert "confluence:cloud:page:4" not in storage.data
+
+    # the content comes from the listing, after a request for its version only
+    server.requests.clear()
+    assert content_of(datasource, "2") == "edited"
+    assert server.requests == [(f"{PAGES_URL}/2", {})]
+    assert conversions == ["<p>edited</p>"]
+
+    # a page edited since the listing is downloaded again
+    pages["1"] = {"version": 2, "text": "edited after the listing"}
+    assert content_of(datasource, "1") == "edited after the listing"
+
+
+def test_content_is_converted_once_per_version(monkeypatch, conversions):
+    pages = {"7": {"version": 3, "text": "hello", "space": "s2"}}
+    server = FakeConfluence(pages)
+    datasource = make_datasource(monkeypatch, server, FakeStorage())
+
+    assert content_of(datasource, "7") == "hello"
+    assert content_of(datasource, "7") == "hello"
+    # the version is checked without the body, and the page is not converted again
+    assert server.requests[1] == (f"{PAGES_URL}/7", {})
+    assert len(server.requests) == 2
+    assert len(conversions) == 1
+
+    pages["7"] = {"version": 4, "text": "changed", "space": "s2"}
+    assert content_of(datasource, "7") == "changed"
+    assert len(conversions) == 2
@@ -0,0 +1,196 @@
+import hashlib
+import os
+from types import SimpleNamespace
+
+import pytest
+from dify_plugin.entities.datasource import (
+    OnlineDriveBrowseFilesRequest,
+    OnlineDriveDownloadFileRequest,
+)
+from dify_plugin.entities.invoke_message import InvokeMessage
+from dropbox.exceptions import ApiError
+from dropbox.files import (
+    DeletedMetadata,
+    FileMetadata,
+    FolderMetadata,
+    ListFolderContinueError,
+    ListFolderResult,
+)
+
+from plugin_loader import load_plugin_modules
+
+dropbox_datasource, dropbox_sync = load_plugin_modules(
+    "datasources/dropbox_datasource", "datasources.dropbox", "datasources.utils.dropbox_sync"
+)
+
+
+class FakeStorage:
+    def __init__(self):
+        self.data = {}
+
+    def set(self, key, value):
+        self.data[key] = value
+
+    def get(self, key):
+        return self.data[key]
+
+    def exist(self, key):
+        return key in self.data
+
+
+class FakeDownload:
+    def __init__(self, content):
+        self.content = content
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start : start + chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class FakeDropbox:
+    """A folder whose changes are reported since the cursor they were listed with."""
+
+    def __init__(self):
+        self.entries = []
+        self.changes = []
+        self.calls = []
+        self.files = {}
+        self.reset = False
+
+    def users_get_current_account(self):
+        self.calls.append("account")
+        return SimpleNamespace(account_id="dbid:1")
+
+    def files_list_folder(self, path, limit=None):
+        self.calls.append(("list", path))
+        return ListFolderResult(entries=self.entries, cursor="c1", has_more=False)
+
+    def files_list_folder_continue(self, cursor):
+        self.calls.append(("continue", cursor))
+        if self.reset:
+            raise ApiError("request", ListFolderContinueError.reset, "", "")
+        changes, self.changes = self.changes, []
+        return ListFolderResult(entries=changes, cursor=cursor + "+", has_more=False)
+
+    def files_get_metadata(self, file_id):
+        content = self.files[file_id]
+        hasher = dropbox_sync.ContentHasher()
+        hasher.update(content)
+        return FileMetadata(
+            name="report.pdf",
+            id=file_id,
+            size=len(content),
+            path_display="/report.pdf",
+            content_hash=hasher.hexdigest(),
+        )
+
+    def files_download(self, path):
+        self.calls.append(("download", path))
+        return None, FakeDownload(self.files["id:f"])
+
+
+@pytest.fixture
+def client(monkeypatch):
+    fake = FakeDropbox()
+    monkeypatch.setattr(dropbox_sync.dropbox, "Dropbox", lambda token: fake)
+    monkeypatch.setattr(dropbox_sync, "_clients", dropbox_sync.OrderedDict())
+    return fake
+
+
+@pytest.fixture
+def datasource():
+    runtime = SimpleNamespace(credentials={"access_token": "token"}, user_id="user")
+    return dropbox_datasource.DropboxDataSource(
+        runtime=runtime, session=SimpleNamespace(storage=FakeStorage())
+    )
+
+
+def browse(datasource, max_keys=10, next_page_parameters=None):
+    request = OnlineDriveBrowseFilesRequest(
+        bucket="", prefix="", max_keys=max_keys, next_page_parameters=next_page_parameters
+    )
+    return datasource._browse_files(request).result[0]
+
+
+def test_content_hash_is_computed_over_4mb_blocks():
+    data = os.urandom(10 * 1024 * 1024 + 123)
+    block = 4 * 1024 * 1024
+    blocks = b"".join(
+        hashlib.sha256(data[start : start + block]).digest() for start in range(0, len(data), block)
+    )
+    # parts that do not line up with the blocks
+    hasher = dropbox_sync.ContentHasher()
+    for start in range(0, len(data), 3 * 1024 * 1024):
+        hasher.update(data[start : start + 3 * 1024 * 1024])
+    assert hasher.hexdigest() == hashlib.sha256(blocks).hexdigest()
+
+
+def test_folders_are_updated_from_their_cursor(client, datasource):
+    client.entries = [
+        FileMetadata(name="b.txt", id="id:b", size=3),
+        FolderMetadata(name="Archive", id="id:a"),
+        FileMetadata(name="c.txt", id="id:c", size=5),
+    ]
+    page = browse(datasource, max_keys=2)
+    assert [f.name for f in page.files] == ["Archive", "b.txt"]
+    assert page.is_truncated and page.next_page_parameters == {"offset": 2}
+    page = browse(datasource, max_keys=2, next_page_parameters=page.next_page_parameters)
+    assert [f.name for f in page.files] == ["c.txt"] and not page.is_truncated
+
+    client.changes = [DeletedMetadata(name="b.txt"), FileMetadata(name="d.txt", id="id:d", size=1)]
+    page = browse(datasource)
+    assert [f.name for f in page.files] == ["Archive", "c.txt", "d.txt"]
+    assert [call for call in client.calls if call[0] == "list"] == [("list", "")]
+    # the client and its account are shared by all calls
+    assert client.calls.count("account") == 1
+
+    # a reset cursor lists the folder again
+    client.reset = True
+    client.entries = [FileMetadata(name="e.txt", id="id:e", size=1)]
+    assert [f.name for f in browse(datasource).files] == ["e.txt"]
+
+
+def test_unchanged_files_are_downloaded_again_by_default(client, datasource):
+    client.files["id:f"] = os.urandom(50000)
+    request = OnlineDriveDownloadFileRequest(id="id:f", bucket=None)
+
+    for _ in range(2):
+        messages = list(datasource._download_file(request))
+        assert b"".join(message.message.blob for message in messages) == client.files["id:f"]
+    assert client.calls.count(("download", "/report.pdf")) == 2
+
+
+def test_downloads_are_streamed_and_skipped_when_unchanged(client, datasource):
+    datasource.runtime.credentials = {"access_token": "token", "skip_unchanged_files": True}
+    client.files["id:f"] = os.urandom(50000)
+    request = OnlineDriveDownloadFileRequest(id="id:f", bucket=None)
+
+    messages = list(datasource._download_file(request))
+    chunks = [message.message for message in messages]
+    assert all(message.type == InvokeMessage.MessageType.BLOB_CHUNK for message in messages)
+    assert all(len(chunk.blob) <= dropbox_sync.BLOB_CHUNK_SIZE for chunk in chunks)
+    assert b"".join(chunk.blob for chunk in chunks) == client.files["id:f"]
+    assert chunks[-1].end and not any(chunk.end for chunk in chunks[:-1])
+
+    (message,) = datasource._download_file(request)
+    assert message.type == InvokeMessage.MessageType.JSON
+    assert message.message.json_object["unchanged"] is True
+    assert client.calls.count(("download", "/report.pdf")) == 1
+
+
+def test_corrupted_downloads_are_not_completed():
+    content = b"x" * 100
+    parts = [content[:50], b"y" * 50]
+    hasher = dropbox_sync.ContentHasher()
+    hasher.update(content)
+    messages = []
+    with pytest.raises(ValueError):
+        for message in dropbox_sync.iter_blob_chunks(parts, 100, {}, hasher.hexdigest()):
+            messages.append(message)
+    assert not any(message.message.end for message in messages)
@@ -0,0 +1,152 @@
+import base64
+import hashlib
+import json
+import os
+import threading
+from types import SimpleNamespace
+
+import google_crc32c
+import pytest
+from dify_plugin.entities.datasource import OnlineDriveDownloadFileRequest
+
+from plugin_loader import load_plugin_modules
+
+gcs, object_download = load_plugin_modules(
+    "datasources/google_cloud_storage",
+    "datasources.google_cloud_storage",
+    "datasources.utils.object_download",
+)
+
+COS_COPY = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "..",
+    "..",
+    "datasources",
+    "tencent_cos_storage",
+    "datasources",
+    "utils",
+    "object_download.py",
+)
+
+
+class FakeBlob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        content = bucket.objects.get(name, b"")
+        self.size = len(content)
+        self.content_type = "text/plain"
+        self.content_encoding = None
+        self.crc32c = base64.b64encode(google_crc32c.value(content).to_bytes(4, "big")).decode()
+        self.md5_hash = base64.b64encode(hashlib.md5(content).digest()).decode()
+
+    def download_as_bytes(self, start=None, end=None, checksum="md5"):
+        with self.bucket.lock:
+            self.bucket.reads.append((self.name, start, end))
+        content = self.bucket.objects[self.name]
+        return content[start : None if end is None else end + 1]
+
+
+class FakeBucket:
+    def __init__(self):
+        self.objects = {}
+        self.reads = []
+        self.lock = threading.Lock()
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+    def get_blob(self, name):
+        return FakeBlob(self, name) if name in self.objects else None
+
+
+@pytest.fixture
+def bucket(monkeypatch):
+    fake = FakeBucket()
+    created = []
+
+    def from_service_account_info(info):
+        created.append(info)
+        return SimpleNamespace(
+            bucket=lambda name: fake,
+            list_blobs=lambda name, prefix: [
+                fake.blob(key) for key in sorted(fake.objects) if key.startswith(prefix)
+            ],
+        )
+
+    monkeypatch.setattr(gcs.storage.Client, "from_service_account_info", from_service_account_info)
+    monkeypatch.setattr(object_download, "_clients", object_download.OrderedDict())
+    monkeypatch.setattr(object_download, "RANGE_SIZE", 10000)
+    monkeypatch.setattr(object_download, "SMALL_OBJECT_SIZE", 1000)
+    fake.created = created
+    return fake
+
+
+def download(key):
+    runtime = SimpleNamespace(credentials={"credentials": json.dumps({"project_id": "p"})})
+    datasource = gcs.GoogleCloudStorageDataSource(runtime=runtime, session=None)
+    request = OnlineDriveDownloadFileRequest(id=key, bucket="bucket")
+    return datasource._download_file(request)
+
+
+def blobs(messages):
+    """The content and metadata of every blob, in the order they were completed."""
+    contents, completed = {}, []
+    for message in messages:
+        chunk = message.message
+        contents[chunk.id] = contents.get(chunk.id, b"") + chunk.blob
+        assert len(chunk.blob) <= object_download.BLOB_CHUNK_SIZE
+        if chunk.end:
+            completed.append((contents[chunk.id], message.meta))
+    return completed
+
+
+def test_large_objects_are_read_in_parallel_ranges(bucket):
+    bucket.objects["data/big.bin"] = os.urandom(95000)
+
+    ((content, meta),) = blobs(list(download("data/big.bin")))
+    assert content == bucket.objects["data/big.bin"]
+    assert meta == {"file_name": "data/big.bin", "mime_type": "text/plain"}
+    assert sorted(read[1] for read in bucket.reads) == list(range(0, 95000, 10000))
+
+    # the client is created once per set of credentials
+    list(download("data/big.bin"))
+    assert len(bucket.created) == 1
+
+
+def test_corrupted_objects_are_not_completed(bucket, monkeypatch):
+    bucket.objects["a.txt"] = b"x" * 100
+    original = FakeBlob.__init__
+
+    def corrupted_checksum(self, bucket, name):
+        original(self, bucket, name)
+        self.crc32c = base64.b64encode(b"\0\0\0\0").decode()
+
+    monkeypatch.setattr(FakeBlob, "__init__", corrupted_checksum)
+    messages = []
+    with pytest.raises(ValueError, match="crc32c"):
+        for message in download("a.txt"):
+            messages.append(message)
+    assert messages and not any(message.message.end for message in messages)
+
+
+def test_prefixes_are_downloaded_with_small_objects_fetched_concurrently(bucket):
+    small = {f"docs/{i:02}.txt": os.urandom(100 + i) for i in range(20)}
+    bucket.objects.update(small)
+    bucket.objects["docs/large.bin"] = os.urandom(25000)
+    bucket.objects["docs/empty.txt"] = b""
+    bucket.objects["other.txt"] = b"not in the prefix"
+
+    completed = blobs(list(download("docs/")))
+    expected = {key: bucket.objects[key] for key in sorted(bucket.objects) if key[:5] == "docs/"}
+    assert [meta["file_name"] for _, meta in completed] == list(expected)
+    assert [content for content, _ in completed] == list(expected.values())
+    # small objects are read whole, the large one in ranges
+    assert ("docs/00.txt", 0, 99) in bucket.reads
+    assert len([read for read in bucket.reads if read[0] == "docs/large.bin"]) == 3
+
+
+def test_plugins_share_the_module():
+    with open(object_download.__file__, "rb") as gcs_copy, open(COS_COPY, "rb") as cos_copy:
+        assert gcs_copy.read() == cos_copy.read()
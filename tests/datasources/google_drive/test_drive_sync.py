@@ -0,0 +1,193 @@
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+from dify_plugin.entities.datasource import OnlineDriveDownloadFileRequest
+from dify_plugin.entities.invoke_message import InvokeMessage
+
+from plugin_loader import load_plugin_modules
+
+google_drive, drive_sync = load_plugin_modules(
+    "datasources/google_drive", "datasources.google_drive", "datasources.utils.drive_sync"
+)
+
+FILES_URL = "https://www.googleapis.com/drive/v3/files/"
+
+
+class FakeStorage:
+    def __init__(self):
+        self.data = {}
+
+    def set(self, key, value):
+        self.data[key] = value
+
+    def get(self, key):
+        return self.data[key]
+
+    def exist(self, key):
+        return key in self.data
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, payload=None, content=b"", chunk_size=None):
+        self.status_code = status_code
+        self._payload = payload
+        self.content = content
+        self.text = json.dumps(payload) if payload is not None else ""
+        self.headers = {"Content-Length": str(len(content))}
+        self._chunk_size = chunk_size
+
+    def json(self):
+        return self._payload
+
+    def iter_content(self, chunk_size=1):
+        step = self._chunk_size or chunk_size
+        for start in range(0, len(self.content), step):
+            yield self.content[start : start + step]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class FakeDrive:
+    """Answers the requests of one download from a table of URLs."""
+
+    def __init__(self, metadata, routes):
+        self.metadata = metadata
+        self.routes = routes
+        self.calls = []
+
+    def get(self, url, headers=None, params=None, timeout=None, stream=False):
+        params = params or {}
+        self.calls.append((url, params))
+        if url == FILES_URL + self.metadata["id"] and "fields" in params:
+            return FakeResponse(payload=self.metadata)
+        key = (url, params.get("mimeType", params.get("gid", params.get("alt"))))
+        return self.routes.get(key) or FakeResponse(status_code=404)
+
+
+@pytest.fixture
+def datasource():
+    runtime = SimpleNamespace(
+        credentials={"access_token": "token"}, user_id="user", session_id=None
+    )
+    session = SimpleNamespace(storage=FakeStorage())
+    return google_drive.GoogleDriveDataSource(runtime=runtime, session=session)
+
+
+@pytest.fixture
+def skipping_datasource(datasource):
+    datasource.runtime.credentials = {"access_token": "token", "skip_unchanged_files": True}
+    return datasource
+
+
+def download(datasource, monkeypatch, drive, file_id):
+    monkeypatch.setattr(google_drive.requests, "get", drive.get)
+    request = OnlineDriveDownloadFileRequest(id=file_id, bucket=None)
+    return list(datasource._download_file(request))
+
+
+def binary_file(content):
+    metadata = {
+        "id": "f1",
+        "name": "report.bin",
+        "mimeType": "application/octet-stream",
+        "size": str(len(content)),
+        "md5Checksum": "abc",
+        "modifiedTime": "2025-01-01T00:00:00Z",
+    }
+    routes = {(FILES_URL + "f1", "media"): FakeResponse(content=content, chunk_size=7000)}
+    return metadata, FakeDrive(metadata, routes)
+
+
+def test_unchanged_files_are_downloaded_again_by_default(datasource, monkeypatch):
+    content = os.urandom(20000)
+    _, drive = binary_file(content)
+
+    first = download(datasource, monkeypatch, drive, "f1")
+    second = download(datasource, monkeypatch, drive, "f1")
+    assert b"".join(message.message.blob for message in second) == content
+    assert len(second) == len(first)
+
+
+def test_binary_files_are_streamed_and_skipped_when_unchanged(skipping_datasource, monkeypatch):
+    datasource = skipping_datasource
+    content = os.urandom(20000)
+    metadata, drive = binary_file(content)
+
+    messages = download(datasource, monkeypatch, drive, "f1")
+    chunks = [message.message for message in messages]
+    assert all(message.type == InvokeMessage.MessageType.BLOB_CHUNK for message in messages)
+    assert all(len(chunk.blob) <= drive_sync.BLOB_CHUNK_SIZE for chunk in chunks)
+    assert [chunk.sequence for chunk in chunks] == list(range(len(chunks)))
+    assert b"".join(chunk.blob for chunk in chunks) == content
+    assert chunks[-1].end and not any(chunk.end for chunk in chunks[:-1])
+
+    # the second download of the same version sends no content
+    messages = download(datasource, monkeypatch, drive, "f1")
+    assert len(messages) == 1
+    assert messages[0].type == InvokeMessage.MessageType.JSON
+    assert messages[0].message.json_object["unchanged"] is True
+
+    # a new checksum is downloaded again
+    metadata["md5Checksum"] = "def"
+    assert len(download(datasource, monkeypatch, drive, "f1")) == len(chunks)
+
+
+def test_incomplete_downloads_are_not_recorded(datasource, monkeypatch):
+    metadata = {"id": "f2", "name": "a.bin", "mimeType": "application/zip", "size": "100"}
+    metadata["md5Checksum"] = "abc"
+    routes = {(FILES_URL + "f2", "media"): FakeResponse(content=b"x" * 60)}
+    drive = FakeDrive(metadata, routes)
+
+    with pytest.raises(ValueError):
+        download(datasource, monkeypatch, drive, "f2")
+    assert datasource.session.storage.data == {}
+
+
+def test_docs_are_exported_as_markdown(datasource, monkeypatch):
+    metadata = {
+        "id": "d1",
+        "name": "Notes",
+        "mimeType": "application/vnd.google-apps.document",
+        "version": "7",
+        "modifiedTime": "2025-01-01T00:00:00Z",
+    }
+    routes = {(FILES_URL + "d1/export", "text/markdown"): FakeResponse(content=b"# Notes")}
+    drive = FakeDrive(metadata, routes)
+
+    (message,) = download(datasource, monkeypatch, drive, "d1")
+    assert message.message.blob == b"# Notes"
+    assert message.meta == {"file_name": "Notes.md", "mime_type": "text/markdown"}
+
+
+def test_sheets_are_exported_as_one_csv_per_sheet(datasource, monkeypatch):
+    metadata = {"id": "s1", "name": "Budget", "mimeType": drive_sync.SPREADSHEET_MIME_TYPE}
+    metadata["version"] = "3"
+    sheets = {"sheets": [{"properties": {"sheetId": 0, "title": "2024"}}]}
+    sheets["sheets"].append({"properties": {"sheetId": 17, "title": "2025"}})
+    export_url = "https://docs.google.com/spreadsheets/d/s1/export"
+    routes = {
+        ("https://sheets.googleapis.com/v4/spreadsheets/s1", None): FakeResponse(payload=sheets),
+        (export_url, 0): FakeResponse(content=b"a,b\n1,2\n"),
+        (export_url, 17): FakeResponse(content=b"a,b\n3,4\n"),
+    }
+    drive = FakeDrive(metadata, routes)
+
+    messages = download(datasource, monkeypatch, drive, "s1")
+    assert [message.meta["file_name"] for message in messages] == [
+        "Budget - 2024.csv",
+        "Budget - 2025.csv",
+    ]
+    assert [message.message.blob for message in messages] == [b"a,b\n1,2\n", b"a,b\n3,4\n"]
+
+    # without the Sheets API the spreadsheet is exported as a whole
+    del routes[("https://sheets.googleapis.com/v4/spreadsheets/s1", None)]
+    routes[(FILES_URL + "s1/export", drive_sync.XLSX_MIME_TYPE)] = FakeResponse(content=b"xlsx")
+    metadata["version"] = "4"
+    (message,) = download(datasource, monkeypatch, drive, "s1")
+    assert message.meta == {"file_name": "Budget.xlsx", "mime_type": drive_sync.XLSX_MIME_TYPE}
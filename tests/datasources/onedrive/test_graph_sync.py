@@ -0,0 +1,201 @@
+import importlib.util
+import os
+import threading
+
+import pytest
+
+DATASOURCES_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "..", "datasources")
+SYNC_PATH = os.path.join(DATASOURCES_DIR, "onedrive", "datasources", "utils", "graph_sync.py")
+SHAREPOINT_SYNC_PATH = os.path.join(
+    DATASOURCES_DIR, "sharepoint_datasource", "datasources", "utils", "graph_sync.py"
+)
+
+# the datasource plugins' packages collide, so the module is loaded from its file
+spec = importlib.util.spec_from_file_location("onedrive_graph_sync", SYNC_PATH)
+graph_sync = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(graph_sync)
+
+
+class FakeStorage:
+    def __init__(self):
+        self.data = {}
+
+    def set(self, key, value):
+        self.data[key] = value
+
+    def get(self, key):
+        return self.data[key]
+
+    def exist(self, key):
+        return key in self.data
+
+
+class FakeResponse:
+    def __init__(self, payload=None, status_code=200, content=b""):
+        self._payload = payload
+        self.status_code = status_code
+        self.content = content
+        self.text = ""
+
+    def json(self):
+        return self._payload
+
+
+def item(item_id, parent_id, name, folder=False, size=10):
+    data = {"id": item_id, "name": name, "parentReference": {"id": parent_id}}
+    if folder:
+        data["folder"] = {}
+    else:
+        data["size"] = size
+    return data
+
+
+class FakeGraph:
+    """Serves the delta pages of a drive, and the byte ranges of a file."""
+
+    def __init__(self, pages, content=b""):
+        self.pages = pages
+        self.content = content
+        self.gets = []
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def post(self, url, headers=None, json=None, timeout=None):
+        self.batches.append(json)
+        bodies = [{"id": "drive-1"}, {"id": "root"}]
+        responses = [
+            {"id": request["id"], "status": 200, "body": bodies[int(request["id"])]}
+            for request in json["requests"]
+        ]
+        return FakeResponse({"responses": responses})
+
+    def get(self, url, headers=None, params=None, timeout=None):
+        with self.lock:
+            self.gets.append(url)
+        if "Range" in (headers or {}):
+            start, end = map(int, headers["Range"].removeprefix("bytes=").split("-"))
+            return FakeResponse(status_code=206, content=self.content[start : end + 1])
+        return FakeResponse(self.pages[url])
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    fake = FakeGraph({})
+    monkeypatch.setattr(graph_sync, "_session", fake)
+    monkeypatch.setattr(graph_sync, "_mirrors", graph_sync.OrderedDict())
+    return fake
+
+
+def test_mirror_follows_moves_and_deletes():
+    mirror = graph_sync.DriveMirror("drive", "root", "link")
+    mirror.apply(
+        [
+            {"id": "root", "root": {}},
+            item("docs", "root", "Docs", folder=True),
+            item("a", "docs", "b.txt"),
+            item("b", "docs", "A.txt"),
+            item("c", "root", "notes.md"),
+        ]
+    )
+    assert [child[0] for child in mirror.children("")] == ["docs", "c"]
+    assert [child[1] for child in mirror.children("docs")] == ["A.txt", "b.txt"]
+
+    assert mirror.apply([item("c", "docs", "notes.md")])
+    assert not mirror.apply([item("c", "docs", "notes.md")])
+    assert [child[0] for child in mirror.children("docs")] == ["b", "a", "c"]
+
+    # the contents of a deleted folder go with it
+    mirror.apply([{"id": "docs", "deleted": {}}])
+    assert mirror.children("") == [] and mirror.items == {}
+
+    restored = graph_sync.DriveMirror.from_bytes(mirror.to_bytes())
+    assert restored.items == mirror.items and restored.link == "link"
+
+
+def test_first_crawl_is_spread_over_calls_then_synced_by_delta(graph, monkeypatch):
+    monkeypatch.setattr(graph_sync, "MAX_DELTA_PAGES", 2)
+    start = (
+        f"{graph_sync.GRAPH_BASE_URL}/drives/drive-1/root/delta?$select={graph_sync.DELTA_SELECT}"
+    )
+    graph.pages = {
+        start: {"value": [item("f", "root", "Folder", folder=True)], "@odata.nextLink": "p2"},
+        "p2": {"value": [item("x", "f", "x.pdf")], "@odata.nextLink": "p3"},
+        "p3": {"value": [item("y", "root", "y.pdf")], "@odata.deltaLink": "d1"},
+        "d1": {"value": [item("z", "f", "z.pdf"), {"id": "y", "deleted": {}}]},
+    }
+    graph.pages["d1"]["@odata.deltaLink"] = "d2"
+    storage = FakeStorage()
+
+    # the drive and its root are looked up in one batch
+    assert graph_sync.sync_drive(storage, "user", "/me/drive", {}) is None
+    assert len(graph.batches) == 1 and len(graph.batches[0]["requests"]) == 2
+    mirror = graph_sync.sync_drive(storage, "user", "/me/drive", {})
+    assert mirror.complete and mirror.link == "d1"
+    assert graph.gets == [start, "p2", "p3"]
+
+    # a recent mirror is used as it is
+    assert graph_sync.sync_drive(storage, "user", "/me/drive", {}) is mirror
+    assert len(graph.gets) == 3
+
+    # later syncs only ask for changes, also from another process
+    monkeypatch.setattr(graph_sync, "_mirrors", graph_sync.OrderedDict())
+    monkeypatch.setattr(graph_sync, "MIN_SYNC_INTERVAL_SECONDS", 0)
+    mirror = graph_sync.sync_drive(storage, "user", "/me/drive", {})
+    assert graph.gets[-1] == "d1" and mirror.link == "d2"
+    files, next_page = graph_sync.list_mirror_page(mirror, "f", 1, {}, id_prefix="site/")
+    assert [(f.id, f.name) for f in files] == [("site/x", "x.pdf")] and next_page == {"offset": 1}
+    files, next_page = graph_sync.list_mirror_page(mirror, "f", 1, next_page)
+    assert [f.name for f in files] == ["z.pdf"] and next_page == {}
+    assert [f.name for f in graph_sync.list_mirror_page(mirror, "", 10, {})[0]] == ["Folder"]
+
+
+def test_first_crawl_stops_requesting_pages_after_the_time_budget(graph, monkeypatch):
+    monkeypatch.setattr(graph_sync, "MAX_SYNC_SECONDS", 0)
+    start = (
+        f"{graph_sync.GRAPH_BASE_URL}/drives/drive-1/root/delta?$select={graph_sync.DELTA_SELECT}"
+    )
+    graph.pages = {
+        start: {"value": [item("f", "root", "Folder", folder=True)], "@odata.nextLink": "p2"},
+        "p2": {"value": [item("x", "f", "x.pdf")], "@odata.deltaLink": "d1"},
+    }
+    storage = FakeStorage()
+
+    # every call fetches one page, even with no time left
+    assert graph_sync.sync_drive(storage, "user", "/me/drive", {}) is None
+    assert graph.gets == [start]
+    mirror = graph_sync.sync_drive(storage, "user", "/me/drive", {})
+    assert mirror.complete and graph.gets == [start, "p2"]
+
+
+def test_downloads_are_fetched_in_concurrent_ranges(graph, monkeypatch):
+    monkeypatch.setattr(graph_sync, "RANGE_SIZE", 10000)
+    graph.content = os.urandom(95000)
+
+    messages = list(graph_sync.stream_download("https://download", 95000, {"file_name": "a"}))
+    chunks = [message.message for message in messages]
+    assert b"".join(chunk.blob for chunk in chunks) == graph.content
+    assert all(len(chunk.blob) <= graph_sync.BLOB_CHUNK_SIZE for chunk in chunks)
+    assert [chunk.sequence for chunk in chunks] == list(range(len(chunks)))
+    assert chunks[-1].end and chunks[-1].blob == b""
+    assert not any(chunk.end for chunk in chunks[:-1])
+    assert {chunk.total_length for chunk in chunks} == {95000}
+    assert all(message.meta == {"file_name": "a"} for message in messages)
+    assert len(graph.gets) == 10
+
+    (empty,) = graph_sync.stream_download("https://download", 0, {"file_name": "b"})
+    assert empty.message.end and empty.message.blob == b"" and empty.message.sequence == 0
+
+
+def test_incomplete_downloads_are_not_ended():
+    messages = []
+    with pytest.raises(ValueError):
+        for message in graph_sync.iter_blob_chunks(iter([b"x" * 100]), 150, {}):
+            messages.append(message)
+    assert messages and not any(message.message.end for message in messages)
+
+
+def test_plugins_share_the_module():
+    with open(SYNC_PATH, "rb") as onedrive_copy, open(
+        SHAREPOINT_SYNC_PATH, "rb"
+    ) as sharepoint_copy:
+        assert onedrive_copy.read() == sharepoint_copy.read()
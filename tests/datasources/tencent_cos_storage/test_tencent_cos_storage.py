@@ -0,0 +1,94 @@
+import hashlib
+import os
+from types import SimpleNamespace
+
+import pytest
+from dify_plugin.entities.datasource import OnlineDriveDownloadFileRequest
+
+from plugin_loader import load_plugin_modules
+
+cos, object_download = load_plugin_modules(
+    "datasources/tencent_cos_storage",
+    "datasources.tencent_cos_storage",
+    "datasources.utils.object_download",
+)
+
+
+class FakeCos:
+    """A bucket whose listings are returned in pages of two objects."""
+
+    def __init__(self, config):
+        self.objects = {}
+        self.ranges = []
+
+    def etag(self, key):
+        return f'"{hashlib.md5(self.objects[key]).hexdigest()}"'
+
+    def head_object(self, Bucket, Key):
+        return {
+            "Content-Length": str(len(self.objects[Key])),
+            "Content-Type": "application/pdf",
+            "ETag": self.etag(Key),
+        }
+
+    def get_object(self, Bucket, Key, Range):
+        self.ranges.append((Key, Range))
+        start, end = Range.removeprefix("bytes=").split("-")
+        content = self.objects[Key][int(start) : int(end) + 1 if end else None]
+        return {
+            "Body": SimpleNamespace(get_raw_stream=lambda: SimpleNamespace(read=lambda: content))
+        }
+
+    def list_objects(self, Bucket, Prefix, Marker, MaxKeys):
+        keys = [key for key in sorted(self.objects) if key.startswith(Prefix) and key > Marker]
+        page = keys[:2]
+        return {
+            "Contents": [
+                {"Key": key, "Size": str(len(self.objects[key])), "ETag": self.etag(key)}
+                for key in page
+            ],
+            "IsTruncated": "true" if len(keys) > 2 else "false",
+        }
+
+
+@pytest.fixture
+def client(monkeypatch):
+    fake = FakeCos(None)
+    monkeypatch.setattr(cos, "CosS3Client", lambda config: fake)
+    monkeypatch.setattr(object_download, "_clients", object_download.OrderedDict())
+    monkeypatch.setattr(object_download, "RANGE_SIZE", 4096)
+    return fake
+
+
+def download(key):
+    runtime = SimpleNamespace(
+        credentials={"region": "ap-guangzhou", "secret_id": "id", "secret_key": "key"}
+    )
+    datasource = cos.TencentCOSStorageDataSource(runtime=runtime, session=None)
+    request = OnlineDriveDownloadFileRequest(id=key, bucket="bucket-1250000000")
+    return datasource._download_file(request)
+
+
+def test_objects_are_streamed_and_verified_by_etag(client):
+    client.objects["report.pdf"] = os.urandom(10000)
+
+    messages = list(download("report.pdf"))
+    assert b"".join(message.message.blob for message in messages) == client.objects["report.pdf"]
+    assert messages[-1].message.end
+    assert messages[-1].meta == {"file_name": "report.pdf", "mime_type": "application/pdf"}
+    assert len(client.ranges) == 3
+
+    client.objects["report.pdf"] = b"y" * 10000
+    client.etag = lambda key: '"' + "0" * 32 + '"'
+    with pytest.raises(ValueError, match="md5"):
+        list(download("report.pdf"))
+
+
+def test_prefixes_are_listed_across_pages(client):
+    for i in range(5):
+        client.objects[f"docs/{i}.md"] = f"# {i}".encode()
+    client.objects["docs/"] = b""
+
+    messages = [message for message in download("docs/") if message.message.end]
+    assert [message.meta["file_name"] for message in messages] == [f"docs/{i}.md" for i in range(5)]
+    assert messages[0].meta["mime_type"] == "text/markdown"
@@ -0,0 +1,161 @@
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+from werkzeug import Request
+from werkzeug.test import EnvironBuilder
+
+from plugin_loader import load_plugin_modules
+
+[slack] = load_plugin_modules("extensions/slack_bot", "endpoints.slack")
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = []
+
+    def chat_postMessage(self, **kwargs):
+        self.calls.append(("post", kwargs))
+        return {"ok": True, "ts": "1.0"}
+
+    def chat_update(self, **kwargs):
+        self.calls.append(("update", kwargs))
+        return {"ok": True}
+
+
+class FakeChat:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.modes = []
+
+    def invoke(self, app_id, query, inputs, response_mode):
+        self.modes.append(response_mode)
+        if response_mode == "blocking":
+            return {"answer": "".join(c.get("answer", "") for c in self.chunks)}
+        return iter(self.chunks)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    fake = FakeClient()
+    monkeypatch.setattr(slack, "get_client", lambda token: fake)
+    monkeypatch.setattr(slack, "recent_events", slack.RecentEvents())
+    monkeypatch.setattr(slack, "UPDATE_INTERVAL_SECONDS", 0.0)
+    return fake
+
+
+@pytest.fixture
+def workers(monkeypatch):
+    """The background workers the endpoint starts."""
+    started = []
+
+    class RecordingThread(threading.Thread):
+        def start(self):
+            started.append(self)
+            super().start()
+
+    monkeypatch.setattr(slack.threading, "Thread", RecordingThread)
+    return started
+
+
+def mention(event_id: str = "Ev1", headers: dict | None = None) -> Request:
+    payload = {
+        "type": "event_callback",
+        "event_id": event_id,
+        "event": {"type": "app_mention", "text": "<@U1> hello", "channel": "C1"},
+    }
+    return Request(EnvironBuilder(method="POST", json=payload, headers=headers).get_environ())
+
+
+def build_endpoint(chunks):
+    chat = FakeChat(chunks)
+    return slack.SlackEndpoint(SimpleNamespace(app=SimpleNamespace(chat=chat))), chat
+
+
+SETTINGS = {"bot_token": "xoxb", "app": {"app_id": "app"}, "reply_mode": "streaming"}
+
+
+def test_streaming_reply_updates_the_placeholder(client, workers):
+    chunks = [
+        {"event": "message", "answer": "Hello"},
+        {"event": "message", "answer": " world"},
+        {"event": "message_end"},
+    ]
+    endpoint, chat = build_endpoint(chunks)
+    response = endpoint._invoke(mention(), {}, SETTINGS)
+
+    assert response.status_code == 200
+    assert response.get_data() == b"ok"
+    (worker,) = workers
+    worker.join(5)
+    assert chat.modes == ["streaming"]
+    assert client.calls[0] == (
+        "post",
+        {"channel": "C1", "text": slack.PLACEHOLDER_TEXT, "mrkdwn": True},
+    )
+    updates = [kwargs for kind, kwargs in client.calls if kind == "update"]
+    assert all(u["ts"] == "1.0" for u in updates)
+    assert updates[-1]["text"] == "Hello world"
+    assert updates[-1]["blocks"][0]["text"]["text"] == "Hello world"
+
+
+def test_streaming_reply_is_acknowledged_before_the_answer(client, workers):
+    answering = threading.Event()
+
+    def chunks():
+        answering.wait(5)
+        yield {"event": "message", "answer": "late"}
+
+    endpoint, _ = build_endpoint([])
+    endpoint.session.app.chat.invoke = lambda **kwargs: chunks()
+    response = endpoint._invoke(mention(), {}, SETTINGS)
+
+    # the whole response is available while the answer is still being generated
+    assert response.get_data() == b"ok"
+    assert workers[0].is_alive()
+    answering.set()
+    workers[0].join(5)
+    assert client.calls[-1][1]["text"] == "late"
+
+
+def test_streaming_error_replaces_the_placeholder(client, workers):
+    endpoint, _ = build_endpoint([{"event": "error", "message": "boom"}])
+    endpoint._invoke(mention(), {}, SETTINGS)
+    workers[0].join(5)
+
+    assert client.calls[-1] == ("update", {"channel": "C1", "ts": "1.0", "text": slack.ERROR_REPLY})
+
+
+def test_redelivered_events_are_answered_once(client):
+    endpoint, chat = build_endpoint([{"event": "message", "answer": "hi"}])
+    settings = {**SETTINGS, "reply_mode": "blocking"}
+    first = endpoint._invoke(mention("Ev2"), {}, settings)
+    second = endpoint._invoke(mention("Ev2"), {}, settings)
+
+    assert json.loads(first.get_data())["ok"] is True
+    assert second.get_data() == b"ok"
+    assert chat.modes == ["blocking"]
+    assert [kind for kind, _ in client.calls] == ["post"]
+
+
+def test_retries_are_deduplicated_when_retries_are_allowed(client):
+    endpoint, chat = build_endpoint([{"event": "message", "answer": "hi"}])
+    settings = {**SETTINGS, "reply_mode": "blocking", "allow_retry": True}
+    endpoint._invoke(mention("Ev3"), {}, settings)
+    retry = {"X-Slack-Retry-Num": "1", "X-Slack-Retry-Reason": "http_timeout"}
+    second = endpoint._invoke(mention("Ev3", headers=retry), {}, settings)
+
+    assert second.get_data() == b"ok"
+    assert chat.modes == ["blocking"]
+    assert [kind for kind, _ in client.calls] == ["post"]
+
+
+def test_recent_events_expire():
+    events = slack.RecentEvents(ttl=0.0)
+    assert events.add("a")
+    assert events.add("a")
+    bounded = slack.RecentEvents(max_size=2)
+    assert bounded.add("a") and bounded.add("b") and bounded.add("c")
+    assert bounded.add("a")
+    assert not bounded.add("c")
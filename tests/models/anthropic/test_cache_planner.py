@@ -0,0 +1,102 @@
+import importlib.util
+import os
+
+PLANNER_PATH = os.path.join("models", "anthropic", "models", "llm", "cache_planner.py")
+BEDROCK_PLANNER_PATH = os.path.join("models", "bedrock", "models", "llm", "cache_planner.py")
+
+# the plugins' "models" packages collide, so the module is loaded from its file
+spec = importlib.util.spec_from_file_location("anthropic_cache_planner", PLANNER_PATH)
+cache_planner = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(cache_planner)
+
+CacheSlot = cache_planner.CacheSlot
+TOOLS, SYSTEM, MESSAGES = cache_planner.TOOLS, cache_planner.SYSTEM, cache_planner.MESSAGES
+
+
+def conversation_slots(tool_tokens: int, system_tokens: int, turns: list[int]) -> list:
+    slots = [CacheSlot(TOOLS, tool_tokens, "tools")]
+    total = tool_tokens + system_tokens
+    slots.append(CacheSlot(SYSTEM, total, "system"))
+    for index, tokens in enumerate(turns):
+        total += tokens
+        slots.append(CacheSlot(MESSAGES, total, f"message {index}"))
+    return slots
+
+
+def targets(slots) -> list:
+    return [slot.target for slot in slots]
+
+
+def test_breakpoints_go_to_the_longest_stable_prefixes():
+    slots = conversation_slots(2000, 3000, [1500, 300, 2500, 200, 1800])
+    chosen = cache_planner.plan_breakpoints(slots, min_tokens=1024)
+    # the latest message, the system prompt, then older turns from the newest;
+    # message 2 is too close to message 3 and no breakpoint is left for the tools
+    assert targets(chosen) == ["system", "message 1", "message 3", "message 4"]
+    assert [slot.prefix_tokens for slot in chosen] == sorted(s.prefix_tokens for s in chosen)
+
+    chosen = cache_planner.plan_breakpoints(slots, min_tokens=1024, max_breakpoints=2)
+    assert targets(chosen) == ["system", "message 4"]
+
+    slots = conversation_slots(2000, 3000, [1500])
+    assert targets(cache_planner.plan_breakpoints(slots)) == ["tools", "system", "message 0"]
+
+
+def test_short_prefixes_are_not_marked():
+    slots = conversation_slots(200, 300, [100, 150])
+    assert cache_planner.plan_breakpoints(slots, min_tokens=1024) == []
+
+    # the tools are too short alone, but the system prompt takes the prefix over the minimum
+    slots = conversation_slots(500, 700, [100])
+    assert targets(cache_planner.plan_breakpoints(slots, min_tokens=1024)) == ["message 0"]
+    assert targets(cache_planner.plan_breakpoints(slots[:2], min_tokens=1024)) == ["system"]
+
+    # slots closer than the minimum to a chosen one are left out
+    slots = conversation_slots(3000, 100, [100, 100, 100])
+    assert targets(cache_planner.plan_breakpoints(slots, min_tokens=1024)) == ["message 2"]
+
+
+def test_each_turn_reads_the_prefix_the_previous_turn_wrote():
+    turns = [1200, 1300]
+    previous = None
+    for _ in range(6):
+        chosen = cache_planner.plan_breakpoints(conversation_slots(1500, 2500, turns))
+        assert chosen[-1].target == f"message {len(turns) - 1}"
+        if previous is not None:
+            assert previous in targets(chosen)
+        previous = chosen[-1].target
+        turns.append(1100 + 50 * len(turns))
+
+
+def test_min_cacheable_tokens():
+    assert cache_planner.min_cacheable_tokens("claude-sonnet-4-5-20250929") == 1024
+    assert cache_planner.min_cacheable_tokens("claude-3-5-haiku-20241022") == 2048
+    assert cache_planner.min_cacheable_tokens("claude-3-haiku-20240307") == 2048
+    assert cache_planner.min_cacheable_tokens("claude-haiku-4-5-20251001") == 4096
+
+
+def test_cache_usage_is_tracked_per_conversation():
+    tracker = cache_planner.CacheUsageTracker(maxsize=2)
+    key = cache_planner.conversation_key("claude", [{"name": "search"}], "be helpful")
+    assert key == cache_planner.conversation_key("claude", [{"name": "search"}], "be helpful")
+    assert key != cache_planner.conversation_key("claude", [], "be helpful")
+
+    tracker.record(key, 100, 0, 4000)
+    usage = tracker.record(key, 120, 4000, 900)
+    assert (usage.requests, usage.cache_read_tokens, usage.cache_write_tokens) == (2, 4000, 4900)
+    assert usage.hit_rate == 4000 / (220 + 4000 + 4900)
+    # totals are copies
+    usage.requests = 10
+    assert tracker.get(key).requests == 2
+
+    assert tracker.record(None, 50, None, None).requests == 1
+    tracker.record("other", 1, 0, 0)
+    tracker.record("third", 1, 0, 0)
+    assert tracker.get(key) is None
+
+
+def test_plugins_share_the_planner():
+    with open(PLANNER_PATH, "rb") as anthropic_copy, open(
+        BEDROCK_PLANNER_PATH, "rb"
+    ) as bedrock_copy:
+        assert anthropic_copy.read() == bedrock_copy.read()
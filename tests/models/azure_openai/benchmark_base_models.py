@@ -0,0 +1,88 @@
+"""Compare the base model registry with the former eager list and deep-copy lookups.
+
+Run from the repository root:
+
+    python tests/models/azure_openai/benchmark_base_models.py [lookups]
+"""
+
+import copy
+import importlib.util
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+CONSTANTS_PATH = os.path.join("models", "azure_openai", "models", "constants.py")
+
+_spec = importlib.util.spec_from_file_location("azure_openai_constants", CONSTANTS_PATH)
+constants = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(constants)
+
+IMPORT_SCRIPT = f"""
+import importlib.util, time
+import dify_plugin.entities.model.llm
+spec = importlib.util.spec_from_file_location("constants", {CONSTANTS_PATH!r})
+module = importlib.util.module_from_spec(spec)
+start = time.perf_counter()
+spec.loader.exec_module(module)
+print(time.perf_counter() - start)
+"""
+
+
+def import_time() -> float:
+    # a fresh interpreter per run, with the bytecode already cached by the first one
+    runs = [
+        float(
+            subprocess.run(
+                [sys.executable, "-c", IMPORT_SCRIPT], capture_output=True, text=True
+            ).stdout
+        )
+        for _ in range(6)
+    ]
+    return min(runs[1:])
+
+
+def former_lookup(base_models, base_model_name: str, model: str):
+    for ai_model_entity in base_models:
+        if ai_model_entity.base_model_name == base_model_name:
+            ai_model_entity_copy = copy.deepcopy(ai_model_entity)
+            ai_model_entity_copy.entity.model = model
+            ai_model_entity_copy.entity.label.en_US = model
+            ai_model_entity_copy.entity.label.zh_Hans = model
+            return ai_model_entity_copy
+
+
+def measure(label: str, fn, names: list[str], lookups: int):
+    tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(lookups):
+        fn(names[i % len(names)], f"deployment-{i}")
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<9} {elapsed * 1e6 / lookups:8.1f} us/lookup  peak {peak / 2**10:8.1f} KiB")
+
+
+def main():
+    lookups = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    start = time.perf_counter()
+    eager = [
+        constants.AzureBaseModel(
+            base_model_name=base_model.base_model_name, entity=base_model.entity()
+        )
+        for base_model in constants._LLM_BASE_MODELS
+    ]
+    build = time.perf_counter() - start
+    print(f"import of constants.py: {import_time() * 1000:.1f} ms")
+    print(f"building every LLM entity up front: {build * 1000:.1f} ms")
+
+    names = constants.LLM_BASE_MODELS.names()
+    for name in names:
+        constants.LLM_BASE_MODELS.get_template(name)
+    measure("former", lambda name, model: former_lookup(eager, name, model), names, lookups)
+    measure("registry", constants.LLM_BASE_MODELS.get, names, lookups)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import importlib.util
+import os
+
+import pytest
+
+# loaded from its path, as the "models" package name is shared by every model plugin
+_spec = importlib.util.spec_from_file_location(
+    "azure_openai_constants", os.path.join("models", "azure_openai", "models", "constants.py")
+)
+constants = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(constants)
+
+REGISTRIES = {
+    "llm": (constants.LLM_BASE_MODELS, constants._LLM_BASE_MODELS),
+    "embedding": (constants.EMBEDDING_BASE_MODELS, constants._EMBEDDING_BASE_MODELS),
+    "speech2text": (constants.SPEECH2TEXT_BASE_MODELS, constants._SPEECH2TEXT_BASE_MODELS),
+    "tts": (constants.TTS_BASE_MODELS, constants._TTS_BASE_MODELS),
+}
+
+
+@pytest.mark.parametrize("kind", REGISTRIES)
+def test_lookups_match_a_deep_copy_of_the_entity(kind):
+    registry, base_models = REGISTRIES[kind]
+    assert registry.names() == [base_model.base_model_name for base_model in base_models]
+    for base_model in base_models:
+        # the former lookup
+        expected = base_model.entity()
+        expected.model = "my-deployment"
+        expected.label.en_US = "my-deployment"
+        expected.label.zh_Hans = "my-deployment"
+
+        found = registry.get(base_model.base_model_name, "my-deployment")
+        assert found.base_model_name == base_model.base_model_name
+        assert found.entity.model_dump() == expected.model_dump()
+
+
+def test_entities_are_built_once_and_shared():
+    registry = constants.BaseModelRegistry(constants._LLM_BASE_MODELS)
+    assert registry._entities == {}
+    assert "gpt-4o" in registry and "gpt-unknown" not in registry
+    assert registry.get("gpt-unknown", "my-deployment") is None
+
+    first = registry.get("gpt-4o", "deployment-a")
+    second = registry.get("gpt-4o", "deployment-b")
+    assert list(registry._entities) == ["gpt-4o"]
+    assert first.entity.model == first.entity.label.en_US == "deployment-a"
+    assert second.entity.model == second.entity.label.zh_Hans == "deployment-b"
+    assert first.entity.parameter_rules is second.entity.parameter_rules
+    # the template keeps its own name
+    template = registry.get_template("gpt-4o")
+    assert template.model == "fake-deployment-name"
+    assert template.label.en_US == "fake-deployment-name-label"
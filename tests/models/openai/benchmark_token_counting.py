@@ -0,0 +1,115 @@
+"""Compare the token counting of an agent round with the former per-string counting.
+
+Run from the repository root (tiktoken downloads the gpt-4o encoding on first use):
+
+    python tests/models/openai/benchmark_token_counting.py [tools] [rounds]
+"""
+
+import importlib
+import os
+import sys
+import time
+import tracemalloc
+
+import tiktoken
+from dify_plugin.entities.model.message import (
+    AssistantPromptMessage,
+    PromptMessageTool,
+    SystemPromptMessage,
+    UserPromptMessage,
+)
+
+# the plugin imports its modules from the "models" package of its own root
+sys.path.insert(0, os.path.join("models", "openai"))
+token_counting = importlib.import_module("models.token_counting")
+llm = importlib.import_module("models.llm.llm")
+
+MODEL = "gpt-4o"
+
+
+def make_tools(count: int) -> list[PromptMessageTool]:
+    return [
+        PromptMessageTool(
+            name=f"search_{i}",
+            description=f"Search the knowledge base number {i} for documents about a topic. " * 3,
+            parameters={
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string", "description": "the search query"},
+                    "limit": {"type": "integer", "description": "how many documents to return"},
+                    "sort": {"type": "string", "enum": ["relevance", "date", "title"]},
+                },
+                "required": ["query"],
+            },
+        )
+        for i in range(count)
+    ]
+
+
+def make_messages(rounds: int) -> list:
+    messages = [SystemPromptMessage(content="You are a research assistant. " * 20)]
+    for i in range(rounds):
+        messages.append(
+            UserPromptMessage(content=f"Question {i}: what do we know about topic {i}?")
+        )
+        messages.append(
+            AssistantPromptMessage(content=f"Here is what I found about topic {i}. " * 10)
+        )
+    return messages
+
+
+def former_count(messages, tools) -> int:
+    # the per-string counting the models used before, with the encoder looked up per call
+    encoding = tiktoken.encoding_for_model(MODEL)
+    model = llm.OpenAILargeLanguageModel(model_schemas=[])
+    num_tokens = 3
+    for message in [model._convert_prompt_message_to_dict(m) for m in messages]:
+        num_tokens += 3
+        for value in message.values():
+            num_tokens += len(encoding.encode(str(value)))
+    for tool in tools:
+        for text in ["type", "function", "name", tool.name, "description", tool.description]:
+            num_tokens += len(encoding.encode(text))
+        num_tokens += len(encoding.encode("parameters"))
+        for key, value in tool.parameters["properties"].items():
+            num_tokens += len(encoding.encode(key))
+            for field_key, field_value in value.items():
+                num_tokens += len(encoding.encode(field_key))
+                if field_key == "enum":
+                    for enum_field in field_value:
+                        num_tokens += 3 + len(encoding.encode(enum_field))
+                else:
+                    num_tokens += len(encoding.encode(field_key))
+                    num_tokens += len(encoding.encode(str(field_value)))
+    return num_tokens
+
+
+def current_count(messages, tools) -> int:
+    model = llm.OpenAILargeLanguageModel(model_schemas=[])
+    return model._num_tokens_from_messages(MODEL, messages, tools)
+
+
+def measure(label: str, fn, rounds: int, tool_count: int):
+    tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(rounds):
+        # an agent rebuilds its messages and tools on every round
+        fn(make_messages(i + 1), make_tools(tool_count))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<8} {elapsed * 1000 / rounds:8.2f} ms/round  peak {peak / 2**20:6.1f} MiB")
+
+
+def main():
+    tool_count = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    # load the encoder before timing either path
+    tiktoken.encoding_for_model(MODEL)
+    print(f"{tool_count} tools, {rounds} agent rounds")
+    measure("former", former_count, rounds, tool_count)
+    measure("current", current_count, rounds, tool_count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import importlib
+import os
+import sys
+
+import pytest
+import tiktoken
+from dify_plugin.entities.model.message import (
+    AssistantPromptMessage,
+    PromptMessageTool,
+    SystemPromptMessage,
+    UserPromptMessage,
+)
+
+# the plugin imports its modules from the "models" package of its own root
+sys.path.insert(0, os.path.join("models", "openai"))
+token_counting = importlib.import_module("models.token_counting")
+llm = importlib.import_module("models.llm.llm")
+
+# a byte-level encoding with a few merges, so that the tests need no downloaded BPE files
+_merges = [b"th", b"the", b"in", b"er", b"an", b"on", b"at", b"re", b" t", b" the"]
+ENCODING = tiktoken.Encoding(
+    name="test_bytes",
+    pat_str=r"""'s|'t|'re|'ve|'m|'ll|'d| ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+""",
+    mergeable_ranks={
+        **{bytes([i]): i for i in range(256)},
+        **{merge: 256 + i for i, merge in enumerate(_merges)},
+    },
+    special_tokens={"<|endoftext|>": 300},
+)
+
+
+@pytest.fixture(autouse=True)
+def offline_encoding(monkeypatch):
+    calls = []
+
+    def encoding_for_model(model):
+        calls.append(model)
+        if model.startswith("unknown"):
+            raise KeyError(model)
+        return ENCODING
+
+    monkeypatch.setattr(tiktoken, "encoding_for_model", encoding_for_model)
+    monkeypatch.setattr(tiktoken, "get_encoding", lambda name: ENCODING)
+    token_counting.get_encoding.cache_clear()
+    token_counting._tool_token_cache.clear()
+    yield calls
+    token_counting.get_encoding.cache_clear()
+
+
+def make_tool(i: int) -> PromptMessageTool:
+    return PromptMessageTool(
+        name=f"tool_{i}",
+        description=f"Look up the weather of a city, variant {i}",
+        parameters={
+            "type": "object",
+            "properties": {
+                "city": {"type": "string", "description": "the city to look up"},
+                "unit": {"type": "string", "enum": ["celsius", "fahrenheit"]},
+            },
+            "required": ["city"],
+        },
+    )
+
+
+def reference_tool_tokens(encoding, tools) -> int:
+    # the former per-string count
+    num_tokens = 0
+    for tool in tools:
+        num_tokens += len(encoding.encode("type"))
+        num_tokens += len(encoding.encode("function"))
+        num_tokens += len(encoding.encode("name"))
+        num_tokens += len(encoding.encode(tool.name))
+        num_tokens += len(encoding.encode("description"))
+        num_tokens += len(encoding.encode(tool.description))
+        parameters = tool.parameters
+        num_tokens += len(encoding.encode("parameters"))
+        num_tokens += len(encoding.encode("type"))
+        num_tokens += len(encoding.encode(parameters.get("type")))
+        num_tokens += len(encoding.encode("properties"))
+        for key, value in parameters.get("properties").items():
+            num_tokens += len(encoding.encode(key))
+            for field_key, field_value in value.items():
+                num_tokens += len(encoding.encode(field_key))
+                if field_key == "enum":
+                    for enum_field in field_value:
+                        num_tokens += 3
+                        num_tokens += len(encoding.encode(enum_field))
+                else:
+                    num_tokens += len(encoding.encode(field_key))
+                    num_tokens += len(encoding.encode(str(field_value)))
+        num_tokens += len(encoding.encode("required"))
+        for required_field in parameters["required"]:
+            num_tokens += 3
+            num_tokens += len(encoding.encode(required_field))
+    return num_tokens
+
+
+def test_encoders_are_resolved_once_per_model(offline_encoding):
+    assert token_counting.get_encoding("gpt-4o") is ENCODING
+    assert token_counting.get_encoding("gpt-4o") is ENCODING
+    assert token_counting.get_encoding("unknown-model") is ENCODING
+    token_counting.get_encoding("unknown-model")
+    assert offline_encoding == ["gpt-4o", "unknown-model"]
+
+
+def test_tool_counts_match_and_are_cached(monkeypatch):
+    tools = [make_tool(i) for i in range(30)]
+    expected = reference_tool_tokens(ENCODING, tools)
+    assert token_counting.count_tool_tokens(ENCODING, tools) == expected
+
+    encoded = []
+    token_lengths = token_counting.token_lengths
+    monkeypatch.setattr(
+        token_counting,
+        "token_lengths",
+        lambda encoding, texts: encoded.extend(texts) or token_lengths(encoding, texts),
+    )
+    # tools are rebuilt on every agent round, so the cache must not depend on their identity
+    assert token_counting.count_tool_tokens(ENCODING, [make_tool(i) for i in range(30)]) == expected
+    assert encoded == []
+
+    changed = make_tool(3)
+    changed.description += " and its forecast"
+    assert token_counting.count_tool_tokens(ENCODING, [changed]) == reference_tool_tokens(
+        ENCODING, [changed]
+    )
+    assert changed.description in encoded
+
+
+def test_tool_cache_evicts_the_least_recently_used():
+    cache = token_counting.ToolTokenCache(maxsize=2)
+    first, second, third = make_tool(1), make_tool(2), make_tool(3)
+    cache.count(ENCODING, [first, second])
+    cache.count(ENCODING, [first])
+    cache.count(ENCODING, [third])
+    assert list(cache._counts) == [
+        (ENCODING.name, token_counting._schema_hash(first)),
+        (ENCODING.name, token_counting._schema_hash(third)),
+    ]
+
+
+def test_message_counts():
+    model = llm.OpenAILargeLanguageModel(model_schemas=[])
+    messages = [
+        SystemPromptMessage(content="You are the weather assistant."),
+        UserPromptMessage(content="What is the weather in Berlin? <|endoftext|>", name="alice"),
+    ]
+    # special tokens in user text are counted as text instead of raising
+    text_tokens = sum(
+        len(ENCODING.encode_ordinary(text))
+        for text in [
+            "system",
+            "You are the weather assistant.",
+            "user",
+            "What is the weather in Berlin? <|endoftext|>",
+            "alice",
+        ]
+    )
+    assert model._num_tokens_from_messages("gpt-4o", messages) == 3 * 2 + 1 + text_tokens + 3
+
+    tools = [make_tool(i) for i in range(3)]
+    with_tools = model._num_tokens_from_messages("gpt-4o", messages, tools)
+    assert with_tools == 3 * 2 + 1 + text_tokens + 3 + reference_tool_tokens(ENCODING, tools)
+
+    call = AssistantPromptMessage.ToolCall(
+        id="call_1",
+        type="function",
+        function=AssistantPromptMessage.ToolCall.ToolCallFunction(
+            name="tool_0", arguments='{"city": "Berlin"}'
+        ),
+    )
+    with_call = messages + [AssistantPromptMessage(content="", tool_calls=[call])]
+    assert model._num_tokens_from_messages("gpt-4o", with_call) > model._num_tokens_from_messages(
+        "gpt-4o", messages + [AssistantPromptMessage(content="")]
+    )
+
+
+def test_string_counts():
+    model = llm.OpenAILargeLanguageModel(model_schemas=[])
+    text = "the weather in Berlin " * 100
+    assert model._num_tokens_from_string("gpt-3.5-turbo-instruct", text) == len(
+        ENCODING.encode(text)
+    )
+    # long prompts take the batched path
+    texts = [text] * 200
+    assert sum(len(t) for t in texts) >= token_counting.BATCH_ENCODE_THRESHOLD
+    assert token_counting.count_tokens(ENCODING, texts) == 200 * len(ENCODING.encode(text))
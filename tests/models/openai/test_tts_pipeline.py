@@ -0,0 +1,86 @@
+import importlib
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+
+# the plugin imports its modules from the "models" package of its own root
+sys.path.insert(0, os.path.join("models", "openai"))
+pipeline = importlib.import_module("models.tts.pipeline")
+
+
+class FakeSpeech:
+    """Streams ``sentence-i`` chunks, slower for earlier sentences."""
+
+    def __init__(self, count: int, fail_at: int | None = None):
+        self.count = count
+        self.fail_at = fail_at
+        self.lock = threading.Lock()
+        self.open_streams = 0
+        self.max_open_streams = 0
+        self.started: list[int] = []
+        self.closed: list[int] = []
+
+    @contextmanager
+    def open_stream(self, index: int):
+        with self.lock:
+            self.started.append(index)
+            self.open_streams += 1
+            self.max_open_streams = max(self.max_open_streams, self.open_streams)
+        try:
+            yield self.chunks(index)
+        finally:
+            with self.lock:
+                self.open_streams -= 1
+                self.closed.append(index)
+
+    def chunks(self, index: int):
+        for part in range(3):
+            time.sleep(0.01 * (self.count - index))
+            if index == self.fail_at:
+                raise RuntimeError(f"sentence {index} failed")
+            yield f"{index}.{part};".encode()
+
+
+def test_segments_stream_in_order_within_the_lookahead():
+    speech = FakeSpeech(6)
+    chunks = list(pipeline.stream_pipelined(range(6), speech.open_stream, lookahead=3))
+
+    assert b"".join(chunks) == b"".join(f"{i}.{p};".encode() for i in range(6) for p in range(3))
+    assert speech.max_open_streams <= 3
+    assert sorted(speech.closed) == list(range(6))
+
+
+def test_first_chunk_does_not_wait_for_later_segments():
+    speech = FakeSpeech(4)
+    stream = pipeline.stream_pipelined(range(4), speech.open_stream, lookahead=4)
+    assert next(stream) == b"0.0;"
+    # the first sentence is still being synthesized when its audio starts playing
+    assert 0 not in speech.closed
+    stream.close()
+
+
+def test_closing_the_stream_stops_pending_requests():
+    speech = FakeSpeech(8)
+    stream = pipeline.stream_pipelined(range(8), speech.open_stream, lookahead=2)
+    next(stream)
+    stream.close()
+    time.sleep(0.3)
+
+    assert speech.open_streams == 0
+    assert len(speech.started) == 2
+
+
+def test_errors_reach_the_caller():
+    speech = FakeSpeech(4, fail_at=2)
+    with pytest.raises(RuntimeError, match="sentence 2 failed"):
+        list(pipeline.stream_pipelined(range(4), speech.open_stream))
+
+
+def test_concatenable_formats():
+    assert pipeline.is_concatenable("mp3")
+    assert pipeline.is_concatenable("PCM")
+    assert not pipeline.is_concatenable("wav")
@@ -0,0 +1,24 @@
+import importlib
+import os
+import sys
+from types import ModuleType
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def load_plugin_modules(plugin: str, *names: str) -> list[ModuleType]:
+    """Import ``names`` from the plugin at ``plugin``, relative to the repository root.
+
+    Every plugin ships the same top level packages ("tools", "provider", "datasources",
+    ...), so any cached copy of the packages being imported is dropped first, together
+    with the roots of other plugins on sys.path, as a regular package there would win
+    over a namespace package of this plugin.
+    """
+    packages = {name.split(".")[0] for name in names}
+    for module_name in [name for name in sys.modules if name.split(".")[0] in packages]:
+        del sys.modules[module_name]
+    sys.path[:] = [
+        path for path in sys.path if not os.path.isfile(os.path.join(path, "manifest.yaml"))
+    ]
+    sys.path.insert(0, os.path.join(REPO_ROOT, plugin))
+    return [importlib.import_module(name) for name in names]
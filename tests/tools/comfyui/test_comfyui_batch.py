@@ -0,0 +1,155 @@
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from plugin_loader import load_plugin_modules
+
+comfyui_client, comfyui_workflow = load_plugin_modules(
+    "tools/comfyui", "tools.comfyui_client", "tools.comfyui_workflow"
+)
+
+FILES_PER_PROMPT = 3
+DOWNLOAD_SECONDS = 0.1
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    prompts: list[dict] = []
+    active_downloads = 0
+    max_active_downloads = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.lock:
+            prompt_id = f"p{len(self.prompts)}"
+            self.prompts.append(body["prompt"])
+        self.reply({"prompt_id": prompt_id})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if url.path == "/history":
+            prompt_id = query["prompt_id"]
+            images = [
+                {"filename": f"{prompt_id}_{i}.png", "subfolder": "", "type": "output"}
+                for i in range(FILES_PER_PROMPT)
+            ]
+            self.reply({prompt_id: {"outputs": {"9": {"images": images}}}})
+        elif url.path == "/view":
+            with self.lock:
+                StubHandler.active_downloads += 1
+                StubHandler.max_active_downloads = max(
+                    StubHandler.max_active_downloads, StubHandler.active_downloads
+                )
+            time.sleep(DOWNLOAD_SECONDS)
+            with self.lock:
+                StubHandler.active_downloads -= 1
+            payload = query["filename"].encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    def reply(self, data: dict):
+        payload = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.messages: queue.Queue = queue.Queue()
+        self.opened = 0
+
+    def send_event(self, type_: str, data: dict):
+        self.messages.put(json.dumps({"type": type_, "data": data}))
+
+    def finish(self, prompt_id: str):
+        self.send_event("executing", {"node": "9", "prompt_id": prompt_id})
+        self.send_event("executing", {"node": None, "prompt_id": prompt_id})
+
+    def recv(self):
+        message = self.messages.get(timeout=5)
+        if message is None:
+            raise ConnectionError("closed")
+        return message
+
+    def close(self):
+        self.messages.put(None)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    StubHandler.prompts = []
+    StubHandler.max_active_downloads = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    cli = comfyui_client.ComfyUiClient(f"http://127.0.0.1:{server.server_address[1]}/")
+    ws = FakeWebSocket()
+
+    def open_websocket_connection():
+        ws.opened += 1
+        return ws, "client"
+
+    monkeypatch.setattr(cli, "open_websocket_connection", open_websocket_connection)
+    yield cli, ws
+    server.shutdown()
+
+
+def build_workflows(count: int) -> list:
+    return [
+        comfyui_workflow.ComfyUiWorkflow(
+            {"3": {"class_type": "KSampler", "inputs": {"seed": seed}}}
+        )
+        for seed in range(count)
+    ]
+
+
+def test_prompts_share_one_websocket_and_yield_in_finish_order(client):
+    cli, ws = client
+    results = cli.generate_batch(build_workflows(3))
+    # the server finishes the prompts out of queue order
+    ws.send_event("progress", {"value": 1, "max": 2})
+    ws.finish("p2")
+
+    index, files = next(results)
+    assert index == 2
+    assert [f.filename for f in files] == [f"p2_{i}.png" for i in range(FILES_PER_PROMPT)]
+    assert files[0].blob == b"p2_0.png"
+    assert files[0].mime_type == "image/png"
+
+    ws.finish("p0")
+    ws.finish("p1")
+    assert [index for index, _ in results] == [0, 1]
+    assert ws.opened == 1
+    assert [p["3"]["inputs"]["seed"] for p in StubHandler.prompts] == [0, 1, 2]
+    assert StubHandler.max_active_downloads > 1
+
+
+def test_execution_error_fails_the_batch(client):
+    cli, ws = client
+    ws.send_event(
+        "execution_error",
+        {"prompt_id": "p0", "node_id": "3", "node_type": "KSampler", "exception_message": "OOM"},
+    )
+    with pytest.raises(Exception, match="OOM"):
+        list(cli.generate_batch(build_workflows(2)))
+
+
+def test_generate_returns_the_files_of_one_prompt(client):
+    cli, ws = client
+    ws.finish("p0")
+    files = cli.generate(build_workflows(1)[0])
+    assert [f.filename for f in files] == [f"p0_{i}.png" for i in range(FILES_PER_PROMPT)]
@@ -0,0 +1,148 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from plugin_loader import load_plugin_modules
+
+comfyui_client, comfyui_workflow = load_plugin_modules(
+    "tools/comfyui", "tools.comfyui_client", "tools.comfyui_workflow"
+)
+
+OBJECT_INFO = {
+    "KSampler": {
+        "input": {
+            "required": {
+                "model": ["MODEL"],
+                "seed": ["INT", {"default": 0}],
+                "steps": ["INT", {"default": 20}],
+                "sampler_name": [["euler", "dpmpp_2m"]],
+                "scheduler": [["normal", "karras"]],
+            }
+        },
+        "input_order": {"required": ["model", "seed", "steps", "sampler_name", "scheduler"]},
+    },
+    "CheckpointLoaderSimple": {
+        "input": {"required": {"ckpt_name": [["a.safetensors"]]}},
+        "input_order": {"required": ["ckpt_name"]},
+    },
+    "BrokenNode": {"input": {}},
+}
+
+UI_WORKFLOW = {
+    "nodes": [
+        {
+            "id": 4,
+            "type": "CheckpointLoaderSimple",
+            "mode": 0,
+            "inputs": [],
+            "widgets_values": ["a.safetensors"],
+        },
+        {
+            "id": 3,
+            "type": "KSampler",
+            "mode": 0,
+            "inputs": [{"name": "model", "link": 1}],
+            "widgets_values": [7, "randomize", 20, "euler", "normal"],
+        },
+    ],
+    "links": [[1, 4, 0, 3, 0, "MODEL"]],
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    paths: list[str] = []
+    checkpoints: list[str] = []
+
+    def do_GET(self):
+        self.paths.append(self.path)
+        if self.path == "/object_info":
+            data = OBJECT_INFO
+        elif self.path == "/object_info/KSampler":
+            data = {"KSampler": OBJECT_INFO["KSampler"]}
+        elif self.path == "/models/checkpoints":
+            data = self.checkpoints
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        payload = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def base_url():
+    StubHandler.paths = []
+    StubHandler.checkpoints = ["a.safetensors"]
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+
+
+def test_warm_calls_do_not_hit_the_server(base_url):
+    comfyui_client.ComfyUiClient(base_url).get_samplers()
+    # a new client per tool invocation still shares the cache of its server
+    cli = comfyui_client.ComfyUiClient(base_url)
+    assert cli.get_samplers() == ["euler", "dpmpp_2m"]
+    assert cli.get_schedulers() == ["normal", "karras"]
+    assert cli.get_checkpoints() == cli.get_checkpoints() == ["a.safetensors"]
+    assert cli.get_object_info() is cli.get_object_info()
+    assert StubHandler.paths == ["/object_info/KSampler", "/models/checkpoints", "/object_info"]
+
+    uncached = comfyui_client.ComfyUiClient(base_url, cache_ttl=0)
+    uncached.get_checkpoints()
+    uncached.get_checkpoints()
+    assert StubHandler.paths.count("/models/checkpoints") == 3
+
+
+def test_failed_requests_are_not_cached(base_url):
+    StubHandler.checkpoints = []
+    cli = comfyui_client.ComfyUiClient(base_url)
+    assert cli.get_checkpoints() == []
+    StubHandler.checkpoints = ["a.safetensors"]
+    assert cli.get_checkpoints() == ["a.safetensors"]
+
+
+def test_new_models_are_seen_after_a_miss_or_invalidation(base_url):
+    cli = comfyui_client.ComfyUiClient(base_url)
+    assert cli.has_model("checkpoints", "a.safetensors")
+    StubHandler.checkpoints = ["a.safetensors", "b.safetensors"]
+    assert cli.get_checkpoints() == ["a.safetensors"]
+    assert cli.has_model("checkpoints", "b.safetensors")
+    assert cli.get_checkpoints() == ["a.safetensors", "b.safetensors"]
+
+    StubHandler.checkpoints = ["c.safetensors"]
+    cli.invalidate_cache()
+    assert cli.get_checkpoints() == ["c.safetensors"]
+
+
+def test_node_input_index_matches_object_info():
+    index = comfyui_workflow.build_node_input_index(OBJECT_INFO)
+    assert index == {
+        "KSampler": ["seed", "steps", "sampler_name", "scheduler"],
+        "CheckpointLoaderSimple": ["ckpt_name"],
+    }
+    from_index = comfyui_workflow.ComfyUiWorkflow(
+        json.loads(json.dumps(UI_WORKFLOW)), node_input_index=index
+    )
+    from_object_info = comfyui_workflow.ComfyUiWorkflow(
+        json.loads(json.dumps(UI_WORKFLOW)), object_info=OBJECT_INFO
+    )
+    assert from_index.json() == from_object_info.json()
+    assert from_index.json()["3"]["inputs"] == {
+        "seed": 7,
+        "steps": 20,
+        "sampler_name": "euler",
+        "scheduler": "normal",
+        "model": ["4", 0],
+    }
@@ -0,0 +1,124 @@
+"""Compare the volume engine with the per-slice path on a synthetic CT series.
+
+Run:
+
+    python tests/tools/dicom_reader/benchmark_volume.py [slices] [rows] [kernel_size]
+"""
+
+import importlib
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian
+
+# the plugin imports its modules from the "tools" package of its own root
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), "..", "..", "..", "tools", "dicom_reader")
+)
+dataset_cache = importlib.import_module("tools._dataset_cache")
+volume = importlib.import_module("tools._volume")
+
+
+def build_series(slices: int, rows: int) -> list:
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 2000, size=(rows, rows), dtype=np.int16)
+    series = []
+    for z in range(slices):
+        ds = Dataset()
+        ds.file_meta = FileMetaDataset()
+        ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+        ds.is_little_endian = True
+        ds.is_implicit_VR = False
+        ds.Rows = ds.Columns = rows
+        ds.SamplesPerPixel = 1
+        ds.PhotometricInterpretation = "MONOCHROME2"
+        ds.BitsAllocated = 16
+        ds.BitsStored = 16
+        ds.HighBit = 15
+        ds.PixelRepresentation = 1
+        ds.PixelSpacing = [0.7, 0.7]
+        ds.SliceThickness = 1.25
+        ds.ImageOrientationPatient = [1, 0, 0, 0, 1, 0]
+        ds.ImagePositionPatient = [0.0, 0.0, z * 1.25]
+        ds.InstanceNumber = z + 1
+        ds.RescaleSlope = 1.5
+        ds.RescaleIntercept = -1024
+        ds.PixelData = np.roll(base, z, axis=0).tobytes()
+        series.append(dataset_cache.CachedDicom(ds, len(ds.PixelData)))
+    # uploads rarely arrive in slice order
+    random.Random(0).shuffle(series)
+    return series
+
+
+def box_blur_2d(x2d: np.ndarray, k: int) -> np.ndarray:
+    # the former per-slice blur of dicom_pixel_ops
+    c = np.cumsum(np.pad(x2d, ((0, 0), (1, 0)), mode="edge"), axis=1)
+    h = (c[:, k:] - c[:, :-k]) / k
+    c2 = np.cumsum(np.pad(h, ((1, 0), (0, 0)), mode="edge"), axis=0)
+    return (c2[k:, :] - c2[:-k, :]) / k
+
+
+def per_slice_path(series: list, k: int) -> np.ndarray:
+    ordered = sorted(series, key=lambda d: float(d.dataset.ImagePositionPatient[2]))
+    slices = []
+    for dicom in ordered:
+        ds = dicom.dataset
+        arr = np.asarray(dicom.pixel_array()).astype(np.float32)
+        arr = arr * float(ds.RescaleSlope) + float(ds.RescaleIntercept)
+        slices.append(box_blur_2d(arr, k))
+    stacked = np.stack(slices)
+    lo, hi = -160.0, 240.0
+    return np.clip((stacked - lo) / (hi - lo), 0, 1)
+
+
+def engine_path(series: list, k: int) -> np.ndarray:
+    voxels = volume.build_volume(series).voxels
+    voxels = volume.box_blur_valid(voxels, k, axes=(2, 1))
+    return volume.apply_window(voxels, -160.0, 240.0)
+
+
+def engine_3d_path(series: list, k: int) -> np.ndarray:
+    voxels = volume.build_volume(series).voxels
+    voxels = volume.box_filter(voxels, k)
+    return volume.apply_window(voxels, -160.0, 240.0)
+
+
+def measure(func, *args) -> tuple[np.ndarray, float, int]:
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main() -> None:
+    slices = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 512
+    kernel = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    series = build_series(slices, rows)
+    print(f"volume {rows}x{rows}x{slices}, kernel {kernel}")
+
+    baseline, baseline_time, baseline_peak = measure(per_slice_path, series, kernel)
+    print(f"  per-slice 2D:  {baseline_time:7.2f}s  peak {baseline_peak / 2**20:8.1f} MiB")
+    del baseline
+
+    _, engine_time, engine_peak = measure(engine_path, series, kernel)
+    print(f"  engine 2D:     {engine_time:7.2f}s  peak {engine_peak / 2**20:8.1f} MiB")
+
+    _, engine_3d_time, engine_3d_peak = measure(engine_3d_path, series, kernel)
+    print(f"  engine 3D:     {engine_3d_time:7.2f}s  peak {engine_3d_peak / 2**20:8.1f} MiB")
+
+    small = build_series(8, 32)
+    expected = per_slice_path(small, kernel)
+    assert np.allclose(engine_path(small, kernel), expected, atol=1e-4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import io
+
+import numpy as np
+import pydicom
+import pytest
+from pydicom.data import get_testdata_file
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.pixel_data_handlers.numpy_handler import pack_bits
+from pydicom.uid import ExplicitVRBigEndian, ExplicitVRLittleEndian, RLELossless, generate_uid
+
+from plugin_loader import load_plugin_modules
+
+[dataset_cache] = load_plugin_modules("tools/dicom_reader", "tools._dataset_cache")
+
+
+def build_dicom(
+    frames: int,
+    rows: int = 16,
+    columns: int = 12,
+    samples: int = 1,
+    planar: int = 0,
+    bits: int = 16,
+    signed: int = 0,
+    compressed: bool = False,
+    big_endian: bool = False,
+) -> bytes:
+    ds = Dataset()
+    ds.file_meta = FileMetaDataset()
+    ds.file_meta.TransferSyntaxUID = ExplicitVRBigEndian if big_endian else ExplicitVRLittleEndian
+    ds.file_meta.MediaStorageSOPClassUID = "1.2.840.10008.5.1.4.1.1.7"
+    ds.file_meta.MediaStorageSOPInstanceUID = generate_uid()
+    ds.SOPClassUID = ds.file_meta.MediaStorageSOPClassUID
+    ds.SOPInstanceUID = ds.file_meta.MediaStorageSOPInstanceUID
+    ds.is_little_endian = not big_endian
+    ds.is_implicit_VR = False
+    ds.Rows = rows
+    ds.Columns = columns
+    ds.SamplesPerPixel = samples
+    ds.PhotometricInterpretation = "MONOCHROME2" if samples == 1 else "RGB"
+    if samples > 1:
+        ds.PlanarConfiguration = planar
+    ds.BitsAllocated = bits
+    ds.BitsStored = bits
+    ds.HighBit = bits - 1
+    ds.PixelRepresentation = signed
+    if frames > 1:
+        ds.NumberOfFrames = frames
+
+    dtype = np.dtype(f"{'i' if signed else 'u'}{max(bits // 8, 1)}")
+    shape = (
+        ((frames,) if frames > 1 else ()) + (rows, columns) + ((samples,) if samples > 1 else ())
+    )
+    low = -100 if signed else 0
+    high = 2 if bits == 1 else 200
+    array = np.random.default_rng(frames).integers(low, high, size=shape).astype(dtype)
+    stored = array.astype(dtype.newbyteorder(">" if big_endian else "<"))
+    if bits == 1:
+        ds.PixelData = pack_bits(array)
+    elif samples > 1 and planar == 1:
+        ds.PixelData = np.moveaxis(stored, -1, -3).tobytes()
+    else:
+        ds.PixelData = stored.tobytes()
+    if compressed:
+        ds.compress(RLELossless, array)
+
+    buffer = io.BytesIO()
+    ds.save_as(buffer, write_like_original=False)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"frames": 1},
+        {"frames": 5},
+        {"frames": 5, "signed": 1},
+        {"frames": 1, "samples": 3, "bits": 8},
+        {"frames": 4, "samples": 3, "bits": 8},
+        {"frames": 4, "samples": 3, "bits": 8, "planar": 1},
+        {"frames": 6, "compressed": True},
+        {"frames": 1, "compressed": True},
+        {"frames": 3, "samples": 3, "bits": 8, "compressed": True},
+        {"frames": 5, "big_endian": True},
+        {"frames": 3, "samples": 3, "bits": 8, "big_endian": True},
+        {"frames": 4, "bits": 1},
+    ],
+)
+def test_frames_match_pydicom(options):
+    blob = build_dicom(**options)
+    expected = pydicom.dcmread(io.BytesIO(blob), force=True).pixel_array
+    cache = dataset_cache.DicomDatasetCache()
+    dicom = cache.get(blob)
+
+    frames = options["frames"]
+    for desired in (0, 2, 99, -3):
+        frame, index = dicom.frame(desired)
+        expected_index = max(0, min(desired, frames - 1))
+        expected_frame = expected[expected_index] if frames > 1 else expected
+        assert index == expected_index
+        assert frame.dtype == expected_frame.dtype
+        assert np.array_equal(frame, expected_frame)
+        assert not frame.flags.writeable
+
+    full = dicom.pixel_array()
+    assert full.shape == expected.shape
+    assert np.array_equal(full, expected)
+    assert cache.get(blob) is dicom
+
+
+@pytest.mark.parametrize("name", ["SC_rgb_small_odd_big_endian.dcm", "MR_small_bigendian.dcm"])
+def test_big_endian_pixels_match_pydicom(name):
+    with open(get_testdata_file(name), "rb") as file:
+        blob = file.read()
+    expected = pydicom.dcmread(io.BytesIO(blob), force=True).pixel_array
+    dicom = dataset_cache.DicomDatasetCache().get(blob)
+
+    frame, _ = dicom.frame(0)
+    assert np.array_equal(frame, expected)
+    assert np.array_equal(dicom.pixel_array(), expected)
+
+
+def test_uncompressed_frames_are_views():
+    blob = build_dicom(frames=4)
+    dicom = dataset_cache.DicomDatasetCache().get(blob)
+    frame, _ = dicom.frame(2)
+    assert frame.base is not None
+    assert dicom.nbytes == len(blob)
+
+
+def test_cache_evicts_least_recent_entries():
+    blobs = [build_dicom(frames=2 + i) for i in range(3)]
+    cache = dataset_cache.DicomDatasetCache(max_bytes=len(blobs[1]) + len(blobs[2]))
+    first = cache.get(blobs[0])
+    cache.get(blobs[1])
+    cache.get(blobs[2])
+    assert cache.nbytes <= cache.max_bytes
+    assert cache.get(blobs[0]) is not first
+
+
+def test_newest_entry_is_kept_over_budget():
+    blob = build_dicom(frames=3)
+    cache = dataset_cache.DicomDatasetCache(max_bytes=1)
+    dicom = cache.get(blob)
+    assert cache.get(blob) is dicom
@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian
+
+from plugin_loader import load_plugin_modules
+
+dataset_cache, volume = load_plugin_modules(
+    "tools/dicom_reader", "tools._dataset_cache", "tools._volume"
+)
+
+
+def build_slice(pixels: np.ndarray, z: float, slope: float = 1.0, intercept: float = 0.0):
+    ds = Dataset()
+    ds.file_meta = FileMetaDataset()
+    ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds.is_little_endian = True
+    ds.is_implicit_VR = False
+    ds.Rows, ds.Columns = pixels.shape[:2]
+    ds.SamplesPerPixel = pixels.shape[2] if pixels.ndim == 3 else 1
+    ds.PhotometricInterpretation = "MONOCHROME2" if ds.SamplesPerPixel == 1 else "RGB"
+    if ds.SamplesPerPixel > 1:
+        ds.PlanarConfiguration = 0
+    ds.BitsAllocated = 16
+    ds.BitsStored = 16
+    ds.HighBit = 15
+    ds.PixelRepresentation = 1
+    ds.PixelSpacing = [0.5, 0.75]
+    ds.SliceThickness = 5.0
+    ds.ImageOrientationPatient = [1, 0, 0, 0, 1, 0]
+    ds.ImagePositionPatient = [0.0, 0.0, z]
+    ds.RescaleSlope = slope
+    ds.RescaleIntercept = intercept
+    ds.PixelData = pixels.astype(np.int16).tobytes()
+    return dataset_cache.CachedDicom(ds, len(ds.PixelData))
+
+
+def test_build_volume_sorts_and_rescales():
+    rng = np.random.default_rng(0)
+    slices = [rng.integers(-50, 50, size=(6, 5)) for _ in range(4)]
+    positions = [7.5, -2.5, 5.0, 0.0]
+    dicoms = [
+        build_slice(pixels, z, slope=2.0, intercept=-1024.0) for pixels, z in zip(slices, positions)
+    ]
+
+    result = volume.build_volume(dicoms)
+
+    order = np.argsort(positions)
+    expected = np.stack([slices[i] * 2.0 - 1024.0 for i in order]).astype(np.float32)
+    assert result.voxels.dtype == np.float32
+    assert np.array_equal(result.voxels, expected)
+    assert result.positions == sorted(positions)
+    assert result.spacing == (0.5, 0.75, 2.5)
+
+
+def test_build_volume_rejects_mismatched_slices():
+    with pytest.raises(ValueError):
+        volume.build_volume(
+            [build_slice(np.zeros((4, 4)), 0.0), build_slice(np.zeros((4, 5)), 1.0)]
+        )
+
+
+def test_build_volume_keeps_channels_of_multi_channel_slices():
+    rng = np.random.default_rng(1)
+    slices = [rng.integers(0, 255, size=(6, 5, 3)) for _ in range(2)]
+    dicoms = [build_slice(pixels, z) for pixels, z in zip(slices, [5.0, 0.0])]
+
+    result = volume.build_volume(dicoms)
+
+    assert np.array_equal(result.voxels, np.stack([slices[1], slices[0]]).astype(np.float32))
+    with pytest.raises(ValueError):
+        volume.build_volume([dicoms[0], build_slice(np.zeros((6, 5)), 10.0)])
+
+    # smoothing leaves the channel axis alone
+    smoothed = volume.box_filter(result.voxels, 3, axes=(0, 1, 2))
+    for channel in range(3):
+        assert np.allclose(
+            smoothed[..., channel], volume.box_filter(result.voxels[..., channel], 3), atol=1e-4
+        )
+
+
+def reference_box_filter(x: np.ndarray, size: int) -> np.ndarray:
+    out = x.astype(np.float64)
+    for axis in range(x.ndim):
+        n = x.shape[axis]
+        filtered = np.empty_like(out)
+        for i in range(n):
+            lo, hi = max(0, i - size // 2), min(n, i - size // 2 + size)
+            window = np.take(out, np.arange(lo, hi), axis=axis).mean(axis=axis)
+            index = [slice(None)] * x.ndim
+            index[axis] = i
+            filtered[tuple(index)] = window
+        out = filtered
+    return out
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 4, 7, 12])
+@pytest.mark.parametrize("shape", [(5, 7, 9), (1, 4, 3), (6, 2, 8)])
+def test_box_filter_matches_reference(shape, size):
+    x = np.random.default_rng(size).normal(size=shape).astype(np.float32)
+    result = volume.box_filter(x, size)
+    assert result.shape == x.shape
+    assert np.allclose(result, reference_box_filter(x, size), atol=1e-4)
+
+
+@pytest.mark.parametrize("size", [2, 3, 5])
+def test_box_blur_valid_filters_channels_together(size):
+    x = np.random.default_rng(size).normal(size=(12, 10, 3)).astype(np.float32)
+    result = volume.box_blur_valid(x, size)
+    windows = np.lib.stride_tricks.sliding_window_view(x, (size, size), axis=(0, 1))
+    assert result.shape == (13 - size, 11 - size, 3)
+    assert np.allclose(result, windows.mean(axis=(-2, -1)), atol=1e-5)
+
+
+def test_apply_window_in_place():
+    x = np.array([-10.0, 0.0, 5.0, 10.0, 20.0], dtype=np.float32)
+    result = volume.apply_window(x, 0.0, 10.0)
+    assert result is x
+    assert np.allclose(x, [0.0, 0.0, 0.5, 1.0, 1.0])
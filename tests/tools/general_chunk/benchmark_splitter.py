@@ -0,0 +1,90 @@
+"""Compare the range engine with the string based splitter on large corpora.
+
+Both chunking plugins ship the same range engine, so this also covers parent_child_chunk.
+
+    python tests/tools/general_chunk/benchmark_splitter.py [size_in_mb]
+"""
+
+import importlib
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+# the plugin imports its modules from the "tools" package of its own root
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), "..", "..", "..", "tools", "general_chunk")
+)
+fixed_text_splitter = importlib.import_module("tools.splitter.fixed_text_splitter")
+FixedRecursiveCharacterTextSplitter = fixed_text_splitter.FixedRecursiveCharacterTextSplitter
+
+SEPARATORS = ["\n\n", "。", ". ", " ", ""]
+ENGLISH_WORDS = "the of and to in is that for it as was with be by on not he this are or his from at which".split()
+CHINESE_CHARACTERS = "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可也你"
+
+
+def english_corpus(size: int, rng: random.Random) -> str:
+    parts = []
+    length = 0
+    while length < size:
+        sentence = " ".join(rng.choice(ENGLISH_WORDS) for _ in range(rng.randint(5, 30))) + ". "
+        if rng.random() < 0.1:
+            sentence += "\n\n"
+        parts.append(sentence)
+        length += len(sentence)
+    return "".join(parts)
+
+
+def chinese_corpus(size: int, rng: random.Random) -> str:
+    # long runs without any separator force the per character split
+    parts = []
+    length = 0
+    while length < size:
+        sentence = "".join(rng.choice(CHINESE_CHARACTERS) for _ in range(rng.randint(200, 4000)))
+        sentence += "。" if rng.random() < 0.5 else "\n"
+        parts.append(sentence)
+        length += len(sentence)
+    return "".join(parts)
+
+
+def measure(splitter, text: str) -> tuple[list[str], float, int]:
+    tracemalloc.start()
+    started = time.perf_counter()
+    chunks = splitter.split_text(text)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return chunks, elapsed, peak
+
+
+def main() -> None:
+    size = int(float(sys.argv[1] if len(sys.argv) > 1 else 1) * 1024 * 1024)
+    rng = random.Random(0)
+    kwargs = {
+        "chunk_size": 1000,
+        "chunk_overlap": 100,
+        "fixed_separator": "\\n\\n",
+        "separators": SEPARATORS,
+    }
+    range_splitter = FixedRecursiveCharacterTextSplitter.from_encoder(**kwargs)
+    string_splitter = FixedRecursiveCharacterTextSplitter(
+        length_function=lambda texts: [len(t) for t in texts], **kwargs
+    )
+
+    for name, text in (
+        ("english", english_corpus(size, rng)),
+        ("chinese", chinese_corpus(size, rng)),
+    ):
+        range_chunks, range_time, range_peak = measure(range_splitter, text)
+        string_chunks, string_time, string_peak = measure(string_splitter, text)
+        assert range_chunks == string_chunks, f"{name}: outputs differ"
+        print(
+            f"{name:8} {len(text) / 1024 / 1024:6.1f} MB {len(range_chunks):7} chunks | "
+            f"string {string_time:7.2f}s {string_peak / 1024 / 1024:8.1f} MB peak | "
+            f"range {range_time:7.2f}s {range_peak / 1024 / 1024:8.1f} MB peak"
+        )
+
+
+if __name__ == "__main__":
+    main()
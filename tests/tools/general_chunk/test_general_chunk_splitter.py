@@ -0,0 +1,72 @@
+import filecmp
+import os
+import random
+
+import pytest
+
+from plugin_loader import load_plugin_modules
+
+TOOLS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "..", "tools")
+# both chunking plugins ship the same range engine behind their own splitter
+PLUGINS = ["general_chunk", "parent_child_chunk"]
+
+
+def load_splitter(plugin: str):
+    [fixed_text_splitter] = load_plugin_modules(
+        f"tools/{plugin}", "tools.splitter.fixed_text_splitter"
+    )
+    return fixed_text_splitter.FixedRecursiveCharacterTextSplitter
+
+
+SPLITTERS = {plugin: load_splitter(plugin) for plugin in PLUGINS}
+
+SEPARATORS = ["\n\n", "。", ". ", " ", ""]
+ALPHABET = ["a", "b", "中", "文", " ", "  ", "\n", "\n\n", "。", ". ", ".", "\t"]
+
+
+def build_splitters(plugin: str, chunk_size: int, chunk_overlap: int, fixed_separator: str):
+    FixedRecursiveCharacterTextSplitter = SPLITTERS[plugin]
+    kwargs = {
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "fixed_separator": fixed_separator,
+        "separators": SEPARATORS,
+    }
+    range_splitter = FixedRecursiveCharacterTextSplitter.from_encoder(**kwargs)
+    # any other length function keeps the string based implementation
+    string_splitter = FixedRecursiveCharacterTextSplitter(
+        length_function=lambda texts: [len(t) for t in texts], **kwargs
+    )
+    assert range_splitter._range_engine is not None
+    assert string_splitter._range_engine is None
+    return range_splitter, string_splitter
+
+
+@pytest.mark.parametrize("plugin", PLUGINS)
+@pytest.mark.parametrize("fixed_separator", ["\\n\\n", "。", " ", ""])
+@pytest.mark.parametrize(
+    "chunk_size,chunk_overlap", [(1, 0), (2, 1), (5, 0), (8, 3), (20, 20), (50, 10)]
+)
+def test_range_engine_matches_string_splitter(plugin, fixed_separator, chunk_size, chunk_overlap):
+    rng = random.Random(f"{fixed_separator}-{chunk_size}-{chunk_overlap}")
+    range_splitter, string_splitter = build_splitters(
+        plugin, chunk_size, chunk_overlap, fixed_separator
+    )
+    for _ in range(200):
+        text = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 300)))
+        assert range_splitter.split_text(text) == string_splitter.split_text(text), repr(text)
+
+
+@pytest.mark.parametrize("plugin", PLUGINS)
+def test_range_engine_on_unbroken_cjk_text(plugin):
+    range_splitter, string_splitter = build_splitters(plugin, 100, 10, "\\n\\n")
+    text = "中文文本没有空格" * 500 + "\n" + "中文" * 300
+    assert range_splitter.split_text(text) == string_splitter.split_text(text)
+
+
+def test_plugins_ship_the_same_range_engine():
+    engines = [
+        os.path.join(TOOLS_DIR, plugin, "tools", "splitter", "range_text_splitter.py")
+        for plugin in PLUGINS
+    ]
+    assert filecmp.cmp(*engines, shallow=False)
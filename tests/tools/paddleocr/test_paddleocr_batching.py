@@ -0,0 +1,169 @@
+import base64
+import io
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from dify_plugin.entities.tool import ToolRuntime
+from pypdf import PdfReader, PdfWriter
+
+from plugin_loader import load_plugin_modules
+
+batching, document_parsing, text_recognition = load_plugin_modules(
+    "tools/paddleocr", "tools.batching", "tools.document_parsing", "tools.text_recognition"
+)
+
+PAGES = 10
+
+
+def build_pdf(pages: int) -> str:
+    # the page width encodes the page number, so the stub can report it back
+    writer = PdfWriter()
+    for page in range(1, pages + 1):
+        writer.add_blank_page(width=100 + page, height=100)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    failures: dict[int, int] = {}
+    failure_status = 500
+    requests: list[list[int]] = []
+    # path -> (content type, body) served to GET requests
+    files: dict[str, tuple[str, bytes]] = {}
+    lock = threading.Lock()
+
+    def do_GET(self):
+        content_type, body = self.files[self.path]
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        reader = PdfReader(io.BytesIO(base64.b64decode(body["file"])))
+        pages = [int(page.mediabox.width) - 100 for page in reader.pages]
+        with self.lock:
+            self.requests.append(pages)
+            remaining = self.failures.get(pages[0], 0)
+            self.failures[pages[0]] = remaining - 1
+        if remaining > 0:
+            self.send_response(self.failure_status)
+            self.end_headers()
+            return
+        # later pages finish first, so results arrive out of order
+        time.sleep(0.02 * (PAGES - pages[0]))
+        result = {
+            "layoutParsingResults": [{"markdown": {"text": f"page {p}"}} for p in pages],
+            "ocrResults": [{"prunedResult": {"rec_texts": [f"page {p}"]}} for p in pages],
+        }
+        payload = json.dumps({"result": result}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_url(monkeypatch):
+    StubHandler.failures = {}
+    StubHandler.failure_status = 500
+    StubHandler.requests = []
+    StubHandler.files = {}
+    monkeypatch.setattr(batching, "RETRY_BACKOFF_SECONDS", 0.0)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+
+
+def build_tool(tool_class, url_key: str, url: str):
+    runtime = ToolRuntime(
+        credentials={"aistudio_access_token": "token", url_key: url},
+        user_id=None,
+        session_id=None,
+    )
+    return tool_class(runtime=runtime, session=None)
+
+
+def test_batches_stream_in_page_order(stub_url):
+    tool = build_tool(document_parsing.DocumentParsingTool, "document_parsing_api_url", stub_url)
+    messages = list(tool._invoke({"file": build_pdf(PAGES), "page_batch_size": 3}))
+
+    texts = [m.message.text for m in messages if m.type == m.MessageType.TEXT]
+    assert len(texts) == 4
+    assert "".join(texts) == "\n\n".join(f"page {p}" for p in range(1, PAGES + 1))
+    merged = messages[-1].message.json_object
+    assert len(merged["result"]["layoutParsingResults"]) == PAGES
+    assert sorted(pages[0] for pages in StubHandler.requests) == [1, 4, 7, 10]
+
+
+def test_failed_range_is_retried_alone(stub_url):
+    StubHandler.failures = {4: 2}
+    tool = build_tool(text_recognition.TextRecognitionTool, "text_recognition_api_url", stub_url)
+    messages = list(tool._invoke({"file": build_pdf(PAGES), "page_batch_size": 3}))
+
+    texts = [m.message.text for m in messages if m.type == m.MessageType.TEXT]
+    assert "".join(texts) == "\n\n".join(f"page {p}" for p in range(1, PAGES + 1))
+    first_pages = [pages[0] for pages in StubHandler.requests]
+    assert first_pages.count(4) == 3
+    assert all(first_pages.count(p) == 1 for p in (1, 7, 10))
+
+
+def test_range_failing_after_retries_raises(stub_url):
+    StubHandler.failures = {7: batching.MAX_BATCH_RETRIES + 1}
+    tool = build_tool(document_parsing.DocumentParsingTool, "document_parsing_api_url", stub_url)
+    with pytest.raises(RuntimeError, match="Pages 7-9"):
+        list(tool._invoke({"file": build_pdf(PAGES), "page_batch_size": 3}))
+
+
+def test_small_files_use_a_single_request(stub_url):
+    tool = build_tool(document_parsing.DocumentParsingTool, "document_parsing_api_url", stub_url)
+    messages = list(tool._invoke({"file": build_pdf(2), "page_batch_size": 3}))
+
+    assert len(StubHandler.requests) == 1
+    assert messages[0].message.text == "page 1\n\npage 2"
+
+
+def test_client_errors_are_not_retried(stub_url):
+    StubHandler.failures = {4: 1}
+    StubHandler.failure_status = 403
+    tool = build_tool(document_parsing.DocumentParsingTool, "document_parsing_api_url", stub_url)
+    with pytest.raises(RuntimeError, match="Pages 4-6"):
+        list(tool._invoke({"file": build_pdf(PAGES), "page_batch_size": 3}))
+    assert [pages[0] for pages in StubHandler.requests].count(4) == 1
+
+
+def test_urls_are_only_split_when_they_serve_a_pdf(stub_url):
+    pdf = base64.b64decode(build_pdf(PAGES))
+    StubHandler.files = {
+        "/scan.pdf": ("application/pdf", pdf),
+        "/download": ("application/octet-stream", pdf),
+        "/photo.png": ("image/png", pdf),
+        "/page.html": ("application/octet-stream", b"<html>" + bytes(1024 * 1024)),
+    }
+
+    assert [b[:2] for b in batching.split_pdf_pages(stub_url + "scan.pdf", 4)] == [
+        (1, 4),
+        (5, 8),
+        (9, 10),
+    ]
+    assert len(batching.split_pdf_pages(stub_url + "download", 4)) == 3
+    assert batching.split_pdf_pages(stub_url + "photo.png", 4) is None
+    assert batching.split_pdf_pages(stub_url + "page.html", 4) is None
+
+
+def test_unreadable_pdfs_raise_a_runtime_error():
+    file = base64.b64encode(b"%PDF-1.7 not really a pdf").decode("ascii")
+    with pytest.raises(RuntimeError, match="Failed to split the PDF"):
+        batching.split_pdf_pages(file, 3)
@@ -0,0 +1,93 @@
+from plugin_loader import load_plugin_modules
+
+parent_child_index_processor, entities, fixed_text_splitter = load_plugin_modules(
+    "tools/parent_child_chunk",
+    "tools.index_processor.parent_child_index_processor",
+    "tools.entities.entities",
+    "tools.splitter.fixed_text_splitter",
+)
+
+ParentChildIndexProcessor = parent_child_index_processor.ParentChildIndexProcessor
+
+TEXT = "\n\n".join(
+    f"Paragraph {i}. "
+    + "Some sentence with words. " * (i % 7 + 1)
+    + "中文句子没有空格" * (i % 5)
+    + "\n"
+    + "tail line" * (i % 3)
+    for i in range(300)
+)
+
+
+def build_rule(parent_mode: str = "paragraph"):
+    rule = entities.Rule()
+    rule.parent_mode = parent_mode
+    rule.segmentation = entities.Segmentation(max_tokens=200, separator="\\n\\n")
+    rule.subchunk_segmentation = entities.Segmentation(max_tokens=40, separator="\\n")
+    return rule
+
+
+def test_iter_transform_streams_all_parents_in_batches():
+    processor = ParentChildIndexProcessor()
+    rule = build_rule()
+    parent_splitter = fixed_text_splitter.FixedRecursiveCharacterTextSplitter.from_encoder(
+        chunk_size=200,
+        chunk_overlap=0,
+        fixed_separator="\\n\\n",
+        separators=["\n\n", "。", ". ", " ", ""],
+    )
+    expected_parents = [node for node in parent_splitter.split_text(TEXT) if node.strip()]
+
+    batches = list(processor.iter_transform(TEXT, rule, batch_size=16))
+    chunks = [chunk for batch in batches for chunk in batch.parent_child_chunks]
+
+    assert [len(batch.parent_child_chunks) for batch in batches[:-1]] == [16] * (len(batches) - 1)
+    assert [chunk.parent_content for chunk in chunks] == expected_parents
+    assert all(
+        chunk.child_contents == processor._split_child_nodes(chunk.parent_content, rule)
+        for chunk in chunks
+    )
+    assert chunks == processor.transform(TEXT, rule).parent_child_chunks
+
+
+def test_iter_transform_full_doc_yields_single_chunk():
+    processor = ParentChildIndexProcessor()
+    rule = build_rule("full_doc")
+
+    batches = list(processor.iter_transform(TEXT, rule, batch_size=16))
+
+    assert batches == [processor.transform(TEXT, rule)]
+
+
+def test_transform_matches_cleaning_the_whole_text_first():
+    processor = ParentChildIndexProcessor()
+    rule = build_rule()
+    rule.segmentation = entities.Segmentation(max_tokens=20, separator="\\n\\n")
+    rule.subchunk_segmentation = entities.Segmentation(max_tokens=10, separator="\\n")
+    rule.remove_urls_emails = True
+    text = "\n\n".join(
+        f"Part {i}, see https://example.com/docs/{i}/long/path/on for details. "
+        f"Mail someone.with.a.long.name{i}@example.com now."
+        for i in range(50)
+    )
+    parent_splitter = fixed_text_splitter.FixedRecursiveCharacterTextSplitter.from_encoder(
+        chunk_size=20,
+        chunk_overlap=0,
+        fixed_separator="\\n\\n",
+        separators=["\n\n", "。", ". ", " ", ""],
+    )
+    # the URLs and emails cross the parent boundaries of the uncleaned text
+    assert "https://example.com/" in parent_splitter.split_text(text)
+    cleaned = parent_child_index_processor.CleanProcessor.clean(text, rule)
+    expected = [node for node in parent_splitter.split_text(cleaned) if node.strip()]
+
+    chunks = processor.transform(text, rule).parent_child_chunks
+
+    assert [chunk.parent_content for chunk in chunks] == expected
+    assert not any("example" in chunk.parent_content for chunk in chunks)
+    assert all(
+        chunk.child_contents == processor._split_child_nodes(chunk.parent_content, rule)
+        for chunk in chunks
+    )
+    batches = processor.iter_transform(text, rule, batch_size=4)
+    assert [chunk for batch in batches for chunk in batch.parent_child_chunks] == chunks
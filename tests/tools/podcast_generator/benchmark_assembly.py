@@ -0,0 +1,79 @@
+"""Compare the PCM assembler with the former pydub assembly on a long synthetic script.
+
+Run from the repository root:
+
+    python tests/tools/podcast_generator/benchmark_assembly.py [lines] [seconds_per_line]
+"""
+
+import importlib
+import io
+import os
+import random
+import sys
+import time
+import tracemalloc
+import wave
+
+# the plugin imports its modules from the "tools" package of its own root
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), "..", "..", "..", "tools", "podcast_generator")
+)
+audio_assembly = importlib.import_module("tools.audio_assembly")
+
+AudioSegment = audio_assembly.AudioSegment
+FRAME_RATE = 24000
+
+
+def fake_tts(index: int, seconds: float) -> bytes:
+    # what the TTS backend returns for one line
+    rng = random.Random(index)
+    frames = rng.randbytes(int(seconds * FRAME_RATE) * 2)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(FRAME_RATE)
+        wav.writeframes(frames)
+    return buffer.getvalue()
+
+
+def pydub_assembly(blobs: list[bytes], pauses: list[float]) -> int:
+    combined = AudioSegment.empty()
+    for i, blob in enumerate(blobs):
+        combined += AudioSegment.from_wav(io.BytesIO(blob))
+        if i < len(blobs) - 1:
+            combined += AudioSegment.silent(duration=int(pauses[i] * 1000), frame_rate=FRAME_RATE)
+    buffer = io.BytesIO()
+    combined.export(buffer, format="wav")
+    return len(buffer.getvalue())
+
+
+def streamed_assembly(blobs: list[bytes], pauses: list[float]) -> int:
+    segments = [audio_assembly.parse_wav(blob) for blob in blobs]
+    assembler = audio_assembly.PodcastAssembler(segments, pauses)
+    return sum(len(chunk) for chunk in audio_assembly.rechunk(assembler.iter_wav(), 8192))
+
+
+def measure(label: str, fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = fn(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<10} {elapsed * 1000:9.1f} ms  peak {peak / 2**20:8.1f} MiB  {size} bytes")
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+    blobs = [fake_tts(i, seconds) for i in range(lines)]
+    rng = random.Random(0)
+    pauses = [rng.uniform(0.1, audio_assembly.MAX_SILENCE_SECONDS) for _ in blobs]
+    print(f"{lines} lines of {seconds}s speech")
+    measure("pydub", pydub_assembly, blobs, pauses)
+    measure("streamed", streamed_assembly, blobs, pauses)
+
+
+if __name__ == "__main__":
+    main()
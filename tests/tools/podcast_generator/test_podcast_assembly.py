@@ -0,0 +1,154 @@
+import io
+import math
+import struct
+import wave
+from types import SimpleNamespace
+
+import pytest
+from dify_plugin.entities.tool import ToolInvokeMessage, ToolRuntime
+
+from plugin_loader import load_plugin_modules
+
+audio_assembly, podcast_audio_generator = load_plugin_modules(
+    "tools/podcast_generator", "tools.audio_assembly", "tools.podcast_audio_generator"
+)
+
+AudioSegment = audio_assembly.AudioSegment
+FRAME_RATE = 24000
+
+
+def tone_wav(seconds: float, pitch: float, streamed: bool = False) -> bytes:
+    frames = b"".join(
+        struct.pack("<h", int(8000 * math.sin(2 * math.pi * pitch * i / FRAME_RATE)))
+        for i in range(int(seconds * FRAME_RATE))
+    )
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(FRAME_RATE)
+        wav.writeframes(frames)
+    blob = buffer.getvalue()
+    if streamed:
+        # streamed responses do not know their size when the header is sent
+        blob = blob[:4] + b"\xff\xff\xff\xff" + blob[8:40] + b"\xff\xff\xff\xff" + blob[44:]
+    return blob
+
+
+def reference_mix(blobs: list[bytes], pauses: list[float], stereo: bool) -> bytes:
+    # the former pydub assembly
+    combined = AudioSegment.empty()
+    for i, blob in enumerate(blobs):
+        audio = AudioSegment.from_wav(io.BytesIO(blob))
+        silence = AudioSegment.silent(duration=int(pauses[i] * 1000), frame_rate=FRAME_RATE)
+        if stereo:
+            combined += audio.set_channels(2).pan(-0.2 if i % 2 == 0 else 0.2)
+            silence = silence.set_channels(2)
+        else:
+            combined += audio
+        if i < len(blobs) - 1:
+            combined += silence
+    return combined.raw_data
+
+
+def test_parse_wav_reads_streamed_headers():
+    blob = tone_wav(0.1, 440, streamed=True)
+    segment = audio_assembly.parse_wav(blob)
+    assert segment.format == audio_assembly.PcmFormat(FRAME_RATE, 2, 1)
+    assert segment.frame_count == int(0.1 * FRAME_RATE)
+    with pytest.raises(ValueError):
+        audio_assembly.parse_wav(b"ID3" + bytes(64))
+
+
+@pytest.mark.parametrize("stereo", [False, True])
+def test_assembly_matches_pydub(stereo):
+    blobs = [tone_wav(0.2, 220 * (i + 1)) for i in range(4)]
+    pauses = [0.5, 0.1, 1.2, 0.7]
+    segments = [audio_assembly.parse_wav(blob) for blob in blobs]
+    assembler = audio_assembly.PodcastAssembler(segments, pauses, stereo=stereo)
+
+    frames = b"".join(assembler.iter_frames())
+    assert frames == reference_mix(blobs, pauses, stereo)
+    assert assembler.data_size == len(frames)
+
+    with wave.open(io.BytesIO(b"".join(assembler.iter_wav()))) as wav:
+        assert wav.getnchannels() == (2 if stereo else 1)
+        assert wav.readframes(wav.getnframes()) == frames
+
+
+def test_lines_in_another_format_are_converted():
+    other = AudioSegment.from_wav(io.BytesIO(tone_wav(0.2, 300))).set_frame_rate(16000)
+    buffer = io.BytesIO()
+    other.export(buffer, format="wav")
+    segments = [
+        audio_assembly.parse_wav(tone_wav(0.2, 220)),
+        audio_assembly.parse_wav(buffer.getvalue()),
+    ]
+    assembler = audio_assembly.PodcastAssembler(segments, [0.1, 0.1])
+    assert assembler.segments[1].format == segments[0].format
+    assert abs(assembler.segments[1].frame_count - int(0.2 * FRAME_RATE)) <= 1
+
+
+def test_rechunk():
+    parts = [b"abc", memoryview(b"defgh"), b"", b"ij"]
+    assert list(audio_assembly.rechunk(parts, 4)) == [b"abcd", b"efgh", b"ij"]
+
+
+def invoke_tool(monkeypatch, output_format):
+    class FakeSpeech:
+        def create(self, input, **kwargs):
+            return SimpleNamespace(content=tone_wav(0.05 * len(input), 440, streamed=True))
+
+    monkeypatch.setattr(
+        podcast_audio_generator.openai,
+        "OpenAI",
+        lambda **kwargs: SimpleNamespace(audio=SimpleNamespace(speech=FakeSpeech())),
+    )
+    runtime = ToolRuntime(
+        credentials={"tts_service": "openai", "api_key": "key"}, user_id=None, session_id=None
+    )
+    tool = podcast_audio_generator.PodcastAudioGeneratorTool(runtime=runtime, session=None)
+    return tool._invoke(
+        {
+            "script": "Hello\nHi there\n\nWelcome to the show",
+            "host1_voice": "alloy",
+            "host2_voice": "echo",
+            "output_format": output_format,
+        }
+    )
+
+
+def test_tool_streams_the_podcast_as_blob_chunks(monkeypatch):
+    messages = list(invoke_tool(monkeypatch, "wav"))
+
+    assert messages[0].message.text == "Audio generated successfully"
+    chunks = [m for m in messages if m.type == ToolInvokeMessage.MessageType.BLOB_CHUNK]
+    assert [c.message.sequence for c in chunks] == list(range(len(chunks)))
+    assert [c.message.end for c in chunks] == [False] * (len(chunks) - 1) + [True]
+    assert {c.message.id for c in chunks} == {chunks[0].message.id}
+    assert chunks[0].meta == {"mime_type": "audio/wav"}
+    blob = b"".join(c.message.blob for c in chunks)
+    assert len(blob) == chunks[0].message.total_length
+    with wave.open(io.BytesIO(blob)) as wav:
+        speech_frames = int(0.05 * FRAME_RATE) * len("HelloHi thereWelcome to the show")
+        assert speech_frames < wav.getnframes() <= speech_frames + 2 * 1.5 * FRAME_RATE
+
+
+def test_tool_sends_encoded_formats_with_their_size(monkeypatch):
+    parts = [b"a" * 10000, b"b" * 10000, b"c" * 5000]
+
+    def fake_iter_encoded(self, output_format):
+        yield from parts
+
+    monkeypatch.setattr(audio_assembly.PodcastAssembler, "iter_encoded", fake_iter_encoded)
+    messages = list(invoke_tool(monkeypatch, "mp3"))
+
+    assert messages[0].message.text == "Audio generated successfully"
+    chunks = [m for m in messages if m.type == ToolInvokeMessage.MessageType.BLOB_CHUNK]
+    assert [c.message.sequence for c in chunks] == list(range(len(chunks)))
+    assert [c.message.end for c in chunks] == [False] * (len(chunks) - 1) + [True]
+    assert chunks[-1].message.blob == b""
+    assert all(len(c.message.blob) <= podcast_audio_generator.BLOB_CHUNK_SIZE for c in chunks)
+    assert {c.message.total_length for c in chunks} == {25000}
+    assert {c.meta["mime_type"] for c in chunks} == {"audio/mpeg"}
+    assert b"".join(c.message.blob for c in chunks) == b"".join(parts)
@@ -0,0 +1,152 @@
+import base64
+import io
+import json
+import threading
+import time
+import zlib
+from types import SimpleNamespace
+
+import pytest
+from dify_plugin.entities.tool import ToolRuntime
+from pypdf import PdfReader, PdfWriter
+
+from plugin_loader import load_plugin_modules
+
+[partition] = load_plugin_modules("tools/unstructured", "tools.partition")
+
+PAGES = 7
+
+
+def build_pdf(pages: int) -> bytes:
+    # the page width encodes the page number, so the fake client can report it back
+    writer = PdfWriter()
+    for page in range(1, pages + 1):
+        writer.add_blank_page(width=100 + page, height=100)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def encode_orig_elements(elements: list[dict]) -> str:
+    return base64.b64encode(zlib.compress(json.dumps(elements).encode())).decode()
+
+
+class FakeGeneral:
+    def __init__(self):
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def partition(self, request):
+        parameters = request.partition_parameters
+        reader = PdfReader(io.BytesIO(parameters.files.content))
+        pages = [int(page.mediabox.width) - 100 for page in reader.pages]
+        with self.lock:
+            self.requests.append((pages, parameters.starting_page_number))
+        # later ranges finish first, so results arrive out of order
+        time.sleep(0.02 * (PAGES - pages[0]))
+        elements = []
+        for page in pages:
+            orig = [
+                {"type": "NarrativeText", "element_id": f"n{page}", "text": "", "metadata": {}},
+                {
+                    "type": "Image",
+                    "element_id": f"i{page}",
+                    "text": "",
+                    "metadata": {
+                        "image_base64": base64.b64encode(b"png").decode(),
+                        "image_mime_type": "image/png",
+                    },
+                },
+            ]
+            elements.append(
+                {
+                    "type": "CompositeElement",
+                    "element_id": f"c{page}",
+                    "text": f"page {page}\n",
+                    "metadata": {"orig_elements": encode_orig_elements(orig)},
+                }
+            )
+        return SimpleNamespace(elements=elements)
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    general = FakeGeneral()
+    monkeypatch.setattr(
+        partition.unstructured_client,
+        "UnstructuredClient",
+        lambda **kwargs: SimpleNamespace(general=general),
+    )
+    return general
+
+
+def build_tool():
+    runtime = ToolRuntime(
+        credentials={"api_url": "http://unstructured.local", "server_type": "local"},
+        user_id=None,
+        session_id=None,
+    )
+    uploads = SimpleNamespace(
+        upload=lambda name, data, mimetype: SimpleNamespace(preview_url=f"url/{name}", id=name)
+    )
+    return partition.PartitionTool(runtime=runtime, session=SimpleNamespace(file=uploads))
+
+
+def test_split_pdf_ranges():
+    ranges = partition.split_pdf(build_pdf(PAGES), 3)
+    assert [(first, last) for first, last, _ in ranges] == [(1, 3), (4, 6), (7, 7)]
+    assert partition.split_pdf(build_pdf(2), 3) is None
+    assert partition.split_pdf(b"not a pdf", 3) is None
+
+
+def test_page_ranges_yield_in_page_order(fake_client):
+    tool = build_tool()
+    messages = list(
+        tool._invoke(
+            {
+                "file": SimpleNamespace(blob=build_pdf(PAGES), filename="report.pdf"),
+                "split_pdf_pages": 3,
+            }
+        )
+    )
+
+    groups = [m.message.json_object for m in messages if m.type == m.MessageType.JSON]
+    assert [(g["first_page"], g["last_page"]) for g in groups] == [(1, 3), (4, 6), (7, 7)]
+    element_ids = [e["element_id"] for g in groups for e in g["elements"]]
+    assert element_ids == [f"c{p}" for p in range(1, PAGES + 1)]
+    orig_elements = groups[1]["elements"][0]["metadata"]["orig_elements"]
+    assert orig_elements[1]["metadata"]["dify_file_id"] == "i4"
+    assert "image_base64" not in orig_elements[1]["metadata"]
+
+    texts = [m.message.text for m in messages if m.type == m.MessageType.TEXT]
+    assert "".join(texts).count("page ") == PAGES
+    assert texts[0].startswith("![](url/i1)")
+    assert sorted(start for _, start in fake_client.requests) == [1, 4, 7]
+
+    variables = [m.message for m in messages if m.type == m.MessageType.VARIABLE]
+    assert [v.variable_name for v in variables] == ["images"]
+    assert len(variables[0].variable_value) == PAGES
+
+
+def test_small_files_use_a_single_request(fake_client):
+    tool = build_tool()
+    messages = list(
+        tool._invoke(
+            {
+                "file": SimpleNamespace(blob=build_pdf(2), filename="report.pdf"),
+                "split_pdf_pages": 3,
+            }
+        )
+    )
+
+    assert len(fake_client.requests) == 1
+    variables = [m.message.variable_name for m in messages if m.type == m.MessageType.VARIABLE]
+    assert variables == ["images", "elements"]
+
+
+def test_corrupt_pdfs_raise_the_tool_error(fake_client):
+    tool = build_tool()
+    file = SimpleNamespace(blob=b"%PDF-1.7 not really a pdf", filename="report.pdf")
+    with pytest.raises(Exception, match="Partition request failed"):
+        list(tool._invoke({"file": file, "split_pdf_pages": 3}))
+    assert fake_client.requests == []
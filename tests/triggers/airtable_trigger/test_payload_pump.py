@@ -0,0 +1,148 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from dify_plugin.entities.trigger import Subscription
+from dify_plugin.errors.trigger import EventIgnoreError
+from werkzeug import Request
+from werkzeug.test import EnvironBuilder
+
+from plugin_loader import load_plugin_modules
+
+airtable, payload_pump, record = load_plugin_modules(
+    "triggers/airtable_trigger", "provider.airtable", "provider.payload_pump", "events.record"
+)
+
+CURSOR_KEY = "airtable_cursor_app1_ach1"
+
+
+class FakeStorage:
+    def __init__(self):
+        self.data = {}
+        self.writes = []
+
+    def set(self, key, value):
+        self.writes.append(key)
+        self.data[key] = value
+
+    def get(self, key):
+        return self.data[key]
+
+    def exist(self, key):
+        return key in self.data
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+def change(table_id, record_id, field_id, value, previous=None):
+    changed = {"current": {"cellValuesByFieldId": {field_id: value}}}
+    if previous is not None:
+        changed["previous"] = {"cellValuesByFieldId": {field_id: previous}}
+    return {"changedTablesById": {table_id: {"changedRecordsById": {record_id: changed}}}}
+
+
+class FakeAirtable:
+    """Serves the payloads of a webhook after a cursor, in pages of two."""
+
+    def __init__(self):
+        self.payloads = []
+        self.requests = []
+        self.delay = 0
+
+    def get(self, url, params=None):
+        self.requests.append(dict(params))
+        time.sleep(self.delay)
+        start = int(params.get("cursor", 1)) - 1
+        page = self.payloads[start : start + 2]
+        body = {"payloads": page, "cursor": start + len(page) + 1, "mightHaveMore": start + 2 < len(self.payloads)}
+        return SimpleNamespace(status_code=200, json=lambda: body, text="")
+
+
+@pytest.fixture
+def server(monkeypatch):
+    fake = FakeAirtable()
+
+    class FakeClient:
+        def __init__(self, headers=None, timeout=None):
+            pass
+
+        def __enter__(self):
+            return fake
+
+        def __exit__(self, *exc_info):
+            return False
+
+    monkeypatch.setattr(airtable.httpx, "Client", FakeClient)
+    monkeypatch.setattr(payload_pump, "_webhooks", {})
+    return fake
+
+
+def ping(storage):
+    runtime = SimpleNamespace(credentials={"access_token": "token"}, session=SimpleNamespace(storage=storage))
+    trigger = airtable.AirtableTrigger(runtime)
+    subscription = Subscription(endpoint="https://hook", properties={})
+    body = {"base": {"id": "app1"}, "webhook": {"id": "ach1"}, "timestamp": "2025-01-01T00:00:00.000Z"}
+    request = Request(EnvironBuilder(method="POST", data=json.dumps(body), content_type="application/json").get_environ())
+    return trigger._dispatch_event(subscription, request)
+
+
+def test_pings_during_a_fetch_are_served_by_one_more_fetch(server):
+    storage = FakeStorage()
+    server.payloads = [change("tbl1", f"rec{i}", "fld1", i) for i in range(5)]
+    server.delay = 0.05
+
+    dispatches = []
+    first = threading.Thread(target=lambda: dispatches.append(ping(storage)))
+    first.start()
+    time.sleep(0.01)
+    later = [threading.Thread(target=lambda: dispatches.append(ping(storage))) for _ in range(4)]
+    for thread in later:
+        thread.start()
+    for thread in [first, *later]:
+        thread.join()
+
+    # the first fetch reads all three pages, the pings during it share one more request
+    assert [r.get("cursor") for r in server.requests] == [None, 3, 5, 6]
+    dispatched = [d for d in dispatches if d.events]
+    assert len(dispatched) == 1
+    assert len(dispatched[0].payload["payloads"]) == 5
+    assert dispatched[0].payload["cursor"] == 6
+    # the cursor is written once per fetch that advanced it
+    assert storage.writes.count(CURSOR_KEY) == 1
+    assert payload_pump.decode_cursor(storage.data[CURSOR_KEY]) == 6
+
+
+def test_changes_are_grouped_by_table_and_field():
+    payloads = [
+        {"changedTablesById": {"tbl1": {"createdRecordsById": {"rec1": {"cellValuesByFieldId": {"fld1": "a"}}}}}},
+        change("tbl1", "rec1", "fld1", "b", previous="a"),
+        change("tbl1", "rec2", "fld1", "x", previous="w"),
+        change("tbl1", "rec2", "fld1", "y", previous="x"),
+        change("tbl2", "rec3", "fld2", 1, previous=0),
+        {"changedTablesById": {"tbl2": {"destroyedRecordIds": ["rec3"]}}},
+    ]
+
+    tables = payload_pump.group_changes(payloads)
+    assert tables["tbl1"]["created"] == [{"id": "rec1", "createdTime": None, "fields": {"fld1": "b"}}]
+    assert tables["tbl1"]["updated"] == [{"id": "rec2", "fields": {"fld1": "y"}, "previous": {"fld1": "w"}}]
+    assert tables["tbl1"]["changed_fields"] == {"fld1": ["rec1", "rec2"]}
+    assert tables["tbl2"] == {"created": [], "updated": [], "deleted": ["rec3"], "changed_fields": {}}
+
+
+def test_workflows_get_the_dispatched_batch(server):
+    storage = FakeStorage()
+    server.payloads = [change("tbl1", "rec1", "fld1", "a")]
+    dispatch = ping(storage)
+
+    event = record.RecordCreatedEvent(SimpleNamespace(credentials={}, session=None))
+    variables = event._on_event(None, {}, dispatch.payload).variables
+    assert variables["payloads"] == server.payloads
+    assert variables["tables"]["tbl1"]["changed_fields"] == {"fld1": ["rec1"]}
+
+    # a ping without new payloads starts no workflow
+    assert ping(storage).events == []
+    with pytest.raises(EventIgnoreError):
+        event._on_event(None, {}, {})
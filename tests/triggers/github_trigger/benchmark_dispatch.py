@@ -0,0 +1,137 @@
+"""Compare the dispatch of GitHub webhook deliveries with the former parse-then-route path.
+
+Run from the repository root:
+
+    python tests/triggers/github_trigger/benchmark_dispatch.py [deliveries]
+"""
+
+import hashlib
+import hmac
+import importlib
+import json
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+from dify_plugin.entities.trigger import Subscription
+from dify_plugin.errors.trigger import TriggerValidationError
+from werkzeug import Request
+from werkzeug.test import EnvironBuilder
+
+# the plugin imports its modules from the "provider" package of its own root
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "..", "triggers", "github_trigger"))
+github = importlib.import_module("provider.github")
+event_routing = importlib.import_module("provider.event_routing")
+
+SECRET = "secret"
+# roughly the mix of an organization webhook on a busy monorepo
+EVENT_MIX = [
+    ("push", None, 30),
+    ("pull_request", "synchronize", 15),
+    ("check_run", "completed", 20),
+    ("check_suite", "completed", 10),
+    ("workflow_job", "in_progress", 15),
+    ("status", None, 5),
+    ("issue_comment", "created", 3),
+    ("release", "published", 1),
+    ("team", "edited", 1),
+]
+
+
+def sample_payload(event_type: str, action: str | None, rng: random.Random) -> dict:
+    user = {"login": "octocat", "id": rng.randint(1, 10**8), "type": "User", "site_admin": False}
+    repository = {
+        "id": 1296269,
+        "full_name": "octo-org/monorepo",
+        "owner": dict(user),
+        "private": True,
+        "topics": [f"topic-{i}" for i in range(10)],
+        **{f"{name}_url": f"https://api.github.com/repos/octo-org/monorepo/{name}" for name in "abcdefghijklmnop"},
+    }
+    payload = {"sender": user, "repository": repository, "organization": {"login": "octo-org", "id": 9}}
+    if action:
+        payload["action"] = action
+    if event_type == "push":
+        payload["commits"] = [
+            {
+                "id": f"{rng.getrandbits(160):040x}",
+                "message": "Update the build " * rng.randint(1, 20),
+                "author": dict(user),
+                "modified": [f"services/svc{rng.randint(0, 500)}/main.py" for _ in range(rng.randint(1, 30))],
+            }
+            for _ in range(rng.randint(1, 20))
+        ]
+    else:
+        payload[event_type] = {"id": rng.randint(1, 10**9), "body": "x" * rng.randint(100, 5000), "user": user}
+    return payload
+
+
+def build_corpus(count: int) -> list[tuple[str, bytes, str]]:
+    rng = random.Random(0)
+    kinds = [(event_type, action) for event_type, action, weight in EVENT_MIX for _ in range(weight)]
+    corpus = []
+    for _ in range(count):
+        event_type, action = rng.choice(kinds)
+        body = json.dumps(sample_payload(event_type, action, rng)).encode()
+        signature = "sha256=" + hmac.new(SECRET.encode(), body, hashlib.sha256).hexdigest()
+        corpus.append((event_type, body, signature))
+    return corpus
+
+
+def make_request(event_type: str, body: bytes, signature: str) -> Request:
+    headers = {"X-GitHub-Event": event_type, "X-Hub-Signature-256": signature}
+    environ = EnvironBuilder(method="POST", data=body, content_type="application/json", headers=headers).get_environ()
+    return Request(environ)
+
+
+def former_dispatch(subscription: Subscription, request: Request) -> list[str]:
+    """Verify, then parse with the standard library before routing, like the plugin used to."""
+    event_routing.verify_signature(
+        request.get_data(), request.headers.get("X-Hub-Signature-256"), subscription.properties["webhook_secret"]
+    )
+    event_type = request.headers["X-GitHub-Event"]
+    payload = request.get_json(force=True)
+    return event_routing.route_event(event_type, payload) if event_routing.is_routed(event_type) else []
+
+
+def measure(dispatch, requests: list[Request]) -> tuple[float, int]:
+    rejected = 0
+    started = time.perf_counter()
+    for request in requests:
+        try:
+            dispatch(request)
+        except TriggerValidationError:
+            rejected += 1
+    return time.perf_counter() - started, rejected
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    corpus = build_corpus(count)
+    subscription = Subscription(endpoint="https://hook", properties={"webhook_secret": SECRET})
+    trigger = github.GithubTrigger(SimpleNamespace(credentials={}, session=None))
+    size = sum(len(body) for _, body, _ in corpus)
+    print(f"{count} deliveries, {size / count / 1024:.1f} KB on average")
+
+    for name, signed in (("signed", True), ("forged", False)):
+        runs = {}
+        for path, dispatch in (
+            ("former", lambda request: former_dispatch(subscription, request)),
+            ("current", lambda request: trigger._dispatch_event(subscription, request)),
+        ):
+            # fresh requests, so no run reuses the body or JSON cached by another
+            requests = [make_request(e, body, sig if signed else "sha256=" + "0" * 64) for e, body, sig in corpus]
+            runs[path] = measure(dispatch, requests)
+        print(
+            f"{name:6} | "
+            + " | ".join(
+                f"{path} {elapsed:6.2f}s {count / elapsed:9.0f}/s {rejected} rejected"
+                for path, (elapsed, rejected) in runs.items()
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import hashlib
+import hmac
+import json
+import urllib.parse
+from types import SimpleNamespace
+
+import pytest
+from dify_plugin.entities.trigger import Subscription
+from dify_plugin.errors.trigger import TriggerDispatchError, TriggerValidationError
+from werkzeug import Request
+from werkzeug.test import EnvironBuilder
+
+from plugin_loader import load_plugin_modules
+
+github, event_routing = load_plugin_modules("triggers/github_trigger", "provider.github", "provider.event_routing")
+
+SECRET = "secret"
+
+
+def dispatch(event_type, payload, secret=SECRET, signature=None, form=False):
+    body = json.dumps(payload).encode()
+    content_type = "application/json"
+    if form:
+        body = urllib.parse.urlencode({"payload": body}).encode()
+        content_type = "application/x-www-form-urlencoded"
+    if signature is None:
+        signature = "sha256=" + hmac.new(SECRET.encode(), body, hashlib.sha256).hexdigest()
+    headers = {"X-GitHub-Event": event_type, "X-Hub-Signature-256": signature}
+    request = Request(EnvironBuilder(method="POST", data=body, content_type=content_type, headers=headers).get_environ())
+    subscription = Subscription(endpoint="https://hook", properties={"webhook_secret": secret})
+    return github.GithubTrigger(SimpleNamespace(credentials={}, session=None))._dispatch_event(subscription, request)
+
+
+@pytest.mark.parametrize(
+    ("event_type", "action", "events"),
+    [
+        ("issues", "opened", ["issues"]),
+        ("Pull_Request", "closed", ["pull_request"]),
+        ("workflow_job", "queued", ["workflow_job"]),
+        ("create", None, ["ref_change"]),
+        ("secret_scanning_alert_location", "created", ["secret_scanning"]),
+        ("release", "published", ["release_published"]),
+        ("release", "created", []),
+        ("deployment_status", "created", ["deployment_status_created"]),
+        ("team", "created", []),
+    ],
+)
+def test_deliveries_are_routed_by_event_and_action(event_type, action, events):
+    result = dispatch(event_type, {"action": action, "sender": {"id": 7}}, form=event_type == "issues")
+    assert result.events == events
+
+
+def test_an_action_split_event_needs_an_action():
+    with pytest.raises(TriggerDispatchError):
+        dispatch("release", {"sender": {"id": 7}})
+
+
+def test_only_verified_deliveries_of_routed_events_are_parsed(monkeypatch):
+    parsed = []
+    monkeypatch.setattr(event_routing.orjson, "loads", lambda body: parsed.append(body) or {"sender": {"id": 7}})
+
+    with pytest.raises(TriggerValidationError):
+        dispatch("push", {"sender": {"id": 7}}, signature="sha256=forged")
+    assert dispatch("team", {"sender": {"id": 7}}).events == []
+    assert parsed == []
+
+    result = dispatch("push", {"sender": {"id": 7}})
+    assert (result.user_id, result.events, len(parsed)) == ("7", ["push"], 1)
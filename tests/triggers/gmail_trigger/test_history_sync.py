@@ -0,0 +1,209 @@
+import base64
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from dify_plugin.entities.trigger import Subscription
+from werkzeug import Request
+from werkzeug.test import EnvironBuilder
+
+from plugin_loader import load_plugin_modules
+
+gmail, history_sync = load_plugin_modules("triggers/gmail_trigger", "provider.gmail_trigger", "provider.history_sync")
+
+CHECKPOINT_KEY = "gmail:sub:history_checkpoint"
+
+
+class FakeStorage:
+    def __init__(self):
+        self.data = {}
+
+    def set(self, key, value):
+        self.data[key] = value
+
+    def get(self, key):
+        return self.data[key]
+
+    def exist(self, key):
+        return key in self.data
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self._payload = payload
+        self.status_code = status_code
+        self.text = ""
+
+    def json(self):
+        return self._payload
+
+
+class FakeGmail:
+    """A mailbox history served in pages of two records."""
+
+    def __init__(self, history_id):
+        self.history_id = history_id
+        self.records = []
+        self.requests = []
+        self.failing_page = None
+        self.delay = 0
+
+    def add_message(self, message_id):
+        self.history_id += 1
+        self.records.append(
+            {"id": str(self.history_id), "messagesAdded": [{"message": {"id": message_id, "threadId": "t"}}]}
+        )
+
+    def get_page(self, params):
+        self.requests.append(dict(params))
+        time.sleep(self.delay)
+        page = int(params.get("pageToken") or 0)
+        if page == self.failing_page:
+            return FakeResponse({}, status_code=500)
+        records = [r for r in self.records if int(r["id"]) > int(params["startHistoryId"])]
+        payload = {"history": records[page * 2 : page * 2 + 2], "historyId": str(self.history_id)}
+        if len(records) > page * 2 + 2:
+            payload["nextPageToken"] = str(page + 1)
+        return FakeResponse(payload)
+
+
+@pytest.fixture(autouse=True)
+def fast_lease(monkeypatch):
+    monkeypatch.setattr(history_sync, "LEASE_POLL_SECONDS", 0.01)
+
+
+def test_history_is_read_across_pages_and_the_checkpoint_only_moves_forward():
+    storage = FakeStorage()
+    mailbox = FakeGmail(100)
+    sync = history_sync.HistorySync(storage, "sub")
+
+    assert sync.run(100, mailbox.get_page) is None
+    for i in range(5):
+        mailbox.add_message(f"m{i}")
+    delta = sync.run(103, mailbox.get_page)
+    assert [m["id"] for m in delta.added] == [f"m{i}" for i in range(5)]
+    assert len(mailbox.requests) == 3
+    assert storage.data[CHECKPOINT_KEY] == b"105"
+
+    # a late notification does not move the checkpoint back
+    assert sync.run(104, mailbox.get_page) is None
+    assert storage.data[CHECKPOINT_KEY] == b"105"
+
+
+def test_a_failed_page_keeps_the_checkpoint_after_the_pages_read():
+    storage = FakeStorage()
+    storage.set(CHECKPOINT_KEY, b"100")
+    mailbox = FakeGmail(100)
+    for i in range(4):
+        mailbox.add_message(f"m{i}")
+    mailbox.failing_page = 1
+
+    delta = history_sync.HistorySync(storage, "sub").run(104, mailbox.get_page)
+    assert [m["id"] for m in delta.added] == ["m0", "m1"]
+    assert storage.data[CHECKPOINT_KEY] == b"102"
+
+    mailbox.failing_page = None
+    delta = history_sync.HistorySync(storage, "sub").run(104, mailbox.get_page)
+    assert [m["id"] for m in delta.added] == ["m2", "m3"]
+
+
+def test_the_lease_is_renewed_after_every_page():
+    storage = FakeStorage()
+    storage.set(CHECKPOINT_KEY, b"100")
+    mailbox = FakeGmail(100)
+    for i in range(6):
+        mailbox.add_message(f"m{i}")
+    expiries = []
+    get_page = mailbox.get_page
+
+    def get_page_and_check_lease(params):
+        expiries.append(json.loads(storage.get("gmail:sub:sync_lease"))["expires_at"])
+        time.sleep(0.01)
+        return get_page(params)
+
+    delta = history_sync.HistorySync(storage, "sub").run(106, get_page_and_check_lease)
+    assert len(delta.added) == 6
+    assert len(expiries) == 3 and expiries == sorted(set(expiries))
+
+
+def test_a_sync_whose_lease_was_taken_over_stops_without_moving_the_checkpoint():
+    storage = FakeStorage()
+    storage.set(CHECKPOINT_KEY, b"100")
+    mailbox = FakeGmail(100)
+    for i in range(6):
+        mailbox.add_message(f"m{i}")
+    get_page = mailbox.get_page
+
+    def get_page_then_lose_lease(params):
+        # the lease expired during a slow request and another process claimed it
+        lease = {"owner": "other", "expires_at": time.time() + 30}
+        storage.set("gmail:sub:sync_lease", json.dumps(lease).encode())
+        return get_page(params)
+
+    assert history_sync.HistorySync(storage, "sub").run(106, get_page_then_lose_lease) is None
+    assert len(mailbox.requests) == 1
+    assert storage.data[CHECKPOINT_KEY] == b"100"
+    assert json.loads(storage.get("gmail:sub:sync_lease"))["owner"] == "other"
+
+
+def notification_request(history_id):
+    data = base64.b64encode(json.dumps({"historyId": history_id, "emailAddress": "a@b.c"}).encode()).decode()
+    return Request(EnvironBuilder(method="POST", json={"message": {"data": data}}).get_environ())
+
+
+def test_a_burst_of_notifications_is_dispatched_once(monkeypatch):
+    storage = FakeStorage()
+    storage.set(CHECKPOINT_KEY, b"100")
+    mailbox = FakeGmail(100)
+    for i in range(3):
+        mailbox.add_message(f"m{i}")
+    mailbox.delay = 0.05
+    monkeypatch.setattr(gmail.requests, "get", lambda url, headers, params, timeout: mailbox.get_page(params))
+
+    runtime = SimpleNamespace(credentials={"access_token": "token"}, session=SimpleNamespace(storage=storage))
+    trigger = gmail.GmailTrigger(runtime)
+    subscription = Subscription(endpoint="https://hook", properties={"subscription_key": "sub"})
+    dispatches = []
+
+    def notify(history_id):
+        dispatches.append(trigger._dispatch_event(subscription, notification_request(history_id)))
+
+    threads = [threading.Thread(target=notify, args=(history_id,)) for history_id in (101, 102, 103, 103)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # one read of the history, in two pages
+    assert [r.get("pageToken") for r in mailbox.requests] == [None, "1"]
+    dispatched = [d for d in dispatches if d.events]
+    assert len(dispatched) == 1
+    assert dispatched[0].events == ["gmail_message_added"]
+    assert [m["id"] for m in dispatched[0].payload["message_added"]] == ["m0", "m1", "m2"]
+    assert storage.data[CHECKPOINT_KEY] == b"103"
+    assert "gmail:sub:sync_lease" not in storage.data
+
+
+def test_a_sync_waits_for_another_process():
+    storage = FakeStorage()
+    storage.set(CHECKPOINT_KEY, b"100")
+    lease = {"owner": "other", "expires_at": time.time() + 30}
+    storage.set("gmail:sub:sync_lease", json.dumps(lease).encode())
+    mailbox = FakeGmail(100)
+    mailbox.add_message("m0")
+
+    def finish_other_sync():
+        time.sleep(0.05)
+        storage.set(CHECKPOINT_KEY, b"101")
+        storage.delete("gmail:sub:sync_lease")
+
+    other = threading.Thread(target=finish_other_sync)
+    other.start()
+    assert history_sync.HistorySync(storage, "sub").run(101, mailbox.get_page) is None
+    other.join()
+    assert mailbox.requests == []
@@ -0,0 +1,131 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+from dify_plugin.entities.trigger import Subscription
+from werkzeug import Request
+from werkzeug.test import EnvironBuilder
+
+from plugin_loader import load_plugin_modules
+
+calendar, channel_sync = load_plugin_modules(
+    "triggers/google_calendar_trigger", "provider.google_calendar_trigger", "provider.channel_sync"
+)
+
+SYNC_TOKEN_KEY = "gcal:sub:sync_token"
+
+
+class FakeStorage:
+    def __init__(self):
+        self.data = {}
+
+    def set(self, key, value):
+        self.data[key] = value
+
+    def get(self, key):
+        return self.data[key]
+
+    def exist(self, key):
+        return key in self.data
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self._payload = payload
+        self.status_code = 200
+
+    def json(self):
+        return self._payload
+
+
+class FakeCalendar:
+    """Serves the changes made since a sync token, in pages of two."""
+
+    def __init__(self):
+        self.changes = []
+        self.requests = []
+
+    def update(self, event_id, updated):
+        self.changes.append({"id": event_id, "updated": updated, "status": "confirmed", "sequence": 3})
+
+    def get(self, url, headers=None, params=None, timeout=None):
+        self.requests.append(dict(params))
+        start = int(params["syncToken"])
+        page = int(params.get("pageToken") or 0)
+        items = self.changes[start + page * 2 : start + page * 2 + 2]
+        payload = {"items": items}
+        if start + page * 2 + 2 < len(self.changes):
+            payload["nextPageToken"] = str(page + 1)
+        else:
+            payload["nextSyncToken"] = str(len(self.changes))
+        return FakeResponse(payload)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    fake = FakeCalendar()
+    monkeypatch.setattr(channel_sync, "_http_session", SimpleNamespace(get=fake.get))
+    monkeypatch.setattr(channel_sync, "_channels", {})
+    monkeypatch.setattr(channel_sync, "COALESCE_WINDOW_SECONDS", 0.05)
+    return fake
+
+
+def dispatch(storage, channel_id="channel"):
+    runtime = SimpleNamespace(credentials={"access_token": "token"}, session=SimpleNamespace(storage=storage))
+    trigger = calendar.GoogleCalendarTrigger(runtime)
+    subscription = Subscription(
+        endpoint="https://hook", parameters={}, properties={"subscription_key": "sub", "calendar_id": "primary"}
+    )
+    headers = {"X-Goog-Channel-ID": channel_id, "X-Goog-Resource-State": "exists"}
+    request = Request(EnvironBuilder(method="POST", headers=headers).get_environ())
+    return trigger._dispatch_event(subscription, request)
+
+
+def test_a_burst_of_notifications_is_served_by_one_fetch(server):
+    storage = FakeStorage()
+    storage.set(SYNC_TOKEN_KEY, b"0")
+    for i in range(3):
+        server.update(f"e{i}", "2025-01-01T00:00:00Z")
+
+    dispatches = []
+    threads = [threading.Thread(target=lambda: dispatches.append(dispatch(storage))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # one fetch of two pages
+    assert [r.get("pageToken") for r in server.requests] == [None, "1"]
+    dispatched = [d for d in dispatches if d.events]
+    assert len(dispatched) == 1
+    assert [e["id"] for e in dispatched[0].payload["updated"]] == ["e0", "e1", "e2"]
+    assert storage.data[SYNC_TOKEN_KEY] == b"3"
+
+    # a later notification fetches again, from the stored sync token
+    server.update("e3", "2025-01-01T00:00:00Z")
+    assert [e["id"] for e in dispatch(storage).payload["updated"]] == ["e3"]
+
+
+def test_changes_already_dispatched_are_dropped(server):
+    storage = FakeStorage()
+    storage.set(SYNC_TOKEN_KEY, b"0")
+    server.update("e0", "2025-01-01T00:00:00Z")
+    assert [e["id"] for e in dispatch(storage).payload["updated"]] == ["e0"]
+
+    # another process read the same change with the old token
+    storage.set(SYNC_TOKEN_KEY, b"0")
+    server.update("e0", "2025-01-02T00:00:00Z")
+    result = dispatch(storage)
+    assert [e["updated"] for e in result.payload["updated"]] == ["2025-01-02T00:00:00Z"]
+
+
+def test_the_seen_events_are_bounded(server, monkeypatch):
+    monkeypatch.setattr(calendar.GoogleCalendarTrigger, "_MAX_SEEN_EVENT_IDS", 3)
+    storage = FakeStorage()
+    storage.set(SYNC_TOKEN_KEY, b"0")
+    for i in range(5):
+        server.update(f"e{i}", "2025-01-01T00:00:00Z")
+    dispatch(storage)
+
+    seen = channel_sync.ChannelSync(storage, "sub", "channel", max_seen=3)._read_seen()
+    assert list(seen) == [f"e{i}:2025-01-01T00:00:00Z" for i in (2, 3, 4)]
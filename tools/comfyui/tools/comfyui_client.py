@@ -2,15 +2,72 @@ import dataclasses
 import json
 import mimetypes
 import os
+import queue
+import threading
+import time
 import uuid
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
 from enum import StrEnum
+from typing import Any
 
 import requests
 from dify_plugin.errors.tool import ToolProviderCredentialValidationError
+from requests.adapters import HTTPAdapter
 from websocket import WebSocket
 from yarl import URL
 
-from tools.comfyui_workflow import ComfyUiWorkflow
+from tools.comfyui_workflow import ComfyUiWorkflow, build_node_input_index
+
+MAX_CONCURRENT_DOWNLOADS = 4
+CACHE_TTL_SECONDS = 60
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Return the session shared by all ComfyUI requests of this plugin."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MAX_CONCURRENT_DOWNLOADS * 2)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+class ServerCache:
+    """Responses of ComfyUI servers kept for a limited time, keyed by server and request."""
+
+    def __init__(self):
+        self._entries: dict[tuple, tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get_or_fetch(self, key: tuple, ttl: float, fetch: Callable[[], Any]) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        value = fetch()
+        # an empty value means the request failed, so it is fetched again next time
+        if value:
+            self.put(key, ttl, value)
+        return value
+
+    def put(self, key: tuple, ttl: float, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+
+    def invalidate(self, server_key: tuple):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == server_key]:
+                del self._entries[key]
+
+
+_server_cache = ServerCache()
 
 
 class FileType(StrEnum):
@@ -37,13 +94,22 @@ class ComfyUiResultFile:
 
 
 class ComfyUiClient:
-    def __init__(self, base_url: str, api_key: str | None = None, api_key_comfy_org: str = ""):  # Add api_key parameter
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str | None = None,
+        api_key_comfy_org: str = "",
+        cache_ttl: float = CACHE_TTL_SECONDS,
+    ):
         if base_url is None or len(base_url) == 0:
             raise Exception("Please input base_url")
         self.base_url = URL(base_url)
         self.api_key = api_key  # Store api_key
         # https://docs.comfy.org/development/comfyui-server/api-key-integration#integration-of-api-key-to-use-comfyui-api-nodes
         self.api_key_comfy_org = api_key_comfy_org
+        self._session = get_session()
+        self.cache_ttl = cache_ttl
+        self._cache_key = (str(self.base_url), api_key)
 
     def _get_headers(self) -> dict:  # Helper method to get headers
         headers = {}
@@ -51,16 +117,25 @@ class ComfyUiClient:
             headers["Authorization"] = f"Bearer {self.api_key}"
         return headers
 
-    def get_model_dirs(self, path: str | None = None) -> list[str]:
+    def _cached(self, name: str | tuple, fetch: Callable[[], Any]) -> Any:
+        if self.cache_ttl <= 0:
+            return fetch()
+        return _server_cache.get_or_fetch((self._cache_key, name), self.cache_ttl, fetch)
+
+    def invalidate_cache(self):
         """
-        get checkpoints
+        Forget the model lists and node specs cached for this server,
+        e.g. after a model has been downloaded to it.
         """
+        _server_cache.invalidate(self._cache_key)
+
+    def _fetch_model_dirs(self, path: str | None) -> list[str]:
         try:
             if path is None:
                 api_url = str(self.base_url / "models")
             else:
                 api_url = str(self.base_url / "models" / path)
-            response = requests.get(url=api_url, timeout=(2, 10), headers=self._get_headers())  # Add headers
+            response = self._session.get(url=api_url, timeout=(2, 10), headers=self._get_headers())  # Add headers
             if response.status_code != 200:
                 return []
             else:
@@ -68,6 +143,23 @@ class ComfyUiClient:
         except Exception as e:
             return []
 
+    def get_model_dirs(self, path: str | None = None) -> list[str]:
+        """
+        get checkpoints
+        """
+        return self._cached(("models", path), lambda: self._fetch_model_dirs(path))
+
+    def has_model(self, path: str, model_name: str) -> bool:
+        """
+        Check whether a model exists, asking the server again when the cached list misses it.
+        """
+        if model_name in self.get_model_dirs(path):
+            return True
+        model_names = self._fetch_model_dirs(path)
+        if model_name in model_names and self.cache_ttl > 0:
+            _server_cache.put((self._cache_key, ("models", path)), self.cache_ttl, model_names)
+        return model_name in model_names
+
     def get_all_models(self, exclude_dirs: list[str] = ["custom_nodes"]) -> list[str]:
         result = []
         for model_dir in self.get_model_dirs():
@@ -89,28 +181,47 @@ class ComfyUiClient:
         """
         return self.get_model_dirs("loras")
 
-    def get_object_info(self) -> dict:
+    def _fetch_object_info(self, node_class: str | None = None) -> dict:
         try:
-            api_url = str(self.base_url / "object_info")
-            response = requests.get(url=api_url, timeout=(2, 10), headers=self._get_headers())  # Add headers
+            api_url = self.base_url / "object_info"
+            if node_class is not None:
+                api_url = api_url / node_class
+            response = self._session.get(url=str(api_url), timeout=(2, 10), headers=self._get_headers())  # Add headers
             if response.status_code == 200:
                 return response.json()
         except Exception as e:
             pass
         return {}
 
+    def get_object_info(self) -> dict:
+        """
+        get the specs of every node, cached per server; the result must not be modified
+        """
+        return self._cached("object_info", self._fetch_object_info)
+
+    def get_node_input_index(self) -> dict[str, list[str]]:
+        """
+        get the widget input names of every node, a compact stand-in for object_info
+        when converting workflows to the API format
+        """
+        return self._cached("node_input_index", lambda: build_node_input_index(self._fetch_object_info()))
+
+    def _get_ksampler_inputs(self) -> dict:
+        # samplers and schedulers share one request
+        def fetch() -> dict:
+            try:
+                return self._fetch_object_info("KSampler")["KSampler"]["input"]["required"]
+            except Exception as e:
+                return {}
+
+        return self._cached("KSampler", fetch)
+
     def get_samplers(self) -> list[str]:
         """
         get samplers
         """
         try:
-            api_url = str(self.base_url / "object_info" / "KSampler")
-            response = requests.get(url=api_url, timeout=(2, 10), headers=self._get_headers())  # Add headers
-            if response.status_code != 200:
-                return []
-            else:
-                data = response.json()["KSampler"]["input"]["required"]
-                return data["sampler_name"][0]
+            return self._get_ksampler_inputs()["sampler_name"][0]
         except Exception as e:
             return []
 
@@ -119,18 +230,12 @@ class ComfyUiClient:
         get schedulers
         """
         try:
-            api_url = str(self.base_url / "object_info" / "KSampler")
-            response = requests.get(url=api_url, timeout=(2, 10), headers=self._get_headers())  # Add headers
-            if response.status_code != 200:
-                return []
-            else:
-                data = response.json()["KSampler"]["input"]["required"]
-                return data["scheduler"][0]
+            return self._get_ksampler_inputs()["scheduler"][0]
         except Exception as e:
             return []
 
     def get_history(self, prompt_id: str) -> dict:
-        res = requests.get(
+        res = self._session.get(
             str(self.base_url / "history"),
             params={"prompt_id": prompt_id},
             headers=self._get_headers(),
@@ -139,7 +244,7 @@ class ComfyUiClient:
         return history
 
     def get_image(self, filename: str, subfolder: str, folder_type: str) -> bytes:
-        response = requests.get(
+        response = self._session.get(
             str(self.base_url / "view"),
             params={"filename": filename, "subfolder": subfolder, "type": folder_type},
             headers=self._get_headers(),  # Add headers
@@ -157,7 +262,7 @@ class ComfyUiClient:
             "overwrite": "true",
         }
         try:
-            res = requests.post(
+            res = self._session.post(
                 # Add headers for requests
                 str(self.base_url / "upload" / "image"),
                 files=files,
@@ -169,7 +274,7 @@ class ComfyUiClient:
             return None
 
     def queue_prompt(self, client_id: str, prompt: dict) -> str:
-        res = requests.post(
+        res = self._session.post(
             str(self.base_url / "prompt"),
             data=json.dumps(
                 {
@@ -201,56 +306,115 @@ class ComfyUiClient:
         ws.connect(ws_address, header=headers)
         return ws, client_id
 
+    def iter_finished_prompts(self, ws: WebSocket, prompt_ids: list[str]) -> Iterator[str]:
+        """
+        Read the websocket until every prompt in ``prompt_ids`` has finished,
+        yielding each prompt_id as its execution completes.
+        """
+        pending = set(prompt_ids)
+        while pending:
+            out = ws.recv()
+            if not isinstance(out, str):
+                continue  # binary previews
+            message = json.loads(out)
+            data = message.get("data", {})
+            if message["type"] == "execution_error" and data.get("prompt_id") in pending:
+                raise Exception(
+                    f"Node {data.get('node_id')} ({data.get('node_type')}) failed: {data.get('exception_message')}"
+                )
+            if message["type"] == "executing" and data["node"] is None and data.get("prompt_id") in pending:
+                pending.remove(data["prompt_id"])
+                yield data["prompt_id"]  # Execution is done
+
     def wait_until_generation(self, prompt: dict, ws: WebSocket, prompt_id: str):
-        node_ids = list(prompt.keys())
-        finished_nodes = []
+        for _ in self.iter_finished_prompts(ws, [prompt_id]):
+            pass
 
-        while True:
-            out = ws.recv()
-            if isinstance(out, str):
-                message = json.loads(out)
-                if message["type"] == "progress":
-                    data = message["data"]
-                    current_step = data["value"]
-                if message["type"] == "execution_cached":
-                    data = message["data"]
-                    for itm in data["nodes"]:
-                        if itm not in finished_nodes:
-                            finished_nodes.append(itm)
-                if message["type"] == "executing":
-                    data = message["data"]
-                    if data["node"] not in finished_nodes:
-                        finished_nodes.append(data["node"])
-                    if data["node"] is None and data["prompt_id"] == prompt_id:
-                        break  # Execution is done
+    def get_output_files(self, prompt_id: str) -> list[dict]:
+        history = self.get_history(prompt_id)
+        files = []
+        for output in history["outputs"].values():
+            files.extend(output.get("images", []) + output.get("gifs", []) + output.get("audio", []))
+        return files
 
-    def generate(self, workflow: ComfyUiWorkflow) -> list[ComfyUiResultFile]:
-        workflow_json = workflow.json()
+    def download_file(self, file: dict) -> ComfyUiResultFile:
+        return ComfyUiResultFile(
+            blob=self.get_image(file["filename"], file["subfolder"], file["type"]),
+            filename=file["filename"],
+            mime_type=mimetypes.guess_type(file["filename"])[0],
+            type=file["type"],
+        )
+
+    def _watch_prompts(
+        self,
+        ws: WebSocket,
+        prompt_ids: list[str],
+        downloads: ThreadPoolExecutor,
+        finished: queue.Queue,
+    ):
+        # runs beside the consumer, so outputs of a prompt download while later ones still execute
+        try:
+            for prompt_id in self.iter_finished_prompts(ws, prompt_ids):
+                index = prompt_ids.index(prompt_id)
+                futures = [downloads.submit(self.download_file, file) for file in self.get_output_files(prompt_id)]
+                if not futures:
+                    finished.put((index, []))
+                    continue
+                remaining = [len(futures)]
+                lock = threading.Lock()
+
+                def on_done(_: Future, index=index, futures=futures, remaining=remaining, lock=lock):
+                    with lock:
+                        remaining[0] -= 1
+                        if remaining[0]:
+                            return
+                    try:
+                        finished.put((index, [future.result() for future in futures]))
+                    except Exception as e:
+                        finished.put(e)
+
+                for future in futures:
+                    future.add_done_callback(on_done)
+        except Exception as e:
+            finished.put(e)
+
+    def generate_batch(
+        self, workflows: list[ComfyUiWorkflow], max_concurrent_downloads: int = MAX_CONCURRENT_DOWNLOADS
+    ) -> Iterator[tuple[int, list[ComfyUiResultFile]]]:
+        """
+        Queue all workflows on one websocket session and yield ``(index, files)``
+        for each of them as soon as its prompt has finished and its outputs are downloaded.
+        """
+        if not workflows:
+            return
         try:
             ws, client_id = self.open_websocket_connection()
         except Exception as e:
             raise Exception("Failed to open websocket:" + str(e))
+        downloads = ThreadPoolExecutor(max_workers=max_concurrent_downloads)
+        finished: queue.Queue = queue.Queue()
         try:
-            prompt_id = self.queue_prompt(client_id, workflow_json)
-            self.wait_until_generation(workflow_json, ws, prompt_id)
-        except Exception as e:
-            raise Exception("Error occured during image generation:" + str(e))
-        ws.close()
-
-        history = self.get_history(prompt_id)
-        files: list[ComfyUiResultFile] = []
-        for output in history["outputs"].values():
-            for file in output.get("images", []) + output.get("gifs", []) + output.get("audio", []):
-                image_data = self.get_image(file["filename"], file["subfolder"], file["type"])
-                generated_img = ComfyUiResultFile(
-                    blob=image_data,
-                    filename=file["filename"],
-                    mime_type=mimetypes.guess_type(file["filename"])[0],
-                    type=file["type"],
-                )
-                files.append(generated_img)
+            try:
+                prompt_ids = [self.queue_prompt(client_id, workflow.json()) for workflow in workflows]
+            except Exception as e:
+                raise Exception("Error occured during image generation:" + str(e))
+            watcher = threading.Thread(
+                target=self._watch_prompts, args=(ws, prompt_ids, downloads, finished), daemon=True
+            )
+            watcher.start()
+            for _ in workflows:
+                result = finished.get()
+                if isinstance(result, Exception):
+                    raise Exception("Error occured during image generation:" + str(result))
+                yield result
+        finally:
+            ws.close()
+            downloads.shutdown(wait=False, cancel_futures=True)
 
-        return files
+    def generate(self, workflow: ComfyUiWorkflow) -> list[ComfyUiResultFile]:
+        for _, files in self.generate_batch([workflow]):
+            return files
+        return []
 
     def convert_webp2mp4(self, webp_blob: bytes, fps: int):
         current_dir = os.path.dirname(os.path.realpath(__file__))
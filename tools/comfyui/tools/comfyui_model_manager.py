@@ -73,7 +73,7 @@ class ModelManager:
             raise Exception("Invalid model_name")
         if len(save_dir) == 0:
             raise Exception("Please specify save_dir")
-        if model_name in self._comfyui_cli.get_model_dirs(save_dir):
+        if self._comfyui_cli.has_model(save_dir, model_name):
             # model_name is the name for an existing model in ComfyUI
             return model_name
         civit_patterns = re.findall("^(civitai: *)?([0-9]+)(@([0-9]+))?", model_name)
@@ -97,7 +97,7 @@ class ModelManager:
         raise Exception(f"Model {model_name} does not exist in the local folder {save_dir}/ or online.")
 
     def download_model_autotoken(self, url: str, save_dir: str, filename: str | None = None) -> str:
-        if filename in self._comfyui_cli.get_model_dirs(save_dir):
+        if filename is not None and self._comfyui_cli.has_model(save_dir, filename):
             return filename
         try:
             return self.download_model(url, save_dir, filename, None)
@@ -123,7 +123,7 @@ class ModelManager:
 
         current_dir = os.path.dirname(os.path.realpath(__file__))
         with open(os.path.join(current_dir, "json", "download.json")) as file:
-            workflow = ComfyUiWorkflow(file.read(), object_info=self._comfyui_cli.get_object_info())
+            workflow = ComfyUiWorkflow(file.read(), node_input_index=self._comfyui_cli.get_node_input_index())
         if filename is None:
             filename = url.split("/")[-1].split("?")[0]
         if token is None:
@@ -133,6 +133,7 @@ class ModelManager:
         try:
             _ = self._comfyui_cli.generate(workflow)
         except Exception as e:
+            self._comfyui_cli.invalidate_cache()
             error = f"Failed to download: {str(e)}."
             if len(self._comfyui_cli.get_model_dirs(save_dir)) == 0:
                 error += (
@@ -145,6 +146,7 @@ class ModelManager:
                 )
             raise Exception(error)
 
+        self._comfyui_cli.invalidate_cache()
         return filename
 
     def search_civitai(self, model_id: int, version_id: int | None, save_dir: str) -> CivitAiModel:
@@ -200,7 +202,7 @@ class ModelManager:
             return "", "", "", ""
 
     def download_from_json(self, workflow_json: str) -> list[str]:
-        workflow = ComfyUiWorkflow(workflow_json, object_info=self._comfyui_cli.get_object_info())
+        workflow = ComfyUiWorkflow(workflow_json, node_input_index=self._comfyui_cli.get_node_input_index())
         model_names = []
         for model in workflow.get_models_to_download():
             self.download_model_autotoken(model.url, model.directory, model.name)
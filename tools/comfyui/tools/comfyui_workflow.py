@@ -23,6 +23,30 @@ FluxGuidanceNode = {
 }
 
 
+def widget_input_names(node_info: dict) -> list[str]:
+    """Return the names of the required inputs of a node that are set by widgets, in widget order."""
+    result: list[str] = []
+    for k in node_info["input_order"]["required"]:
+        input_type = node_info["input"]["required"][k][0]
+        if input_type in ["INT", "FLOAT", "STRING", "COMBO"] or type(input_type) is list:
+            result.append(k)
+    return result
+
+
+def build_node_input_index(object_info: dict) -> dict[str, list[str]]:
+    """
+    Reduce object_info to the widget input names of every node class,
+    which is all generate_api_ready needs from it.
+    """
+    index = {}
+    for class_type, node_info in object_info.items():
+        try:
+            index[class_type] = widget_input_names(node_info)
+        except (KeyError, IndexError, TypeError):
+            continue
+    return index
+
+
 @dataclasses.dataclass
 class ComfyUIModel:
     name: str
@@ -31,7 +55,12 @@ class ComfyUIModel:
 
 
 class ComfyUiWorkflow:
-    def __init__(self, workflow_json: str | dict, object_info: dict | None = None):
+    def __init__(
+        self,
+        workflow_json: str | dict,
+        object_info: dict | None = None,
+        node_input_index: dict[str, list[str]] | None = None,
+    ):
         if type(workflow_json) is str:
 
             def clean_json_string(string: str) -> str:
@@ -50,9 +79,9 @@ class ComfyUiWorkflow:
         self._workflow_original = workflow_json
         self.models_to_download: list[ComfyUIModel] = []
         if "nodes" in workflow_json:
-            if object_info is None:
+            if object_info is None and node_input_index is None:
                 raise Exception("This json is not API ready and object_info is needed.")
-            self._workflow_api = self.generate_api_ready(object_info)
+            self._workflow_api = self.generate_api_ready(object_info, node_input_index)
             for node in workflow_json["nodes"]:
                 if "properties" in node and "models" in node["properties"]:
                     for model in node["properties"]["models"]:
@@ -63,17 +92,15 @@ class ComfyUiWorkflow:
     def __str__(self):
         return json.dumps(self._workflow_api)
 
-    def generate_api_ready(self, object_info: dict) -> dict:
+    def generate_api_ready(
+        self, object_info: dict | None = None, node_input_index: dict[str, list[str]] | None = None
+    ) -> dict:
         def get_widget_values(class_type: str) -> list[str]:
-            result: list[str] = []
+            if node_input_index is not None:
+                return node_input_index.get(class_type, [])
             if class_type not in object_info:
                 return []
-            data = object_info[class_type]
-            for k in data["input_order"]["required"]:
-                input_type = data["input"]["required"][k][0]
-                if input_type in ["INT", "FLOAT", "STRING", "COMBO"] or type(input_type) is list:
-                    result.append(k)
-            return result
+            return widget_input_names(object_info[class_type])
 
         result = {}
         nodes = self.json_original()["nodes"]
@@ -38,7 +38,7 @@ class DownloadCivitAI(Tool):
         yield self.create_variable_message("type", civitai_model.model_type)
         yield self.create_variable_message("source", civitai_model.source)
 
-        if civitai_model.name in comfyui.get_model_dirs(civitai_model.directory):
+        if comfyui.has_model(civitai_model.directory, civitai_model.name):
             yield self.create_text_message("Model was found on local. Download skipped.")
             return
         yield self.create_text_message("Downloading...")
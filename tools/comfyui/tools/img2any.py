@@ -59,7 +59,6 @@ class ComfyuiImg2Any(Tool):
             )
 
     def depth_pro(self, feature, image_names) -> list[ComfyUiResultFile]:
-        output_images = []
         current_dir = os.path.dirname(os.path.realpath(__file__))
         with open(os.path.join(current_dir, "json", "depth_pro.json")) as file:
             workflow = ComfyUiWorkflow(file.read(), object_info=self.comfyui.get_object_info())
@@ -68,32 +67,39 @@ class ComfyuiImg2Any(Tool):
             precision = "fp32"
         workflow.set_property("6", "inputs/precision", precision)
 
+        workflows = []
         for image_name in image_names:
             workflow.set_property("8", "inputs/image", image_name)
-            try:
-                output_images.append(self.comfyui.generate(workflow)[0])
-            except Exception as e:
-                raise ToolProviderCredentialValidationError(
-                    f"Failed to generate image: {str(e)}."
-                    + " Maybe install https://github.com/spacepxl/ComfyUI-Depth-Pro on ComfyUI"
-                )
+            workflows.append(ComfyUiWorkflow(workflow.json()))
+        output_images = [None] * len(workflows)
+        try:
+            for index, files in self.comfyui.generate_batch(workflows):
+                output_images[index] = files[0]
+        except Exception as e:
+            raise ToolProviderCredentialValidationError(
+                f"Failed to generate image: {str(e)}."
+                + " Maybe install https://github.com/spacepxl/ComfyUI-Depth-Pro on ComfyUI"
+            )
         return output_images
 
     def depth_anything(self, feature, image_names) -> list[ComfyUiResultFile]:
-        output_images = []
         current_dir = os.path.dirname(os.path.realpath(__file__))
         with open(os.path.join(current_dir, "json", "depth_anything.json")) as file:
             workflow = ComfyUiWorkflow(file.read(), object_info=self.comfyui.get_object_info())
         workflow.set_property("2", "inputs/model", feature)
+        workflows = []
         for image_name in image_names:
             workflow.set_property("3", "inputs/image", image_name)
-            try:
-                output_images.append(self.comfyui.generate(workflow)[0])
-            except Exception as e:
-                raise ToolProviderCredentialValidationError(
-                    f"Failed to generate image: {str(e)}."
-                    + " Maybe install https://github.com/kijai/ComfyUI-DepthAnythingV2 on ComfyUI"
-                )
+            workflows.append(ComfyUiWorkflow(workflow.json()))
+        output_images = [None] * len(workflows)
+        try:
+            for index, files in self.comfyui.generate_batch(workflows):
+                output_images[index] = files[0]
+        except Exception as e:
+            raise ToolProviderCredentialValidationError(
+                f"Failed to generate image: {str(e)}."
+                + " Maybe install https://github.com/kijai/ComfyUI-DepthAnythingV2 on ComfyUI"
+            )
         return output_images
 
     def face_swap(self, image_name1, image_name2) -> list[ComfyUiResultFile]:
@@ -112,7 +118,6 @@ class ComfyuiImg2Any(Tool):
         return output_images
 
     def upscale(self, feature, image_names) -> list[ComfyUiResultFile]:
-        output_images = []
         current_dir = os.path.dirname(os.path.realpath(__file__))
         with open(os.path.join(current_dir, "json", "upscale.json")) as file:
             workflow = ComfyUiWorkflow(file.read(), object_info=self.comfyui.get_object_info())
@@ -122,13 +127,17 @@ class ComfyuiImg2Any(Tool):
                 "upscale_models",
             )
         workflow.set_property("13", "inputs/model_name", model_name)
+        workflows = []
         for image_name in image_names:
             workflow.set_property("16", "inputs/image", image_name)
-            try:
-                output_images.append(self.comfyui.generate(workflow)[0])
-            except Exception as e:
-                raise ToolProviderCredentialValidationError(
-                    f"Failed to generate image: {str(e)}."
-                    + " Maybe install https://github.com/kijai/ComfyUI-DepthAnythingV2 on ComfyUI"
-                )
+            workflows.append(ComfyUiWorkflow(workflow.json()))
+        output_images = [None] * len(workflows)
+        try:
+            for index, files in self.comfyui.generate_batch(workflows):
+                output_images[index] = files[0]
+        except Exception as e:
+            raise ToolProviderCredentialValidationError(
+                f"Failed to generate image: {str(e)}."
+                + " Maybe install https://github.com/kijai/ComfyUI-DepthAnythingV2 on ComfyUI"
+            )
         return output_images
@@ -99,7 +99,7 @@ class ComfyuiImg2Img(Tool):
 
         current_dir = os.path.dirname(os.path.realpath(__file__))
         with open(os.path.join(current_dir, "json", "img2img.json")) as file:
-            workflow = ComfyUiWorkflow(file.read(), self.comfyui.get_object_info())
+            workflow = ComfyUiWorkflow(file.read(), node_input_index=self.comfyui.get_node_input_index())
 
         workflow.set_k_sampler(
             None,
@@ -122,17 +122,19 @@ class ComfyuiImg2Img(Tool):
             workflow.add_lora_node("3", "6", "7", lora_name, strength, strength)
         yield self.create_json_message(workflow.json())
 
+        seeded_workflows = []
         for _ in range(batch_size):
             workflow.randomize_seed()
-            try:
-                output_images = self.comfyui.generate(workflow)
-            except Exception as e:
-                raise ToolProviderCredentialValidationError(f"Failed to generate image: {str(e)}")
-            for img in output_images:
-                yield self.create_blob_message(
-                    blob=img.blob,
-                    meta={
-                        "filename": img.filename,
-                        "mime_type": img.mime_type,
-                    },
-                )
+            seeded_workflows.append(ComfyUiWorkflow(workflow.json()))
+        try:
+            for _, output_images in self.comfyui.generate_batch(seeded_workflows):
+                for img in output_images:
+                    yield self.create_blob_message(
+                        blob=img.blob,
+                        meta={
+                            "filename": img.filename,
+                            "mime_type": img.mime_type,
+                        },
+                    )
+        except Exception as e:
+            raise ToolProviderCredentialValidationError(f"Failed to generate image: {str(e)}")
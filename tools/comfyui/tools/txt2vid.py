@@ -137,7 +137,7 @@ class ComfyuiTxt2Vid(Tool):
 
         current_dir = os.path.dirname(os.path.realpath(__file__))
         with open(os.path.join(current_dir, "json", "txt2vid_mochi.json")) as file:
-            workflow = ComfyUiWorkflow(file.read(), self.comfyui.get_object_info())
+            workflow = ComfyUiWorkflow(file.read(), node_input_index=self.comfyui.get_node_input_index())
 
         workflow.set_k_sampler(
             None,
@@ -187,7 +187,7 @@ class ComfyuiTxt2Vid(Tool):
         )
         current_dir = os.path.dirname(os.path.realpath(__file__))
         with open(os.path.join(current_dir, "json", "txt2vid_hunyuan.json")) as file:
-            workflow = ComfyUiWorkflow(file.read(), self.comfyui.get_object_info())
+            workflow = ComfyUiWorkflow(file.read(), node_input_index=self.comfyui.get_node_input_index())
         workflow.set_k_sampler(
             None,
             config.steps,
@@ -229,7 +229,7 @@ class ComfyuiTxt2Vid(Tool):
         )
         current_dir = os.path.dirname(os.path.realpath(__file__))
         with open(os.path.join(current_dir, "json", "txt2vid_wan2_1.json")) as file:
-            workflow = ComfyUiWorkflow(file.read(), self.comfyui.get_object_info())
+            workflow = ComfyUiWorkflow(file.read(), node_input_index=self.comfyui.get_node_input_index())
 
         workflow.set_prompt("6", config.prompt)
         workflow.set_prompt("7", config.negative_prompt)
@@ -253,7 +253,7 @@ class ComfyuiTxt2Vid(Tool):
             os.path.join(current_dir, "json", "txt2vid_wan2_2_14B.json"),
             encoding="UTF-8",
         ) as file:
-            workflow = ComfyUiWorkflow(file.read(), self.comfyui.get_object_info())
+            workflow = ComfyUiWorkflow(file.read(), node_input_index=self.comfyui.get_node_input_index())
             self.model_manager.download_from_json(workflow.json_original_str())
 
         workflow.set_prompt("89", config.prompt)
@@ -273,7 +273,7 @@ class ComfyuiTxt2Vid(Tool):
             os.path.join(current_dir, "json", "txt2vid_wan2_2_5B.json"),
             encoding="UTF-8",
         ) as file:
-            workflow = ComfyUiWorkflow(file.read(), self.comfyui.get_object_info())
+            workflow = ComfyUiWorkflow(file.read(), node_input_index=self.comfyui.get_node_input_index())
             self.model_manager.download_from_json(workflow.json_original_str())
 
         workflow.set_prompt("6", config.prompt)
@@ -307,7 +307,7 @@ class ComfyuiTxt2Vid(Tool):
 
         current_dir = os.path.dirname(os.path.realpath(__file__))
         with open(os.path.join(current_dir, "json", "txt2vid_ltxv.json")) as file:
-            workflow = ComfyUiWorkflow(file.read(), self.comfyui.get_object_info())
+            workflow = ComfyUiWorkflow(file.read(), node_input_index=self.comfyui.get_node_input_index())
 
         webp_node_id = workflow.identify_node_by_class_type("SaveAnimatedWEBP")
         workflow.set_property(webp_node_id, "inputs/fps", config.fps)
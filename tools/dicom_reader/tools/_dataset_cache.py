@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import numpy as np
+import pydicom
+from pydicom.encaps import encapsulate, generate_pixel_data_frame
+from pydicom.pixel_data_handlers.util import pixel_dtype
+
+# Workflows usually chain several DICOM tools over the same upload, so parsed
+# datasets are shared between invocations and frames are decoded on demand.
+# The budget stays well below the plugin memory limit declared in the manifest.
+DATASET_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Native pixel data that cannot be viewed frame by frame with numpy alone
+_SUBSAMPLED_PHOTOMETRICS = {"YBR_FULL_422", "YBR_PARTIAL_422", "YBR_PARTIAL_420"}
+_NUMBER_OF_FRAMES_TAG = 0x00280008
+_PIXEL_DATA_TAG = 0x7FE00010
+
+
+class CachedDicom:
+    """
+    A parsed dataset with lazily decoded pixel frames.
+
+    Uncompressed pixel data is exposed as read-only numpy views over the parsed
+    PixelData buffer, so no frame is copied; uncompressed data that cannot be
+    viewed that way is decoded whole by pydicom. Encapsulated (compressed) pixel
+    data is decoded one frame at a time and the decoded frames are kept.
+    """
+
+    def __init__(self, dataset: pydicom.dataset.Dataset, blob_size: int, on_resize=None):
+        self.dataset = dataset
+        self.blob_size = blob_size
+        self._on_resize = on_resize
+        self._frames: dict[int, np.ndarray] = {}
+        self._pixel_array: np.ndarray | None = None
+        self._decoded_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        return self.blob_size + self._decoded_bytes
+
+    @property
+    def number_of_frames(self) -> int:
+        return int(getattr(self.dataset, "NumberOfFrames", 1) or 1)
+
+    @property
+    def has_pixel_data(self) -> bool:
+        return any(
+            keyword in self.dataset
+            for keyword in ("PixelData", "FloatPixelData", "DoubleFloatPixelData")
+        )
+
+    def frame(self, desired_frame: int) -> tuple[np.ndarray, int]:
+        """Return one frame and its clamped index, decoding only that frame.
+
+        Mirrors ``select_frame``: single-frame datasets return the whole array.
+        """
+        frames = self.number_of_frames
+        if frames <= 1:
+            return self.pixel_array(), 0
+        index = max(0, min(int(desired_frame), frames - 1))
+        with self._lock:
+            if self._pixel_array is not None and self._pixel_array.shape[0] == frames:
+                return self._pixel_array[index], index
+            cached = self._frames.get(index)
+        if cached is not None:
+            return cached, index
+
+        view = self._native_frames(index, 1)
+        if view is not None:
+            return view[0], index
+        if not self._is_encapsulated():
+            # native data numpy cannot view (big endian, 1-bit, subsampled YBR) is decoded whole
+            return self.pixel_array()[index], index
+
+        array = self._decode_encapsulated_frame(index)
+        array.setflags(write=False)
+        with self._lock:
+            self._frames[index] = array
+            self._decoded_bytes += array.nbytes
+        self._resized()
+        return array, index
+
+    def pixel_array(self) -> np.ndarray:
+        """Return the full pixel array, as ``Dataset.pixel_array`` would."""
+        with self._lock:
+            if self._pixel_array is not None:
+                return self._pixel_array
+
+        array = self._native_frames(0, self.number_of_frames)
+        decoded_bytes = 0
+        if array is None:
+            array = np.asarray(self.dataset.pixel_array)
+            decoded_bytes = array.nbytes
+        elif self.number_of_frames <= 1:
+            array = array[0]
+        array.setflags(write=False)
+
+        with self._lock:
+            self._pixel_array = array
+            # decoded single frames are now redundant with the full array
+            self._frames.clear()
+            self._decoded_bytes = decoded_bytes
+        self._resized()
+        return array
+
+    def _resized(self) -> None:
+        if self._on_resize is not None:
+            self._on_resize()
+
+    def _is_encapsulated(self) -> bool:
+        transfer_syntax = getattr(getattr(self.dataset, "file_meta", None), "TransferSyntaxUID", None)
+        return transfer_syntax is not None and transfer_syntax.is_encapsulated
+
+    def _native_frames(self, start: int, count: int) -> np.ndarray | None:
+        """Zero-copy ``(count, rows, cols[, samples])`` view over uncompressed pixel data."""
+        ds = self.dataset
+        transfer_syntax = getattr(getattr(ds, "file_meta", None), "TransferSyntaxUID", None)
+        if transfer_syntax is None or transfer_syntax.is_compressed or "PixelData" not in ds:
+            return None
+        # big endian pixel data needs the byte swapping pydicom does
+        if not transfer_syntax.is_little_endian:
+            return None
+        bits_allocated = int(getattr(ds, "BitsAllocated", 0) or 0)
+        if bits_allocated not in (8, 16, 32, 64):
+            return None
+        if str(getattr(ds, "PhotometricInterpretation", "")) in _SUBSAMPLED_PHOTOMETRICS:
+            return None
+
+        rows = int(ds.Rows)
+        columns = int(ds.Columns)
+        samples = int(getattr(ds, "SamplesPerPixel", 1) or 1)
+        try:
+            dtype = pixel_dtype(ds)
+        except Exception:  # pylint: disable=broad-except
+            return None
+
+        frame_items = rows * columns * samples
+        pixel_data = ds.PixelData
+        if len(pixel_data) < frame_items * dtype.itemsize * (start + count):
+            return None
+        array = np.frombuffer(
+            pixel_data,
+            dtype=dtype,
+            count=frame_items * count,
+            offset=frame_items * dtype.itemsize * start,
+        )
+        if samples == 1:
+            return array.reshape(count, rows, columns)
+        if int(getattr(ds, "PlanarConfiguration", 0) or 0) == 0:
+            return array.reshape(count, rows, columns, samples)
+        return array.reshape(count, samples, rows, columns).transpose(0, 2, 3, 1)
+
+    def _decode_encapsulated_frame(self, index: int) -> np.ndarray:
+        """Decode a single compressed frame through the regular pydicom handlers."""
+        ds = self.dataset
+        frame_bytes = generate_pixel_data_frame(ds.PixelData, self.number_of_frames)
+        for _ in range(index):
+            next(frame_bytes)
+        fragment = next(frame_bytes)
+
+        # a fresh dataset sharing every other element, so the cached one is untouched
+        single = pydicom.dataset.Dataset()
+        for element in ds:
+            if element.tag not in (_NUMBER_OF_FRAMES_TAG, _PIXEL_DATA_TAG):
+                single.add(element)
+        single.file_meta = ds.file_meta
+        single.is_little_endian = ds.is_little_endian
+        single.is_implicit_VR = ds.is_implicit_VR
+        single.add_new(_NUMBER_OF_FRAMES_TAG, "IS", 1)
+        single.add_new(_PIXEL_DATA_TAG, "OB", encapsulate([fragment]))
+        single[_PIXEL_DATA_TAG].is_undefined_length = True
+        return np.asarray(single.pixel_array)
+
+
+class DicomDatasetCache:
+    """LRU cache of parsed DICOM datasets keyed by blob hash and bounded by bytes."""
+
+    def __init__(self, max_bytes: int = DATASET_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, CachedDicom] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, blob: bytes) -> CachedDicom:
+        """Return the cached dataset for ``blob``, parsing it on first use.
+
+        Raises the same exceptions as ``pydicom.dcmread``.
+        """
+        key = hashlib.sha256(blob).hexdigest()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        dataset = pydicom.dcmread(BytesIO(blob), stop_before_pixels=False, force=True)
+        entry = CachedDicom(dataset, len(blob), on_resize=self._evict)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+        self._evict()
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def nbytes(self) -> int:
+        with self._lock:
+            return sum(entry.nbytes for entry in self._entries.values())
+
+    def _evict(self) -> None:
+        with self._lock:
+            total = sum(entry.nbytes for entry in self._entries.values())
+            # keep the most recent entry even when it alone exceeds the budget
+            while total > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                total -= evicted.nbytes
+
+
+dataset_cache = DicomDatasetCache()
+
+
+def load_dicom(blob: bytes) -> CachedDicom:
+    """Parse ``blob`` through the shared dataset cache."""
+    return dataset_cache.get(blob)
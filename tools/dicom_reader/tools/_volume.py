@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Iterable, Sequence
+
+import numpy as np
+import pydicom
+
+from ._dataset_cache import CachedDicom
+
+
+@dataclass
+class SliceVolume:
+    """A stack of slices as one ``(slices, rows, columns[, samples])`` float32 array."""
+
+    voxels: np.ndarray
+    spacing: tuple[float, float, float]
+    positions: list[float | None]
+
+    @property
+    def voxel_volume(self) -> float:
+        dx, dy, dz = self.spacing
+        return float(dx * dy * dz)
+
+
+def slice_position(ds: pydicom.dataset.Dataset) -> float | None:
+    """Distance of the slice along its normal, from ImagePositionPatient."""
+    position = getattr(ds, "ImagePositionPatient", None)
+    if position is None or len(position) < 3:
+        return None
+    normal = np.array([0.0, 0.0, 1.0])
+    orientation = getattr(ds, "ImageOrientationPatient", None)
+    try:
+        if orientation is not None and len(orientation) >= 6:
+            row = np.array([float(v) for v in orientation[:3]])
+            column = np.array([float(v) for v in orientation[3:6]])
+            normal = np.cross(row, column)
+        return float(np.dot(normal, [float(v) for v in position[:3]]))
+    except (TypeError, ValueError):
+        return None
+
+
+def sort_slices(dicoms: Iterable[CachedDicom]) -> list[CachedDicom]:
+    """Order slices by ImagePositionPatient, falling back to InstanceNumber."""
+    dicoms = list(dicoms)
+    positions = [slice_position(dicom.dataset) for dicom in dicoms]
+    if all(position is not None for position in positions):
+        order = sorted(range(len(dicoms)), key=lambda i: positions[i])
+        return [dicoms[i] for i in order]
+    numbers = [getattr(dicom.dataset, "InstanceNumber", None) for dicom in dicoms]
+    if all(number is not None for number in numbers):
+        order = sorted(range(len(dicoms)), key=lambda i: int(numbers[i]))
+        return [dicoms[i] for i in order]
+    return dicoms
+
+
+def pixel_spacing(ds: pydicom.dataset.Dataset) -> tuple[float, float]:
+    spacing = getattr(ds, "PixelSpacing", None)
+    try:
+        if spacing is not None and len(spacing) >= 2:
+            return float(spacing[0]), float(spacing[1])
+    except (TypeError, ValueError):
+        pass
+    return 1.0, 1.0
+
+
+def slice_thickness(ds: pydicom.dataset.Dataset) -> float:
+    for tag in ("SliceThickness", "SpacingBetweenSlices"):
+        value = getattr(ds, tag, None)
+        if value is not None:
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                continue
+    return 1.0
+
+
+def rescale_into(out: np.ndarray, pixels: np.ndarray, ds: pydicom.dataset.Dataset) -> np.ndarray:
+    """Write ``pixels * RescaleSlope + RescaleIntercept`` into ``out`` without temporaries."""
+    slope = float(getattr(ds, "RescaleSlope", 1.0) or 1.0)
+    intercept = float(getattr(ds, "RescaleIntercept", 0.0) or 0.0)
+    if slope == 1.0:
+        out[...] = pixels
+    else:
+        np.multiply(pixels, slope, out=out, casting="unsafe")
+    if intercept != 0.0:
+        out += intercept
+    return out
+
+
+def build_volume(dicoms: Sequence[CachedDicom]) -> SliceVolume:
+    """
+    Stack a series into one preallocated float32 volume in rescaled units.
+
+    Single-frame slices are sorted by position; the frames of a multi-frame
+    dataset keep their stored order. Multi-channel slices keep their samples
+    on a trailing axis.
+    """
+    if not dicoms:
+        raise ValueError("No slices were provided.")
+    ordered = sort_slices(dicoms) if len(dicoms) > 1 else list(dicoms)
+
+    first = ordered[0].dataset
+    rows, columns = int(first.Rows), int(first.Columns)
+    samples = int(getattr(first, "SamplesPerPixel", 1) or 1)
+    total = 0
+    for dicom in ordered:
+        ds = dicom.dataset
+        if int(ds.Rows) != rows or int(ds.Columns) != columns:
+            raise ValueError(
+                f"Slice size {int(ds.Rows)}x{int(ds.Columns)} does not match {rows}x{columns}."
+            )
+        if int(getattr(ds, "SamplesPerPixel", 1) or 1) != samples:
+            raise ValueError("Slices with different samples per pixel cannot be stacked.")
+        total += dicom.number_of_frames
+
+    shape = (total, rows, columns) + ((samples,) if samples > 1 else ())
+    voxels = np.empty(shape, dtype=np.float32)
+    positions: list[float | None] = []
+    offset = 0
+    for dicom in ordered:
+        count = dicom.number_of_frames
+        pixels = dicom.pixel_array()
+        target = voxels[offset : offset + count]
+        rescale_into(target if count > 1 else target[0], pixels, dicom.dataset)
+        if count == 1:
+            positions.append(slice_position(dicom.dataset))
+        else:
+            positions.extend([None] * count)
+        offset += count
+
+    dx, dy = pixel_spacing(first)
+    dz = slice_thickness(first)
+    known = [p for p in positions if p is not None]
+    if len(known) > 1 and len(known) == len(positions):
+        gaps = np.abs(np.diff(known))
+        gaps = gaps[gaps > 0]
+        if gaps.size:
+            dz = float(np.median(gaps))
+    return SliceVolume(voxels=voxels, spacing=(dx, dy, dz), positions=positions)
+
+
+def apply_window(x: np.ndarray, lower: float, upper: float) -> np.ndarray:
+    """Map ``[lower, upper]`` onto ``[0, 1]`` in place, clipping values outside."""
+    if upper <= lower:
+        x.fill(0)
+        return x
+    x -= lower
+    x *= 1.0 / (upper - lower)
+    np.clip(x, 0.0, 1.0, out=x)
+    return x
+
+
+def _axis_index(axis: int, index) -> tuple:
+    return (slice(None),) * axis + (index,)
+
+
+def _leading_cumsum(x: np.ndarray, axis: int) -> np.ndarray:
+    """Cumulative sum along ``axis`` with a leading zero plane."""
+    shape = list(x.shape)
+    shape[axis] += 1
+    csum = np.empty(shape, dtype=np.float32)
+    csum[_axis_index(axis, 0)] = 0
+    if axis == x.ndim - 1:
+        np.cumsum(x, axis=axis, out=csum[_axis_index(axis, slice(1, None))])
+        return csum
+    # np.cumsum walks outer axes element by element; adding whole planes is much faster
+    for i in range(x.shape[axis]):
+        np.add(
+            csum[_axis_index(axis, i)], x[_axis_index(axis, i)], out=csum[_axis_index(axis, i + 1)]
+        )
+    return csum
+
+
+def _box_mean_along(x: np.ndarray, size: int, axis: int) -> None:
+    """Centred moving average along one axis, written back into ``x``.
+
+    Windows are truncated at the borders and averaged over the voxels they cover.
+    """
+    n = x.shape[axis]
+    csum = _leading_cumsum(x, axis)
+    start = np.arange(n) - size // 2
+    lo = np.clip(start, 0, n)
+    hi = np.clip(start + size, 0, n)
+
+    # interior windows are full: one strided subtraction over the whole slab
+    first, last = size // 2, n - size + size // 2
+    if last >= first:
+        interior = x[_axis_index(axis, slice(first, last + 1))]
+        np.subtract(
+            csum[_axis_index(axis, slice(size, n + 1))],
+            csum[_axis_index(axis, slice(0, n + 1 - size))],
+            out=interior,
+        )
+        interior *= 1.0 / size
+        border = np.concatenate([np.arange(0, first), np.arange(last + 1, n)])
+    else:
+        border = np.arange(n)
+    if border.size:
+        counts = (hi[border] - lo[border]).astype(np.float32)
+        counts_shape = [1] * x.ndim
+        counts_shape[axis] = border.size
+        sums = np.take(csum, hi[border], axis=axis) - np.take(csum, lo[border], axis=axis)
+        x[_axis_index(axis, border)] = sums / counts.reshape(counts_shape)
+
+
+def box_filter(volume: np.ndarray, size: int, axes: Sequence[int] | None = None) -> np.ndarray:
+    """
+    Separable box filter that keeps the input shape.
+
+    Each axis is one cumulative sum and one strided subtraction, so the cost
+    does not depend on ``size`` and no Python loop runs over slices or channels.
+    """
+    result = np.array(volume, dtype=np.float32, copy=True)
+    if size <= 1:
+        return result
+    for axis in range(result.ndim) if axes is None else axes:
+        if result.shape[axis]:
+            _box_mean_along(result, size, axis)
+    return result
+
+
+def box_blur_valid(x: np.ndarray, size: int, axes: Sequence[int] = (1, 0)) -> np.ndarray:
+    """
+    Box blur keeping only full windows, so each listed axis shrinks by ``size - 1``.
+
+    Trailing axes (such as colour channels) are filtered together.
+    """
+    result = np.asarray(x, dtype=np.float32)
+    for axis in axes:
+        n = result.shape[axis]
+        count = max(n + 1 - size, 0)
+        csum = _leading_cumsum(result, axis)
+        # window sums overwrite the prefix sums front to back, reusing their buffer
+        window = csum[_axis_index(axis, slice(0, count))]
+        if axis == csum.ndim - 1:
+            window[...] = csum[_axis_index(axis, slice(size, size + count))] - window
+        else:
+            for i in range(count):
+                np.subtract(
+                    csum[_axis_index(axis, i + size)],
+                    csum[_axis_index(axis, i)],
+                    out=csum[_axis_index(axis, i)],
+                )
+        window *= 1.0 / size
+        result = window
+    return result
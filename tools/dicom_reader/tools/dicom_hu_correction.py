@@ -1,13 +1,12 @@
 from __future__ import annotations
 
 from typing import Any
-from io import BytesIO
 
 import numpy as np
-import pydicom
 from dify_plugin import Tool
 
-from ._utils import as_bool, as_int, make_preview_png_bytes, select_frame, to_uint8_minmax
+from ._dataset_cache import load_dicom
+from ._utils import as_bool, as_int, make_preview_png_bytes, to_uint8_minmax
 
 
 class DicomHUCorrectionTool(Tool):
@@ -33,13 +32,14 @@ class DicomHUCorrectionTool(Tool):
 
         filename = getattr(file_obj, "filename", "dicom_file.dcm")
         try:
-            ds = pydicom.dcmread(BytesIO(blob), stop_before_pixels=False, force=True)
+            dicom = load_dicom(blob)
         except Exception as exc:  # pylint: disable=broad-except
             yield self.create_text_message(f"Failed to parse DICOM: {exc}")
             return
+        ds = dicom.dataset
 
         try:
-            arr = np.asarray(ds.pixel_array)
+            frame, idx = dicom.frame(frame_index)
         except Exception as exc:  # pylint: disable=broad-except
             yield self.create_json_message({"error": f"No pixel data: {exc}"})
             return
@@ -47,7 +47,6 @@ class DicomHUCorrectionTool(Tool):
         slope = float(getattr(ds, "RescaleSlope", 1.0) or 1.0)
         intercept = float(getattr(ds, "RescaleIntercept", 0.0) or 0.0)
 
-        frame, idx = select_frame(ds, arr, frame_index)
         hu = frame.astype(np.float32) * slope + intercept
 
         result: dict[str, Any] = {
@@ -1,14 +1,13 @@
 from __future__ import annotations
 
 from typing import Any
-from io import BytesIO
 
 import numpy as np
-import pydicom
 from PIL import Image
 from dify_plugin import Tool
 
-from ._utils import as_bool, as_int, make_preview_png_bytes, select_frame
+from ._dataset_cache import load_dicom
+from ._utils import as_bool, as_int, make_preview_png_bytes
 
 
 class DicomModelInputTool(Tool):
@@ -36,18 +35,17 @@ class DicomModelInputTool(Tool):
 
         filename = getattr(file_obj, "filename", "dicom_file.dcm")
         try:
-            ds = pydicom.dcmread(BytesIO(blob), stop_before_pixels=False, force=True)
+            dicom = load_dicom(blob)
         except Exception as exc:  # pylint: disable=broad-except
             yield self.create_text_message(f"Failed to parse DICOM: {exc}")
             return
 
         try:
-            arr = np.asarray(ds.pixel_array)
+            frame, _ = dicom.frame(frame_index)
         except Exception as exc:  # pylint: disable=broad-except
             yield self.create_text_message(f"No pixel array: {exc}")
             return
 
-        frame, _ = select_frame(ds, arr, frame_index)
         x = frame.astype(np.float32)
 
         # Ensure 2D/3D (channels last if multi-channel)
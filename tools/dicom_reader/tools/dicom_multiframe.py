@@ -1,13 +1,12 @@
 from __future__ import annotations
 
 from typing import Any
-from io import BytesIO
 
 import numpy as np
-import pydicom
 from dify_plugin import Tool
 
-from ._utils import as_bool, as_int, make_preview_png_bytes, select_frame
+from ._dataset_cache import load_dicom
+from ._utils import as_bool, as_int, make_preview_png_bytes
 
 
 class DicomMultiframeTool(Tool):
@@ -33,29 +32,30 @@ class DicomMultiframeTool(Tool):
 
         filename = getattr(file_obj, "filename", "dicom_file.dcm")
         try:
-            ds = pydicom.dcmread(BytesIO(blob), stop_before_pixels=False, force=True)
+            dicom = load_dicom(blob)
         except Exception as exc:  # pylint: disable=broad-except
             yield self.create_text_message(f"Failed to parse DICOM: {exc}")
             return
 
         try:
-            arr = np.asarray(ds.pixel_array)
+            frame, idx = dicom.frame(frame_index)
+            arr_shape = dicom.pixel_array().shape if with_shapes else None
         except Exception as exc:  # pylint: disable=broad-except
             yield self.create_json_message({
-                "number_of_frames": int(getattr(ds, "NumberOfFrames", 1) or 1),
+                "number_of_frames": dicom.number_of_frames,
                 "error": f"No pixel array: {exc}",
             })
             return
 
         info: dict[str, Any] = {
-            "number_of_frames": int(getattr(ds, "NumberOfFrames", 1) or 1),
+            "number_of_frames": dicom.number_of_frames,
         }
 
         if with_shapes:
-            info["array_shape"] = tuple(int(x) for x in arr.shape)
+            info["array_shape"] = tuple(int(x) for x in arr_shape)
 
         if include_preview:
-            preview = self._preview_frame(arr, ds, frame_index, max_edge, filename)
+            preview = self._preview_frame(frame, idx, max_edge, filename)
             if "blob" in preview:
                 blob = preview.pop("blob")
                 yield self.create_blob_message(blob=blob, meta={
@@ -66,8 +66,7 @@ class DicomMultiframeTool(Tool):
 
         yield self.create_json_message(info)
 
-    def _preview_frame(self, arr: np.ndarray, ds, frame_index: int, max_edge: int, original_filename: str) -> dict[str, Any]:
-        frame, idx = select_frame(ds, arr, frame_index)
+    def _preview_frame(self, frame: np.ndarray, idx: int, max_edge: int, original_filename: str) -> dict[str, Any]:
         frame = np.squeeze(frame)
         blob, pw, ph = make_preview_png_bytes(frame, max_edge)
         name = (original_filename.rsplit(".", 1)[0] or "dicom") + f"_frame_{idx}.png"
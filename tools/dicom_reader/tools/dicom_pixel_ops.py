@@ -1,13 +1,13 @@
 from __future__ import annotations
 
-from io import BytesIO
 from typing import Any
 
 import numpy as np
-import pydicom
 from dify_plugin import Tool
 
-from ._utils import as_int, make_preview_png_bytes, select_frame, to_uint8_minmax
+from ._dataset_cache import load_dicom
+from ._utils import as_int, make_preview_png_bytes, to_uint8_minmax
+from ._volume import apply_window, box_blur_valid
 
 
 class DicomPixelOpsTool(Tool):
@@ -37,18 +37,17 @@ class DicomPixelOpsTool(Tool):
 
         filename = getattr(file_obj, "filename", "dicom_file.dcm")
         try:
-            ds = pydicom.dcmread(BytesIO(blob), stop_before_pixels=False, force=True)
+            dicom = load_dicom(blob)
         except Exception as exc:  # pylint: disable=broad-except
             yield self.create_text_message(f"Failed to parse DICOM: {exc}")
             return
 
         try:
-            arr = np.asarray(ds.pixel_array)
+            frame, idx = dicom.frame(frame_index)
         except Exception as exc:  # pylint: disable=broad-except
             yield self.create_json_message({"error": f"No pixel data: {exc}"})
             return
 
-        frame, idx = select_frame(ds, arr, frame_index)
         data = frame.astype(np.float32)
 
         if op == "normalize":
@@ -63,10 +62,7 @@ class DicomPixelOpsTool(Tool):
             out = np.clip(data, lo, hi)
         elif op == "contrast_stretch":
             p1, p99 = np.percentile(data, [1, 99])
-            if p99 == p1:
-                out = np.zeros_like(data)
-            else:
-                out = np.clip((data - p1) / (p99 - p1), 0, 1)
+            out = apply_window(data, float(p1), float(p99))
         elif op == "box_blur":
             out = self._box_blur(data, ksize)
         else:
@@ -96,30 +92,17 @@ class DicomPixelOpsTool(Tool):
         yield self.create_json_message({"result": stats, "preview": preview})
 
     def _normalize(self, x: np.ndarray) -> np.ndarray:
-        vmin = float(np.min(x))
-        vmax = float(np.max(x))
-        if vmax == vmin:
-            return np.zeros_like(x)
-        return (x - vmin) / (vmax - vmin)
+        # x is a private float32 copy, so it is windowed in place
+        return apply_window(x, float(np.min(x)), float(np.max(x)))
 
     def _box_blur(self, x: np.ndarray, k: int) -> np.ndarray:
-        # Separable box blur for 2D, and per-channel for 3D (H, W, C)
+        # Separable box blur over (H, W); channels of (H, W, C) are filtered together
         if k <= 1:
             return x.copy()
-        if x.ndim == 2:
-            return self._box_blur_2d(x, k)
-        if x.ndim == 3:
-            return np.stack([self._box_blur_2d(x[..., c], k) for c in range(x.shape[-1])], axis=-1)
-        # Fallback: blur last two dims
-        x2d = x.reshape(x.shape[-2], x.shape[-1])
-        return self._box_blur_2d(x2d, k)
-
-    def _box_blur_2d(self, x2d: np.ndarray, k: int) -> np.ndarray:
-        c = np.cumsum(np.pad(x2d, ((0, 0), (1, 0)), mode='edge'), axis=1)
-        h = (c[:, k:] - c[:, :-k]) / k
-        c2 = np.cumsum(np.pad(h, ((1, 0), (0, 0)), mode='edge'), axis=0)
-        v = (c2[k:, :] - c2[:-k, :]) / k
-        return v
+        if x.ndim > 3:
+            # Fallback: blur last two dims
+            x = x.reshape(x.shape[-2], x.shape[-1])
+        return box_blur_valid(x, k)
 
     # duplicate helpers removed; using shared utils
 
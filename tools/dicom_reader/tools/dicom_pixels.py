@@ -1,13 +1,12 @@
 from __future__ import annotations
 
 from typing import Any
-from io import BytesIO
 
 import numpy as np
-import pydicom
 from dify_plugin import Tool
 
-from ._utils import as_bool, as_int, make_preview_png_bytes, select_frame
+from ._dataset_cache import CachedDicom, load_dicom
+from ._utils import as_bool, as_int, make_preview_png_bytes
 
 
 class DicomPixelsTool(Tool):
@@ -36,13 +35,13 @@ class DicomPixelsTool(Tool):
 
         filename = getattr(file_obj, "filename", "dicom_file.dcm")
         try:
-            ds = pydicom.dcmread(BytesIO(blob), stop_before_pixels=False, force=True)
+            dicom = load_dicom(blob)
         except Exception as exc:  # pylint: disable=broad-except
             yield self.create_text_message(f"Failed to parse DICOM: {exc}")
             return
 
         try:
-            arr = np.asarray(ds.pixel_array)
+            arr = dicom.pixel_array()
         except Exception as exc:  # pylint: disable=broad-except
             yield self.create_json_message({"error": f"No pixel data: {exc}"})
             return
@@ -57,7 +56,7 @@ class DicomPixelsTool(Tool):
         }
 
         if include_preview:
-            preview = self._generate_preview(ds, arr, preview_frame, max_preview_edge, filename)
+            preview = self._generate_preview(dicom, preview_frame, max_preview_edge, filename)
             if "blob" in preview:
                 blob = preview.pop("blob")
                 yield self.create_blob_message(blob=blob, meta={
@@ -68,8 +67,8 @@ class DicomPixelsTool(Tool):
 
         yield self.create_json_message(info)
 
-    def _generate_preview(self, ds, arr: np.ndarray, desired_frame: int, max_edge: int, original_filename: str) -> dict[str, Any]:
-        frame, actual_idx = select_frame(ds, arr, desired_frame)
+    def _generate_preview(self, dicom: CachedDicom, desired_frame: int, max_edge: int, original_filename: str) -> dict[str, Any]:
+        frame, actual_idx = dicom.frame(desired_frame)
         frame = np.squeeze(frame)
         if frame.ndim not in (2, 3):
             return {"error": f"Unsupported frame shape {tuple(frame.shape)}"}
@@ -19,6 +19,8 @@ from pydicom.sequence import Sequence
 from pydicom.tag import BaseTag, Tag
 from pydicom.uid import UID
 
+from ._dataset_cache import CachedDicom, load_dicom
+
 try:  # pydicom < 3.0 exposes PersonName only
     from pydicom.valuerep import PersonNameBase
 except ImportError:  # pragma: no cover - compatibility shim
@@ -96,12 +98,14 @@ class DicomReaderTool(Tool):
         file_size = len(blob)
         needs_pixel_data = include_stats or include_preview
 
+        dicom: CachedDicom | None = None
         try:
-            dataset = pydicom.dcmread(
-                BytesIO(blob),
-                stop_before_pixels=not needs_pixel_data,
-                force=True,
-            )
+            if needs_pixel_data:
+                # pixel work goes through the shared cache so chained tools decode once
+                dicom = load_dicom(blob)
+                dataset = dicom.dataset
+            else:
+                dataset = pydicom.dcmread(BytesIO(blob), stop_before_pixels=True, force=True)
         except InvalidDicomError as exc:
             yield self.create_text_message(f"The provided file is not a valid DICOM dataset: {exc}")
             return
@@ -115,7 +119,7 @@ class DicomReaderTool(Tool):
 
         stats_result: dict[str, Any] | None = None
         if include_stats:
-            stats_result = self._extract_pixel_statistics(dataset)
+            stats_result = self._extract_pixel_statistics(dicom)
             if "error" in stats_result:
                 summary_notes.append(f"Pixel statistics unavailable: {stats_result['error']}")
             else:
@@ -123,7 +127,7 @@ class DicomReaderTool(Tool):
 
         preview_result: dict[str, Any] | None = None
         if include_preview:
-            preview_result = self._generate_preview(dataset, preview_frame, max_preview_edge, filename)
+            preview_result = self._generate_preview(dicom, preview_frame, max_preview_edge, filename)
             if "error" in preview_result:
                 summary_notes.append(f"Preview image unavailable: {preview_result['error']}")
             else:
@@ -256,9 +260,9 @@ class DicomReaderTool(Tool):
             "number_of_frames": int(num_frames) if num_frames else 1,
         }
 
-    def _extract_pixel_statistics(self, dataset: pydicom.dataset.Dataset) -> dict[str, Any]:
+    def _extract_pixel_statistics(self, dicom: CachedDicom) -> dict[str, Any]:
         try:
-            pixel_array = dataset.pixel_array
+            pixel_array = dicom.pixel_array()
         except Exception as exc:  # pylint: disable=broad-except
             return {"error": str(exc)}
 
@@ -295,24 +299,19 @@ class DicomReaderTool(Tool):
 
     def _generate_preview(
         self,
-        dataset: pydicom.dataset.Dataset,
+        dicom: CachedDicom,
         desired_frame: int,
         max_preview_edge: int,
         original_filename: str,
     ) -> dict[str, Any]:
         try:
-            pixel_array = dataset.pixel_array
+            frame, actual_frame = dicom.frame(desired_frame)
         except Exception as exc:  # pylint: disable=broad-except
             return {"error": str(exc)}
 
-        array = np.asarray(pixel_array)
-        if array.size == 0:
+        if frame.size == 0:
             return {"error": "Pixel data is empty."}
 
-        frame, actual_frame = self._select_frame(dataset, array, desired_frame)
-        if frame is None:
-            return {"error": "Requested frame index is out of range."}
-
         frame = np.asarray(frame)
         frame = np.squeeze(frame)
         original_shape = tuple(int(x) for x in frame.shape)
@@ -380,23 +379,6 @@ class DicomReaderTool(Tool):
             "note": "Preview is min-max normalized and size-capped for transport stability.",
         }
 
-    def _select_frame(
-        self,
-        dataset: pydicom.dataset.Dataset,
-        array: np.ndarray,
-        desired_frame: int,
-    ) -> tuple[np.ndarray | None, int]:
-        num_frames = getattr(dataset, "NumberOfFrames", 1)
-        if array.ndim >= 4:
-            frames = array.shape[0]
-            index = max(0, min(int(desired_frame), frames - 1))
-            return array[index], index
-        if array.ndim == 3 and num_frames and num_frames > 1 and array.shape[0] == num_frames:
-            frames = array.shape[0]
-            index = max(0, min(int(desired_frame), frames - 1))
-            return array[index], index
-        return array, 0
-
     def _normalize_to_uint8(self, array: np.ndarray) -> np.ndarray:
         data = np.asarray(array)
         if data.dtype == np.uint8:
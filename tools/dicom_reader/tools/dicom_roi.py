@@ -2,13 +2,12 @@ from __future__ import annotations
 
 import json
 from typing import Any
-from io import BytesIO
 
 import numpy as np
-import pydicom
 from dify_plugin import Tool
 
-from ._utils import as_bool, as_int, make_preview_png_bytes, select_frame, to_uint8_minmax
+from ._dataset_cache import load_dicom
+from ._utils import as_bool, as_int, make_preview_png_bytes, to_uint8_minmax
 
 
 class DicomROITool(Tool):
@@ -44,18 +43,17 @@ class DicomROITool(Tool):
 
         filename = getattr(file_obj, "filename", "dicom_file.dcm")
         try:
-            ds = pydicom.dcmread(BytesIO(blob), stop_before_pixels=False, force=True)
+            dicom = load_dicom(blob)
         except Exception as exc:  # pylint: disable=broad-except
             yield self.create_text_message(f"Failed to parse DICOM: {exc}")
             return
 
         try:
-            arr = np.asarray(ds.pixel_array)
+            frame, idx = dicom.frame(frame_index)
         except Exception as exc:  # pylint: disable=broad-except
             yield self.create_text_message(f"No pixel array: {exc}")
             return
 
-        frame, idx = select_frame(ds, arr, frame_index)
         img = frame.astype(np.float32)
         if img.ndim > 2:
             img = img[..., 0]
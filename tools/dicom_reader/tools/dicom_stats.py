@@ -2,13 +2,12 @@ from __future__ import annotations
 
 import json
 from typing import Any
-from io import BytesIO
 
 import numpy as np
-import pydicom
 from dify_plugin import Tool
 
-from ._utils import as_int, select_frame
+from ._dataset_cache import load_dicom
+from ._utils import as_int
 
 
 class DicomStatsTool(Tool):
@@ -40,18 +39,17 @@ class DicomStatsTool(Tool):
             return
 
         try:
-            ds = pydicom.dcmread(BytesIO(blob), stop_before_pixels=False, force=True)
+            dicom = load_dicom(blob)
         except Exception as exc:  # pylint: disable=broad-except
             yield self.create_text_message(f"Failed to parse DICOM: {exc}")
             return
 
         try:
-            arr = np.asarray(ds.pixel_array)
+            frame, _ = dicom.frame(frame_index)
         except Exception as exc:  # pylint: disable=broad-except
             yield self.create_json_message({"error": f"No pixel array: {exc}"})
             return
 
-        frame, _ = select_frame(ds, arr, frame_index)
         x = frame.astype(np.float32)
         if x.ndim > 2:
             x = x[..., 0]
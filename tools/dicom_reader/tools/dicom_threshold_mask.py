@@ -1,13 +1,12 @@
 from __future__ import annotations
 
 from typing import Any
-from io import BytesIO
 
 import numpy as np
-import pydicom
 from dify_plugin import Tool
 
-from ._utils import as_float, as_int, make_preview_png_bytes, select_frame, to_uint8_minmax
+from ._dataset_cache import load_dicom
+from ._utils import as_float, as_int, make_preview_png_bytes, to_uint8_minmax
 
 
 class DicomThresholdMaskTool(Tool):
@@ -33,18 +32,17 @@ class DicomThresholdMaskTool(Tool):
 
         filename = getattr(file_obj, "filename", "dicom_file.dcm")
         try:
-            ds = pydicom.dcmread(BytesIO(blob), stop_before_pixels=False, force=True)
+            dicom = load_dicom(blob)
         except Exception as exc:  # pylint: disable=broad-except
             yield self.create_text_message(f"Failed to parse DICOM: {exc}")
             return
 
         try:
-            arr = np.asarray(ds.pixel_array).astype(np.float32)
+            frame, idx = dicom.frame(frame_index)
         except Exception as exc:  # pylint: disable=broad-except
             yield self.create_json_message({"error": f"No pixel array: {exc}"})
             return
-
-        frame, idx = select_frame(ds, arr, frame_index)
+        frame = frame.astype(np.float32)
         mask = self._threshold(frame, thr_lo, thr_hi)
         count = int(np.count_nonzero(mask))
 
@@ -1,107 +1,78 @@
 from __future__ import annotations
 
 from typing import Any
-from io import BytesIO
 
 import numpy as np
-import pydicom
 from dify_plugin import Tool
 
+from ._dataset_cache import load_dicom
 from ._utils import as_float, as_int
+from ._volume import box_filter, build_volume
 
 
 class DicomVolumeTool(Tool):
     """
     Estimate volume and density using pixel spacing and slice thickness.
     Builds a binary mask using a threshold (or range) and multiplies voxel count by voxel volume.
+    A series of single-slice files is stacked into one volume ordered by slice position.
     """
 
     def _invoke(self, tool_parameters: dict[str, Any]):
+        file_objs = [f for f in (tool_parameters.get("dicom_files") or []) if f]
         file_obj = tool_parameters.get("dicom_file")
-        if not file_obj:
-            yield self.create_text_message("`dicom_file` is required.")
+        if file_obj:
+            file_objs.insert(0, file_obj)
+        if not file_objs:
+            yield self.create_text_message("`dicom_file` or `dicom_files` is required.")
             return
 
         frame_index = as_int(tool_parameters.get("frame_index"), None)
         thr_lo = as_float(tool_parameters.get("threshold_lower"), None)
         thr_hi = as_float(tool_parameters.get("threshold_upper"), None)
-
-        blob = getattr(file_obj, "blob", None)
-        if blob is None:
-            yield self.create_text_message("Unable to read the uploaded file.")
-            return
-
-        try:
-            ds = pydicom.dcmread(BytesIO(blob), stop_before_pixels=False, force=True)
-        except Exception as exc:  # pylint: disable=broad-except
-            yield self.create_text_message(f"Failed to parse DICOM: {exc}")
-            return
+        ksize = max(1, as_int(tool_parameters.get("kernel_size"), 1))
+
+        dicoms = []
+        for obj in file_objs:
+            blob = getattr(obj, "blob", None)
+            if blob is None:
+                yield self.create_text_message("Unable to read the uploaded file.")
+                return
+            try:
+                dicoms.append(load_dicom(blob))
+            except Exception as exc:  # pylint: disable=broad-except
+                yield self.create_text_message(f"Failed to parse DICOM: {exc}")
+                return
 
         try:
-            arr = np.asarray(ds.pixel_array).astype(np.float32)
+            volume = build_volume(dicoms)
         except Exception as exc:  # pylint: disable=broad-except
             yield self.create_json_message({"error": f"No pixel array: {exc}"})
             return
 
-        # Attempt HU correction if tags exist
-        slope = float(getattr(ds, "RescaleSlope", 1.0) or 1.0)
-        intercept = float(getattr(ds, "RescaleIntercept", 0.0) or 0.0)
-        arr = arr * slope + intercept
-
-        # Determine voxel size
-        dx, dy = 1.0, 1.0
-        spacing = getattr(ds, "PixelSpacing", None)
-        if isinstance(spacing, (list, tuple)) and len(spacing) >= 2:
-            try:
-                dx, dy = float(spacing[0]), float(spacing[1])
-            except Exception:
-                pass
-        dz = None
-        for tag in ("SliceThickness", "SpacingBetweenSlices"):
-            val = getattr(ds, tag, None)
-            if val is not None:
-                try:
-                    dz = float(val)
-                    break
-                except Exception:
-                    continue
-        if dz is None:
-            dz = 1.0
+        arr = volume.voxels
+        if ksize > 1:
+            # channels of multi-channel slices are smoothed separately
+            arr = box_filter(arr, ksize, axes=(0, 1, 2))
+        dx, dy, dz = volume.spacing
 
-        # Select a frame or operate across frames if available
-        num_frames = int(getattr(ds, "NumberOfFrames", 1) or 1)
-        if arr.ndim >= 4:  # assume first dim is frames
-            if frame_index is None:
-                mask_volume, mean_val = self._volume_over_frames(arr, thr_lo, thr_hi)
-                frames_used = arr.shape[0]
-            else:
-                idx = max(0, min(int(frame_index), arr.shape[0] - 1))
-                mask = self._threshold(arr[idx], thr_lo, thr_hi)
-                mask_volume = int(np.count_nonzero(mask))
-                mean_val = float(np.mean(arr[idx][mask])) if np.any(mask) else None
-                frames_used = 1
-        elif arr.ndim == 3 and num_frames > 1 and arr.shape[0] == num_frames:
-            if frame_index is None:
-                mask_volume, mean_val = self._volume_over_frames(arr, thr_lo, thr_hi)
-                frames_used = arr.shape[0]
-            else:
-                idx = max(0, min(int(frame_index), arr.shape[0] - 1))
-                mask = self._threshold(arr[idx], thr_lo, thr_hi)
-                mask_volume = int(np.count_nonzero(mask))
-                mean_val = float(np.mean(arr[idx][mask])) if np.any(mask) else None
-                frames_used = 1
+        # Select a frame (slice) or operate across all of them
+        if frame_index is None or arr.shape[0] == 1:
+            mask_volume, mean_val = self._volume_over_frames(arr, thr_lo, thr_hi)
+            frames_used = arr.shape[0]
         else:
-            mask = self._threshold(arr, thr_lo, thr_hi)
+            idx = max(0, min(int(frame_index), arr.shape[0] - 1))
+            mask = self._threshold(arr[idx], thr_lo, thr_hi)
             mask_volume = int(np.count_nonzero(mask))
-            mean_val = float(np.mean(arr[mask])) if np.any(mask) else None
+            mean_val = float(np.mean(arr[idx][mask])) if np.any(mask) else None
             frames_used = 1
 
         # Physical volume
-        voxel_volume = float(dx * dy * dz)
+        voxel_volume = volume.voxel_volume
         volume_mm3 = float(mask_volume) * voxel_volume
 
         result = {
             "frames_used": int(frames_used),
+            "slices": int(arr.shape[0]),
             "voxel_size_mm": [dx, dy, dz],
             "voxel_volume_mm3": voxel_volume,
             "threshold_lower": thr_lo,
@@ -125,14 +96,16 @@ class DicomVolumeTool(Tool):
         return mask
 
     def _volume_over_frames(self, arr: np.ndarray, lo: float | None, hi: float | None) -> tuple[int, float | None]:
-        total = 0
-        vals = []
-        for i in range(arr.shape[0]):
-            m = self._threshold(arr[i], lo, hi)
-            c = int(np.count_nonzero(m))
-            total += c
-            if c > 0:
-                vals.append(float(np.mean(arr[i][m])))
-        return total, (float(np.mean(vals)) if vals else None)
-
-    # duplicate helpers removed; using shared utils
+        # Per-slice thresholds and means, computed for the whole stack at once
+        flat = arr.reshape(arr.shape[0], -1)
+        if lo is None and hi is None:
+            mask = flat > flat.mean(axis=1, keepdims=True)
+        else:
+            mask = self._threshold(flat, lo, hi)
+        counts = np.count_nonzero(mask, axis=1)
+        sums = np.add.reduce(flat, axis=1, dtype=np.float64, where=mask)
+        present = counts > 0
+        total = int(counts.sum())
+        if not present.any():
+            return total, None
+        return total, float(np.mean(sums[present] / counts[present]))
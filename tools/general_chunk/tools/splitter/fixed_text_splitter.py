@@ -14,6 +14,15 @@ from .text_splitter import (
     TokenTextSplitter,
     Union,
 )
+from .range_text_splitter import RangeTextSplitEngine
+
+
+def _character_encoder(texts: list[str]) -> list[int]:
+    if not texts:
+        return []
+
+    return [len(text) for text in texts]
+
 
 class EnhanceRecursiveCharacterTextSplitter(RecursiveCharacterTextSplitter):
     """
@@ -27,13 +36,6 @@ class EnhanceRecursiveCharacterTextSplitter(RecursiveCharacterTextSplitter):
         disallowed_special: Union[Literal["all"], Collection[str]] = "all",  # noqa: UP037
         **kwargs: Any,
     ):
-
-        def _character_encoder(texts: list[str]) -> list[int]:
-            if not texts:
-                return []
-
-            return [len(text) for text in texts]
-
         if issubclass(cls, TokenTextSplitter):
             extra_kwargs = {
                 "allowed_special": allowed_special,
@@ -50,9 +52,29 @@ class FixedRecursiveCharacterTextSplitter(EnhanceRecursiveCharacterTextSplitter)
         super().__init__(**kwargs)
         self._fixed_separator = codecs.decode(fixed_separator, "unicode_escape") 
         self._separators = separators or ["\n\n", "\n", " ", ""]
+        self._range_engine = self._build_range_engine()
+
+    def _build_range_engine(self) -> Optional[RangeTextSplitEngine]:
+        """Use the range engine when lengths are plain character counts."""
+        if (
+            self._length_function is not _character_encoder
+            or not self._keep_separator
+            or self._chunk_size <= 0
+            or self._chunk_overlap < 0
+        ):
+            return None
+        return RangeTextSplitEngine(
+            chunk_size=self._chunk_size,
+            chunk_overlap=self._chunk_overlap,
+            separators=self._separators,
+            keep_top_level_separator=False,
+        )
 
     def split_text(self, text: str) -> list[str]:
         """Split incoming text and return chunks."""
+        if self._range_engine is not None:
+            return self._range_engine.split_text(text, self._fixed_separator)
+
         if self._fixed_separator:
             chunks = text.split(self._fixed_separator)
         else:
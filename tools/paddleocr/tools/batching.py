@@ -0,0 +1,189 @@
+import base64
+import binascii
+import io
+import logging
+import threading
+import time
+from collections.abc import Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any
+
+import requests
+from pypdf import PdfReader, PdfWriter
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+REQUEST_TIMEOUT = (10, 600)
+MAX_CONCURRENT_BATCHES = 4
+MAX_BATCH_RETRIES = 2
+RETRY_BACKOFF_SECONDS = 1.0
+# a URL served as anything else is not downloaded to be split
+_PDF_CONTENT_TYPES = {"", "application/pdf", "application/x-pdf", "application/octet-stream"}
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+
+
+class TransientRequestError(RuntimeError):
+    """A PaddleOCR request that timed out or hit a server error, so it may succeed if retried."""
+
+
+def get_session() -> requests.Session:
+    """Return the session shared by all PaddleOCR requests of this plugin."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MAX_CONCURRENT_BATCHES * 2)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def post_request(api_url: str, access_token: str, params: dict[str, Any]) -> dict[str, Any]:
+    """Call a PaddleOCR API and return the decoded response."""
+    try:
+        resp = get_session().post(
+            api_url,
+            headers={"Client-Platform": "dify", "Authorization": f"token {access_token}"},
+            json=params,
+            timeout=REQUEST_TIMEOUT,
+        )
+        resp.raise_for_status()
+        return resp.json()
+    except requests.exceptions.JSONDecodeError as e:
+        raise RuntimeError(f"Failed to decode JSON response from PaddleOCR API: {resp.text}") from e
+    except requests.exceptions.Timeout as e:
+        raise TransientRequestError("PaddleOCR API request timed out") from e
+    except requests.exceptions.HTTPError as e:
+        if e.response is not None and e.response.status_code >= 500:
+            raise TransientRequestError(f"PaddleOCR API request failed: {e}") from e
+        raise RuntimeError(f"PaddleOCR API request failed: {e}") from e
+    except requests.exceptions.RequestException as e:
+        raise RuntimeError(f"PaddleOCR API request failed: {e}") from e
+
+
+def _is_pdf(data: bytes) -> bool:
+    return data.lstrip()[:5] == b"%PDF-"
+
+
+def _load_pdf_bytes(file: str) -> bytes | None:
+    """Return the content of a URL or Base64 ``file`` parameter, or None if it is not a PDF.
+
+    A URL is only downloaded in full when its content type and first bytes are those of a PDF.
+    """
+    if file.startswith(("http://", "https://")):
+        try:
+            with get_session().get(file, timeout=REQUEST_TIMEOUT, stream=True) as resp:
+                resp.raise_for_status()
+                content_type = resp.headers.get("Content-Type", "").split(";")[0].strip().lower()
+                if content_type not in _PDF_CONTENT_TYPES:
+                    return None
+                chunks = resp.iter_content(chunk_size=64 * 1024)
+                head = next(chunks, b"")
+                if not _is_pdf(head):
+                    return None
+                return head + b"".join(chunks)
+        except requests.exceptions.RequestException as e:
+            raise RuntimeError(f"Failed to download the file: {e}") from e
+    try:
+        data = base64.b64decode(file, validate=False)
+    except (binascii.Error, ValueError):
+        return None
+    return data if _is_pdf(data) else None
+
+
+def split_pdf_pages(file: str, batch_size: int) -> list[tuple[int, int, str]] | None:
+    """
+    Split a PDF ``file`` parameter into Base64-encoded page ranges.
+
+    Returns ``(first_page, last_page, file)`` tuples with 1-based inclusive pages,
+    or None when the file is not a PDF or fits into a single batch.
+    """
+    data = _load_pdf_bytes(file)
+    if not data:
+        return None
+    try:
+        reader = PdfReader(io.BytesIO(data))
+        page_count = len(reader.pages)
+        if page_count <= batch_size:
+            return None
+
+        batches = []
+        for start in range(0, page_count, batch_size):
+            end = min(start + batch_size, page_count)
+            writer = PdfWriter()
+            writer.append(reader, pages=(start, end))
+            buffer = io.BytesIO()
+            writer.write(buffer)
+            batches.append((start + 1, end, base64.b64encode(buffer.getvalue()).decode("ascii")))
+    except Exception as e:
+        raise RuntimeError(f"Failed to split the PDF into page ranges: {e}") from e
+    return batches
+
+
+def _post_batch(api_url: str, access_token: str, params: dict[str, Any]) -> dict[str, Any]:
+    # a range that timed out or hit a server error is retried on its own while the others keep going
+    attempt = 0
+    while True:
+        try:
+            return post_request(api_url, access_token, params)
+        except TransientRequestError as e:
+            if attempt >= MAX_BATCH_RETRIES:
+                raise
+            logger.warning("PaddleOCR batch request failed, retrying: %s", e)
+            time.sleep(RETRY_BACKOFF_SECONDS * (2**attempt))
+            attempt += 1
+
+
+def iter_batch_results(
+    api_url: str,
+    access_token: str,
+    params: dict[str, Any],
+    batches: list[tuple[int, int, str]],
+    max_workers: int = MAX_CONCURRENT_BATCHES,
+) -> Iterator[tuple[int, int, dict[str, Any]]]:
+    """
+    Submit the page ranges concurrently and yield ``(first_page, last_page, result)``
+    in page order, each as soon as it and every range before it have completed.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as executor:
+        pending: dict[Future, int] = {
+            executor.submit(
+                _post_batch, api_url, access_token, {**params, "file": file, "fileType": 0}
+            ): index
+            for index, (_, _, file) in enumerate(batches)
+        }
+        done_results: dict[int, dict[str, Any]] = {}
+        next_index = 0
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    try:
+                        done_results[index] = future.result()
+                    except RuntimeError as e:
+                        first_page, last_page, _ = batches[index]
+                        raise RuntimeError(f"Pages {first_page}-{last_page}: {e}") from e
+                while next_index in done_results:
+                    first_page, last_page, _ = batches[next_index]
+                    yield first_page, last_page, done_results.pop(next_index)
+                    next_index += 1
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def merge_results(
+    merged: dict[str, Any] | None, result: dict[str, Any], key: str
+) -> dict[str, Any]:
+    """Append the per-page entries under ``result[key]`` of a batch to ``merged``."""
+    if merged is None:
+        return result
+    merged.setdefault("result", {}).setdefault(key, []).extend(
+        result.get("result", {}).get(key, [])
+    )
+    return merged
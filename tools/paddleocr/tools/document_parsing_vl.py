@@ -1,14 +1,12 @@
 from collections.abc import Generator
 from typing import Any
 
-import requests
 from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
 
+from tools.batching import iter_batch_results, merge_results, post_request, split_pdf_pages
 from tools.utils import remove_img_from_markdown
 
-REQUEST_TIMEOUT = (10, 600)
-
 
 class DocumentParsingVlTool(Tool):
     def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage]:
@@ -55,29 +53,30 @@ class DocumentParsingVlTool(Tool):
             if optional_param_name in tool_parameters:
                 params[optional_param_name] = tool_parameters[optional_param_name]
 
-        try:
-            resp = requests.post(
-                api_url,
-                headers={"Client-Platform": "dify", "Authorization": f"token {access_token}"},
-                json=params,
-                timeout=REQUEST_TIMEOUT,
-            )
-            resp.raise_for_status()
-            result = resp.json()
-        except requests.exceptions.JSONDecodeError as e:
-            raise RuntimeError(
-                f"Failed to decode JSON response from PaddleOCR API: {resp.text}"
-            ) from e
-        except requests.exceptions.Timeout as e:
-            raise RuntimeError("PaddleOCR API request timed out") from e
-        except requests.exceptions.RequestException as e:
-            raise RuntimeError(f"PaddleOCR API request failed: {e}") from e
+        page_batch_size = int(tool_parameters.get("page_batch_size") or 0)
+        batches = None
+        if page_batch_size > 0 and params.get("fileType") != 1:
+            batches = split_pdf_pages(params["file"], page_batch_size)
+
+        if not batches:
+            result = post_request(api_url, access_token, params)
+            yield self.create_text_message(self._extract_text(result))
+            yield self.create_json_message(result)
+            return
+
+        # stream the text of each page range in page order as soon as it is ready
+        merged = None
+        for first_page, _, result in iter_batch_results(api_url, access_token, params, batches):
+            text = self._extract_text(result)
+            yield self.create_text_message(text if first_page == 1 else "\n\n" + text)
+            merged = merge_results(merged, result, "layoutParsingResults")
+        yield self.create_json_message(merged)
 
+    def _extract_text(self, result: dict[str, Any]) -> str:
         markdown_text_list = []
         for item in result.get("result", {}).get("layoutParsingResults", []):
             markdown_text = item.get("markdown", {}).get("text")
             if markdown_text is not None:
                 markdown_text = remove_img_from_markdown(markdown_text)
                 markdown_text_list.append(markdown_text)
-        yield self.create_text_message("\n\n".join(markdown_text_list))
-        yield self.create_json_message(result)
+        return "\n\n".join(markdown_text_list)
@@ -1,11 +1,10 @@
 from collections.abc import Generator
 from typing import Any
 
-import requests
 from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
 
-REQUEST_TIMEOUT = (10, 600)
+from tools.batching import iter_batch_results, merge_results, post_request, split_pdf_pages
 
 
 class TextRecognitionTool(Tool):
@@ -45,28 +44,29 @@ class TextRecognitionTool(Tool):
             if optional_param_name in tool_parameters:
                 params[optional_param_name] = tool_parameters[optional_param_name]
 
-        try:
-            resp = requests.post(
-                api_url,
-                headers={"Client-Platform": "dify", "Authorization": f"token {access_token}"},
-                json=params,
-                timeout=REQUEST_TIMEOUT,
-            )
-            resp.raise_for_status()
-            result = resp.json()
-        except requests.exceptions.JSONDecodeError as e:
-            raise RuntimeError(
-                f"Failed to decode JSON response from PaddleOCR API: {resp.text}"
-            ) from e
-        except requests.exceptions.Timeout as e:
-            raise RuntimeError("PaddleOCR API request timed out") from e
-        except requests.exceptions.RequestException as e:
-            raise RuntimeError(f"PaddleOCR API request failed: {e}") from e
+        page_batch_size = int(tool_parameters.get("page_batch_size") or 0)
+        batches = None
+        if page_batch_size > 0 and params.get("fileType") != 1:
+            batches = split_pdf_pages(params["file"], page_batch_size)
+
+        if not batches:
+            result = post_request(api_url, access_token, params)
+            yield self.create_text_message(self._extract_text(result))
+            yield self.create_json_message(result)
+            return
+
+        # stream the text of each page range in page order as soon as it is ready
+        merged = None
+        for first_page, _, result in iter_batch_results(api_url, access_token, params, batches):
+            text = self._extract_text(result)
+            yield self.create_text_message(text if first_page == 1 else "\n\n" + text)
+            merged = merge_results(merged, result, "ocrResults")
+        yield self.create_json_message(merged)
 
+    def _extract_text(self, result: dict[str, Any]) -> str:
         all_text = []
         for item in result.get("result", {}).get("ocrResults", []):
             text_list = item.get("prunedResult", {}).get("rec_texts")
             if text_list is not None:
                 all_text.append("\n".join(text_list))
-        yield self.create_text_message("\n\n".join(all_text))
-        yield self.create_json_message(result)
+        return "\n\n".join(all_text)
@@ -1,7 +1,11 @@
 """Paragraph index processor."""
 
 import uuid
+from collections.abc import Generator
+from functools import lru_cache
 from hashlib import sha256
+from itertools import islice
+
 from tools.cleaner.clean_processor import CleanProcessor
 from tools.document import ChildDocument, Document
 from tools.entities.entities import (
@@ -22,32 +26,52 @@ class ParentChildIndexProcessor:
         else:
             raise ValueError(f"Unsupported parent mode: {rules.parent_mode}")
 
+    def iter_transform(
+        self, input_text: str, rules: Rule, batch_size: int
+    ) -> Generator[ParentChildStructureChunk, None, None]:
+        """Transform the text, yielding parent-child chunks in groups of ``batch_size`` parents."""
+        if rules.parent_mode != ParentMode.PARAGRAPH:
+            yield self.transform(input_text, rules)
+            return
+
+        for parents in self._iter_parent_batches(input_text, rules, batch_size):
+            yield ParentChildStructureChunk(
+                parent_child_chunks=[
+                    ParentChildChunk(
+                        parent_content=parent,
+                        child_contents=self._split_child_nodes(parent, rules),
+                        parent_mode="paragraph",
+                    )
+                    for parent in parents
+                ]
+            )
+
     def _process_paragraph_mode(
         self, input_text: str, rules: Rule
     ) -> ParentChildStructureChunk:
         all_documents = ParentChildStructureChunk(parent_child_chunks=[])
+        for batch in self.iter_transform(input_text, rules, batch_size=64):
+            all_documents.parent_child_chunks.extend(batch.parent_child_chunks)
+        return all_documents
+
+    def _iter_parent_batches(
+        self, input_text: str, rules: Rule, batch_size: int
+    ) -> Generator[list[str], None, None]:
+        """Clean the text, then split it into parent nodes grouped by ``batch_size``."""
         splitter = FixedRecursiveCharacterTextSplitter.from_encoder(
             chunk_size=rules.segmentation.max_tokens,
             chunk_overlap=rules.segmentation.chunk_overlap,
             fixed_separator=rules.segmentation.separator,
             separators=["\n\n", "。", ". ", " ", ""],
         )
-        # Clean text content
+        # Clean text content before splitting, so a URL or email across a parent boundary goes whole
         input_text = self._clean_content(input_text, rules)
         # Split text into nodes
-        text_nodes = splitter.split_text(text=input_text)
-        for text_node in text_nodes:
-            if text_node.strip():
-                # Split text into child nodes
-                child_nodes = self._split_child_nodes(text_node, rules)
-                all_documents.parent_child_chunks.append(
-                    ParentChildChunk(
-                        parent_content=text_node,
-                        child_contents=child_nodes,
-                        parent_mode="paragraph",
-                    )
-                )
-        return all_documents
+        text_nodes = (
+            text_node for text_node in splitter.iter_split_text(input_text) if text_node.strip()
+        )
+        while batch := list(islice(text_nodes, batch_size)):
+            yield batch
 
     def _process_full_doc_mode(
         self, input_text: str, rules: Rule
@@ -66,11 +90,10 @@ class ParentChildIndexProcessor:
         """Split a document node into child nodes."""
         if not rules.subchunk_segmentation:
             raise ValueError("No subchunk segmentation found in rules.")
-        child_splitter = FixedRecursiveCharacterTextSplitter.from_encoder(
-            chunk_size=rules.subchunk_segmentation.max_tokens,
+        child_splitter = _get_child_splitter(
+            max_tokens=rules.subchunk_segmentation.max_tokens,
             chunk_overlap=rules.subchunk_segmentation.chunk_overlap,
-            fixed_separator=rules.subchunk_segmentation.separator,
-            separators=["\n\n", "。", ". ", " ", ""],
+            separator=rules.subchunk_segmentation.separator,
         )
         child_nodes = []
         child_texts = child_splitter.split_text(input_text)
@@ -92,6 +115,19 @@ class ParentChildIndexProcessor:
         return page_content
 
 
+@lru_cache(maxsize=8)
+def _get_child_splitter(
+    max_tokens: int, chunk_overlap: int, separator: str
+) -> FixedRecursiveCharacterTextSplitter:
+    """Child splitters are stateless, so one per segmentation is shared by all parents."""
+    return FixedRecursiveCharacterTextSplitter.from_encoder(
+        chunk_size=max_tokens,
+        chunk_overlap=chunk_overlap,
+        fixed_separator=separator,
+        separators=["\n\n", "。", ". ", " ", ""],
+    )
+
+
 def generate_text_hash(text: str) -> str:
     """Generate a SHA-256 hash for the given text."""
     hash_text = str(text) + "None"
@@ -20,6 +20,7 @@ class ParentChildChunkTool(Tool):
         subchunk_separator = tool_parameters.get("subchunk_separator", "\n")
         remove_urls_emails = tool_parameters.get("remove_urls_emails", False)
         remove_extra_spaces = tool_parameters.get("remove_extra_spaces", False)
+        stream_output = tool_parameters.get("stream_output", False)
 
         rule = Rule()
         rule.parent_mode = parent_mode
@@ -28,6 +29,16 @@ class ParentChildChunkTool(Tool):
         rule.remove_urls_emails = remove_urls_emails
         rule.remove_extra_spaces = remove_extra_spaces
         parent_child_processor = ParentChildIndexProcessor()
+        if stream_output:
+            batch_size = int(tool_parameters.get("batch_size") or 64)
+            if batch_size < 1:
+                raise ValueError("batch_size must be at least 1")
+            for parent_child_structure_chunk in parent_child_processor.iter_transform(
+                input_text=input_text, rules=rule, batch_size=batch_size
+            ):
+                yield self.create_json_message(parent_child_structure_chunk.model_dump())
+            return
+
         parent_child_structure_chunk = parent_child_processor.transform(
             input_text=input_text, rules=rule
         )
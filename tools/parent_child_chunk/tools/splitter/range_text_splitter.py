@@ -0,0 +1,285 @@
+"""Range based engine for the recursive character splitters.
+
+The string based splitters build one string per split (one per character for
+the empty separator) and re-join lists of splits while merging them, which
+grows quadratically on large inputs without spaces.  This engine walks
+``(start, end)`` index ranges over the original text and only slices when a
+chunk is emitted.  Lengths are the widths of the ranges, so it only applies
+to splitters measuring length in characters.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+from collections import deque
+from collections.abc import Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+_NON_WHITESPACE = re.compile(r"\S+")
+_REGEX_SPECIAL_CHARACTERS = frozenset(".^$*+?{}[]\\|()")
+
+
+def _iter_literal_ranges(
+    text: str, start: int, end: int, separator: str
+) -> Iterator[tuple[int, int]]:
+    """Ranges of ``text[start:end].split(separator)``."""
+    separator_length = len(separator)
+    position = start
+    while True:
+        index = text.find(separator, position, end)
+        if index == -1:
+            yield position, end
+            return
+        yield position, index
+        position = index + separator_length
+
+
+def _iter_keep_separator_ranges(
+    text: str, start: int, end: int, separator: str
+) -> Iterator[tuple[int, int]]:
+    """Ranges of ``_split_text_with_regex`` with ``keep_separator`` enabled."""
+    separator_length = len(separator)
+    position = start
+    while True:
+        index = text.find(separator, position, end)
+        if index == -1:
+            yield position, end
+            return
+        yield position, index + separator_length
+        position = index + separator_length
+
+
+def _iter_whitespace_ranges(text: str, start: int, end: int) -> Iterator[tuple[int, int]]:
+    """Ranges of ``text[start:end].split()``."""
+    for match in _NON_WHITESPACE.finditer(text, start, end):
+        yield match.span()
+
+
+def _drop_empty_ranges(text: str, ranges: Iterable[tuple[int, int]]) -> Iterator[tuple[int, int]]:
+    """Drop the ranges the string splitters filter out as ``""`` or ``"\\n"``."""
+    for start, end in ranges:
+        if end - start > 1 or (end - start == 1 and text[start] != "\n"):
+            yield start, end
+
+
+def _join_ranges(text: str, ranges: Iterable[tuple[int, int]]) -> str:
+    """Concatenate the ranges, slicing contiguous runs only once."""
+    pieces = []
+    run_start = run_end = -1
+    for start, end in ranges:
+        if start == run_end:
+            run_end = end
+            continue
+        if run_end != -1:
+            pieces.append(text[run_start:run_end])
+        run_start, run_end = start, end
+    if run_end != -1:
+        pieces.append(text[run_start:run_end])
+    return "".join(pieces)
+
+
+class RangeTextSplitEngine:
+    """Character based recursive splitting over index ranges.
+
+    Produces the same chunks as ``FixedRecursiveCharacterTextSplitter`` with
+    a character length function and ``keep_separator`` enabled.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int,
+        chunk_overlap: int,
+        separators: list[str],
+        keep_top_level_separator: bool,
+    ):
+        """
+        Args:
+            chunk_size: Maximum size of chunks to return
+            chunk_overlap: Overlap in characters between chunks
+            separators: Separators tried in order by the recursive split
+            keep_top_level_separator: Whether the first recursive level keeps
+                separators like ``_split_text_with_regex`` or drops them like
+                ``str.split``
+        """
+        self._chunk_size = chunk_size
+        self._chunk_overlap = chunk_overlap
+        self._separators = separators
+        self._keep_top_level_separator = keep_top_level_separator
+        self._regex_separators = {
+            separator: re.compile(separator)
+            for separator in separators
+            if _REGEX_SPECIAL_CHARACTERS.intersection(separator)
+        }
+
+    def split_text(self, text: str, fixed_separator: str) -> list[str]:
+        """Split text on the fixed separator, then recursively split oversized chunks."""
+        return list(self.iter_split_text(text, fixed_separator))
+
+    def iter_split_text(self, text: str, fixed_separator: str) -> Iterator[str]:
+        """Like ``split_text``, yielding the chunks of each fixed separator piece in turn."""
+        if fixed_separator:
+            chunks = _iter_literal_ranges(text, 0, len(text), fixed_separator)
+        else:
+            chunks = [(0, len(text))]
+
+        for start, end in chunks:
+            if end - start > self._chunk_size:
+                yield from self._recursive_split(text, start, end)
+            else:
+                yield text[start:end]
+
+    def _recursive_split(self, text: str, start: int, end: int) -> list[str]:
+        separator = self._separators[-1]
+        new_separators = []
+        for i, _s in enumerate(self._separators):
+            if _s == "":
+                separator = _s
+                break
+            if text.find(_s, start, end) != -1:
+                separator = _s
+                new_separators = self._separators[i + 1 :]
+                break
+
+        if not separator:
+            return self._split_characters(text, start, end)
+
+        if self._keep_top_level_separator:
+            splits = _iter_keep_separator_ranges(text, start, end, separator)
+        elif separator == " ":
+            splits = _iter_whitespace_ranges(text, start, end)
+        else:
+            splits = _iter_literal_ranges(text, start, end, separator)
+        return self._split_ranges(text, _drop_empty_ranges(text, splits), new_separators)
+
+    def _split(self, text: str, start: int, end: int, separators: list[str]) -> list[str]:
+        separator = separators[-1]
+        new_separators = []
+        for i, _s in enumerate(separators):
+            if _s == "":
+                separator = _s
+                break
+            if self._contains(text, start, end, _s):
+                separator = _s
+                new_separators = separators[i + 1 :]
+                break
+
+        if not separator:
+            return self._merge_characters(text, start, end)
+
+        splits = _iter_keep_separator_ranges(text, start, end, separator)
+        return self._split_ranges(text, _drop_empty_ranges(text, splits), new_separators)
+
+    def _contains(self, text: str, start: int, end: int, separator: str) -> bool:
+        pattern = self._regex_separators.get(separator)
+        if pattern is None:
+            return text.find(separator, start, end) != -1
+        # the string splitters search separators as patterns on the chunk itself
+        return pattern.search(text[start:end]) is not None
+
+    def _split_ranges(
+        self, text: str, splits: Iterable[tuple[int, int]], new_separators: list[str]
+    ) -> list[str]:
+        final_chunks = []
+        good_splits: list[tuple[int, int]] = []
+        for start, end in splits:
+            if end - start < self._chunk_size:
+                good_splits.append((start, end))
+                continue
+            if good_splits:
+                final_chunks.extend(self._merge_ranges(text, good_splits))
+                good_splits = []
+            if not new_separators:
+                final_chunks.append(text[start:end])
+            else:
+                final_chunks.extend(self._split(text, start, end, new_separators))
+
+        if good_splits:
+            final_chunks.extend(self._merge_ranges(text, good_splits))
+        return final_chunks
+
+    def _merge_ranges(self, text: str, splits: list[tuple[int, int]]) -> list[str]:
+        # with keep_separator the string splitters merge splits without a separator
+        docs = []
+        current_doc: deque[tuple[int, int]] = deque()
+        total = 0
+        for start, end in splits:
+            length = end - start
+            if total + length > self._chunk_size:
+                if total > self._chunk_size:
+                    logger.warning(
+                        f"Created a chunk of size {total}, which is longer than the specified {self._chunk_size}"
+                    )
+                if current_doc:
+                    doc = _join_ranges(text, current_doc).strip()
+                    if doc:
+                        docs.append(doc)
+                    while total > self._chunk_overlap or (
+                        total + length > self._chunk_size and total > 0
+                    ):
+                        popped_start, popped_end = current_doc.popleft()
+                        total -= popped_end - popped_start
+            current_doc.append((start, end))
+            total += length
+        doc = _join_ranges(text, current_doc).strip()
+        if doc:
+            docs.append(doc)
+        return docs
+
+    def _split_characters(self, text: str, start: int, end: int) -> list[str]:
+        """Fill chunks character by character, carrying the overlap over."""
+        characters = text[start:end].replace("\n", "")
+        total = len(characters)
+        final_chunks = []
+        current_start = overlap_start = 0
+        current_length = overlap_length = 0
+        position = 0
+        while position < total:
+            if current_length + 1 <= self._chunk_size - self._chunk_overlap:
+                step = min(
+                    total - position, self._chunk_size - self._chunk_overlap - current_length
+                )
+                current_length += step
+                position += step
+            elif current_length + 1 <= self._chunk_size:
+                step = min(total - position, self._chunk_size - current_length)
+                if not overlap_length:
+                    overlap_start = position
+                overlap_length += step
+                current_length += step
+                position += step
+            else:
+                final_chunks.append(characters[current_start:position])
+                current_start = overlap_start if overlap_length else position
+                current_length = overlap_length + 1
+                overlap_length = 0
+                position += 1
+        if current_length:
+            final_chunks.append(characters[current_start:])
+        return final_chunks
+
+    def _merge_characters(self, text: str, start: int, end: int) -> list[str]:
+        """Merge single characters into windows sliding by the overlap."""
+        characters = text[start:end].replace("\n", "")
+        if self._chunk_size == 1:
+            return list(characters)
+
+        total = len(characters)
+        docs = []
+        window_start = window_length = 0
+        position = 0
+        while position < total:
+            if window_length == self._chunk_size:
+                doc = characters[window_start:position].strip()
+                if doc:
+                    docs.append(doc)
+                window_length = min(window_length, self._chunk_overlap, self._chunk_size - 1)
+                window_start = position - window_length
+            step = min(total - position, self._chunk_size - window_length)
+            window_length += step
+            position += step
+        doc = characters[window_start:position].strip()
+        if doc:
+            docs.append(doc)
+        return docs
@@ -0,0 +1,253 @@
+import dataclasses
+import struct
+import subprocess
+import threading
+import warnings
+from collections.abc import Iterable, Iterator
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore")
+    from pydub import AudioSegment
+    from pydub.utils import get_encoder_name
+
+# the longest pause between two lines
+MAX_SILENCE_SECONDS = 1.5
+STEREO_PAN = (-0.2, 0.2)
+WAV_HEADER_SIZE = 44
+ENCODER_CHUNK_SIZE = 64 * 1024
+_PCM_CODECS = {1: "u8", 2: "s16le", 3: "s24le", 4: "s32le"}
+
+
+@dataclasses.dataclass(frozen=True)
+class PcmFormat:
+    frame_rate: int
+    sample_width: int
+    channels: int
+
+    @property
+    def frame_size(self) -> int:
+        return self.sample_width * self.channels
+
+    def silence_frames(self, seconds: float) -> int:
+        # the frame count of pydub's AudioSegment.silent
+        return int(self.frame_rate * (int(seconds * 1000) / 1000.0))
+
+
+@dataclasses.dataclass
+class PcmSegment:
+    format: PcmFormat
+    frames: bytes | memoryview
+
+    @property
+    def frame_count(self) -> int:
+        return len(self.frames) // self.format.frame_size
+
+
+def parse_wav(blob: bytes) -> PcmSegment:
+    """
+    Return the PCM frames of a WAV file as a view into ``blob``, without decoding them.
+    Streamed WAV files declare placeholder chunk sizes, so the data chunk is clipped to the blob.
+    """
+    if blob[:4] != b"RIFF" or blob[8:12] != b"WAVE":
+        raise ValueError("Not a WAV file")
+    pcm_format = None
+    position = 12
+    while position + 8 <= len(blob):
+        chunk_id = blob[position : position + 4]
+        (size,) = struct.unpack_from("<I", blob, position + 4)
+        body = position + 8
+        if chunk_id == b"fmt ":
+            audio_format, channels, frame_rate = struct.unpack_from("<HHI", blob, body)
+            (bits_per_sample,) = struct.unpack_from("<H", blob, body + 14)
+            if audio_format not in (1, 0xFFFE):
+                raise ValueError(f"Unsupported WAV encoding {audio_format}")
+            pcm_format = PcmFormat(frame_rate, bits_per_sample // 8, channels)
+        elif chunk_id == b"data":
+            if pcm_format is None:
+                raise ValueError("WAV data chunk precedes its format chunk")
+            end = min(body + size, len(blob))
+            end -= (end - body) % pcm_format.frame_size
+            return PcmSegment(pcm_format, memoryview(blob)[body:end])
+        position = body + size + (size & 1)
+    raise ValueError("WAV file has no data chunk")
+
+
+def _to_audio_segment(segment: PcmSegment) -> AudioSegment:
+    return AudioSegment(
+        data=bytes(segment.frames),
+        sample_width=segment.format.sample_width,
+        frame_rate=segment.format.frame_rate,
+        channels=segment.format.channels,
+    )
+
+
+class PodcastAssembler:
+    """
+    Lay out the line segments of a podcast and the pauses between them as one PCM stream.
+
+    Frames are produced segment by segment in order, so the podcast is never held as a
+    single growing buffer. Segments already in the output format are passed through as
+    they are, and one buffer of silence is shared by every pause.
+    """
+
+    def __init__(
+        self,
+        segments: list[PcmSegment | None],
+        pauses: list[float],
+        stereo: bool = False,
+    ):
+        present = [segment for segment in segments if segment is not None]
+        if not present:
+            raise ValueError("No audio segments to assemble")
+        base = present[0].format
+        self.segments = [
+            segment if segment is None or segment.format == base else self._convert(segment, base)
+            for segment in segments
+        ]
+        self.pauses = pauses
+        self.stereo = stereo
+        self.format = dataclasses.replace(base, channels=2) if stereo else base
+        self._silence = memoryview(
+            bytes(self.format.silence_frames(MAX_SILENCE_SECONDS) * self.format.frame_size)
+        )
+
+    @staticmethod
+    def _convert(segment: PcmSegment, target: PcmFormat) -> PcmSegment:
+        # lines in another format are rare, so they go through pydub
+        audio = (
+            _to_audio_segment(segment)
+            .set_frame_rate(target.frame_rate)
+            .set_sample_width(target.sample_width)
+            .set_channels(target.channels)
+        )
+        return PcmSegment(target, audio.raw_data)
+
+    def _pause(self, index: int) -> memoryview:
+        seconds = min(self.pauses[index], MAX_SILENCE_SECONDS)
+        return self._silence[: self.format.silence_frames(seconds) * self.format.frame_size]
+
+    def _layout(self) -> Iterator[tuple[int, PcmSegment, memoryview | None]]:
+        last = len(self.segments) - 1
+        for index, segment in enumerate(self.segments):
+            if segment is None:
+                continue
+            yield index, segment, self._pause(index) if index < last else None
+
+    @property
+    def data_size(self) -> int:
+        size = 0
+        for _, segment, pause in self._layout():
+            size += segment.frame_count * self.format.frame_size
+            if pause is not None:
+                size += len(pause)
+        return size
+
+    def _frames(self, index: int, segment: PcmSegment) -> bytes | memoryview:
+        if not self.stereo:
+            return segment.frames
+        pan = STEREO_PAN[index % 2]
+        return _to_audio_segment(segment).set_channels(2).pan(pan).raw_data
+
+    def iter_frames(self) -> Iterator[bytes | memoryview]:
+        for index, segment, pause in self._layout():
+            yield self._frames(index, segment)
+            if pause is not None and len(pause):
+                yield pause
+
+    def wav_header(self) -> bytes:
+        fmt = self.format
+        data_size = self.data_size
+        return struct.pack(
+            "<4sI4s4sIHHIIHH4sI",
+            b"RIFF",
+            36 + data_size,
+            b"WAVE",
+            b"fmt ",
+            16,
+            1,
+            fmt.channels,
+            fmt.frame_rate,
+            fmt.frame_rate * fmt.frame_size,
+            fmt.frame_size,
+            fmt.sample_width * 8,
+            b"data",
+            data_size,
+        )
+
+    def iter_wav(self) -> Iterator[bytes | memoryview]:
+        yield self.wav_header()
+        yield from self.iter_frames()
+
+    def iter_encoded(self, output_format: str) -> Iterator[bytes]:
+        """
+        Feed the frames to an ffmpeg encoder while reading its output, so neither
+        the raw nor the encoded podcast has to be built up before encoding starts.
+        """
+        fmt = self.format
+        process = subprocess.Popen(
+            [
+                get_encoder_name(),
+                "-loglevel",
+                "error",
+                "-f",
+                _PCM_CODECS[fmt.sample_width],
+                "-ar",
+                str(fmt.frame_rate),
+                "-ac",
+                str(fmt.channels),
+                "-i",
+                "pipe:0",
+                "-f",
+                output_format,
+                "pipe:1",
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        errors: list[BaseException] = []
+
+        def feed():
+            try:
+                for frames in self.iter_frames():
+                    process.stdin.write(frames)
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                process.stdin.close()
+
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+        try:
+            while chunk := process.stdout.read(ENCODER_CHUNK_SIZE):
+                yield chunk
+        finally:
+            process.stdout.close()
+            feeder.join()
+            stderr = process.stderr.read()
+            process.stderr.close()
+            if process.wait() != 0 and not errors:
+                errors.append(RuntimeError(f"Encoding failed: {stderr.decode(errors='replace')}"))
+        if errors:
+            raise errors[0]
+
+
+def rechunk(parts: Iterable[bytes | memoryview], size: int) -> Iterator[bytes]:
+    """Cut a stream of buffers into ``size``-byte chunks, copying only where a chunk spans two buffers."""
+    pending = bytearray()
+    for part in parts:
+        view = memoryview(part)
+        if pending:
+            taken = min(size - len(pending), len(view))
+            pending += view[:taken]
+            view = view[taken:]
+            if len(pending) < size:
+                continue
+            yield bytes(pending)
+            pending.clear()
+        while len(view) >= size:
+            yield bytes(view[:size])
+            view = view[size:]
+        pending += view
+    if pending:
+        yield bytes(pending)
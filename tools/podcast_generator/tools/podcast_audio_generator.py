@@ -1,17 +1,18 @@
 import concurrent.futures
-import io
 import random
-import warnings
-from typing import Any, Literal, Optional, Union, Generator
+import tempfile
+import uuid
+from typing import Any, Literal, Union, Generator
 import openai
 from yarl import URL
 from dify_plugin.entities.tool import ToolInvokeMessage
 from dify_plugin.errors.tool import ToolProviderCredentialValidationError
 from dify_plugin import Tool
 
-with warnings.catch_warnings():
-    warnings.simplefilter("ignore")
-    from pydub import AudioSegment
+from tools.audio_assembly import MAX_SILENCE_SECONDS, PcmSegment, PodcastAssembler, parse_wav, rechunk
+
+# the size of the blob chunks the plugin SDK sends blobs in
+BLOB_CHUNK_SIZE = 8192
 
 
 class ToolParameterValidationError(Exception):
@@ -27,11 +28,6 @@ class PodcastAudioGeneratorTool(Tool):
         }
         return mime_types.get(output_format, "audio/wav")
 
-    @staticmethod
-    def _generate_silence(duration: float):
-        silence = AudioSegment.silent(duration=int(duration * 1000))
-        return silence
-
     @staticmethod
     def _generate_audio_segment(
             client: openai.OpenAI,
@@ -40,7 +36,7 @@ class PodcastAudioGeneratorTool(Tool):
             voice: Literal["alloy", "ash", "ballad", "coral", "echo", "fable", "nova", "onyx", "sage", "shimmer", "verse"],
             instructions: str,
             index: int,
-    ) -> tuple[int, Union[AudioSegment, str], Optional[AudioSegment]]:
+    ) -> tuple[int, Union[PcmSegment, str]]:
         try:
             response = client.audio.speech.create(
                 model=model,
@@ -49,12 +45,29 @@ class PodcastAudioGeneratorTool(Tool):
                 input=line.strip(),
                 response_format="wav"
             )
-            audio = AudioSegment.from_wav(io.BytesIO(response.content))
-            silence_duration = random.uniform(0.1, 1.5)
-            silence = PodcastAudioGeneratorTool._generate_silence(silence_duration)
-            return (index, audio, silence)
+            return (index, parse_wav(response.content))
         except Exception as e:
-            return (index, f"Error generating audio: {str(e)}", None)
+            return (index, f"Error generating audio: {str(e)}")
+
+    def _create_blob_chunks(self, parts, total_length: int, meta: dict) -> Generator[ToolInvokeMessage, None, None]:
+        # stream the file as the chunks the SDK would split a blob message into
+        blob_id = uuid.uuid4().hex
+        sequence = -1
+        for sequence, chunk in enumerate(rechunk(parts, BLOB_CHUNK_SIZE)):
+            yield ToolInvokeMessage(
+                type=ToolInvokeMessage.MessageType.BLOB_CHUNK,
+                message=ToolInvokeMessage.BlobChunkMessage(
+                    id=blob_id, sequence=sequence, total_length=total_length, blob=chunk, end=False
+                ),
+                meta=meta,
+            )
+        yield ToolInvokeMessage(
+            type=ToolInvokeMessage.MessageType.BLOB_CHUNK,
+            message=ToolInvokeMessage.BlobChunkMessage(
+                id=blob_id, sequence=sequence + 1, total_length=total_length, blob=b"", end=True
+            ),
+            meta=meta,
+        )
 
     def _invoke(
             self, tool_parameters: dict[str, Any]
@@ -104,36 +117,31 @@ class PodcastAudioGeneratorTool(Tool):
                 instructions = host1_instructions if i % 2 == 0 else host2_instructions
                 future = executor.submit(self._generate_audio_segment, client, model, line, voice, instructions, i)
                 futures.append(future)
-            audio_segments: list[Any] = [None] * len(script_lines)
+            audio_segments: list[PcmSegment | None] = [None] * len(script_lines)
             for future in concurrent.futures.as_completed(futures):
-                (index, audio, silence) = future.result()
+                (index, audio) = future.result()
                 if isinstance(audio, str):
                     yield self.create_text_message(audio)
-                audio_segments[index] = (audio, silence)
+                else:
+                    audio_segments[index] = audio
 
-        # combine audio segments into a single audio file
-        combined_audio = AudioSegment.empty()
-        if channel_mode == "stereo":
-            for i, (audio, silence) in enumerate(audio_segments):
-                if audio:
-                    pan_value = -0.2 if i % 2 == 0 else 0.2
-                    stereo_audio = audio.set_channels(2).pan(pan_value)
-                    combined_audio += stereo_audio
-                    if i < len(audio_segments) - 1 and silence:
-                        combined_audio += silence.set_channels(2)
-        else:
-            for i, (audio, silence) in enumerate(audio_segments):
-                if audio:
-                    combined_audio += audio
-                    if i < len(audio_segments) - 1 and silence:
-                        combined_audio += silence
+        # lay out the segments with a random pause after each line
+        pauses = [random.uniform(0.1, MAX_SILENCE_SECONDS) for _ in script_lines]
+        assembler = PodcastAssembler(audio_segments, pauses, stereo=channel_mode == "stereo")
+        meta = {"mime_type": self._get_mime_type(output_format)}
+        if output_format == "wav":
+            total_length = len(assembler.wav_header()) + assembler.data_size
+            yield self.create_text_message("Audio generated successfully")
+            yield from self._create_blob_chunks(assembler.iter_wav(), total_length, meta)
+            return
 
-        # export combined audio to bytes
-        buffer = io.BytesIO()
-        combined_audio.export(buffer, format=output_format)
-        blob_bytes = buffer.getvalue()
-        for resp in [
-            self.create_text_message("Audio generated successfully"),
-            self.create_blob_message(blob=blob_bytes, meta={"mime_type": self._get_mime_type(output_format)}),
-        ]:
-            yield resp
+        # the encoded size is only known once ffmpeg is done, so the output is spooled to disk
+        with tempfile.TemporaryFile() as encoded:
+            for part in assembler.iter_encoded(output_format):
+                encoded.write(part)
+            total_length = encoded.tell()
+            encoded.seek(0)
+            yield self.create_text_message("Audio generated successfully")
+            yield from self._create_blob_chunks(
+                iter(lambda: encoded.read(BLOB_CHUNK_SIZE), b""), total_length, meta
+            )
@@ -1,8 +1,10 @@
 import base64
+import io
 import json
 import logging
 import zlib
 from collections.abc import Generator
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dataclasses import dataclass
 from mimetypes import guess_extension
 from typing import Any
@@ -13,10 +15,60 @@ import unstructured_client
 from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
 from dify_plugin.errors.tool import ToolProviderCredentialValidationError
+from pypdf import PdfReader, PdfWriter
 from unstructured_client.models import operations, shared
 
 logger = logging.getLogger(__name__)
 
+MAX_CONCURRENT_RANGES = 4
+
+ADVANCED_OPTIONS = [
+    "coordinates",
+    "content_type",
+    "encoding",
+    "extract_image_block_types",
+    "gz_uncompressed_content_type",
+    "include_page_breaks",
+    "ocr_languages",
+    "output_format",
+    "pdf_infer_table_structure",
+    "skip_infer_table_types",
+    "starting_page_number",
+    "unique_element_ids",
+    "xml_keep_tags",
+    "combine_under_n_chars",
+    "include_orig_elements",
+    "multipage_sections",
+    "new_after_n_chars",
+    "overlap",
+    "overlap_all",
+    "similarity_threshold",
+]
+
+
+def split_pdf(content: bytes, pages_per_range: int) -> list[tuple[int, int, bytes]] | None:
+    """
+    Split a PDF into ``(first_page, last_page, content)`` ranges of 1-based pages.
+
+    Returns None when the content is not a PDF or fits into a single range.
+    """
+    if not content[:1024].lstrip().startswith(b"%PDF-"):
+        return None
+    reader = PdfReader(io.BytesIO(content))
+    page_count = len(reader.pages)
+    if page_count <= pages_per_range:
+        return None
+
+    page_ranges = []
+    for start in range(0, page_count, pages_per_range):
+        end = min(start + pages_per_range, page_count)
+        writer = PdfWriter()
+        writer.append(reader, pages=(start, end))
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        page_ranges.append((start + 1, end, buffer.getvalue()))
+    return page_ranges
+
 
 @dataclass
 class Credentials:
@@ -65,125 +117,106 @@ class PartitionTool(Tool):
         decompressed_orig_elements = zlib.decompress(decoded_orig_elements)
         return decompressed_orig_elements.decode("utf-8")
 
+    def _build_partition_parameters(
+        self, tool_parameters: dict[str, Any], content: bytes, file_name: str, **overrides: Any
+    ) -> shared.PartitionParameters:
+        options = {
+            k: v
+            for k, v in json.loads(tool_parameters.get("advanced_options", "{}")).items()
+            if k in ADVANCED_OPTIONS and v is not None
+        }
+        options.update(overrides)
+        return shared.PartitionParameters(
+            files=shared.Files(content=content, file_name=file_name),
+            strategy=tool_parameters.get("strategy", "hi_res"),
+            vlm_model=tool_parameters.get("vlm_model", "gpt-4o"),
+            vlm_model_provider=tool_parameters.get("vlm_model_provider", "openai"),
+            languages=json.loads(
+                tool_parameters.get("languages", "[]") if tool_parameters.get("languages") else "[]"
+            ),
+            chunking_strategy=tool_parameters.get("chunking_strategy", None),
+            max_characters=tool_parameters.get("max_characters", 500),
+            overlap=tool_parameters.get("overlap", 0),
+            **options,
+        )
+
+    def _upload_image(
+        self, element: dict, images: list, blobs: list[ToolInvokeMessage] | None
+    ) -> str:
+        """Upload the Base64 image of an element and return its markdown reference."""
+        image_bytes = base64.b64decode(element["metadata"]["image_base64"])
+        mime_type = element["metadata"]["image_mime_type"]
+        file_res = self.session.file.upload(element["element_id"], image_bytes, mimetype=mime_type)
+        images.append(file_res)
+        element["metadata"]["preview_url"] = file_res.preview_url
+        element["metadata"]["dify_file_id"] = file_res.id
+        element["metadata"].pop("image_base64")
+        if blobs is not None and not file_res.preview_url:
+            extension = guess_extension(mime_type)
+            image_name = f"image_{element['element_id']}{extension}"
+            blobs.append(
+                self.create_blob_message(
+                    image_bytes, meta={"filename": image_name, "mime_type": mime_type}
+                )
+            )
+        return f"![]({file_res.preview_url})\n"
+
+    def _process_elements(
+        self, elements: list[dict], images: list, blobs: list[ToolInvokeMessage]
+    ) -> str:
+        """Upload the images of ``elements`` and return their text.
+
+        ``orig_elements`` are only decoded here, one element at a time.
+        """
+        text = ""
+        for element in elements:
+            if element["type"] == "Image":
+                text += self._upload_image(element, images, blobs)
+
+            if "orig_elements" in element["metadata"]:
+                # ...get the chunk's associated elements in context...
+                orig_elements = json.loads(
+                    self.extract_orig_elements(element["metadata"]["orig_elements"])
+                )
+
+                for orig_element in orig_elements:
+                    if orig_element["type"] == "Image" and orig_element["metadata"].get(
+                        "image_base64"
+                    ):
+                        text += self._upload_image(orig_element, images, None)
+
+                element["metadata"]["orig_elements"] = orig_elements
+
+            text += element["text"]
+        return text
+
     def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage]:
         credentials = self._get_credentials()
         client = unstructured_client.UnstructuredClient(
-            server_url=credentials.api_url,
-            api_key_auth=credentials.api_key,
+            server_url=credentials.api_url, api_key_auth=credentials.api_key
         )
 
         file = tool_parameters.get("file")
+        pages_per_range = int(tool_parameters.get("split_pdf_pages") or 0)
 
-        req = operations.PartitionRequest(
-            partition_parameters=shared.PartitionParameters(
-                files=shared.Files(
-                    content=file.blob,
-                    file_name=file.filename,
-                ),
-                strategy=tool_parameters.get("strategy", "hi_res"),
-                vlm_model=tool_parameters.get("vlm_model", "gpt-4o"),
-                vlm_model_provider=tool_parameters.get("vlm_model_provider", "openai"),
-                languages=json.loads(
-                    tool_parameters.get("languages", "[]")
-                    if tool_parameters.get("languages")
-                    else "[]"
-                ),
-                chunking_strategy=tool_parameters.get("chunking_strategy", None),
-                max_characters=tool_parameters.get("max_characters", 500),
-                overlap=tool_parameters.get("overlap", 0),
-                **{
-                    k: v
-                    for k, v in json.loads(
-                        tool_parameters.get("advanced_options", "{}")
-                    ).items()
-                    if k
-                    in [
-                        "coordinates",
-                        "content_type",
-                        "encoding",
-                        "extract_image_block_types",
-                        "gz_uncompressed_content_type",
-                        "include_page_breaks",
-                        "ocr_languages",
-                        "output_format",
-                        "pdf_infer_table_structure",
-                        "skip_infer_table_types",
-                        "starting_page_number",
-                        "unique_element_ids",
-                        "xml_keep_tags",
-                        "combine_under_n_chars",
-                        "include_orig_elements",
-                        "multipage_sections",
-                        "new_after_n_chars",
-                        "overlap",
-                        "overlap_all",
-                        "similarity_threshold",
-                    ]
-                    and v is not None
-                },
-            ),
-        )
         try:
+            page_ranges = split_pdf(file.blob, pages_per_range) if pages_per_range > 0 else None
+            if page_ranges:
+                yield from self._invoke_page_ranges(client, tool_parameters, file, page_ranges)
+                return
+
+            req = operations.PartitionRequest(
+                partition_parameters=self._build_partition_parameters(
+                    tool_parameters, file.blob, file.filename
+                )
+            )
             res = client.general.partition(request=req)
 
-            text = ""
             images = []
+            blobs: list[ToolInvokeMessage] = []
             elements = res.elements
-            for element in elements:
-                if element["type"] == "Image":
-                    base64_data = element["metadata"]["image_base64"]
-                    image_bytes = base64.b64decode(base64_data)
-                    mime_type = element["metadata"]["image_mime_type"]
-                    extension = guess_extension(mime_type)
-                    image_name = f"image_{element['element_id']}{extension}"
-                    file_res = self.session.file.upload(
-                        element["element_id"],
-                        image_bytes,
-                        mimetype=mime_type,
-                    )
-                    images.append(file_res)
-                    element["metadata"]["preview_url"] = file_res.preview_url
-                    element["metadata"]["dify_file_id"] = file_res.id
-                    element["metadata"].pop("image_base64")
-                    text += f"![]({file_res.preview_url})\n"
-                    if not file_res.preview_url:
-                        yield self.create_blob_message(
-                            image_bytes,
-                            meta={"filename": image_name, "mime_type": mime_type},
-                        )
-
-                if "orig_elements" in element["metadata"]:
-                    # ...get the chunk's associated elements in context...
-                    orig_elements = json.loads(
-                        self.extract_orig_elements(element["metadata"]["orig_elements"])
-                    )
-
-                    for orig_element in orig_elements:
-                        if orig_element["type"] == "Image":
-                            if orig_element["metadata"].get("image_base64"):
-                                base64_data = orig_element["metadata"]["image_base64"]
-                                image_bytes = base64.b64decode(base64_data)
-                                mime_type = orig_element["metadata"]["image_mime_type"]
-                                extension = guess_extension(mime_type)
-                                image_name = (
-                                    f"image_{orig_element['element_id']}{extension}"
-                                )
-                                file_res = self.session.file.upload(
-                                    orig_element["element_id"],
-                                    image_bytes,
-                                    mimetype=mime_type,
-                                )
-                                images.append(file_res)
-                                orig_element["metadata"]["preview_url"] = (
-                                    file_res.preview_url
-                                )
-                                orig_element["metadata"]["dify_file_id"] = file_res.id
-                                orig_element["metadata"].pop("image_base64")
-                                text += f"![]({file_res.preview_url})\n"
-
-                    element["metadata"]["orig_elements"] = orig_elements
-
-                text += element["text"]
+            text = self._process_elements(elements, images, blobs)
+            yield from blobs
 
             yield self.create_text_message(text)
             yield self.create_variable_message("images", images)
@@ -191,3 +224,68 @@ class PartitionTool(Tool):
         except Exception as e:
             logger.exception(f"Partition request failed. msg:{e} ")
             raise Exception(f"Partition request failed. msg:{e}")
+
+    def _invoke_page_ranges(
+        self,
+        client: unstructured_client.UnstructuredClient,
+        tool_parameters: dict[str, Any],
+        file: Any,
+        page_ranges: list[tuple[int, int, bytes]],
+    ) -> Generator[ToolInvokeMessage]:
+        """
+        Partition page ranges concurrently and yield each range's elements in page order.
+
+        Elements are released after their range is yielded, so the `elements` variable
+        is not produced; each range is returned as a JSON message instead.
+        """
+        advanced_options = json.loads(tool_parameters.get("advanced_options", "{}"))
+        first_page_number = int(advanced_options.get("starting_page_number") or 1)
+
+        def partition_range(first_page: int, content: bytes) -> list[dict]:
+            req = operations.PartitionRequest(
+                partition_parameters=self._build_partition_parameters(
+                    tool_parameters,
+                    content,
+                    file.filename,
+                    starting_page_number=first_page_number + first_page - 1,
+                    split_pdf_page=False,
+                )
+            )
+            return client.general.partition(request=req).elements
+
+        images = []
+        with ThreadPoolExecutor(
+            max_workers=min(MAX_CONCURRENT_RANGES, len(page_ranges))
+        ) as executor:
+            pending = {
+                executor.submit(partition_range, first_page, content): index
+                for index, (first_page, _, content) in enumerate(page_ranges)
+            }
+            finished: dict[int, list[dict]] = {}
+            next_index = 0
+            try:
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        finished[pending.pop(future)] = future.result()
+                    # reassemble in page order, yielding every range that is ready
+                    while next_index in finished:
+                        first_page, last_page, _ = page_ranges[next_index]
+                        elements = finished.pop(next_index)
+                        next_index += 1
+
+                        blobs: list[ToolInvokeMessage] = []
+                        text = self._process_elements(elements, images, blobs)
+                        yield from blobs
+                        yield self.create_text_message(text)
+                        yield self.create_json_message(
+                            {
+                                "first_page": first_page_number + first_page - 1,
+                                "last_page": first_page_number + last_page - 1,
+                                "elements": elements,
+                            }
+                        )
+            finally:
+                for future in pending:
+                    future.cancel()
+        yield self.create_variable_message("images", images)
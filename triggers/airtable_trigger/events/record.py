@@ -5,38 +5,49 @@ import httpx
 from werkzeug import Request
 
 from dify_plugin.entities.trigger import Variables
+from dify_plugin.errors.trigger import EventIgnoreError
 from dify_plugin.interfaces.trigger import Event
 
+from provider.payload_pump import group_changes
+
 
 class RecordCreatedEvent(Event):
     """Triggered when a new Airtable record is created."""
 
     def _on_event(self, request: Request, parameters: Mapping[str, Any], payload: Mapping[str, Any]) -> Variables:
-        """Process Airtable webhook notification and fetch actual payload data.
-        
+        """Return the webhook payloads fetched for the notification.
+
         Airtable sends a notification ping that doesn't contain the actual data.
-        We need to fetch the payload from the API using the webhook ID.
+        The payloads are fetched once per ping by the trigger, from the saved cursor,
+        and delivered here together with their record changes grouped by table.
+        A manual cursor replays the payloads from that cursor instead.
         """
-        # Get base_id and webhook_id from the notification payload
-        payload = request.get_json()
+        manual_cursor = parameters.get("cursor")
+        if manual_cursor:
+            return self._replay_from_cursor(request, parameters, int(manual_cursor))
+
+        payloads = payload.get("payloads") or []
+        if not payloads:
+            raise EventIgnoreError()
+
+        return Variables(variables={
+            "base_id": payload.get("base_id"),
+            "webhook_id": payload.get("webhook_id"),
+            "timestamp": payload.get("timestamp"),
+            "cursor": payload.get("cursor"),
+            "payloads": payloads,
+            "tables": payload.get("tables") or group_changes(payloads),
+        })
+
+    def _replay_from_cursor(self, request: Request, parameters: Mapping[str, Any], cursor: int) -> Variables:
+        """Fetch one page of payloads from a manual cursor, leaving the saved cursor as it is."""
+        notification = request.get_json()
+
+        base_id = notification.get("base", {}).get("id")
+        webhook_id = notification.get("webhook", {}).get("id")
 
-        base_id = payload.get("base", {}).get("id")
-        webhook_id = payload.get("webhook", {}).get("id")
-        
         # Get limit from parameters (default to 1, max 50 per Airtable API)
         limit = min(parameters.get("limit", 1), 50)
-        
-        # Get cursor - priority: manual input > saved value > None (first time)
-        manual_cursor = parameters.get("cursor")
-        saved_cursor_key = f"airtable_cursor_{base_id}_{webhook_id}"
-        
-        if manual_cursor:
-            cursor = manual_cursor
-        elif self.runtime.session.storage.exist(saved_cursor_key):
-            cursor_bytes = self.runtime.session.storage.get(saved_cursor_key)
-            cursor = int.from_bytes(cursor_bytes, byteorder='big')
-        else:
-            cursor = None
 
         access_token = self.runtime.credentials.get("access_token")
 
@@ -44,34 +55,22 @@ class RecordCreatedEvent(Event):
             "Authorization": f"Bearer {access_token}",
             "Content-Type": "application/json",
         }
-        
-        # Build params - only include cursor if we have one
-        params: dict[str, Any] = {"limit": limit}
-        if cursor is not None:
-            params["cursor"] = cursor
-            
+
         response = httpx.get(
                     f"https://api.airtable.com/v0/bases/{base_id}/webhooks/{webhook_id}/payloads",
                     headers=headers,
-                    params=params,
+                    params={"limit": limit, "cursor": cursor},
                     timeout=10
                 )
-        
+
         result = response.json()
         payloads = result.get("payloads", [])
-        
-        # Save the new cursor for next time
-        # Convert int to bytes for storage (use 4 bytes for cursor)
-        new_cursor = result.get("cursor")
-        if new_cursor is not None:
-            cursor_bytes = new_cursor.to_bytes(4, byteorder='big')
-            self.runtime.session.storage.set(saved_cursor_key, cursor_bytes)
-        
-        # Return the fetched payloads
+
         return Variables(variables={
             "base_id": base_id,
             "webhook_id": webhook_id,
-            "timestamp": payload.get("timestamp"),
-            "cursor": new_cursor,
+            "timestamp": notification.get("timestamp"),
+            "cursor": result.get("cursor"),
             "payloads": payloads,
+            "tables": group_changes(payloads),
         })
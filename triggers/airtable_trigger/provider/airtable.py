@@ -18,15 +18,57 @@ from dify_plugin.errors.trigger import (
 )
 from dify_plugin.interfaces.trigger import Trigger, TriggerSubscriptionConstructor
 
+from .payload_pump import PayloadPump, PumpResult, group_changes
+
 
 class AirtableTrigger(Trigger):
     """Handle Airtable webhook event dispatch."""
 
+    _API_BASE_URL = "https://api.airtable.com/v0"
+
     def _dispatch_event(self, subscription: Subscription, request: Request) -> EventDispatch:
-        self._validate_payload(subscription, request)
+        notification = self._validate_payload(subscription, request)
         response = Response(response="ok", status=200)
+
+        base_id = (notification.get("base") or {}).get("id")
+        webhook_id = (notification.get("webhook") or {}).get("id")
+        if not base_id or not webhook_id:
+            raise TriggerDispatchError("Missing base or webhook ID in notification")
+
+        # Pings covered by a fetch for an earlier one, or with no new payloads, start no workflow
+        result = self._pump_payloads(base_id, webhook_id)
+        if result is None or not result.payloads:
+            return EventDispatch(events=[], response=response)
+
         events: list[str] = self._dispatch_trigger_events()
-        return EventDispatch(events=events, response=response)
+        payload = {
+            "base_id": base_id,
+            "webhook_id": webhook_id,
+            "timestamp": notification.get("timestamp"),
+            "cursor": result.cursor,
+            "payloads": result.payloads,
+            "tables": group_changes(result.payloads),
+        }
+        return EventDispatch(events=events, response=response, payload=payload)
+
+    def _pump_payloads(self, base_id: str, webhook_id: str) -> PumpResult | None:
+        """Fetch the payloads since the stored cursor, following pagination, and commit the new cursor."""
+        access_token = (self.runtime.credentials or {}).get("access_token")
+        headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json",
+        }
+        url = f"{self._API_BASE_URL}/bases/{base_id}/webhooks/{webhook_id}/payloads"
+
+        with httpx.Client(headers=headers, timeout=10) as client:
+
+            def get_page(params: Mapping[str, Any]) -> Mapping[str, Any]:
+                response = client.get(url, params=params)
+                if response.status_code != 200:
+                    raise TriggerDispatchError(f"Failed to fetch Airtable payloads: {response.text}")
+                return response.json()
+
+            return PayloadPump(self.runtime.session.storage, base_id, webhook_id).run(get_page)
 
     def _dispatch_trigger_events(self) -> list[str]:
         """Dispatch events based on Airtable webhook payload.
@@ -39,7 +81,8 @@ class AirtableTrigger(Trigger):
         }
         
         Note: Airtable doesn't send the actual changed data in the notification.
-        The notification is just a ping that tells you to fetch the payloads.
+        The notification is just a ping that tells you to fetch the payloads,
+        which is done once per ping in _dispatch_event for all workflows.
         """
         return ["record"]
 
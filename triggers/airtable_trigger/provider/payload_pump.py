@@ -0,0 +1,210 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# the most payloads Airtable returns per request
+PAGE_LIMIT = 50
+# pages read per ping; the rest is read on the next one
+MAX_PAGES = 20
+# a fetch lease left behind by a crashed process is taken over after this long
+LEASE_SECONDS = 30
+LEASE_POLL_SECONDS = 0.5
+
+
+def cursor_key(base_id: str, webhook_id: str) -> str:
+    return f"airtable_cursor_{base_id}_{webhook_id}"
+
+
+def encode_cursor(cursor: int) -> bytes:
+    # big-endian, in at least the 4 bytes earlier versions stored
+    return cursor.to_bytes(max(4, (cursor.bit_length() + 7) // 8), byteorder="big")
+
+
+def decode_cursor(data: bytes) -> int:
+    return int.from_bytes(data, byteorder="big")
+
+
+@dataclass
+class _WebhookState:
+    lock: threading.Lock
+    # pings received, and how many of them had arrived when the last fetch started
+    received: int = 0
+    covered: int = 0
+
+
+_webhooks: dict[str, _WebhookState] = {}
+_webhooks_guard = threading.Lock()
+
+
+def _webhook_state(key: str) -> _WebhookState:
+    with _webhooks_guard:
+        state = _webhooks.get(key)
+        if state is None:
+            state = _webhooks[key] = _WebhookState(lock=threading.Lock())
+        return state
+
+
+@dataclass
+class PumpResult:
+    payloads: list[dict[str, Any]]
+    cursor: int
+
+
+class PayloadPump:
+    """Read the payloads of an Airtable webhook since its stored cursor, one fetch at a time.
+
+    Airtable notifications are pings without data, sent for every change. Fetches of a
+    webhook are serialized, by a lock within the process and by a lease in the plugin
+    storage across processes, and each follows ``mightHaveMore`` to the end in one pass.
+    Pings that arrived before a fetch started are covered by it and read nothing, so
+    the pings that arrive while a fetch runs are served together by one more fetch.
+    The cursor is committed once, with a single write after the pages were read.
+    """
+
+    def __init__(self, storage: Any, base_id: str, webhook_id: str):
+        self._storage = storage
+        self._cursor_key = cursor_key(base_id, webhook_id)
+        self._lease_key = f"airtable_fetch_lease_{base_id}_{webhook_id}"
+        self._state = _webhook_state(f"{base_id}:{webhook_id}")
+
+    def run(self, get_page: Callable[[Mapping[str, Any]], Mapping[str, Any]]) -> PumpResult | None:
+        """Return the new payloads, or None if an earlier fetch covered this ping.
+
+        ``get_page`` requests one page of the webhook's payloads with the given params.
+        """
+        state = self._state
+        with _webhooks_guard:
+            state.received += 1
+            ticket = state.received
+
+        with state.lock:
+            if state.covered >= ticket:
+                return None
+            with _webhooks_guard:
+                covered = state.received
+            owner = self._acquire_lease()
+            try:
+                result = self._fetch(get_page)
+            finally:
+                self._release_lease(owner)
+            state.covered = covered
+            return result
+
+    def _fetch(self, get_page: Callable[[Mapping[str, Any]], Mapping[str, Any]]) -> PumpResult:
+        start = decode_cursor(self._storage.get(self._cursor_key)) if self._storage.exist(self._cursor_key) else None
+        cursor = start
+        payloads: list[dict[str, Any]] = []
+        for page in range(MAX_PAGES):
+            params: dict[str, Any] = {"limit": PAGE_LIMIT}
+            if cursor is not None:
+                params["cursor"] = cursor
+            try:
+                data = get_page(params)
+            except Exception as exc:
+                if not page:
+                    raise
+                # keep what was read; the rest is read on the next ping
+                logger.warning(f"Failed to read Airtable payloads after cursor {cursor}: {exc}")
+                break
+            payloads.extend(data.get("payloads") or [])
+            if data.get("cursor") is not None:
+                cursor = int(data["cursor"])
+            if not data.get("mightHaveMore"):
+                break
+
+        if cursor is not None and cursor != start:
+            self._storage.set(self._cursor_key, encode_cursor(cursor))
+        return PumpResult(payloads=payloads, cursor=cursor if cursor is not None else 0)
+
+    def _read_lease(self) -> dict[str, Any] | None:
+        if not self._storage.exist(self._lease_key):
+            return None
+        try:
+            return json.loads(self._storage.get(self._lease_key).decode("utf-8"))
+        except ValueError:
+            return None
+
+    def _acquire_lease(self) -> str:
+        """Wait for another process's fetch of the webhook to finish, then claim the next one.
+
+        The plugin storage has no compare-and-set, so the lease is read back after writing
+        it, and a process that lost the race waits for the winner.
+        """
+        owner = uuid.uuid4().hex
+        while True:
+            lease = self._read_lease()
+            if lease is None or lease.get("expires_at", 0) < time.time():
+                self._storage.set(
+                    self._lease_key,
+                    json.dumps({"owner": owner, "expires_at": time.time() + LEASE_SECONDS}).encode("utf-8"),
+                )
+                lease = self._read_lease()
+                if lease is not None and lease.get("owner") == owner:
+                    return owner
+            time.sleep(LEASE_POLL_SECONDS)
+
+    def _release_lease(self, owner: str) -> None:
+        lease = self._read_lease()
+        if lease is not None and lease.get("owner") == owner:
+            self._storage.delete(self._lease_key)
+
+
+def group_changes(payloads: list[Mapping[str, Any]]) -> dict[str, dict[str, Any]]:
+    """Merge the record changes of many payloads, per table.
+
+    For every table: the records created, updated and deleted over all payloads, by id,
+    with their latest cell values, and for every changed field the records it changed in.
+    A record created and then updated is reported as created with its latest values; a
+    record deleted is only reported as deleted.
+    """
+    tables: dict[str, dict[str, Any]] = {}
+    for payload in payloads:
+        for table_id, changes in (payload.get("changedTablesById") or {}).items():
+            table = tables.setdefault(table_id, {"created": {}, "updated": {}, "deleted": [], "changed_fields": {}})
+            for record_id, record in (changes.get("createdRecordsById") or {}).items():
+                table["created"][record_id] = {
+                    "id": record_id,
+                    "createdTime": record.get("createdTime"),
+                    "fields": dict(record.get("cellValuesByFieldId") or {}),
+                }
+            for record_id, record in (changes.get("changedRecordsById") or {}).items():
+                current = (record.get("current") or {}).get("cellValuesByFieldId") or {}
+                previous = (record.get("previous") or {}).get("cellValuesByFieldId") or {}
+                for field_id in current:
+                    table["changed_fields"].setdefault(field_id, [])
+                    if record_id not in table["changed_fields"][field_id]:
+                        table["changed_fields"][field_id].append(record_id)
+                if record_id in table["created"]:
+                    table["created"][record_id]["fields"].update(current)
+                    continue
+                updated = table["updated"].setdefault(record_id, {"id": record_id, "fields": {}, "previous": {}})
+                updated["fields"].update(current)
+                for field_id, value in previous.items():
+                    # the value before the first change of the batch
+                    updated["previous"].setdefault(field_id, value)
+            for record_id in changes.get("destroyedRecordIds") or []:
+                table["created"].pop(record_id, None)
+                table["updated"].pop(record_id, None)
+                if record_id not in table["deleted"]:
+                    table["deleted"].append(record_id)
+
+    return {
+        table_id: {
+            "created": list(table["created"].values()),
+            "updated": list(table["updated"].values()),
+            "deleted": table["deleted"],
+            "changed_fields": {
+                field_id: [record_id for record_id in record_ids if record_id not in table["deleted"]]
+                for field_id, record_ids in table["changed_fields"].items()
+                if set(record_ids) - set(table["deleted"])
+            },
+        }
+        for table_id, table in tables.items()
+    }
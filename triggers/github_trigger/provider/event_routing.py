@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import hashlib
+import hmac
+import urllib.parse
+from collections.abc import Mapping
+from typing import Any
+
+import orjson
+
+from dify_plugin.errors.trigger import TriggerDispatchError, TriggerValidationError
+
+# GitHub webhook event -> trigger events, for events not split by action
+_EVENT_ROUTES: dict[str, tuple[str, ...]] = {
+    **{
+        event_type: (event_type,)
+        for event_type in (
+            # core, review and CI events
+            "issues",
+            "issue_comment",
+            "pull_request",
+            "pull_request_review",
+            "pull_request_review_comment",
+            "check_suite",
+            "check_run",
+            "workflow_run",
+            "workflow_job",
+            "push",
+            "star",
+            "code_scanning_alert",
+            "commit_comment",
+            "status",
+            "deployment",
+            "dependabot_alert",
+            "repository_vulnerability_alert",
+            "branch_protection_configuration",
+            "branch_protection_rule",
+            "repository_ruleset",
+            # additional events
+            "discussion",
+            "discussion_comment",
+            "fork",
+            "gollum",
+            "issue_dependencies",
+            "sub_issues",
+            "label",
+            "member",
+            "merge_group",
+            "meta",
+            "milestone",
+            "package",
+            "registry_package",
+            "page_build",
+            "ping",
+            "project",
+            "project_column",
+            "project_card",
+            "public",
+            "pull_request_review_thread",
+            "repository",
+            "repository_import",
+            "repository_advisory",
+            "security_and_analysis",
+            "custom_property_values",
+            "deploy_key",
+            "watch",
+        )
+    },
+    "secret_scanning_alert": ("secret_scanning",),
+    "secret_scanning_alert_location": ("secret_scanning",),
+    "secret_scanning_scan": ("secret_scanning",),
+    "create": ("ref_change",),
+    "delete": ("ref_change",),
+}
+
+# (GitHub webhook event, action) -> trigger events, for events with a trigger event per action
+_ACTION_ROUTES: dict[tuple[str, str], tuple[str, ...]] = {
+    ("deployment_status", "created"): ("deployment_status_created",),
+    ("release", "published"): ("release_published",),
+}
+_ACTION_EVENTS = frozenset(event_type for event_type, _ in _ACTION_ROUTES)
+
+
+def is_routed(event_type: str) -> bool:
+    """Whether any trigger event can be dispatched for the GitHub event."""
+    event_type = event_type.lower()
+    return event_type in _EVENT_ROUTES or event_type in _ACTION_EVENTS
+
+
+def route_event(event_type: str, payload: Mapping[str, Any]) -> list[str]:
+    """Return the trigger events of a GitHub webhook delivery."""
+    event_type = event_type.lower()
+    events = _EVENT_ROUTES.get(event_type)
+    if events is not None:
+        return list(events)
+    if event_type in _ACTION_EVENTS:
+        action = payload.get("action")
+        if not action:
+            raise TriggerDispatchError(f"GitHub event '{event_type}' missing action in payload")
+        return list(_ACTION_ROUTES.get((event_type, action), ()))
+    return []
+
+
+def verify_signature(body: bytes, signature: str | None, webhook_secret: str) -> None:
+    """Check the ``X-Hub-Signature-256`` header against the raw request body."""
+    if not signature:
+        raise TriggerValidationError("Missing webhook signature")
+
+    expected_signature = "sha256=" + hmac.new(webhook_secret.encode(), body, hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(signature, expected_signature):
+        raise TriggerValidationError("Invalid webhook signature")
+
+
+def parse_payload(body: bytes, content_type: str) -> Mapping[str, Any]:
+    """Parse the raw body of a webhook delivery, sent as JSON or as a ``payload`` form field."""
+    try:
+        if "application/x-www-form-urlencoded" in content_type:
+            form_data = urllib.parse.parse_qs(body).get(b"payload")
+            if not form_data or not form_data[0]:
+                raise TriggerDispatchError("Missing payload in form data")
+            body = form_data[0]
+        payload = orjson.loads(body) if body else None
+        if not payload:
+            raise TriggerDispatchError("Empty request body")
+        return payload
+    except TriggerDispatchError:
+        raise
+    except Exception as exc:
+        raise TriggerDispatchError(f"Failed to parse payload: {exc}") from exc
@@ -1,8 +1,5 @@
 from __future__ import annotations
 
-import hashlib
-import hmac
-import json
 import secrets
 import time
 import urllib.parse
@@ -22,151 +19,35 @@ from dify_plugin.errors.trigger import (
     TriggerDispatchError,
     TriggerProviderCredentialValidationError,
     TriggerProviderOAuthError,
-    TriggerValidationError,
 )
 from dify_plugin.interfaces.trigger import Trigger, TriggerSubscriptionConstructor
 
+from .event_routing import is_routed, parse_payload, route_event, verify_signature
+
 
 class GithubTrigger(Trigger):
     """Handle GitHub webhook event dispatch."""
 
     def _dispatch_event(self, subscription: Subscription, request: Request) -> EventDispatch:
+        # the signature is checked on the raw body, so a forged delivery is never parsed
+        body = request.get_data()
         webhook_secret = subscription.properties.get("webhook_secret")
         if webhook_secret:
-            self._validate_signature(request=request, webhook_secret=webhook_secret)
+            verify_signature(body, request.headers.get("X-Hub-Signature-256"), webhook_secret)
 
         event_type: str | None = request.headers.get("X-GitHub-Event")
         if not event_type:
             raise TriggerDispatchError("Missing GitHub event type header")
 
-        payload: Mapping[str, Any] = self._validate_payload(request)
-        user_id = str(payload.get("sender", {}).get("id", "unknown"))
         response = Response(response='{"status": "ok"}', status=200, mimetype="application/json")
-        events: list[str] = self._dispatch_trigger_events(event_type=event_type, payload=payload)
-        return EventDispatch(user_id=user_id, events=events, response=response)
+        if not is_routed(event_type):
+            # no trigger event for it, so there is nothing to parse
+            return EventDispatch(events=[], response=response)
 
-    def _dispatch_trigger_events(self, event_type: str, payload: Mapping[str, Any]) -> list[str]:
-        event_type = event_type.lower()
-        action: str | None = payload.get("action")
-        # Unified core events (breaking change): issues / issue_comment / pull_request
-        if event_type in {"issues", "issue_comment", "pull_request"}:
-            return [event_type]
-
-        # Unified review & CI events (breaking change)
-        if event_type in {
-            "pull_request_review",
-            "pull_request_review_comment",
-            "check_suite",
-            "check_run",
-            "workflow_run",
-            "workflow_job",
-        }:
-            return [event_type]
-
-        if event_type in {"deployment_status", "release"}:
-            if not action:
-                raise TriggerDispatchError(f"GitHub event '{event_type}' missing action in payload")
-            return [f"{event_type}_{action}"]
-
-        if event_type == "push":
-            return ["push"]
-
-        if event_type == "star":
-            return ["star"]
-
-        # Unified events without action splitting
-        if event_type == "code_scanning_alert":
-            return ["code_scanning_alert"]
-
-        if event_type in {"secret_scanning_alert", "secret_scanning_alert_location", "secret_scanning_scan"}:
-            return ["secret_scanning"]
-
-        if event_type in {"create", "delete"}:
-            return ["ref_change"]
-
-        if event_type == "commit_comment":
-            return ["commit_comment"]
-
-        if event_type == "status":
-            return ["status"]
-
-        if event_type == "deployment":
-            return ["deployment"]
-
-        if event_type == "dependabot_alert":
-            return ["dependabot_alert"]
-
-        if event_type == "repository_vulnerability_alert":
-            return ["repository_vulnerability_alert"]
-
-        if event_type in {"branch_protection_configuration", "branch_protection_rule"}:
-            return [event_type]
-
-        if event_type == "repository_ruleset":
-            return ["repository_ruleset"]
-
-        # Additional unified GitHub events (breaking change by design)
-        if event_type in {
-            "discussion",
-            "discussion_comment",
-            "fork",
-            "gollum",
-            "issue_dependencies",
-            "sub_issues",
-            "label",
-            "member",
-            "merge_group",
-            "meta",
-            "milestone",
-            "package",
-            "registry_package",
-            "page_build",
-            "ping",
-            "project",
-            "project_column",
-            "project_card",
-            "public",
-            "pull_request_review_thread",
-            "repository",
-            "repository_import",
-            "repository_advisory",
-            "security_and_analysis",
-            "custom_property_values",
-            "deploy_key",
-            "watch",
-        }:
-            return [event_type]
-
-        return []
-
-    def _validate_payload(self, request: Request) -> Mapping[str, Any]:
-        try:
-            content_type = request.headers.get("Content-Type", "")
-            if "application/x-www-form-urlencoded" in content_type:
-                form_data = request.form.get("payload")
-                if not form_data:
-                    raise TriggerDispatchError("Missing payload in form data")
-                payload = json.loads(form_data)
-            else:
-                payload = request.get_json(force=True)
-            if not payload:
-                raise TriggerDispatchError("Empty request body")
-            return payload
-        except TriggerDispatchError:
-            raise
-        except Exception as exc:  # pragma: no cover - defensive logging path
-            raise TriggerDispatchError(f"Failed to parse payload: {exc}") from exc
-
-    def _validate_signature(self, request: Request, webhook_secret: str) -> None:
-        signature = request.headers.get("X-Hub-Signature-256")
-        if not signature:
-            raise TriggerValidationError("Missing webhook signature")
-
-        expected_signature = (
-            "sha256=" + hmac.new(webhook_secret.encode(), request.get_data(), hashlib.sha256).hexdigest()
-        )
-        if not hmac.compare_digest(signature, expected_signature):
-            raise TriggerValidationError("Invalid webhook signature")
+        payload: Mapping[str, Any] = parse_payload(body, request.headers.get("Content-Type", ""))
+        user_id = str(payload.get("sender", {}).get("id", "unknown"))
+        events: list[str] = route_event(event_type, payload)
+        return EventDispatch(user_id=user_id, events=events, response=response)
 
 
 class GithubSubscriptionConstructor(TriggerSubscriptionConstructor):
@@ -24,6 +24,8 @@ from dify_plugin.errors.trigger import (
 )
 from dify_plugin.interfaces.trigger import Trigger, TriggerSubscriptionConstructor
 
+from .history_sync import HistorySync
+
 
 class GmailTrigger(Trigger):
     """Handle Gmail Pub/Sub push event dispatch.
@@ -31,7 +33,7 @@ class GmailTrigger(Trigger):
     Responsibilities:
     - Optionally verify Pub/Sub OIDC JWT
     - Parse Pub/Sub envelope and Gmail notification
-    - Fetch Gmail history delta since last checkpoint
+    - Fetch Gmail history delta since last checkpoint, one sync per mailbox at a time
     - Split delta into concrete event families and stash batches
     - Return EventDispatch with events and a combined payload for convenience
     """
@@ -53,46 +55,33 @@ class GmailTrigger(Trigger):
         headers = {"Authorization": f"Bearer {access_token}"}
         user_id: str = "me"
 
-        # 4) Prepare storage keys and checkpoint
+        # 4) Fetch history delta since last checkpoint; notifications already covered by
+        # an earlier sync of the mailbox, and the first one, have nothing to dispatch
         sub_key = props.get("subscription_key") or ""
-        checkpoint_key = f"gmail:{sub_key}:history_checkpoint"
-        # storage keys kept for backward compatibility in events fallback; we no longer write pending batches
-
-        session = self.runtime.session
-        if not session.storage.exist(checkpoint_key):
-            # First notification: initialize checkpoint and return 200
-            session.storage.set(checkpoint_key, str(notification["historyId"]).encode("utf-8"))
-            return EventDispatch(events=[], response=self._ok())
-
-        start_history_id: str = session.storage.get(checkpoint_key).decode("utf-8")
-
-        # 5) Fetch history delta since last checkpoint
-        messages, added, deleted, labels_added, labels_removed = self._fetch_history_delta(
-            headers=headers,
-            user_id=user_id,
-            start_history_id=start_history_id,
+        delta = HistorySync(self.runtime.session.storage, sub_key).run(
+            notification["historyId"],
+            lambda params: self._get_history_page(headers=headers, user_id=user_id, params=params),
         )
+        if delta is None:
+            return EventDispatch(events=[], response=self._ok())
 
-        # Always advance checkpoint to current notification's historyId
-        session.storage.set(checkpoint_key, str(notification["historyId"]).encode("utf-8"))
-
-        # 6) Build combined payload and select events (no storage stashing)
+        # 5) Build combined payload and select events (no storage stashing)
         events: list[str] = []
-        if added:
+        if delta.added:
             events.append("gmail_message_added")
-        if deleted:
+        if delta.deleted:
             events.append("gmail_message_deleted")
-        if labels_added:
+        if delta.labels_added:
             events.append("gmail_label_added")
-        if labels_removed:
+        if delta.labels_removed:
             events.append("gmail_label_removed")
         combined_payload = {
-            "historyId": str(notification["historyId"]),
-            "messages": messages,
-            "message_added": added,
-            "message_deleted": deleted,
-            "label_added": labels_added,
-            "label_removed": labels_removed,
+            "historyId": str(delta.history_id),
+            "messages": delta.messages,
+            "message_added": delta.added,
+            "message_deleted": delta.deleted,
+            "label_added": delta.labels_added,
+            "label_removed": delta.labels_removed,
         }
 
         return EventDispatch(events=events, response=self._ok(), payload=combined_payload)
@@ -136,68 +125,14 @@ class GmailTrigger(Trigger):
             raise TriggerDispatchError("Missing historyId or emailAddress in Gmail notification")
         return notification
 
-    def _fetch_history_delta(
+    def _get_history_page(
         self,
         headers: Mapping[str, str],
         user_id: str,
-        start_history_id: str,
-    ):
-        """Fetch Gmail history delta and return categorized changes.
-
-        If the start_history_id is invalid/out-of-date, reset the pointer and return empty changes.
-        """
-        added: list[dict[str, Any]] = []
-        deleted: list[dict[str, Any]] = []
-        labels_added: list[dict[str, Any]] = []
-        labels_removed: list[dict[str, Any]] = []
-        messages: list[dict[str, Any]] = []
-
+        params: Mapping[str, Any],
+    ) -> requests.Response:
         url = f"{self._GMAIL_BASE}/users/{user_id}/history"
-        params: dict[str, Any] = {"startHistoryId": start_history_id}
-
-        while True:
-            resp: requests.Response = requests.get(url, headers=headers, params=params, timeout=10)
-            if resp.status_code != 200:
-                # history id may be invalid/out of range; swallow this batch and move checkpoint forward by caller
-                return [], [], [], [], []
-            data: dict[str, Any] = resp.json() or {}
-            for h in data.get("history", []) or []:
-                for item in h.get("messagesAdded", []) or []:
-                    msg = item.get("message") or {}
-                    if not msg.get("id"):
-                        continue
-                    added.append({"id": msg.get("id"), "threadId": msg.get("threadId")})
-                for item in h.get("messagesDeleted", []) or []:
-                    msg = item.get("message") or {}
-                    if msg.get("id"):
-                        deleted.append({"id": msg.get("id"), "threadId": msg.get("threadId")})
-                for item in h.get("labelsAdded", []) or []:
-                    msg = item.get("message") or {}
-                    if msg.get("id"):
-                        labels_added.append(
-                            {
-                                "id": msg.get("id"),
-                                "threadId": msg.get("threadId"),
-                                "labelIds": item.get("labelIds") or [],
-                            }
-                        )
-                for item in h.get("labelsRemoved", []) or []:
-                    msg = item.get("message") or {}
-                    if msg.get("id"):
-                        labels_removed.append(
-                            {
-                                "id": msg.get("id"),
-                                "threadId": msg.get("threadId"),
-                                "labelIds": item.get("labelIds") or [],
-                            }
-                        )
-            page_token = data.get("nextPageToken")
-            if not page_token:
-                break
-            params["pageToken"] = page_token
-
-        messages.extend(added + deleted)
-        return messages, added, deleted, labels_added, labels_removed
+        return requests.get(url, headers=headers, params=params, timeout=10)
 
     def _verify_oidc_token(self, token: str, audience: str, expected_email: str | None = None) -> None:
         """Verify OIDC token from Pub/Sub push using google-auth if available."""
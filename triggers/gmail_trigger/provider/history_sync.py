@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+import uuid
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass, field
+from typing import Any
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# a sync lease left behind by a crashed process is taken over after this long; it is renewed
+# after every history page, so it only has to outlast one request (10 s timeout)
+LEASE_SECONDS = 30
+LEASE_POLL_SECONDS = 0.5
+# history pages read per sync; the rest is read on the next notification
+MAX_HISTORY_PAGES = 50
+
+_mailbox_locks: dict[str, threading.Lock] = {}
+_mailbox_locks_guard = threading.Lock()
+
+
+def _mailbox_lock(sub_key: str) -> threading.Lock:
+    with _mailbox_locks_guard:
+        return _mailbox_locks.setdefault(sub_key, threading.Lock())
+
+
+@dataclass
+class HistoryDelta:
+    """Changes read from the Gmail history, split into event families."""
+
+    history_id: int
+    added: list[dict[str, Any]] = field(default_factory=list)
+    deleted: list[dict[str, Any]] = field(default_factory=list)
+    labels_added: list[dict[str, Any]] = field(default_factory=list)
+    labels_removed: list[dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def messages(self) -> list[dict[str, Any]]:
+        return self.added + self.deleted
+
+    def add_page(self, data: Mapping[str, Any]) -> None:
+        for h in data.get("history", []) or []:
+            for item in h.get("messagesAdded", []) or []:
+                msg = item.get("message") or {}
+                if msg.get("id"):
+                    self.added.append({"id": msg.get("id"), "threadId": msg.get("threadId")})
+            for item in h.get("messagesDeleted", []) or []:
+                msg = item.get("message") or {}
+                if msg.get("id"):
+                    self.deleted.append({"id": msg.get("id"), "threadId": msg.get("threadId")})
+            for key, changes in (("labelsAdded", self.labels_added), ("labelsRemoved", self.labels_removed)):
+                for item in h.get(key, []) or []:
+                    msg = item.get("message") or {}
+                    if msg.get("id"):
+                        changes.append(
+                            {
+                                "id": msg.get("id"),
+                                "threadId": msg.get("threadId"),
+                                "labelIds": item.get("labelIds") or [],
+                            }
+                        )
+            if h.get("id"):
+                self.history_id = max(self.history_id, int(h["id"]))
+
+
+class HistorySync:
+    """Read the Gmail history of a subscription's mailbox since its checkpoint, one sync at a time.
+
+    Pub/Sub delivers notifications in bursts, each carrying the mailbox's latest historyId.
+    Syncs of a mailbox are serialized, by a lock within the process and by a lease in the
+    plugin storage across processes. A notification whose historyId the checkpoint has
+    already passed is covered by an earlier sync and reads nothing, so a burst results in
+    one history read and one dispatch. The checkpoint only ever moves forward, and only
+    past the history that was read.
+    """
+
+    def __init__(self, storage: Any, sub_key: str):
+        self._storage = storage
+        self._checkpoint_key = f"gmail:{sub_key}:history_checkpoint"
+        self._lease_key = f"gmail:{sub_key}:sync_lease"
+        self._sub_key = sub_key
+
+    def run(
+        self,
+        notification_history_id: str | int,
+        get_page: Callable[[dict[str, Any]], requests.Response],
+    ) -> HistoryDelta | None:
+        """Sync up to the notification, returning None when there is nothing new to dispatch.
+
+        ``get_page`` requests one page of ``users.history.list`` with the given params.
+        """
+        target = int(notification_history_id)
+        with _mailbox_lock(self._sub_key):
+            owner = self._acquire_lease()
+            try:
+                checkpoint = self._read_checkpoint()
+                if checkpoint is None:
+                    # first notification: start from here
+                    self._write_checkpoint(target)
+                    return None
+                if checkpoint >= target:
+                    return None
+                delta = self._read_history(checkpoint, target, get_page, owner)
+                if delta is not None:
+                    self._write_checkpoint(max(checkpoint, delta.history_id))
+                return delta
+            finally:
+                self._release_lease(owner)
+
+    def _read_history(
+        self,
+        checkpoint: int,
+        target: int,
+        get_page: Callable[[dict[str, Any]], requests.Response],
+        owner: str,
+    ) -> HistoryDelta | None:
+        delta = HistoryDelta(history_id=checkpoint)
+        params: dict[str, Any] = {"startHistoryId": str(checkpoint)}
+        for page in range(MAX_HISTORY_PAGES):
+            if page and not self._renew_lease(owner):
+                # another process took the expired lease over and reads the same history
+                logger.warning(f"Lost the Gmail sync lease of {self._sub_key} after {page} pages")
+                return None
+            resp = get_page(params)
+            if resp.status_code == 404 and page == 0:
+                # the checkpoint is too old for Gmail to replay; skip to the notification
+                logger.warning(f"Gmail history {checkpoint} is no longer available, skipping to {target}")
+                delta.history_id = target
+                return delta
+            if resp.status_code != 200:
+                # keep the checkpoint after the pages read, the rest is read on the next notification
+                logger.warning(f"Failed to read Gmail history page {page}: {resp.status_code} {resp.text}")
+                return delta if page else None
+            data: dict[str, Any] = resp.json() or {}
+            delta.add_page(data)
+            page_token = data.get("nextPageToken")
+            if not page_token:
+                # the whole history was read, up to the mailbox's current historyId
+                delta.history_id = max(delta.history_id, target, int(data.get("historyId") or 0))
+                return delta
+            params["pageToken"] = page_token
+        return delta
+
+    def _read_checkpoint(self) -> int | None:
+        if not self._storage.exist(self._checkpoint_key):
+            return None
+        try:
+            return int(self._storage.get(self._checkpoint_key).decode("utf-8"))
+        except ValueError:
+            return None
+
+    def _write_checkpoint(self, history_id: int) -> None:
+        self._storage.set(self._checkpoint_key, str(history_id).encode("utf-8"))
+
+    def _read_lease(self) -> dict[str, Any] | None:
+        if not self._storage.exist(self._lease_key):
+            return None
+        try:
+            return json.loads(self._storage.get(self._lease_key).decode("utf-8"))
+        except ValueError:
+            return None
+
+    def _acquire_lease(self) -> str:
+        """Wait for another process's sync of the mailbox to finish, then claim the next one.
+
+        The plugin storage has no compare-and-set, so the lease is read back after writing
+        it, and a process that lost the race waits for the winner.
+        """
+        owner = uuid.uuid4().hex
+        while True:
+            lease = self._read_lease()
+            if lease is None or lease.get("expires_at", 0) < time.time():
+                self._storage.set(
+                    self._lease_key,
+                    json.dumps({"owner": owner, "expires_at": time.time() + LEASE_SECONDS}).encode("utf-8"),
+                )
+                lease = self._read_lease()
+                if lease is not None and lease.get("owner") == owner:
+                    return owner
+            time.sleep(LEASE_POLL_SECONDS)
+
+    def _renew_lease(self, owner: str) -> bool:
+        """Extend the lease for the next request, returning False if it is no longer ours."""
+        lease = self._read_lease()
+        if lease is None or lease.get("owner") != owner:
+            return False
+        self._storage.set(
+            self._lease_key,
+            json.dumps({"owner": owner, "expires_at": time.time() + LEASE_SECONDS}).encode("utf-8"),
+        )
+        return True
+
+    def _release_lease(self, owner: str) -> None:
+        lease = self._read_lease()
+        if lease is not None and lease.get("owner") == owner:
+            self._storage.delete(self._lease_key)
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+from typing import Any
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# notifications of a channel arriving this soon after each other are served by one fetch
+COALESCE_WINDOW_SECONDS = 0.5
+
+_http_session: requests.Session | None = None
+_http_session_lock = threading.Lock()
+
+
+def http_session() -> requests.Session:
+    """A session shared by all requests to the Calendar API, so connections are reused."""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+            _http_session = session
+        return _http_session
+
+
+def event_version(item: Mapping[str, Any]) -> str:
+    """An event as of one change: its id and ``updated`` time."""
+    return f"{item.get('id')}:{item.get('updated')}"
+
+
+@dataclass
+class _ChannelState:
+    lock: threading.Lock
+    # notifications received, and how many of them had arrived when the last fetch started
+    received: int = 0
+    covered: int = 0
+
+
+_channels: dict[str, _ChannelState] = {}
+_channels_guard = threading.Lock()
+
+
+def _channel_state(key: str) -> _ChannelState:
+    with _channels_guard:
+        state = _channels.get(key)
+        if state is None:
+            state = _channels[key] = _ChannelState(lock=threading.Lock())
+        return state
+
+
+class ChannelSync:
+    """Fetch the changes of a notification channel once per burst of notifications.
+
+    Google Calendar sends a notification per change, so a busy calendar produces bursts
+    of them for the same channel. A notification first waits for the coalescing window,
+    then fetches the changes since the stored sync token; notifications that arrived
+    before that fetch started are covered by it and fetch nothing. Fetches of a channel
+    run one at a time.
+
+    The version of every dispatched event, its id and ``updated`` time, is remembered in
+    the plugin storage, so a change read twice, like by two plugin processes, is only
+    dispatched once.
+    """
+
+    def __init__(self, storage: Any, subscription_key: str, channel_id: str, max_seen: int):
+        self._storage = storage
+        self._max_seen = max_seen
+        self._seen_key = f"gcal:{subscription_key}:seen_events"
+        self._state = _channel_state(f"{subscription_key}:{channel_id}")
+
+    def run(self, fetch: Callable[[], list[dict[str, Any]]]) -> list[dict[str, Any]] | None:
+        """Return the changes not dispatched yet, or None if an earlier fetch covered this notification."""
+        state = self._state
+        with _channels_guard:
+            state.received += 1
+            ticket = state.received
+
+        with state.lock:
+            if state.covered >= ticket:
+                return None
+            time.sleep(COALESCE_WINDOW_SECONDS)
+            with _channels_guard:
+                covered = state.received
+            items = fetch()
+            # only once the fetch went through, so a failed one is retried by the next notification
+            state.covered = covered
+            return self._unseen(items)
+
+    def _unseen(self, items: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        seen = self._read_seen()
+        unseen: list[dict[str, Any]] = []
+        for item in items:
+            version = event_version(item)
+            if version in seen:
+                seen.move_to_end(version)
+                continue
+            seen[version] = None
+            unseen.append(item)
+        while len(seen) > self._max_seen:
+            seen.popitem(last=False)
+        if items:
+            self._storage.set(self._seen_key, json.dumps(list(seen)).encode("utf-8"))
+        return unseen
+
+    def _read_seen(self) -> OrderedDict[str, None]:
+        if not self._storage.exist(self._seen_key):
+            return OrderedDict()
+        try:
+            versions = json.loads(self._storage.get(self._seen_key).decode("utf-8"))
+        except ValueError:
+            logger.warning("Discarding unreadable seen events of a Google Calendar subscription")
+            return OrderedDict()
+        return OrderedDict.fromkeys(v for v in versions if isinstance(v, str))
@@ -26,6 +26,8 @@ from dify_plugin.errors.trigger import (
 )
 from dify_plugin.interfaces.trigger import Trigger, TriggerSubscriptionConstructor
 
+from .channel_sync import ChannelSync, http_session
+
 _CALENDAR_API_BASE = "https://www.googleapis.com/calendar/v3"
 
 
@@ -90,7 +92,7 @@ def _retrieve_sync_token(
 
     while True:
         try:
-            resp = requests.get(url, headers=headers, params=params, timeout=10)
+            resp = http_session().get(url, headers=headers, params=params, timeout=10)
         except requests.RequestException as exc:
             raise error_factory(f"Network error while obtaining sync token: {exc}") from exc
 
@@ -190,42 +192,48 @@ class GoogleCalendarTrigger(Trigger):
         sync_storage_key = f"gcal:{subscription_key}:sync_token"
 
         # Ensure we have a sync token persisted for incremental fetches
-        sync_token: str | None = None
-        initialized_now = False
-        if session.storage.exist(sync_storage_key):
-            sync_token = session.storage.get(sync_storage_key).decode("utf-8")
-        else:
+        if not session.storage.exist(sync_storage_key):
             initial_sync = properties.get("initial_sync_token")
             if initial_sync:
-                sync_token = str(initial_sync)
-                session.storage.set(sync_storage_key, sync_token.encode("utf-8"))
+                session.storage.set(sync_storage_key, str(initial_sync).encode("utf-8"))
             else:
                 sync_token = self._bootstrap_sync_token(access_token=access_token, calendar_id=calendar_id)
                 session.storage.set(sync_storage_key, sync_token.encode("utf-8"))
-                initialized_now = True
-
-        if initialized_now:
-            # No events to emit on initial bootstrap
-            return EventDispatch(events=[], response=self._ok())
+                # No events to emit on initial bootstrap
+                return EventDispatch(events=[], response=self._ok())
 
         # The first webhook after a watch is created has resourceState=sync; nothing to process.
         if resource_state == "sync":
             return EventDispatch(events=[], response=self._ok())
 
-        try:
-            items, next_sync_token = self._fetch_events_delta(
-                access_token=access_token,
-                calendar_id=calendar_id,
-                sync_token=sync_token,
-            )
-        except SyncTokenExpiredError:
-            fresh_token = self._bootstrap_sync_token(access_token=access_token, calendar_id=calendar_id)
-            if fresh_token:
-                session.storage.set(sync_storage_key, fresh_token.encode("utf-8"))
-            return EventDispatch(events=[], response=self._ok())
+        next_sync_token: str | None = None
 
-        if next_sync_token:
-            session.storage.set(sync_storage_key, next_sync_token.encode("utf-8"))
+        def fetch() -> list[dict[str, Any]]:
+            nonlocal next_sync_token
+            # read under the channel's lock, after the previous fetch stored its token
+            sync_token = session.storage.get(sync_storage_key).decode("utf-8")
+            try:
+                items, next_sync_token = self._fetch_events_delta(
+                    access_token=access_token,
+                    calendar_id=calendar_id,
+                    sync_token=sync_token,
+                )
+            except SyncTokenExpiredError:
+                fresh_token = self._bootstrap_sync_token(access_token=access_token, calendar_id=calendar_id)
+                if fresh_token:
+                    session.storage.set(sync_storage_key, fresh_token.encode("utf-8"))
+                return []
+            if next_sync_token:
+                session.storage.set(sync_storage_key, next_sync_token.encode("utf-8"))
+            return items
+
+        # Notifications of a burst are served by one fetch, and changes already dispatched are dropped
+        channel_sync = ChannelSync(
+            session.storage, subscription_key, channel_id or resource_id, max_seen=self._MAX_SEEN_EVENT_IDS
+        )
+        items = channel_sync.run(fetch)
+        if items is None:
+            return EventDispatch(events=[], response=self._ok())
 
         created: list[dict[str, Any]] = []
         updated: list[dict[str, Any]] = []
@@ -310,7 +318,7 @@ class GoogleCalendarTrigger(Trigger):
 
         while True:
             try:
-                resp = requests.get(url, headers=headers, params=params, timeout=10)
+                resp = http_session().get(url, headers=headers, params=params, timeout=10)
             except requests.RequestException as exc:
                 raise TriggerDispatchError(f"Network error while fetching calendar delta: {exc}") from exc
 